@@ -0,0 +1,54 @@
+"""Add conversation_summaries for compacted snapshot history
+
+Revision ID: add_conversation_summaries
+Revises: add_task_dedup_key
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "add_conversation_summaries"
+down_revision: Union[str, None] = "add_task_dedup_key"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "conversation_summaries",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("kind", sa.String(20), nullable=False),
+        sa.Column("summary", sa.Text(), nullable=False),
+        sa.Column("turns", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("turn_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("first_turn_at", sa.String(64), nullable=True),
+        sa.Column("last_turn_at", sa.String(64), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "idx_conversation_summaries_user_kind_id",
+        "conversation_summaries",
+        ["user_id", "kind", "id"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "idx_conversation_summaries_user_kind_id", table_name="conversation_summaries"
+    )
+    op.drop_table("conversation_summaries")
@@ -0,0 +1,50 @@
+"""Add memory_snapshot_archive for snapshots expired by retention
+
+Revision ID: add_snapshot_archive
+Revises: add_snapshot_latest_index
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "add_snapshot_archive"
+down_revision: Union[str, None] = "add_snapshot_latest_index"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "memory_snapshot_archive",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False
+        ),
+        sa.Column("codename", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "archived_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True
+        ),
+        sa.Column("document", sa.LargeBinary(), nullable=False),
+        sa.Column("embedding_data", sa.LargeBinary(), nullable=True),
+    )
+    op.create_index(
+        "idx_memory_snapshot_archive_user_id_updated_at",
+        "memory_snapshot_archive",
+        ["user_id", sa.text("updated_at DESC")],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema (archived snapshots are dropped)."""
+    op.drop_index(
+        "idx_memory_snapshot_archive_user_id_updated_at", table_name="memory_snapshot_archive"
+    )
+    op.drop_table("memory_snapshot_archive")
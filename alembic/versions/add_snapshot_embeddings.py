@@ -0,0 +1,30 @@
+"""Store semantic-memory embeddings as a packed float32 blob
+
+Revision ID: add_snapshot_embeddings
+Revises: add_snapshot_sections
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "add_snapshot_embeddings"
+down_revision: Union[str, None] = "add_snapshot_sections"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows keep inline embeddings until next saved
+    op.add_column(
+        "memory_snapshots", sa.Column("embedding_data", sa.LargeBinary(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema (embeddings of rows saved since the upgrade are dropped)."""
+    op.drop_column("memory_snapshots", "embedding_data")
@@ -0,0 +1,31 @@
+"""Index memory_snapshots for the latest snapshot per user
+
+Revision ID: add_snapshot_latest_index
+Revises: add_snapshot_embeddings
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "add_snapshot_latest_index"
+down_revision: Union[str, None] = "add_snapshot_embeddings"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "idx_memory_snapshots_user_id_updated_at",
+        "memory_snapshots",
+        ["user_id", sa.text("updated_at DESC")],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("idx_memory_snapshots_user_id_updated_at", table_name="memory_snapshots")
@@ -0,0 +1,36 @@
+"""Split memory snapshots into separately written section columns
+
+Revision ID: add_snapshot_sections
+Revises: add_conversation_summaries
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "add_snapshot_sections"
+down_revision: Union[str, None] = "add_conversation_summaries"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SECTION_COLUMNS = ("hta_tree_data", "semantic_memory_data", "log_data", "section_hashes")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows keep their full document in snapshot_data until next saved
+    for name in SECTION_COLUMNS:
+        op.add_column(
+            "memory_snapshots",
+            sa.Column(name, postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema (sections of rows saved since the upgrade are dropped)."""
+    for name in reversed(SECTION_COLUMNS):
+        op.drop_column("memory_snapshots", name)
@@ -0,0 +1,35 @@
+"""Add dedup_key to task_queue_entries for coalescing duplicate tasks
+
+Revision ID: add_task_dedup_key
+Revises: add_task_queue_entries
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "add_task_dedup_key"
+down_revision: Union[str, None] = "add_task_queue_entries"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "task_queue_entries", sa.Column("dedup_key", sa.String(255), nullable=True)
+    )
+    op.create_index(
+        "idx_task_queue_dedup_key_status",
+        "task_queue_entries",
+        ["dedup_key", "status"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("idx_task_queue_dedup_key_status", table_name="task_queue_entries")
+    op.drop_column("task_queue_entries", "dedup_key")
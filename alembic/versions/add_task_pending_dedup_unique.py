@@ -0,0 +1,59 @@
+"""Allow one pending task per dedup key and record coalesced duplicates
+
+Revision ID: add_task_pending_dedup_unique
+Revises: unwrap_double_encoded_json
+
+Duplicates folded into a queued task are kept as ``coalesced`` rows pointing at
+that task, so callers can wait on the ID they chose. A partial unique index
+stops two workers from both queueing the same key; duplicates that slipped in
+before it existed are folded into the oldest pending task first.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "add_task_pending_dedup_unique"
+down_revision: Union[str, None] = "unwrap_double_encoded_json"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PENDING = "status = 'queued' AND attempts = 0"
+
+# Oldest pending task sharing the row's dedup key
+OLDEST_PENDING = (
+    "(SELECT k.id FROM task_queue_entries k "
+    "WHERE k.dedup_key = task_queue_entries.dedup_key "
+    "AND k.status = 'queued' AND k.attempts = 0 "
+    "ORDER BY k.created_at, k.id LIMIT 1)"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "task_queue_entries", sa.Column("coalesced_into", sa.String(64), nullable=True)
+    )
+    op.execute(
+        f"UPDATE task_queue_entries SET status = 'coalesced', "
+        f"coalesced_into = {OLDEST_PENDING} "
+        f"WHERE dedup_key IS NOT NULL AND {PENDING} AND id <> {OLDEST_PENDING}"
+    )
+    op.create_index(
+        "uq_task_queue_pending_dedup_key",
+        "task_queue_entries",
+        ["dedup_key"],
+        unique=True,
+        sqlite_where=sa.text(PENDING),
+        postgresql_where=sa.text(PENDING),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("uq_task_queue_pending_dedup_key", table_name="task_queue_entries")
+    op.execute("DELETE FROM task_queue_entries WHERE status = 'coalesced'")
+    op.drop_column("task_queue_entries", "coalesced_into")
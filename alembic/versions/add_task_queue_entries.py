@@ -0,0 +1,67 @@
+"""Add task_queue_entries table for the durable task store
+
+Revision ID: add_task_queue_entries
+Revises: update_uuid_fields
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "add_task_queue_entries"
+down_revision: Union[str, None] = "update_uuid_fields"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "task_queue_entries",
+        sa.Column("id", sa.String(64), primary_key=True),
+        sa.Column("task_name", sa.String(255), nullable=False),
+        sa.Column("args", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("kwargs", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column(
+            "task_metadata", postgresql.JSONB(astext_type=sa.Text()), nullable=True
+        ),
+        sa.Column("priority", sa.Integer(), nullable=False, server_default="5"),
+        sa.Column("status", sa.String(20), nullable=False, server_default="queued"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("max_attempts", sa.Integer(), nullable=False, server_default="3"),
+        sa.Column("available_at", sa.Float(), nullable=False),
+        sa.Column("lease_owner", sa.String(64), nullable=True),
+        sa.Column("lease_expires_at", sa.Float(), nullable=True),
+        sa.Column("result", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("error", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("expires_at", sa.Float(), nullable=True),
+        sa.Column("created_at", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.Float(), nullable=False),
+    )
+    op.create_index(
+        "idx_task_queue_status_priority_available",
+        "task_queue_entries",
+        ["status", "priority", "available_at"],
+    )
+    op.create_index(
+        "idx_task_queue_status_lease",
+        "task_queue_entries",
+        ["status", "lease_expires_at"],
+    )
+    op.create_index(
+        "idx_task_queue_expires_at", "task_queue_entries", ["expires_at"]
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("idx_task_queue_expires_at", table_name="task_queue_entries")
+    op.drop_index("idx_task_queue_status_lease", table_name="task_queue_entries")
+    op.drop_index(
+        "idx_task_queue_status_priority_available", table_name="task_queue_entries"
+    )
+    op.drop_table("task_queue_entries")
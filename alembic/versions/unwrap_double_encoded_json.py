@@ -0,0 +1,85 @@
+"""Unwrap JSON values double-encoded by the old JSONType
+
+Revision ID: unwrap_double_encoded_json
+Revises: add_snapshot_archive
+
+JSONType used to encode values itself before the JSONB / SQLite JSON column
+encoded them again, so every stored value is a JSON string holding the
+document's JSON text. JSONType now passes values through to the dialect and
+no longer decodes strings it reads from those columns; this rewrites the old
+rows once. TEXT columns on other databases were encoded once and are left
+unchanged.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "unwrap_double_encoded_json"
+down_revision: Union[str, None] = "add_snapshot_archive"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# JSONType columns per table
+JSON_COLUMNS = {
+    "hta_trees": ["manifest"],
+    "hta_nodes": ["internal_task_details", "journey_summary", "branch_triggers"],
+    "memory_snapshots": [
+        "snapshot_data",
+        "hta_tree_data",
+        "semantic_memory_data",
+        "log_data",
+        "section_hashes",
+    ],
+    "conversation_summaries": ["turns"],
+    "task_footprints": ["snapshot_ref", "event_metadata"],
+    "reflection_logs": ["snapshot_ref", "analysis_metadata"],
+    "task_queue_entries": ["args", "kwargs", "task_metadata", "result", "error"],
+}
+
+# (unwrap, wrap) statements per dialect; {c} is the quoted column
+STATEMENTS = {
+    "postgresql": (
+        "UPDATE {t} SET {c} = ({c} #>> '{{}}')::jsonb WHERE jsonb_typeof({c}) = 'string'",
+        "UPDATE {t} SET {c} = to_jsonb({c}::text) WHERE {c} IS NOT NULL",
+    ),
+    "sqlite": (
+        "UPDATE {t} SET {c} = json_extract({c}, '$') "
+        "WHERE json_valid({c}) AND json_type({c}) = 'text'",
+        "UPDATE {t} SET {c} = json_quote({c}) WHERE {c} IS NOT NULL",
+    ),
+}
+
+
+def rewrite_json_columns(bind, unwrap: bool = True) -> None:
+    """Unwrap (or, for downgrade, re-wrap) every existing JSONType column."""
+    statements = STATEMENTS.get(bind.dialect.name)
+    if statements is None:
+        return  # TEXT fallback: stored encoded once already
+    statement = statements[0] if unwrap else statements[1]
+    preparer = bind.dialect.identifier_preparer
+    inspector = sa.inspect(bind)
+    for table, columns in JSON_COLUMNS.items():
+        if not inspector.has_table(table):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        for column in columns:
+            if column in existing:
+                bind.execute(
+                    sa.text(
+                        statement.format(t=preparer.quote(table), c=preparer.quote(column))
+                    )
+                )
+
+
+def upgrade() -> None:
+    """Upgrade data."""
+    rewrite_json_columns(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade data (values are double-encoded again for the old JSONType)."""
+    rewrite_json_columns(op.get_bind(), unwrap=False)
@@ -0,0 +1,165 @@
+"""
+Compare sync and async database sessions under concurrent API requests.
+
+Serves the same endpoint twice from one FastAPI app: one loads the user's
+latest snapshot through the sync ``Session`` (as the routers did through
+``get_db``), the other through an ``AsyncSession`` (``get_async_db``). Both
+are driven with N simultaneous requests. Each request first runs a query
+that sleeps ``--db-latency`` ms inside the database driver, standing in for
+a network round trip to PostgreSQL: on the sync path it stalls the event
+loop, so requests are served one after another; on the async path the
+driver waits in its own thread and the requests overlap.
+
+Usage:
+    python -m benchmarks.bench_async_db
+    python -m benchmarks.bench_async_db --concurrency 100 --rounds 5 --db-latency 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, sessionmaker
+
+from forest_app.persistence.async_repository import AsyncMemorySnapshotRepository
+from forest_app.persistence.models import Base, UserModel
+from forest_app.persistence.repository import MemorySnapshotRepository
+
+ROUND_TRIP = text("SELECT bench_sleep(:ms)")
+
+
+@compiles(UUID, "sqlite")
+def _uuid_as_char(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+def _register_sleep(sync_engine):
+    @event.listens_for(sync_engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function(
+            "bench_sleep", 1, lambda ms: time.sleep(ms / 1000) or 0
+        )
+
+
+def build_app(path: Path, users: int):
+    """App with /sync/{user_id} and /async/{user_id}; returns (app, user ids, engines)."""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    _register_sleep(engine)
+    _register_sleep(async_engine.sync_engine)
+    tables = [Base.metadata.tables[name] for name in ("users", "memory_snapshots")]
+    Base.metadata.create_all(engine, tables=tables)
+
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+    AsyncSessionLocal = sessionmaker(
+        async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+
+    user_ids = [uuid.uuid4() for _ in range(users)]
+    with SessionLocal() as db:
+        repo = MemorySnapshotRepository(db)
+        for user_id in user_ids:
+            db.add(UserModel(id=user_id, email=f"{user_id}@example.com", hashed_password="x"))
+            repo.create_snapshot(user_id, {"core_state": {"hta_tree": {"root": {}}}}, "bench")
+        db.commit()
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/sync/{user_id}")
+    async def sync_endpoint(user_id: uuid.UUID, ms: float, db: Session = Depends(get_db)):
+        db.execute(ROUND_TRIP, {"ms": ms})
+        model = MemorySnapshotRepository(db).get_latest_snapshot(user_id)
+        return {"codename": model.codename}
+
+    @app.get("/async/{user_id}")
+    async def async_endpoint(
+        user_id: uuid.UUID, ms: float, db: AsyncSession = Depends(get_async_db)
+    ):
+        await db.execute(ROUND_TRIP, {"ms": ms})
+        model = await AsyncMemorySnapshotRepository(db).get_latest_snapshot(user_id)
+        return {"codename": model.codename}
+
+    return app, user_ids, (engine, async_engine)
+
+
+async def run(app, user_ids, prefix: str, concurrency: int, rounds: int, latency_ms: float):
+    """Fires `concurrency` simultaneous requests per round; returns (latencies ms, elapsed s)."""
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def one(i):
+            start = time.perf_counter()
+            response = await client.get(
+                f"/{prefix}/{user_ids[i % len(user_ids)]}", params={"ms": latency_ms}
+            )
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await asyncio.gather(*(one(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def report(label, latencies, elapsed):
+    ordered = sorted(latencies)
+    pick = lambda p: ordered[int(p * (len(ordered) - 1))]  # noqa: E731
+    print(
+        f"{label:<6} requests={len(ordered):5d}  throughput={len(ordered) / elapsed:8.1f}/s  "
+        f"mean={statistics.mean(ordered):8.1f}ms  p50={pick(0.5):8.1f}ms  "
+        f"p99={pick(0.99):8.1f}ms"
+    )
+
+
+async def main_async(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        app, user_ids, (engine, async_engine) = build_app(Path(tmp) / "bench.db", args.users)
+        try:
+            for prefix in ("sync", "async"):
+                report(
+                    prefix,
+                    *await run(
+                        app, user_ids, prefix, args.concurrency, args.rounds, args.db_latency
+                    ),
+                )
+        finally:
+            await async_engine.dispose()
+            engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--db-latency", type=float, default=10.0)
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark ContextTrimmer.trim_content on large contexts.
+
+Builds synthetic, sectioned contexts of roughly 10k-100k tokens and reports the
+time per trim and how many characters were passed to the tokenizer relative to
+the input size (1.0x means the content was encoded once).
+
+Usage:
+    python -m benchmarks.bench_context_trimmer
+    python -m benchmarks.bench_context_trimmer --sizes 10000 100000 --repeat 5
+    python -m benchmarks.bench_context_trimmer --byte-level   # no vocabulary download
+"""
+
+import argparse
+import statistics
+import time
+
+import tiktoken
+
+from forest_app.integrations.context_trimmer import ContextTrimmer, TrimmerConfig
+
+
+class CountingEncoder:
+    """Forwards to a tiktoken encoding and records encoded characters."""
+
+    def __init__(self, encoder):
+        self._encoder = encoder
+        self.encoded_chars = 0
+
+    def encode(self, text):
+        self.encoded_chars += len(text)
+        return self._encoder.encode(text)
+
+    def __getattr__(self, name):
+        return getattr(self._encoder, name)
+
+
+def byte_level_encoding():
+    return tiktoken.Encoding(
+        "byte_level",
+        pat_str=r"\S+|\s+",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={},
+    )
+
+
+def build_context(encoder, target_tokens: int) -> str:
+    """Build a sectioned context of approximately target_tokens tokens."""
+    paragraph = (
+        "The user reflected on their progress today, noting that the morning "
+        "routine felt steady but the afternoon focus block slipped again. "
+    )
+    parts = ["## Summary\nKey goals: finish the draft, keep the walking habit.\n"]
+    tokens = len(encoder.encode(parts[0]))
+    paragraph_tokens = len(encoder.encode(paragraph))
+    section = 0
+    while tokens < target_tokens:
+        header = f"## Reflection {section}\n" if section % 3 else f"=== Background {section}\n"
+        body = paragraph * 8
+        parts.append(header + body + "\n")
+        tokens += paragraph_tokens * 8 + 6
+        section += 1
+    return "".join(parts)
+
+
+def run(sizes, repeat, max_tokens, byte_level, encoding_name):
+    base = byte_level_encoding() if byte_level else tiktoken.get_encoding(encoding_name)
+    print(f"{'tokens':>8} {'ms/trim':>10} {'encoded/input':>14}")
+    for size in sizes:
+        encoder = CountingEncoder(base)
+        trimmer = ContextTrimmer(TrimmerConfig(max_tokens=max_tokens), encoder=encoder)
+        content = build_context(base, size)
+
+        timings = []
+        encoder.encoded_chars = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            trimmer.trim_content(content)
+            timings.append((time.perf_counter() - start) * 1000)
+        ratio = encoder.encoded_chars / (len(content) * repeat)
+        print(f"{size:>8} {statistics.median(timings):>10.2f} {ratio:>13.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 25_000, 50_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-tokens", type=int, default=4000)
+    parser.add_argument("--encoding", default="cl100k_base")
+    parser.add_argument("--byte-level", action="store_true")
+    args = parser.parse_args()
+    run(args.sizes, args.repeat, args.max_tokens, args.byte_level, args.encoding)
+
+
+if __name__ == "__main__":
+    main()
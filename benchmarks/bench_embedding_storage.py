@@ -0,0 +1,137 @@
+"""
+Compare inline JSON and packed float32 storage of semantic-memory embeddings.
+
+Saves a snapshot holding N semantic memories with D-dimension embeddings to
+SQLite under each ``SNAPSHOT_EMBEDDING_STORAGE`` format and reports:
+
+- stored: bytes of the semantic memory section plus the embedding blob
+- save: ``create_snapshot`` + commit
+- load: ``get_latest_snapshot`` on a fresh session + ``MemorySnapshot.from_dict``
+- query: cosine similarity of one query vector against every loaded embedding
+
+Usage:
+    python -m benchmarks.bench_embedding_storage
+    python -m benchmarks.bench_embedding_storage --memories 2000 --dim 1536 --codec json
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from forest_app.core.snapshot import MemorySnapshot
+from forest_app.persistence.embedding_store import STORAGE_FORMATS, set_embedding_storage
+from forest_app.persistence.models import Base, MemorySnapshotModel, UserModel
+from forest_app.persistence.repository import MemorySnapshotRepository
+from forest_app.utils.json_codec import engine_json_options, set_json_codec
+
+
+@compiles(UUID, "sqlite")
+def _uuid_as_char(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+def build_snapshot(memories: int, dim: int) -> MemorySnapshot:
+    rng = np.random.default_rng(7)
+    snapshot = MemorySnapshot()
+    snapshot.semantic_memories["memories"] = [
+        {
+            "timestamp": "2026-01-01T00:00:00+00:00",
+            "event_type": "reflection",
+            "content": f"Reflection {i}: the afternoon walk helped me refocus.",
+            "importance": 0.5,
+            "embedding": rng.standard_normal(dim).astype(np.float32).tolist(),
+        }
+        for i in range(memories)
+    ]
+    return snapshot
+
+
+def time_ms(fn, repeat: int):
+    samples, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def run(storage: str, snapshot: MemorySnapshot, repeat: int):
+    """Returns (stored bytes, save ms, load ms, query ms) for one format."""
+    set_embedding_storage(storage)
+    data = snapshot.to_dict()
+    query = np.random.default_rng(1).standard_normal(
+        len(data["semantic_memories"]["memories"][0]["embedding"])
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", **engine_json_options())
+        tables = [Base.metadata.tables[name] for name in ("users", "memory_snapshots")]
+        Base.metadata.create_all(engine, tables=tables)
+        Session = sessionmaker(bind=engine)
+        user_id = uuid.uuid4()
+        with Session() as db:
+            db.add(UserModel(id=user_id, email="bench@example.com", hashed_password="x"))
+            db.commit()
+
+        def save():
+            with Session() as db:
+                MemorySnapshotRepository(db).create_snapshot(user_id, data, "bench")
+                db.commit()
+
+        def load():
+            with Session() as db:
+                model = MemorySnapshotRepository(db).get_latest_snapshot(user_id)
+                return MemorySnapshot.from_dict(model.snapshot_data)
+
+        def similarity(loaded):
+            vectors = [m["embedding"] for m in loaded.semantic_memories["memories"]]
+            return [
+                np.dot(query, v) / (np.linalg.norm(query) * np.linalg.norm(v))
+                for v in map(np.asarray, vectors)
+            ]
+
+        save_ms, _ = time_ms(save, repeat)
+        load_ms, loaded = time_ms(load, repeat)
+        query_ms, _ = time_ms(lambda: similarity(loaded), repeat)
+        with Session() as db:
+            table = MemorySnapshotModel.__table__
+            stored = db.execute(
+                select(
+                    func.length(table.c.semantic_memory_data)
+                    + func.coalesce(func.length(table.c.embedding_data), 0)
+                ).limit(1)
+            ).scalar()
+        engine.dispose()
+    return stored, save_ms, load_ms, query_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--memories", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--codec", default="auto", help="JSON codec (auto, orjson, json)")
+    args = parser.parse_args()
+
+    codec = set_json_codec(args.codec)
+    snapshot = build_snapshot(args.memories, args.dim)
+    print(f"{args.memories} memories x {args.dim} dims, JSON codec: {codec.name}")
+    for storage in STORAGE_FORMATS:
+        stored, save, load, query = run(storage, snapshot, args.repeat)
+        print(
+            f"{storage:<13} stored={stored / 1024 / 1024:7.2f} MiB  save={save:8.1f}ms  "
+            f"load={load:8.1f}ms  query={query:7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
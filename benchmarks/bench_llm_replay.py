@@ -0,0 +1,130 @@
+"""
+Load-test the LLM client offline by replaying a recorded cassette.
+
+Capture a cassette by running the app (or any workload, e.g. onboarding and
+``/core/command`` sessions) with ``LLM_REPLAY_MODE=record``. This script then
+sends the recorded JSON-mode requests through ``LLMClient`` at the given
+concurrency, answered from the cassette with the recorded latencies (scaled
+or resampled) and injected provider errors, so retries, circuit breakers and
+admission control behave as they would against the real API. No network
+access is needed; GOOGLE_API_KEY only has to be set to some value.
+
+Usage:
+    python -m benchmarks.bench_llm_replay llm_cassette.jsonl
+    python -m benchmarks.bench_llm_replay llm_cassette.jsonl --requests 2000 \\
+        --concurrency 64 --latency sampled --latency-scale 0.5 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+from pydantic import BaseModel
+
+from forest_app.integrations.llm import LLMClient
+from forest_app.integrations.llm_rate_limiter import LLMRateLimiter
+from forest_app.integrations.llm_replay import LLMReplayProvider
+
+
+class AnyJson(BaseModel):
+    """Accepts any JSON object; the benchmark does not check response content."""
+
+    model_config = {"extra": "allow"}
+
+
+def replayable(provider):
+    """Recorded non-streamed JSON-mode requests, in recording order."""
+    return [
+        request
+        for request in provider.cassette.requests()
+        if not request["stream"]
+        and request["generation_config"].get("response_mime_type") == "application/json"
+    ]
+
+
+async def run(args):
+    provider = LLMReplayProvider(
+        args.cassette,
+        latency=args.latency,
+        latency_scale=args.latency_scale,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    requests = replayable(provider)
+    if not requests:
+        raise SystemExit(f"No replayable JSON-mode requests in {args.cassette}")
+    client = LLMClient(
+        replay=provider,
+        rate_limiter=LLMRateLimiter(max_concurrency=args.concurrency),
+    )
+    advanced = client.advanced_model_name
+
+    latencies, errors = [], Counter()
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(requests[i % len(requests)])
+
+    async def worker():
+        while not queue.empty():
+            request = queue.get_nowait()
+            config = request["generation_config"]
+            contents = request["contents"]
+            start = time.perf_counter()
+            try:
+                await client.generate(
+                    contents if isinstance(contents, list) else [contents],
+                    AnyJson,
+                    use_advanced_model=bool(advanced) and request["model"].endswith(advanced),
+                    temperature=config.get("temperature"),
+                    top_p=config.get("top_p", 1.0),
+                    top_k=config.get("top_k", 32),
+                    max_output_tokens=config.get("max_output_tokens", 8192),
+                    retry_wait=args.retry_wait,
+                    operation="replay",
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed, provider.get_metrics()
+
+
+def report(latencies, errors, elapsed, metrics):
+    total = len(latencies) + sum(errors.values())
+    print(f"requests={total}  ok={len(latencies)}  throughput={total / elapsed:8.1f}/s")
+    if latencies:
+        ordered = sorted(latencies)
+        pick = lambda p: ordered[int(p * (len(ordered) - 1))]  # noqa: E731
+        print(
+            f"latency mean={statistics.mean(ordered):8.1f}ms  p50={pick(0.5):8.1f}ms  "
+            f"p95={pick(0.95):8.1f}ms  p99={pick(0.99):8.1f}ms"
+        )
+    for name, count in errors.most_common():
+        print(f"error {name:<28} {count:6d}")
+    print(
+        "provider " + "  ".join(f"{k}={v}" for k, v in metrics.items() if isinstance(v, int))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("cassette")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", default="recorded")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--retry-wait", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report(*asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
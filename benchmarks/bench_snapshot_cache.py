@@ -0,0 +1,168 @@
+"""
+Measure the latest-snapshot cache on a command loop.
+
+Runs C commands for one user against SQLite the way ``/core/command`` does
+(load the latest snapshot, change it, save and commit), with the snapshot
+cache enabled and disabled, and reports:
+
+- load: median time to get the user's latest ``MemorySnapshot``
+- hit rate and load time saved, from the cache's metrics
+- lookup: median ``ORDER BY updated_at DESC LIMIT 1`` lookup among U users
+  with S snapshots each, with and without the composite index
+
+Usage:
+    python -m benchmarks.bench_snapshot_cache
+    python -m benchmarks.bench_snapshot_cache --commands 200 --memories 2000
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from forest_app.core.snapshot import MemorySnapshot
+from forest_app.persistence import snapshot_cache
+from forest_app.persistence.async_repository import AsyncMemorySnapshotRepository
+from forest_app.persistence.models import Base, UserModel
+from forest_app.persistence.snapshot_cache import SnapshotCache, load_latest_snapshot
+from forest_app.utils.json_codec import engine_json_options
+
+INDEX = "idx_memory_snapshots_user_id_updated_at"
+
+
+@compiles(UUID, "sqlite")
+def _uuid_as_char(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+def build_snapshot(memories: int, dim: int) -> MemorySnapshot:
+    rng = np.random.default_rng(7)
+    snapshot = MemorySnapshot()
+    snapshot.semantic_memories["memories"] = [
+        {
+            "timestamp": "2026-01-01T00:00:00+00:00",
+            "event_type": "reflection",
+            "content": f"Reflection {i}: the afternoon walk helped me refocus.",
+            "importance": 0.5,
+            "embedding": rng.standard_normal(dim).astype(np.float32).tolist(),
+        }
+        for i in range(memories)
+    ]
+    return snapshot
+
+
+async def create_database(path: Path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", **engine_json_options())
+    tables = [Base.metadata.tables[name] for name in ("users", "memory_snapshots")]
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=tables)
+    return engine, sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def add_user(Session) -> uuid.UUID:
+    user_id = uuid.uuid4()
+    async with Session() as db:
+        db.add(UserModel(id=user_id, email=f"{user_id}@example.com", hashed_password="x"))
+        await db.commit()
+    return user_id
+
+
+async def run_commands(enabled: bool, snapshot: MemorySnapshot, commands: int):
+    """Returns (median load ms, cache metrics) for a command loop."""
+    cache = snapshot_cache._cache = SnapshotCache(enabled=enabled)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = await create_database(Path(tmp) / "bench.db")
+        user_id = await add_user(Session)
+        async with Session() as db:
+            AsyncMemorySnapshotRepository(db).create_snapshot(user_id, snapshot.to_dict())
+            await db.commit()
+
+        samples = []
+        for i in range(commands):
+            async with Session() as db:
+                start = time.perf_counter()
+                model, loaded = await load_latest_snapshot(user_id, db)
+                samples.append((time.perf_counter() - start) * 1000)
+                loaded.capacity = (i % 10) / 10
+                AsyncMemorySnapshotRepository(db).update_snapshot(model, loaded.to_dict())
+                await db.commit()
+                await db.refresh(model, attribute_names=["updated_at"])
+                cache.remember(user_id, model, loaded)
+        await engine.dispose()
+    return statistics.median(samples), cache.get_metrics()
+
+
+async def time_lookup(users: int, per_user: int, repeat: int):
+    """Returns median latest-row lookup ms with and without the composite index."""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = await create_database(Path(tmp) / "lookup.db")
+        user_ids = [await add_user(Session) for _ in range(users)]
+        async with Session() as db:
+            for user_id in user_ids:
+                for _ in range(per_user):
+                    AsyncMemorySnapshotRepository(db).create_snapshot(user_id, {"capacity": 0.5})
+            await db.commit()
+
+        query = text(
+            "SELECT id, updated_at FROM memory_snapshots "
+            "WHERE user_id = :user_id ORDER BY updated_at DESC LIMIT 1"
+        )
+
+        async def median_ms():
+            samples = []
+            async with Session() as db:
+                for i in range(repeat):
+                    params = {"user_id": user_ids[i % users].hex}
+                    start = time.perf_counter()
+                    (await db.execute(query, params)).first()
+                    samples.append((time.perf_counter() - start) * 1000)
+            return statistics.median(samples)
+
+        indexed = await median_ms()
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP INDEX {INDEX}"))
+        unindexed = await median_ms()
+        await engine.dispose()
+    return indexed, unindexed
+
+
+async def main_async(args):
+    snapshot = build_snapshot(args.memories, args.dim)
+    print(f"{args.commands} commands, {args.memories} memories x {args.dim} dims")
+    for enabled in (False, True):
+        load_ms, metrics = await run_commands(enabled, snapshot, args.commands)
+        print(
+            f"cache {'on ' if enabled else 'off'}  load={load_ms:7.2f}ms  "
+            f"hit_rate={metrics['hit_rate']:5.1%}  "
+            f"saved={metrics['load_seconds_saved'] * 1000:8.1f}ms"
+        )
+    indexed, unindexed = await time_lookup(args.users, args.per_user, args.commands)
+    print(
+        f"latest lookup ({args.users} users x {args.per_user} snapshots): "
+        f"indexed={indexed:.3f}ms  unindexed={unindexed:.3f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--commands", type=int, default=50)
+    parser.add_argument("--memories", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--per-user", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
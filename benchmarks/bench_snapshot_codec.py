@@ -0,0 +1,136 @@
+"""
+Benchmark snapshot save and load time per JSON codec.
+
+Builds snapshots of realistic sizes (by default 1 MB and 10 MB), mostly
+semantic memories with 768-dimension embeddings plus an HTA tree, and for
+every installed codec (stdlib json, orjson, msgspec) measures:
+
+- encode / decode: serializing and parsing the full document
+- save: ``create_snapshot`` + commit to SQLite (section hashing included)
+- load: ``get_latest_snapshot`` on a fresh session + ``MemorySnapshot.from_dict``
+
+Usage:
+    python -m benchmarks.bench_snapshot_codec
+    python -m benchmarks.bench_snapshot_codec --sizes 1 5 10 --repeat 5
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from forest_app.core.snapshot import MemorySnapshot
+from forest_app.persistence.models import Base, UserModel
+from forest_app.persistence.repository import MemorySnapshotRepository
+from forest_app.utils.json_codec import BACKENDS, build_codec, set_json_codec
+
+EMBEDDING_DIM = 768
+
+
+@compiles(UUID, "sqlite")
+def _uuid_as_char(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+def build_snapshot(target_mb: float, codec) -> MemorySnapshot:
+    """Snapshot whose serialized size is about ``target_mb`` megabytes."""
+    rng = random.Random(42)
+    snapshot = MemorySnapshot()
+    snapshot.core_state["hta_tree"] = {
+        "root": {
+            "id": "root",
+            "title": "Finish the novel",
+            "children": [
+                {"id": f"node-{i}", "title": f"Chapter {i} outline", "status": "pending"}
+                for i in range(200)
+            ],
+        }
+    }
+    memories = snapshot.semantic_memories.setdefault("memories", [])
+    target = target_mb * 1024 * 1024
+    size = len(codec.dumps_bytes(snapshot.to_dict()))
+    while size < target:
+        memory = {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "content": "Felt steady after the morning walk; the draft moved forward.",
+            "embedding": [rng.uniform(-1, 1) for _ in range(EMBEDDING_DIM)],
+        }
+        memories.append(memory)
+        size += len(codec.dumps_bytes(memory))
+    return snapshot
+
+
+def time_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(codec, snapshot: MemorySnapshot, repeat: int):
+    """Returns median ms for (encode, decode, save, load) with ``codec``."""
+    set_json_codec(codec.name)
+    data = snapshot.to_dict()
+    encoded = codec.dumps(data)
+    encode = time_ms(lambda: codec.dumps(data), repeat)
+    decode = time_ms(lambda: codec.loads(encoded), repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(
+            f"sqlite:///{Path(tmp) / 'bench.db'}",
+            json_serializer=codec.dumps,
+            json_deserializer=codec.loads,
+        )
+        tables = [Base.metadata.tables[name] for name in ("users", "memory_snapshots")]
+        Base.metadata.create_all(engine, tables=tables)
+        Session = sessionmaker(bind=engine)
+        user_id = uuid.uuid4()
+        with Session() as db:
+            db.add(UserModel(id=user_id, email="bench@example.com", hashed_password="x"))
+            db.commit()
+
+        def save():
+            with Session() as db:
+                MemorySnapshotRepository(db).create_snapshot(user_id, data, "bench")
+                db.commit()
+
+        def load():
+            with Session() as db:
+                model = MemorySnapshotRepository(db).get_latest_snapshot(user_id)
+                MemorySnapshot.from_dict(model.snapshot_data)
+
+        save_ms = time_ms(save, repeat)
+        load_ms = time_ms(load, repeat)
+        engine.dispose()
+    return encode, decode, save_ms, load_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1.0, 10.0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    codecs = {codec.name: codec for codec in map(build_codec, BACKENDS)}
+    for size in args.sizes:
+        snapshot = build_snapshot(size, codecs["json"])
+        for name, codec in codecs.items():
+            encode, decode, save, load = run(codec, snapshot, args.repeat)
+            print(
+                f"{size:5.1f} MB  {name:<8} encode={encode:8.1f}ms  decode={decode:8.1f}ms  "
+                f"save={save:8.1f}ms  load={load:8.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
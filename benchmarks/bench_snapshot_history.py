@@ -0,0 +1,129 @@
+"""
+Benchmark snapshot size and save latency as conversation history grows.
+
+Simulates a long-lived user with 10k conversation turns, saving the snapshot
+to SQLite every few turns, once with history retention disabled (every turn
+stays in the snapshot) and once with the configured retention policy (older
+turns are compacted into conversation_summaries). Reports the serialized
+snapshot size and save latency over the run.
+
+Usage:
+    python -m benchmarks.bench_snapshot_history
+    python -m benchmarks.bench_snapshot_history --turns 10000 --save-every 10 --retain 20
+"""
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from forest_app.core.history_retention import (
+    RetentionPolicy,
+    compact_history,
+    take_pending_segments,
+)
+from forest_app.core.snapshot import MemorySnapshot
+from forest_app.persistence.models import Base, UserModel
+from forest_app.persistence.repository import (
+    ConversationSummaryRepository,
+    MemorySnapshotRepository,
+)
+
+
+@compiles(UUID, "sqlite")
+def _uuid_as_char(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+TURN_TEXT = (
+    "Today I worked on the draft for an hour and went for a walk. "
+    "The afternoon focus block slipped again, mostly because of meetings."
+)
+
+
+def run(turns: int, save_every: int, policy):
+    """Simulate one user; returns (save latencies in ms, final snapshot bytes, segments)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        tables = [
+            Base.metadata.tables[name]
+            for name in ("users", "memory_snapshots", "conversation_summaries")
+        ]
+        Base.metadata.create_all(engine, tables=tables)
+        db = sessionmaker(bind=engine)()
+
+        user = UserModel(id=uuid.uuid4(), email="bench@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+
+        snapshots = MemorySnapshotRepository(db)
+        summaries = ConversationSummaryRepository(db)
+        snapshot = MemorySnapshot()
+        model = None
+        latencies = []
+        segments = 0
+
+        for i in range(turns):
+            snapshot.conversation_history.append(
+                {
+                    "role": "user" if i % 2 == 0 else "assistant",
+                    "content": f"{TURN_TEXT} ({i})",
+                    "timestamp": f"2026-01-01T00:00:00.{i:06d}",
+                }
+            )
+            if (i + 1) % save_every:
+                continue
+
+            start = time.perf_counter()
+            if policy is not None:
+                compact_history(snapshot, policy)
+            data = snapshot.to_dict()
+            if model is None:
+                model = snapshots.create_snapshot(user.id, data, "bench")
+            else:
+                snapshots.update_snapshot(model, data, "bench")
+            pending = take_pending_segments(snapshot)
+            if pending:
+                summaries.add_segments(user.id, pending)
+                segments += len(pending)
+            db.commit()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        size = len(json.dumps(snapshot.to_dict()).encode("utf-8"))
+        db.close()
+        engine.dispose()
+    return latencies, size, segments
+
+
+def report(label, latencies, size, segments):
+    tail = latencies[-max(1, len(latencies) // 10):]
+    print(
+        f"{label:<12} snapshot={size / 1024:8.1f} KiB  segments={segments:5d}  "
+        f"save mean={statistics.mean(latencies):7.2f}ms  "
+        f"last-10% mean={statistics.mean(tail):7.2f}ms  max={max(latencies):7.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=10_000)
+    parser.add_argument("--save-every", type=int, default=10)
+    parser.add_argument("--retain", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=10)
+    args = parser.parse_args()
+
+    report("unbounded", *run(args.turns, args.save_every, None))
+    policy = RetentionPolicy(retain_turns=args.retain, compact_batch=args.batch)
+    report("retention", *run(args.turns, args.save_every, policy))
+
+
+if __name__ == "__main__":
+    main()
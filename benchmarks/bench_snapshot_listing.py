@@ -0,0 +1,115 @@
+"""
+Compare full-row and projected snapshot listing.
+
+Stores N snapshots of a given size for one user in SQLite and reports the
+median time to list them:
+
+- full: ``list_snapshots`` (loads every ``MemorySnapshotModel``)
+- page: ``list_snapshot_infos`` first page (id, codename, timestamps)
+- deep page: the last page, reached by following cursors
+
+Usage:
+    python -m benchmarks.bench_snapshot_listing
+    python -m benchmarks.bench_snapshot_listing --snapshots 200 --sizes 0.01 1 5
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from forest_app.persistence.models import Base, UserModel
+from forest_app.persistence.repository import MemorySnapshotRepository
+from forest_app.utils.json_codec import engine_json_options
+
+
+@compiles(UUID, "sqlite")
+def _uuid_as_char(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+def build_document(size_mb: float) -> dict:
+    entry = {"content": "Felt steady after the morning walk; the draft moved forward."}
+    count = max(1, int(size_mb * 1024 * 1024 / 80))
+    return {"capacity": 0.5, "reflection_log": [entry] * count}
+
+
+def time_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(size_mb: float, snapshots: int, limit: int, repeat: int):
+    """Returns median ms for (full listing, first page, last page)."""
+    document = build_document(size_mb)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", **engine_json_options())
+        tables = [Base.metadata.tables[name] for name in ("users", "memory_snapshots")]
+        Base.metadata.create_all(engine, tables=tables)
+        Session = sessionmaker(bind=engine)
+        user_id = uuid.uuid4()
+        with Session() as db:
+            db.add(UserModel(id=user_id, email="bench@example.com", hashed_password="x"))
+            repo = MemorySnapshotRepository(db)
+            for i in range(snapshots):
+                repo.create_snapshot(user_id, document, f"Snapshot {i}")
+            db.commit()
+
+        with Session() as db:
+            cursors = [None]
+            while True:
+                _, before = MemorySnapshotRepository(db).list_snapshot_infos(
+                    user_id, limit=limit, before=cursors[-1]
+                )
+                if before is None:
+                    break
+                cursors.append(before)
+
+        def full():
+            with Session() as db:
+                MemorySnapshotRepository(db).list_snapshots(user_id, limit=limit)
+
+        def page(before):
+            with Session() as db:
+                MemorySnapshotRepository(db).list_snapshot_infos(
+                    user_id, limit=limit, before=before
+                )
+
+        result = (
+            time_ms(full, repeat),
+            time_ms(lambda: page(None), repeat),
+            time_ms(lambda: page(cursors[-1]), repeat),
+        )
+        engine.dispose()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--snapshots", type=int, default=100)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[0.01, 1.0])
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        full, first, last = run(size, args.snapshots, args.limit, args.repeat)
+        print(
+            f"{args.snapshots} snapshots x {size:5.2f} MB  full={full:8.1f}ms  "
+            f"page={first:6.2f}ms  deep page={last:6.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
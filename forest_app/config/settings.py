@@ -23,12 +23,110 @@ class AppSettings(BaseSettings):
     SECRET_KEY: str = secrets.token_hex(32)  # 256-bit secret key
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
     DEBUG: bool = ENVIRONMENT != "production"
+    # Async driver URL; derived from DB_CONNECTION_STRING (asyncpg / aiosqlite) if unset
+    DB_ASYNC_CONNECTION_STRING: Optional[str] = None
+    # Connection pool, per engine (sync and async); sizing is ignored for SQLite
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0  # Wait for a free connection before failing
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_WARMUP_CONNECTIONS: int = 2  # Opened at startup, capped at DB_POOL_SIZE; 0 skips
+    # JSON backend for persisted documents: "auto", "orjson", "msgspec" or "json"
+    JSON_CODEC: str = "auto"
 
     # --- Optional with defaults (Core LLM/App) ---
     GEMINI_MODEL_NAME: str = "gemini-1.5-flash-latest"
     GEMINI_ADVANCED_MODEL_NAME: str = "gemini-1.5-pro-latest"
     LLM_TEMPERATURE: float = 0.7
 
+    # --- LLM response cache ---
+    LLM_CACHE_MAX_ENTRIES: int = 256
+    LLM_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    LLM_CACHE_TTL_SECONDS: float = 3600.0
+    LLM_CACHE_SHARED: bool = False  # Share responses through CacheService
+
+    # --- LLM micro-batching (0 disables) ---
+    LLM_MICRO_BATCH_WINDOW_MS: int = 0
+    LLM_MICRO_BATCH_MAX_SIZE: int = 8
+
+    # --- LLM admission control (0 = unlimited) ---
+    LLM_MAX_CONCURRENCY: int = 0
+    LLM_REQUESTS_PER_MINUTE: int = 0
+    LLM_TOKENS_PER_MINUTE: int = 0
+    # Per-model overrides, e.g. {"gemini-1.5-pro-latest": {"rpm": 2, "tpm": 32000}}
+    LLM_MODEL_RATE_LIMITS: Dict[str, Dict[str, int]] = {}
+
+    # --- LLM prompt prefix caching (provider context caching) ---
+    LLM_PROMPT_CACHE_MIN_TOKENS: int = 32768  # Provider minimum for a cached prefix
+    LLM_PROMPT_CACHE_TTL_SECONDS: float = 3600.0
+    LLM_PROMPT_CACHE_MAX_ENTRIES: int = 64  # 0 disables caching (savings are still logged)
+
+    # --- LLM circuit breakers (one per model and operation) ---
+    LLM_CIRCUIT_WINDOW_TYPE: str = "count"  # "count" (last N calls) or "time" (last N seconds)
+    LLM_CIRCUIT_WINDOW_SIZE: int = 20
+    LLM_CIRCUIT_FAILURE_RATE: float = 0.5  # Failure rate that opens a circuit
+    LLM_CIRCUIT_SLOW_CALL_SECONDS: float = 30.0  # 0 disables slow-call tracking
+    LLM_CIRCUIT_SLOW_CALL_RATE: float = 0.8  # Slow-call rate that opens a circuit
+    LLM_CIRCUIT_HALF_OPEN_CALLS: int = 2  # Probes let through after the recovery timeout
+    # Config changes per model, operation or "model:operation"
+    LLM_CIRCUIT_OVERRIDES: Dict[str, Dict[str, Any]] = {
+        "hta_generation": {"slow_call_threshold": 120.0},
+        "hta_evolution": {"slow_call_threshold": 120.0},
+    }
+
+    # --- Request deadlines and hedged LLM requests ---
+    REQUEST_TIMEOUT_SECONDS: float = 120.0  # Default budget per HTTP request (0 = none)
+    REQUEST_TIMEOUT_MAX_SECONDS: float = 600.0  # Cap on X-Request-Timeout (0 = no cap)
+    LLM_HEDGE_REQUESTS: bool = False  # Race a fallback service once a call is slow
+    LLM_HEDGE_PERCENTILE: float = 0.95  # Latency percentile that triggers the hedge
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # Latencies needed before hedging an operation
+
+    # --- LLM record/replay (offline load testing) ---
+    LLM_REPLAY_MODE: str = "off"  # "record" (capture real calls) or "replay" (no network)
+    LLM_REPLAY_PATH: str = "llm_cassette.jsonl"
+    LLM_REPLAY_LATENCY: str = "recorded"  # "recorded", "sampled", "none" or seconds
+    LLM_REPLAY_LATENCY_SCALE: float = 1.0
+    LLM_REPLAY_ERROR_RATE: float = 0.0  # Share of replayed calls failing with a 503
+    LLM_REPLAY_SEED: int = 0
+    LLM_REPLAY_STRICT: bool = False  # Fail unrecorded requests instead of reusing similar ones
+
+    # --- HTA evolution ---
+    HTA_EVOLUTION_MODE: str = "patch"  # "patch" (subtree + outline -> edit ops) or "full"
+    HTA_PATCH_MIN_NODES: int = 25  # Smaller trees are always evolved whole
+    HTA_PATCH_FOCUS_MAX_NODES: int = 60  # Size cap for the subtree sent in full
+    HTA_PATCH_OUTLINE_MAX_NODES: int = 200  # Nodes listed in the outline of the rest
+
+    # --- Snapshot history retention ---
+    # Turns kept verbatim in the snapshot; older ones move to conversation_summaries
+    SNAPSHOT_HISTORY_RETAIN_TURNS: int = 20
+    SNAPSHOT_REFLECTION_LOG_RETAIN: int = 20
+    SNAPSHOT_HISTORY_COMPACT_BATCH: int = 10  # Turns allowed over the limit before compacting
+    SNAPSHOT_HISTORY_SUMMARY_MAX_CHARS: int = 4000  # Cap on the rolling summary
+
+    # --- Snapshot codenames (generated in the background after saving) ---
+    SNAPSHOT_CODENAME_BATCH_SIZE: int = 16  # Snapshots named per LLM call
+    SNAPSHOT_CODENAME_BATCH_WINDOW_SECONDS: float = 2.0  # Wait for more requests to batch
+    SNAPSHOT_CODENAME_CACHE_SIZE: int = 1024  # Codenames cached by context hash
+    # Semantic-memory embeddings: "float32", "float32+zlib" or "json" (inline lists)
+    SNAPSHOT_EMBEDDING_STORAGE: str = "float32"
+    # Write-behind: commands stage snapshots in memory; a flusher coalesces writes
+    SNAPSHOT_WRITE_BEHIND: bool = False
+    SNAPSHOT_WRITE_BEHIND_WINDOW_SECONDS: float = 2.0  # Dirty time before a flush
+    SNAPSHOT_WRITE_BEHIND_MAX_DELAY_SECONDS: float = 10.0  # Flush even if the user is busy
+    # Latest deserialized snapshot per user, checked against the stored row's updated_at
+    SNAPSHOT_CACHE_ENABLED: bool = True
+    SNAPSHOT_CACHE_MAX_USERS: int = 1000
+    # Retention: older snapshots move to memory_snapshot_archive in background batches
+    SNAPSHOT_RETENTION_ENABLED: bool = True
+    SNAPSHOT_RETENTION_KEEP_LAST: int = 50  # Most recent snapshots kept per user
+    SNAPSHOT_RETENTION_DAILY_CHECKPOINTS: int = 30  # Newest snapshot per day, last N days
+    SNAPSHOT_RETENTION_WEEKLY_CHECKPOINTS: int = 52  # Newest snapshot per week, last N weeks
+    SNAPSHOT_RETENTION_INTERVAL_SECONDS: float = 21600.0
+    SNAPSHOT_RETENTION_BATCH_SIZE: int = 20  # Snapshots archived per transaction
+    SNAPSHOT_RETENTION_BATCH_PAUSE_SECONDS: float = 0.5
+    SNAPSHOT_RETENTION_MAX_USERS_PER_RUN: int = 100
+
     # --- Optional Engine Configurations ---
     # (These configure engines IF they are enabled by flags below)
     METRICS_ENGINE_ALPHA: float = 0.3
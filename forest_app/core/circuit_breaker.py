@@ -5,16 +5,47 @@ This module implements the circuit breaker pattern to ensure robust
 interactions with external services. It provides graceful degradation
 and fallback mechanisms to maintain the sanctuary experience when
 external dependencies are unstable.
+
+Breakers judge health over a sliding window of recent calls rather than a
+run of consecutive failures: the circuit opens when, with at least
+``failure_threshold`` calls in the window, the failure rate or the rate of
+slow calls reaches its threshold. After ``recovery_timeout`` seconds a
+limited number of probe calls is let through (half-open); their outcome
+decides whether the circuit closes again.
+
+A CircuitBreakerRegistry keeps one breaker per scope (e.g. per model and
+operation) so that a failing endpoint does not block unrelated ones:
+
+    breakers = CircuitBreakerRegistry(CircuitBreakerConfig(name="llm"))
+    with breakers.get(model_name, "sentiment").guard():
+        response = await model.generate_content_async(prompt)
+
+State, window rates and call counters are exposed through ``get_metrics``.
 """
 
 import asyncio
 import functools
 import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
 from enum import Enum
-from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
-
-import pybreaker
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from pybreaker import CircuitBreakerError
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +53,9 @@ logger = logging.getLogger(__name__)
 T = TypeVar("T")
 R = TypeVar("R")
 
+WINDOW_COUNT = "count"  # The last ``window_size`` calls
+WINDOW_TIME = "time"  # Calls made in the last ``window_size`` seconds
+
 
 class CircuitState(Enum):
     """States for the circuit breaker."""
@@ -31,6 +65,17 @@ class CircuitState(Enum):
     HALF_OPEN = "half_open"  # Testing if service is back online
 
 
+class CircuitOpenError(CircuitBreakerError):
+    """Raised when a call is rejected because the circuit is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(
+            f"Circuit '{name}' is open; retry in {retry_after:.1f}s"
+        )
+        self.name = name
+        self.retry_after = retry_after
+
+
 class CircuitBreakerConfig:
     """Configuration for a circuit breaker."""
 
@@ -42,24 +87,120 @@ class CircuitBreakerConfig:
         fallback_function: Optional[Callable] = None,
         name: str = "default",
         timeout: Optional[float] = None,
+        window_type: str = WINDOW_COUNT,
+        window_size: int = 20,
+        failure_rate_threshold: float = 0.5,
+        slow_call_threshold: Optional[float] = None,
+        slow_call_rate_threshold: float = 1.0,
+        half_open_max_calls: int = 1,
+        ignored_exceptions: List[type] = None,
     ):
         """
         Initialize circuit breaker configuration.
 
         Args:
-            failure_threshold: Number of failures before opening circuit
+            failure_threshold: Minimum number of calls in the window before
+                the failure and slow-call rates are evaluated
             recovery_timeout: Seconds to wait before trying half-open state
-            expected_exceptions: List of exception types that trigger the breaker
+            expected_exceptions: List of exception types that count as failures
             fallback_function: Function to call when circuit is open
             name: Name for this circuit breaker (for logging)
             timeout: Optional timeout for the protected function
+            window_type: "count" (last ``window_size`` calls) or "time"
+                (calls in the last ``window_size`` seconds)
+            window_size: Size of the sliding window
+            failure_rate_threshold: Failure rate (0-1) that opens the circuit
+            slow_call_threshold: Seconds after which a call counts as slow
+                (None disables slow-call tracking)
+            slow_call_rate_threshold: Slow-call rate (0-1) that opens the circuit
+            half_open_max_calls: Probe calls allowed while half-open
+            ignored_exceptions: Exception types that are neither failures nor
+                successes (checked before ``expected_exceptions``)
         """
+        if window_type not in (WINDOW_COUNT, WINDOW_TIME):
+            raise ValueError(f"Unknown window type {window_type!r}")
         self.failure_threshold = failure_threshold
         self.recovery_timeout = recovery_timeout
         self.expected_exceptions = expected_exceptions or [Exception]
         self.fallback_function = fallback_function
         self.name = name
         self.timeout = timeout
+        self.window_type = window_type
+        self.window_size = window_size
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.ignored_exceptions = ignored_exceptions or []
+
+    def copy(self, **changes: Any) -> "CircuitBreakerConfig":
+        """Return a copy of this configuration with ``changes`` applied."""
+        values = dict(self.__dict__)
+        values.update(changes)
+        return CircuitBreakerConfig(**values)
+
+
+class _SlidingWindow:
+    """Outcome counts over the last N calls or the last N seconds."""
+
+    def __init__(self, window_type: str, size: int, clock: Callable[[], float]):
+        self.window_type = window_type
+        self.size = size
+        self._clock = clock
+        # (timestamp, failed, slow)
+        self._entries: Deque[Tuple[float, bool, bool]] = deque()
+        self.failures = 0
+        self.slow_calls = 0
+
+    def _evict(self) -> None:
+        if self.window_type == WINDOW_COUNT:
+            excess = len(self._entries) - self.size
+        else:
+            cutoff = self._clock() - self.size
+            excess = 0
+            for timestamp, _, _ in self._entries:
+                if timestamp > cutoff:
+                    break
+                excess += 1
+        for _ in range(max(0, excess)):
+            _, failed, slow = self._entries.popleft()
+            self.failures -= failed
+            self.slow_calls -= slow
+
+    def add(self, failed: bool, slow: bool) -> None:
+        self._entries.append((self._clock(), failed, slow))
+        self.failures += failed
+        self.slow_calls += slow
+        self._evict()
+
+    def rates(self) -> Tuple[int, float, float]:
+        """Number of calls, failure rate and slow-call rate in the window."""
+        self._evict()
+        calls = len(self._entries)
+        if not calls:
+            return 0, 0.0, 0.0
+        return calls, self.failures / calls, self.slow_calls / calls
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.failures = 0
+        self.slow_calls = 0
+
+
+class _CallPermit:
+    """One admitted call; records when the protected work actually started."""
+
+    __slots__ = ("epoch", "probe", "started", "_clock")
+
+    def __init__(self, epoch: int, probe: bool, clock: Callable[[], float]):
+        self.epoch = epoch
+        self.probe = probe
+        self.started = clock()
+        self._clock = clock
+
+    def mark_started(self) -> None:
+        """Start timing the call now."""
+        self.started = self._clock()
 
 
 class CircuitBreaker:
@@ -67,7 +208,8 @@ class CircuitBreaker:
     Circuit breaker implementation for protecting external service calls.
 
     This implementation supports both synchronous and asynchronous functions,
-    with configurable failure thresholds, timeouts, and fallback mechanisms.
+    with sliding-window failure and slow-call rates, a bounded number of
+    half-open probes, timeouts, and fallback mechanisms.
     """
 
     _instances: Dict[str, "CircuitBreaker"] = {}
@@ -81,88 +223,226 @@ class CircuitBreaker:
             )
         return cls._instances[name]
 
-    def __init__(self, config: CircuitBreakerConfig):
+    def __init__(
+        self,
+        config: CircuitBreakerConfig,
+        clock: Callable[[], float] = time.monotonic,
+    ):
         """
         Initialize a new circuit breaker.
 
         Args:
             config: Configuration for this circuit breaker
+            clock: Monotonic time source (seconds)
         """
         self.config = config
         self.state = CircuitState.CLOSED
-        self.failure_count = 0
         self.last_failure_time = None
         self.last_success_time = None
 
-        # Create pybreaker instance
-        self._breaker = pybreaker.CircuitBreaker(
-            fail_max=config.failure_threshold,
-            reset_timeout=config.recovery_timeout,
-            exclude=config.expected_exceptions,
-            name=config.name,
-        )
-
-        # Set up pybreaker-compatible listener
-        class _PyBreakerListener(pybreaker.CircuitBreakerListener):
-            def __init__(listener_self, parent):
-                listener_self.parent = parent
-
-            def state_change(listener_self, cb, old_state, new_state):
-                if new_state == pybreaker.STATE_OPEN:
-                    parent._on_open(cb)
-                elif new_state == pybreaker.STATE_CLOSED:
-                    parent._on_close(cb)
-                elif new_state == pybreaker.STATE_HALF_OPEN:
-                    parent._on_half_open(cb)
-
-        parent = self
-        self._breaker.add_listener(_PyBreakerListener(parent))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._window = _SlidingWindow(config.window_type, config.window_size, clock)
+        # Bumped on every state change so late results of earlier calls are
+        # not counted against the new state
+        self._epoch = 0
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probe_outcomes: List[Tuple[bool, bool]] = []
+        self._totals = {
+            "successes": 0,
+            "failures": 0,
+            "slow_calls": 0,
+            "ignored": 0,
+            "rejected": 0,
+            "opened": 0,
+        }
 
         logger.info(
-            "Circuit breaker '%s' initialized with failure threshold %s, recovery timeout %ss",
+            "Circuit breaker '%s' initialized (%s window of %s, failure rate %.0f%%, "
+            "min calls %s, recovery timeout %ss)",
             config.name,
+            config.window_type,
+            config.window_size,
+            config.failure_rate_threshold * 100,
             config.failure_threshold,
             config.recovery_timeout,
         )
 
-    def _on_open(self, breaker):
-        """Called when circuit transitions to open state."""
-        self.state = CircuitState.OPEN
-        logger.warning(
-            "Circuit '%s' OPENED after %s failures",
-            self.config.name,
-            self.failure_count,
-        )
+    @property
+    def failure_count(self) -> int:
+        """Failures currently in the sliding window."""
+        return self._window.failures
+
+    def _transition(self, state: CircuitState) -> None:
+        """Change state (lock held) and start a fresh measurement period."""
+        if state is self.state:
+            return
+        old_state, self.state = self.state, state
+        self._epoch += 1
+        self._probes_started = 0
+        self._probe_outcomes = []
+        if state is CircuitState.OPEN:
+            self._opened_at = self._clock()
+            self._totals["opened"] += 1
+            calls, failure_rate, slow_rate = self._window.rates()
+            logger.warning(
+                "Circuit '%s' OPENED (%s -> open): %d calls, failure rate %.0f%%, "
+                "slow-call rate %.0f%%",
+                self.config.name,
+                old_state.value,
+                calls,
+                failure_rate * 100,
+                slow_rate * 100,
+            )
+        elif state is CircuitState.HALF_OPEN:
+            logger.info(
+                "Circuit '%s' HALF-OPEN, testing service health", self.config.name
+            )
+        else:
+            self._window.clear()
+            logger.info(
+                "Circuit '%s' CLOSED, service appears healthy", self.config.name
+            )
 
-    def _on_close(self, breaker):
-        """Called when circuit transitions to closed state."""
-        self.state = CircuitState.CLOSED
-        self.failure_count = 0
-        self.last_success_time = datetime.now()
-        logger.info("Circuit '%s' CLOSED, service appears healthy", self.config.name)
-
-    def _on_half_open(self, breaker):
-        """Called when circuit transitions to half-open state."""
-        self.state = CircuitState.HALF_OPEN
-        logger.info("Circuit '%s' HALF-OPEN, testing service health", self.config.name)
-
-    def _record_success(self):
-        """Record a successful call."""
-        self.last_success_time = datetime.now()
-        # Let pybreaker handle state transitions
-
-    def _record_failure(self, exception):
-        """Record a failed call."""
-        self.failure_count += 1
-        self.last_failure_time = datetime.now()
-        # Let pybreaker handle state transitions
-        logger.debug(
-            "Circuit '%s' recorded failure (%s/%s): %s",
-            self.config.name,
-            self.failure_count,
-            self.config.failure_threshold,
-            exception,
+    def _acquire(self) -> _CallPermit:
+        """Admit a call or raise CircuitOpenError."""
+        with self._lock:
+            now = self._clock()
+            if self.state is CircuitState.OPEN:
+                retry_after = self._opened_at + self.config.recovery_timeout - now
+                if retry_after > 0:
+                    self._totals["rejected"] += 1
+                    raise CircuitOpenError(self.config.name, retry_after)
+                self._transition(CircuitState.HALF_OPEN)
+            if self.state is CircuitState.HALF_OPEN:
+                if self._probes_started >= self.config.half_open_max_calls:
+                    self._totals["rejected"] += 1
+                    raise CircuitOpenError(self.config.name, 0.0)
+                self._probes_started += 1
+                return _CallPermit(self._epoch, True, self._clock)
+            return _CallPermit(self._epoch, False, self._clock)
+
+    def _classify(self, exc: BaseException) -> Optional[bool]:
+        """True for a failure, None if the exception is ignored."""
+        if isinstance(exc, tuple(self.config.ignored_exceptions)):
+            return None
+        if isinstance(exc, tuple(self.config.expected_exceptions)):
+            return True
+        return None
+
+    def _record(self, permit: _CallPermit, failed: Optional[bool]) -> None:
+        """Record the outcome of an admitted call (``None`` = ignored)."""
+        duration = self._clock() - permit.started
+        slow_threshold = self.config.slow_call_threshold
+        slow = slow_threshold is not None and duration >= slow_threshold
+        with self._lock:
+            if failed is None:
+                self._totals["ignored"] += 1
+                if permit.probe and permit.epoch == self._epoch:
+                    # Let another probe through in its place
+                    self._probes_started -= 1
+                return
+            if failed:
+                self._totals["failures"] += 1
+                self.last_failure_time = datetime.now()
+            else:
+                self._totals["successes"] += 1
+                self.last_success_time = datetime.now()
+            self._totals["slow_calls"] += slow
+            if permit.epoch != self._epoch:
+                return
+            if self.state is CircuitState.HALF_OPEN:
+                self._probe_outcomes.append((failed, slow))
+                if len(self._probe_outcomes) >= self.config.half_open_max_calls:
+                    self._finish_probing()
+                return
+            self._window.add(failed, slow)
+            logger.debug(
+                "Circuit '%s' recorded %s%s (%.2fs)",
+                self.config.name,
+                "failure" if failed else "success",
+                " (slow)" if slow else "",
+                duration,
+            )
+            calls, failure_rate, slow_rate = self._window.rates()
+            if calls >= self.config.failure_threshold and (
+                failure_rate >= self.config.failure_rate_threshold
+                or slow_rate >= self.config.slow_call_rate_threshold
+            ):
+                self._transition(CircuitState.OPEN)
+
+    def _finish_probing(self) -> None:
+        """Close or re-open the circuit once every probe has reported."""
+        count = len(self._probe_outcomes)
+        failure_rate = sum(f for f, _ in self._probe_outcomes) / count
+        slow_rate = sum(s for _, s in self._probe_outcomes) / count
+        if (
+            failure_rate >= self.config.failure_rate_threshold
+            or slow_rate >= self.config.slow_call_rate_threshold
+        ):
+            self._transition(CircuitState.OPEN)
+        else:
+            self._transition(CircuitState.CLOSED)
+
+    @contextmanager
+    def guard(self) -> Iterator[_CallPermit]:
+        """
+        Protect the enclosed block as one call.
+
+        Works in sync and async code alike. Call ``mark_started`` on the
+        yielded permit to exclude local queueing (e.g. rate limiting) from
+        the call's duration.
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        permit = self._acquire()
+        try:
+            yield permit
+        except BaseException as e:
+            self._record(permit, self._classify(e))
+            raise
+        self._record(permit, False)
+
+    def reset(self) -> None:
+        """Force the circuit closed and forget the window."""
+        with self._lock:
+            self._transition(CircuitState.CLOSED)
+            self._window.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Report breaker state.
+
+        Returns:
+            State, window size and rates, seconds until a probe is allowed,
+            and lifetime counters (successes, failures, slow calls, ignored
+            and rejected calls, times opened)
+        """
+        with self._lock:
+            calls, failure_rate, slow_rate = self._window.rates()
+            retry_after = 0.0
+            if self.state is CircuitState.OPEN:
+                retry_after = max(
+                    0.0,
+                    self._opened_at + self.config.recovery_timeout - self._clock(),
+                )
+            return {
+                "state": self.state.value,
+                "window_calls": calls,
+                "failure_rate": failure_rate,
+                "slow_call_rate": slow_rate,
+                "retry_after": retry_after,
+                **self._totals,
+            }
+
+    def _fallback(self, exc: Exception, args: tuple, kwargs: dict) -> Any:
+        """Return the result of the configured fallback function."""
+        logger.info(
+            "Using fallback for circuit '%s' after %s", self.config.name, type(exc).__name__
         )
+        return self.config.fallback_function(*args, **kwargs)
 
     def call(self, func: Callable[..., T], *args, **kwargs) -> T:
         """
@@ -177,24 +457,16 @@ class CircuitBreaker:
             Result of the function call
 
         Raises:
-            pybreaker.CircuitBreakerError: If circuit is open
+            CircuitOpenError: If circuit is open
             Exception: If function raises an exception and no fallback is available
         """
         try:
-            # Use pybreaker to manage the circuit state
-            result = self._breaker.call(func, *args, **kwargs)
-            self._record_success()
-            return result
+            with self.guard():
+                return func(*args, **kwargs)
         except Exception as e:
-            self._record_failure(e)
-
-            # Try fallback if available
-            if self.config.fallback_function:
-                logger.info("Using fallback for circuit '%s'", self.config.name)
-                return self.config.fallback_function(*args, **kwargs)
-
-            # Re-raise the exception
-            raise
+            if not self.config.fallback_function:
+                raise
+            return self._fallback(e, args, kwargs)
 
     async def call_async(self, func: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
         """
@@ -209,45 +481,104 @@ class CircuitBreaker:
             Result of the async function
 
         Raises:
-            pybreaker.CircuitBreakerError: If circuit is open
+            CircuitOpenError: If circuit is open
             Exception: If function raises an exception and no fallback is available
         """
         try:
-            # Add timeout if configured
-            if self.config.timeout:
-                # Wrap function with timeout
-                async def func_with_timeout():
+            with self.guard():
+                if self.config.timeout:
                     return await asyncio.wait_for(
                         func(*args, **kwargs), timeout=self.config.timeout
                     )
+                return await func(*args, **kwargs)
+        except Exception as e:
+            if not self.config.fallback_function:
+                raise
+            result = self._fallback(e, args, kwargs)
+            if asyncio.iscoroutine(result):
+                result = await result
+            return result
 
-                # Use pybreaker to manage the circuit state for the timeout-wrapped function
-                result = await self._breaker.call(func_with_timeout)
-            else:
-                # Use pybreaker directly
-                result = await self._breaker.call(func, *args, **kwargs)
 
-            self._record_success()
-            return result
+class CircuitBreakerRegistry:
+    """
+    One circuit breaker per scope, created on first use.
 
-        except Exception as e:
-            self._record_failure(e)
+    Scopes are joined into the breaker name (``get("gemini-pro", "hta")`` ->
+    ``"llm:gemini-pro:hta"`` for a base config named "llm"). ``overrides``
+    maps a scope part or a full scope to config changes, applied in order,
+    e.g. ``{"hta_evolution": {"slow_call_threshold": 120}}``.
+    """
 
-            # Try fallback if available
-            if self.config.fallback_function:
-                if asyncio.iscoroutinefunction(self.config.fallback_function):
-                    logger.info(
-                        "Using async fallback for circuit '%s'", self.config.name
-                    )
-                    return await self.config.fallback_function(*args, **kwargs)
-                else:
-                    logger.info(
-                        "Using sync fallback for circuit '%s'", self.config.name
-                    )
-                    return self.config.fallback_function(*args, **kwargs)
+    def __init__(
+        self,
+        config: Optional[CircuitBreakerConfig] = None,
+        overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.config = config or CircuitBreakerConfig()
+        self.overrides = overrides or {}
+        self._clock = clock
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
 
-            # Re-raise the exception
-            raise
+    @classmethod
+    def from_settings(
+        cls, prefix: str, **config_options: Any
+    ) -> "CircuitBreakerRegistry":
+        """
+        Build a registry from ``{prefix}*`` settings.
+
+        Reads ``WINDOW_TYPE``, ``WINDOW_SIZE``, ``FAILURE_RATE``,
+        ``SLOW_CALL_SECONDS`` (0 disables), ``SLOW_CALL_RATE``,
+        ``HALF_OPEN_CALLS`` and ``OVERRIDES``; ``config_options`` supply
+        everything else (name, exceptions, failure threshold, ...).
+        """
+        overrides: Dict[str, Dict[str, Any]] = {}
+        try:
+            from forest_app.config.settings import settings
+
+            slow_seconds = getattr(settings, f"{prefix}SLOW_CALL_SECONDS")
+            config_options.update(
+                window_type=getattr(settings, f"{prefix}WINDOW_TYPE"),
+                window_size=getattr(settings, f"{prefix}WINDOW_SIZE"),
+                failure_rate_threshold=getattr(settings, f"{prefix}FAILURE_RATE"),
+                slow_call_threshold=slow_seconds or None,
+                slow_call_rate_threshold=getattr(settings, f"{prefix}SLOW_CALL_RATE"),
+                half_open_max_calls=getattr(settings, f"{prefix}HALF_OPEN_CALLS"),
+            )
+            overrides = dict(getattr(settings, f"{prefix}OVERRIDES"))
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"Circuit breaker settings unavailable, using defaults: {e}")
+        return cls(CircuitBreakerConfig(**config_options), overrides)
+
+    def get(self, *scope: str) -> CircuitBreaker:
+        """Return the breaker for ``scope``, creating it if needed."""
+        key = ":".join(scope)
+        breaker = self._breakers.get(key)
+        if breaker is not None:
+            return breaker
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                changes: Dict[str, Any] = {}
+                for part in (*scope, key):
+                    changes.update(self.overrides.get(part, {}))
+                config = self.config.copy(
+                    **changes, name=":".join((self.config.name, *scope))
+                )
+                breaker = CircuitBreaker(config, clock=self._clock)
+                self._breakers[key] = breaker
+        return breaker
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Metrics of every breaker, keyed by scope."""
+        return {key: b.get_metrics() for key, b in list(self._breakers.items())}
+
+    def reset(self) -> None:
+        """Close every circuit."""
+        for breaker in list(self._breakers.values()):
+            breaker.reset()
 
 
 def circuit_protected(
@@ -257,17 +588,20 @@ def circuit_protected(
     fallback_function: Optional[Callable] = None,
     name: Optional[str] = None,
     timeout: Optional[float] = None,
+    **window_options: Any,
 ):
     """
     Decorator for applying circuit breaker pattern to functions.
 
     Args:
-        failure_threshold: Number of failures before opening circuit
+        failure_threshold: Minimum calls in the window before the circuit can open
         recovery_timeout: Seconds to wait before trying half-open state
-        expected_exceptions: List of exception types that trigger the breaker
+        expected_exceptions: List of exception types that count as failures
         fallback_function: Function to call when circuit is open
         name: Optional name for this circuit breaker
         timeout: Optional timeout for the function
+        **window_options: Further CircuitBreakerConfig options (window type
+            and size, rate thresholds, half-open probes)
 
     Returns:
         Decorated function with circuit breaker protection
@@ -285,6 +619,7 @@ def circuit_protected(
             fallback_function=fallback_function,
             name=circuit_name,
             timeout=timeout,
+            **window_options,
         )
 
         # Create or get circuit breaker
@@ -305,6 +640,7 @@ def circuit_protected(
             def wrapper(*args, **kwargs):
                 return breaker.call(func, *args, **kwargs)
 
+        wrapper.circuit_breaker = breaker
         return wrapper
 
     return decorator
@@ -11,6 +11,8 @@ import logging
 from datetime import datetime, timezone
 from typing import Any, Dict, List
 
+from forest_app.integrations.llm_rate_limiter import LLMPriority, llm_priority
+
 try:
     from forest_app.core.circuit_breaker import circuit_protected
 except ImportError as e:
@@ -153,10 +155,11 @@ class TopNodeEvolutionManager:
                 journey_data, original_vision
             )
 
-            # Get recommendation from LLM
-            response = await self.llm_client.generate_text(
-                prompt, max_tokens=1000, temperature=0.5
-            )
+            # Get recommendation from LLM (background work, yields to interactive calls)
+            with llm_priority(LLMPriority.BACKGROUND):
+                response = await self.llm_client.generate_text(
+                    prompt, max_tokens=1000, temperature=0.5
+                )
 
             # Parse the response
             recommendation = self._parse_evolution_recommendation(response)
@@ -0,0 +1,215 @@
+"""
+Bounded conversation history for MemorySnapshot.
+
+Snapshots used to keep every reflection and (up to a hard cut) every chat turn,
+so the serialized snapshot, and the cost of saving it, grew with the age of the
+account. This module keeps only a recent window of turns in the snapshot:
+
+- older turns are compacted into *segments* (an extractive summary plus the raw
+  turns) that are persisted to the ``conversation_summaries`` table and can be
+  loaded on demand through the paged history API;
+- a short rolling summary of everything archived stays in the snapshot
+  (``history_archive``); the Arbiter prompt includes the conversation summary
+  so older context is not lost entirely.
+
+Compaction uses hysteresis: it only runs once a list exceeds the retention
+window by ``compact_batch`` turns, so most saves do not rewrite the archive.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from forest_app.integrations.context_trimmer import summary_lines
+
+logger = logging.getLogger(__name__)
+
+# Snapshot attribute -> archive kind
+HISTORY_KINDS: Dict[str, str] = {
+    "conversation_history": "conversation",
+    "reflection_log": "reflection",
+}
+SESSION_INFO_KEY = "history_segments_written"  # Segments waiting for a commit
+
+
+@dataclass
+class RetentionPolicy:
+    """How much history a snapshot keeps verbatim."""
+
+    retain_turns: int = 20
+    reflection_retain: int = 20
+    compact_batch: int = 10
+    summary_max_chars: int = 4000
+
+    @classmethod
+    def from_settings(cls) -> "RetentionPolicy":
+        """Build the policy from application settings, falling back to defaults."""
+        try:
+            from forest_app.config.settings import settings
+
+            return cls(
+                retain_turns=settings.SNAPSHOT_HISTORY_RETAIN_TURNS,
+                reflection_retain=settings.SNAPSHOT_REFLECTION_LOG_RETAIN,
+                compact_batch=settings.SNAPSHOT_HISTORY_COMPACT_BATCH,
+                summary_max_chars=settings.SNAPSHOT_HISTORY_SUMMARY_MAX_CHARS,
+            )
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"History retention settings unavailable, using defaults: {e}")
+            return cls()
+
+    def retain_for(self, kind: str) -> int:
+        """Number of turns of ``kind`` kept in the snapshot."""
+        return self.reflection_retain if kind == "reflection" else self.retain_turns
+
+
+def summarize_segment(turns: List[Dict[str, Any]]) -> str:
+    """
+    Build an extractive summary of compacted turns.
+
+    Uses the same lines as ``ContextTrimmer.summarize_turns`` (first sentence
+    of each turn, prefixed by its role, oldest first) without its header or
+    token budget, since the rolling summary is bounded by characters.
+
+    Args:
+        turns: Turns being archived
+
+    Returns:
+        One line per non-empty turn
+    """
+    return "\n".join(summary_lines(turns))
+
+
+def _roll_summary(previous: str, addition: str, max_chars: int) -> str:
+    """Append to the rolling summary, dropping the oldest lines past ``max_chars``."""
+    combined = f"{previous}\n{addition}" if previous and addition else previous or addition
+    if len(combined) <= max_chars:
+        return combined
+    cut = combined.find("\n", len(combined) - max_chars)
+    return combined[cut + 1 :] if cut != -1 else combined[-max_chars:]
+
+
+def compact_history(
+    snapshot: Any,
+    policy: Optional[RetentionPolicy] = None,
+    summarizer: Optional[Callable[[List[Dict[str, Any]]], str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Move turns beyond the retention window out of the snapshot.
+
+    Compacted segments are appended to ``snapshot.pending_history_segments``
+    (not serialized) for the persistence layer to store, and are cleared
+    once the save commits. The rolling summary in ``snapshot.history_archive``
+    is updated.
+
+    Args:
+        snapshot: MemorySnapshot to compact in place
+        policy: Retention policy (defaults to settings)
+        summarizer: Optional callable turning a list of turns into summary text
+
+    Returns:
+        The segments created by this call (empty if nothing was compacted)
+    """
+    policy = policy or RetentionPolicy.from_settings()
+    summarize = summarizer or summarize_segment
+    archive = getattr(snapshot, "history_archive", None)
+    if not isinstance(archive, dict):
+        archive = {}
+        snapshot.history_archive = archive
+    pending = getattr(snapshot, "pending_history_segments", None)
+    if not isinstance(pending, list):
+        pending = []
+        snapshot.pending_history_segments = pending
+
+    created = []
+    for attr, kind in HISTORY_KINDS.items():
+        turns = getattr(snapshot, attr, None)
+        retain = max(0, policy.retain_for(kind))
+        if not isinstance(turns, list) or len(turns) <= retain + policy.compact_batch:
+            continue
+
+        split = len(turns) - retain
+        evicted, kept = turns[:split], turns[split:]
+        try:
+            summary = summarize(evicted)
+        except Exception as e:
+            logger.warning("History summarizer failed for %s, using extractive summary: %s", kind, e)
+            summary = summarize_segment(evicted)
+
+        timestamps = [t.get("timestamp") for t in evicted if isinstance(t, dict) and t.get("timestamp")]
+        segment = {
+            "kind": kind,
+            "summary": summary,
+            "turns": evicted,
+            "turn_count": len(evicted),
+            "first_turn_at": timestamps[0] if timestamps else None,
+            "last_turn_at": timestamps[-1] if timestamps else None,
+        }
+        created.append(segment)
+
+        state = archive.setdefault(kind, {"summary": "", "archived": 0})
+        state["summary"] = _roll_summary(state.get("summary", ""), summary, policy.summary_max_chars)
+        state["archived"] = int(state.get("archived", 0)) + len(evicted)
+        setattr(snapshot, attr, kept)
+        logger.debug("Compacted %d %s turns (%d kept)", len(evicted), kind, len(kept))
+
+    pending.extend(created)
+    return created
+
+
+def take_pending_segments(snapshot: Any) -> List[Dict[str, Any]]:
+    """Return and clear the segments waiting to be persisted."""
+    pending = getattr(snapshot, "pending_history_segments", None) or []
+    snapshot.pending_history_segments = []
+    return pending
+
+
+def pending_segments(snapshot: Any) -> List[Dict[str, Any]]:
+    """The segments waiting to be persisted, without clearing them."""
+    return list(getattr(snapshot, "pending_history_segments", None) or [])
+
+
+def clear_segments_after_commit(db: Any, snapshot: Any, segments: List[Dict[str, Any]]) -> None:
+    """
+    Drop ``segments`` from the snapshot's pending list once ``db`` commits.
+
+    The snapshot's ``conversation_history`` is already compacted, so the
+    segments stay pending if the transaction rolls back and a retried save
+    writes them again.
+
+    Args:
+        db: Session or AsyncSession the segments were added to
+        snapshot: MemorySnapshot the segments were compacted from
+        segments: Segments added to the transaction
+    """
+    if not segments:
+        return
+    _install_session_hooks()
+    session = getattr(db, "sync_session", db)
+    session.info.setdefault(SESSION_INFO_KEY, []).append((snapshot, segments))
+
+
+def _after_commit(session: Any) -> None:
+    for snapshot, segments in session.info.pop(SESSION_INFO_KEY, []):
+        written = {id(segment) for segment in segments}
+        pending = getattr(snapshot, "pending_history_segments", None) or []
+        snapshot.pending_history_segments = [s for s in pending if id(s) not in written]
+
+
+def _after_rollback(session: Any) -> None:
+    session.info.pop(SESSION_INFO_KEY, None)
+
+
+_hooks_installed = False
+
+
+def _install_session_hooks() -> None:
+    """Listen for commits and rollbacks on every ORM session (once)."""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+    _hooks_installed = True
@@ -104,6 +104,25 @@ except ImportError as e:
         async def stop(self):
             pass
 
+try:
+    from forest_app.core.snapshot_codename import get_codename_scheduler
+except ImportError as e:
+    logging.error(f"Failed to import get_codename_scheduler: {e}")
+    get_codename_scheduler = None
+
+try:
+    from forest_app.core.snapshot_retention import get_snapshot_retention
+except ImportError as e:
+    logging.error(f"Failed to import get_snapshot_retention: {e}")
+    get_snapshot_retention = None
+
+try:
+    from forest_app.core.task_store import create_task_store
+except ImportError as e:
+    logging.error(f"Failed to import create_task_store: {e}")
+    def create_task_store(*args, **kwargs):
+        return None
+
 try:
     from forest_app.integrations.llm import LLMClient
 except ImportError as e:
@@ -127,11 +146,21 @@ class ArchitectureContainer(containers.DeclarativeContainer):
         instance_of=SemanticMemoryManagerBase
     )
 
+    # Durable task store (None keeps the queue in memory)
+    task_store = providers.Singleton(
+        create_task_store,
+        backend=config.architecture.task_queue.store,
+        db_url=config.architecture.task_queue.store_url,
+    )
+
     # Task Queue (Singleton)
     task_queue = providers.Singleton(
         TaskQueue,
         max_workers=config.architecture.task_queue.max_workers,
         result_ttl=config.architecture.task_queue.result_ttl,
+        store=task_store,
+        visibility_timeout=config.architecture.task_queue.visibility_timeout,
+        max_attempts=config.architecture.task_queue.max_attempts,
     )
 
     # Cache Service (Singleton)
@@ -180,6 +209,14 @@ async def initialize_architecture(app: FastAPI = None) -> ArchitectureContainer:
             "task_queue": {
                 "max_workers": int(os.environ.get("FOREST_TASK_WORKERS", "10")),
                 "result_ttl": int(os.environ.get("FOREST_TASK_RESULT_TTL", "300")),
+                "store": os.environ.get("FOREST_TASK_STORE", "memory"),
+                "store_url": os.environ.get(
+                    "FOREST_TASK_STORE_URL", os.environ.get("DB_CONNECTION_STRING")
+                ),
+                "visibility_timeout": float(
+                    os.environ.get("FOREST_TASK_VISIBILITY_TIMEOUT", "300")
+                ),
+                "max_attempts": int(os.environ.get("FOREST_TASK_MAX_ATTEMPTS", "3")),
             },
             "cache": {
                 "backend": os.environ.get("FOREST_CACHE_BACKEND", "memory"),
@@ -199,6 +236,10 @@ async def initialize_architecture(app: FastAPI = None) -> ArchitectureContainer:
     # Initialize components that need startup
     task_queue = container.task_queue()
     await task_queue.start()
+    if get_codename_scheduler is not None:
+        get_codename_scheduler().attach_queue(task_queue)
+    if get_snapshot_retention is not None:
+        get_snapshot_retention().start(task_queue)
 
     # Register lifecycle management if app provided
     if app:
@@ -213,6 +254,8 @@ async def initialize_architecture(app: FastAPI = None) -> ArchitectureContainer:
 
             # Shutdown
             logger.info("Shutting down The Forest architecture components...")
+            if get_snapshot_retention is not None:
+                await get_snapshot_retention().stop()
             await task_queue.stop()
 
         # Assign lifespan to app
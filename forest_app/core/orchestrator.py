@@ -201,6 +201,26 @@ class ForestOrchestrator:
             self.logger.error("Error in process_reflection: %s", e)
             raise
 
+    async def stream_reflection(
+        self,
+        user_input: str,
+        snapshot: MemorySnapshot,
+        event_sink: Callable[[str, Dict[str, Any]], Any],
+    ) -> Dict[str, Any]:
+        """Process a reflection, pushing tasks and narrative deltas to ``event_sink``.
+
+        Returns the same payload as the non-streaming command path once the
+        arbiter response is complete. Persisting the snapshot is left to the
+        caller so it can happen after the stream has been delivered.
+        """
+        try:
+            return await self.reflection_processor.process(
+                user_input, snapshot, event_sink=event_sink
+            )
+        except Exception as e:
+            self.logger.error("Error in stream_reflection: %s", e)
+            raise
+
     async def process_task_completion(
         self,
         task_id: str,
@@ -4,7 +4,9 @@ import json
 import logging
 import uuid
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from forest_app.integrations.llm_rate_limiter import LLMPriority, llm_priority
 
 try:
     from forest_app.core.harmonic_framework import HarmonicRouting, SilentScoring
@@ -23,6 +25,12 @@ except ImportError as e:
     logging.error(f"Failed to import MemorySnapshot: {e}")
     class MemorySnapshot:
         pass
+try:
+    from forest_app.core.history_retention import compact_history
+except ImportError as e:
+    logging.error(f"Failed to import history_retention: {e}")
+    def compact_history(snapshot, policy=None, summarizer=None):
+        return []
 try:
     from forest_app.core.utils import clamp01
 except ImportError as e:
@@ -299,7 +307,10 @@ class ReflectionProcessor:
             # Continue without snapshot update
 
     async def process(
-        self, user_input: str, snapshot: MemorySnapshot
+        self,
+        user_input: str,
+        snapshot: MemorySnapshot,
+        event_sink: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
     ) -> Dict[str, Any]:
         """
         Processes user reflection, updates state, generates task(s)/narrative.
@@ -307,6 +318,10 @@ class ReflectionProcessor:
               withering is updated before this method is called. It focuses
               on the core reflection processing logic and modifies the snapshot directly.
               It does NOT save component states back to the snapshot.
+
+        If ``event_sink`` is given, partial results are pushed to it while
+        processing: a ``"tasks"`` event as soon as tasks are selected, then
+        ``"narrative"`` events carrying arbiter text deltas as they stream in.
         """
         logger.info("Processing reflection...")
 
@@ -328,7 +343,11 @@ class ReflectionProcessor:
         if user_input:  # Avoid adding empty reflections
             snapshot.current_batch_reflections.append(user_input)
             snapshot.conversation_history.append(
-                {"role": "user", "content": user_input}
+                {
+                    "role": "user",
+                    "content": user_input,
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                }
             )
             logger.info(
                 "Appended reflection. Batch size: %s. History size: %s.",
@@ -464,6 +483,13 @@ class ReflectionProcessor:
             if hasattr(snapshot, "current_frontier_batch_ids"):
                 snapshot.current_frontier_batch_ids = []
 
+        if event_sink is not None:
+            await self._emit(
+                event_sink,
+                "tasks",
+                {"tasks": generated_tasks or ([fallback_task] if fallback_task else [])},
+            )
+
         # --- 5. Arbiter Narrative Generation ---
         narrative = "(fallback narrative)"
         arbiter_task_data_refined = (
@@ -513,15 +539,20 @@ class ReflectionProcessor:
                 user_input=user_input,
                 snapshot_dict=snap_dict_for_llm,
                 conversation_history=snapshot.conversation_history,
+                history_archive=getattr(snapshot, "history_archive", None),
                 primary_task=primary_task_for_prompt,
                 task_titles=task_titles_for_prompt,
                 style_directive_input=style,
             )
 
-            # Call LLM
-            arb_out: Optional[ArbiterStandardResponse] = await self.llm_client.generate(
-                prompt_parts=[arb_prompt], response_model=ArbiterStandardResponse
-            )
+            # Call LLM; the user is waiting, so this goes ahead of background calls
+            with llm_priority(LLMPriority.INTERACTIVE):
+                if event_sink is not None and hasattr(self.llm_client, "generate_stream"):
+                    arb_out = await self._stream_arbiter(arb_prompt, event_sink)
+                else:
+                    arb_out: Optional[ArbiterStandardResponse] = await self.llm_client.generate(
+                        prompt_parts=[arb_prompt], response_model=ArbiterStandardResponse
+                    )
 
             # Process response
             if isinstance(arb_out, ArbiterStandardResponse):
@@ -550,14 +581,14 @@ class ReflectionProcessor:
         # Append narrative to history
         if isinstance(narrative, str):
             snapshot.conversation_history.append(
-                {"role": "assistant", "content": narrative}
+                {
+                    "role": "assistant",
+                    "content": narrative,
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                }
             )
-            # Trim history if needed
-            max_history = 20
-            if len(snapshot.conversation_history) > max_history:
-                snapshot.conversation_history = snapshot.conversation_history[
-                    -max_history:
-                ]
+            # Compact turns beyond the retention window into rolling summaries
+            compact_history(snapshot)
 
         # Potentially update the task in generated_tasks or fallback_task if Arbiter refined it
         if isinstance(arbiter_task_data_refined, dict):
@@ -695,6 +726,31 @@ class ReflectionProcessor:
 
     # --- Internal Helper Methods ---
 
+    async def _emit(
+        self,
+        event_sink: Callable[[str, Dict[str, Any]], Awaitable[None]],
+        event: str,
+        data: Dict[str, Any],
+    ) -> None:
+        """Pushes a partial result; a failing sink never breaks processing."""
+        try:
+            await event_sink(event, data)
+        except Exception as exc:
+            logger.warning("Event sink failed for '%s': %s", event, exc)
+
+    async def _stream_arbiter(
+        self,
+        arb_prompt: str,
+        event_sink: Callable[[str, Dict[str, Any]], Awaitable[None]],
+    ) -> Optional[ArbiterStandardResponse]:
+        """Runs the arbiter call, forwarding narrative text as it is generated."""
+        stream = self.llm_client.generate_stream(
+            [arb_prompt], ArbiterStandardResponse, stream_field="narrative"
+        )
+        async for delta in stream:
+            await self._emit(event_sink, "narrative", {"delta": delta})
+        return stream.result
+
     # <<< CORRECTED LINE
     def _get_fallback_task(self, reason: str) -> Dict[str, Any]:
         """Generates a generic fallback task when primary task generation fails."""
@@ -712,6 +768,7 @@ class ReflectionProcessor:
         primary_task: Dict[str, Any],
         task_titles: List[str],
         style_directive_input: str = "",
+        history_archive: Optional[Dict[str, Any]] = None,
     ) -> str:
         """Constructs the prompt for the Arbiter LLM call."""
         # Context Pruning (Simplified for example)
@@ -728,6 +785,14 @@ class ReflectionProcessor:
             [f"{msg['role']}: {msg['content']}" for msg in conversation_history[-5:]]
         )  # Last 5 messages
 
+        # Rolling summary of turns compacted out of the snapshot (history_retention)
+        archived = (history_archive or {}).get("conversation") or {}
+        earlier_text = (
+            f"Earlier Conversation (summary):\n{archived['summary']}\n\n"
+            if isinstance(archived, dict) and archived.get("summary")
+            else ""
+        )
+
         # Style Directive
         style_text = (
             f"Style: {style_directive_input}"
@@ -741,7 +806,7 @@ class ReflectionProcessor:
         prompt = f"""
 Context Summary: {context_summary}
 
-Recent Conversation:
+{earlier_text}Recent Conversation:
 {history_text}
 
 Current Task Focus: {task_summary}
@@ -1,25 +1,36 @@
 """RequestContext for in-process context propagation."""
 
+import contextvars
+import time
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from functools import lru_cache
-from typing import Dict, Optional
+from typing import Dict, Iterator, Optional
 from uuid import UUID, uuid4
 
 from pydantic import BaseModel, Field
 
+from forest_app.integrations.deadline import deadline_at
+
+_current_context: contextvars.ContextVar[Optional["RequestContext"]] = (
+    contextvars.ContextVar("request_context", default=None)
+)
+
 
 class RequestContext(BaseModel):
     """
     Context object for request-scoped information propagation.
 
-    Contains user_id, trace_id, timestamp and feature flags to be
-    passed through service layers and included in logs.
+    Contains user_id, trace_id, timestamp, feature flags and the request
+    deadline to be passed through service layers and included in logs.
     """
 
     user_id: Optional[UUID] = None
     trace_id: UUID = Field(default_factory=uuid4)
     timestamp_utc: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     feature_flags: Dict[str, bool] = Field(default_factory=dict)
+    # Absolute time.monotonic() value by which the request must be answered
+    deadline: Optional[float] = None
 
     model_config = {
         "frozen": True,
@@ -34,3 +45,29 @@ class RequestContext(BaseModel):
         Cached for performance as this may be called frequently.
         """
         return self.feature_flags.get(feature_name, False)
+
+    def remaining_seconds(self) -> Optional[float]:
+        """Seconds left before the deadline (may be negative), or None."""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    @contextmanager
+    def bind(self) -> Iterator["RequestContext"]:
+        """
+        Make this the current context for the enclosed block.
+
+        The deadline is propagated to every outbound LLM call made in the
+        block (see ``forest_app.integrations.deadline``).
+        """
+        token = _current_context.set(self)
+        try:
+            with deadline_at(self.deadline):
+                yield self
+        finally:
+            _current_context.reset(token)
+
+
+def current_request_context() -> Optional[RequestContext]:
+    """The RequestContext bound to the current request, if any."""
+    return _current_context.get()
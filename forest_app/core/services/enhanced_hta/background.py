@@ -12,9 +12,11 @@ providing rich, computationally intensive features.
 
 import logging
 from datetime import datetime, timezone
-from typing import Any, Awaitable, Callable, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
 from uuid import UUID
 
+from forest_app.integrations.llm_rate_limiter import LLMPriority, llm_priority
+
 try:
     from forest_app.core.snapshot import MemorySnapshot
 except ImportError as e:
@@ -22,13 +24,17 @@ except ImportError as e:
     class MemorySnapshot:
         pass
 try:
-    from forest_app.core.task_queue import TaskQueue
+    from forest_app.core.task_queue import TaskQueue, register_task
 except ImportError as e:
     logging.error(f"Failed to import TaskQueue: {e}")
     class TaskQueue:
         @staticmethod
         def get_instance():
             return None
+    def register_task(name=None):
+        def decorator(func):
+            return func
+        return decorator
 try:
     from forest_app.core.transaction_decorator import transaction_protected
 except ImportError as e:
@@ -61,19 +67,23 @@ class BackgroundTaskManager:
 
     async def enqueue_task(
         self,
-        task_func: Callable[..., Awaitable[Any]],
+        task_func: Union[Callable[..., Awaitable[Any]], str],
         *args,
         priority: int = 5,
         metadata: Optional[Dict[str, Any]] = None,
+        dedup_key: Optional[str] = None,
+        coalesce: str = "merge",
         **kwargs,
     ) -> bool:
         """Enqueue a task for background processing.
 
         Args:
-            task_func: The async function to execute
+            task_func: The async function to execute, or a registered task name
             *args: Positional arguments for the task function
             priority: Task priority (1-10, lower is higher priority)
             metadata: Optional metadata for tracking and logging
+            dedup_key: Optional key for coalescing duplicate pending tasks
+            coalesce: "merge" to keep the pending task, "supersede" to replace it
             **kwargs: Keyword arguments for the task function
 
         Returns:
@@ -81,7 +91,13 @@ class BackgroundTaskManager:
         """
         try:
             await self.task_queue.enqueue(
-                task_func, *args, priority=priority, metadata=metadata or {}, **kwargs
+                task_func,
+                *args,
+                priority=priority,
+                metadata=metadata or {},
+                dedup_key=dedup_key,
+                coalesce=coalesce,
+                **kwargs,
             )
             return True
         except Exception as e:
@@ -249,15 +265,6 @@ class BackgroundTaskManager:
                 class NodeGenerator:
                     async def generate_branch_from_parent(self, parent_node, memory_snapshot):
                         return []
-            try:
-                from forest_app.persistence.repositories import HTATreeRepository
-            except ImportError as e:
-                logging.error(f"Failed to import HTATreeRepository: {e}")
-                class HTATreeRepository:
-                    async def add_nodes_bulk(self, branch_nodes):
-                        pass
-                    async def update_branch_triggers(self, node_id, new_triggers):
-                        pass
             memory_manager = HTAMemoryManager()
             node_generator = self._get_node_generator()
             tree_repository = self._get_tree_repository()
@@ -275,10 +282,11 @@ class BackgroundTaskManager:
                 # Get latest memory snapshot for context
                 memory_snapshot = await memory_manager.get_latest_snapshot(user_id)
 
-                # Generate branch nodes
-                branch_nodes = await node_generator.generate_branch_from_parent(
-                    parent_node=node, memory_snapshot=memory_snapshot
-                )
+                # Generate branch nodes; expansion yields to interactive LLM calls
+                with llm_priority(LLMPriority.BACKGROUND):
+                    branch_nodes = await node_generator.generate_branch_from_parent(
+                        parent_node=node, memory_snapshot=memory_snapshot
+                    )
 
                 if branch_nodes:
                     # Add new nodes to the tree
@@ -304,6 +312,39 @@ class BackgroundTaskManager:
             logger.error(f"Error expanding nodes in background: {e}")
             return False
 
+    async def expand_nodes_by_id(self, node_ids: List[str], user_id: str) -> bool:
+        """Load nodes by ID and expand them.
+
+        Durable task storage only holds JSON arguments, so queued expansions
+        carry node IDs and are resolved here when a worker picks them up.
+
+        Args:
+            node_ids: String IDs of the nodes to expand
+            user_id: String UUID of the user
+
+        Returns:
+            Boolean indicating expansion success
+
+        Raises:
+            RuntimeError: If the tree repository is unavailable, so the task
+                fails instead of silently expanding nothing
+        """
+        tree_repository = self._get_tree_repository()
+        try:
+            nodes = []
+            for node_id in node_ids:
+                node = await tree_repository.get_node_by_id(UUID(node_id))
+                if node is not None:
+                    nodes.append(node)
+                else:
+                    logger.warning(f"Node {node_id} no longer exists; skipping expansion")
+
+            return await self.expand_nodes_in_background(nodes, UUID(user_id))
+
+        except Exception as e:
+            logger.error(f"Error resolving nodes for background expansion: {e}")
+            return False
+
     def _get_node_generator(self):
         """Get the node generator for creating new nodes.
 
@@ -328,16 +369,29 @@ class BackgroundTaskManager:
         This is abstracted to allow easier testing and mocking.
 
         Returns:
-            TreeRepository instance
+            HTATreeRepository instance
+
+        Raises:
+            RuntimeError: If the repository cannot be imported
         """
         try:
-            from forest_app.persistence.repositories import HTATreeRepository
-            return HTATreeRepository()
+            from forest_app.core.session_manager import SessionManager
+            from forest_app.persistence.hta_tree_repository import HTATreeRepository
         except ImportError as e:
-            logging.error(f"Failed to import HTATreeRepository: {e}")
-            class HTATreeRepository:
-                async def add_nodes_bulk(self, branch_nodes):
-                    pass
-                async def update_branch_triggers(self, node_id, new_triggers):
-                    pass
-            return HTATreeRepository()
+            logger.error(f"Failed to import HTATreeRepository: {e}")
+            raise RuntimeError("HTA tree repository unavailable") from e
+        return HTATreeRepository(SessionManager.get_instance())
+
+
+@register_task("enhanced_hta.expand_nodes")
+async def expand_nodes_task(node_ids: List[str], user_id: str) -> bool:
+    """Durable entry point for background node expansion.
+
+    Args:
+        node_ids: String IDs of the nodes to expand
+        user_id: String UUID of the user
+
+    Returns:
+        Boolean indicating expansion success
+    """
+    return await BackgroundTaskManager().expand_nodes_by_id(node_ids, user_id)
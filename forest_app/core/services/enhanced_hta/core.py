@@ -301,12 +301,17 @@ class EnhancedHTAService(HTAService):
 
         if expand_nodes:
             # Schedule background expansion using the background manager
+            # Enqueue by registered name with JSON arguments so the expansion
+            # survives restarts when a durable task store is configured
+            node_ids = sorted(str(n.id) for n in expand_nodes)
             await self.background_manager.enqueue_task(
-                self.background_manager.expand_nodes_in_background,
-                expand_nodes,
-                user_id,
+                "enhanced_hta.expand_nodes",
+                node_ids,
+                str(user_id),
                 priority=3,  # Medium priority
                 metadata={"type": "node_expansion", "user_id": str(user_id)},
+                # Repeated completions must not trigger duplicate LLM expansions
+                dedup_key=f"expand_nodes:{node.tree_id}:{','.join(node_ids)}",
             )
 
     def _llm_fallback(self, *args, **kwargs):
@@ -368,6 +373,9 @@ class EnhancedHTAService(HTAService):
                             "type": "meaningful_moments",
                             "user_id": format_uuid(tree.user_id),
                         },
+                        # A newer save of the same tree replaces pending work
+                        dedup_key=f"meaningful_moments:{format_uuid(tree.id)}",
+                        coalesce="supersede",
                     )
 
             return success
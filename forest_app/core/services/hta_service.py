@@ -75,6 +75,23 @@ except ImportError as e:
     class HTATree:
         pass
 
+try:
+    from forest_app.modules.hta_patch import (
+        HTAPatchError,
+        apply_patch,
+        build_outline,
+        select_focus_node,
+        subtree_size,
+    )
+
+    hta_patch_import_ok = True
+except ImportError as e:
+    log_import_error(e, "hta_service.py:hta_patch")
+    hta_patch_import_ok = False
+
+    class HTAPatchError(ValueError):
+        pass
+
 try:
     from forest_app.modules.seed import Seed, SeedManager
 except ImportError as e:
@@ -84,6 +101,12 @@ except ImportError as e:
     class SeedManager:
         pass
 
+try:
+    from forest_app.config.settings import settings
+except ImportError as e:
+    log_import_error(e, "hta_service.py:settings")
+    settings = None
+
 # Feature flags with error handling
 try:
     from forest_app.core.feature_flags import Feature, is_enabled
@@ -433,7 +456,14 @@ class HTAService(HTAServiceProtocol):
         elif not reflections:
             logger.info("No reflections provided for evolution. Using default goal.")
 
-        # 2. Call LLM for evolution
+        # 2. Large trees evolve through a patch on the relevant subtree
+        if self._use_patch_evolution(tree):
+            patched_tree = await self._evolve_tree_with_patch(tree, evolution_goal)
+            if patched_tree is not None:
+                return patched_tree
+            logger.info("Patch evolution failed; falling back to full-tree evolution.")
+
+        # 3. Call LLM for whole-tree evolution
         try:
             current_hta_json = json.dumps(tree.to_dict())  # Serialize current tree
             logger.debug(
@@ -444,11 +474,12 @@ class HTAService(HTAServiceProtocol):
                 await self.llm_client.request_hta_evolution(
                     current_hta_json=current_hta_json,
                     evolution_goal=evolution_goal,
+                    tree_key=str(tree.root.id),
                     # use_advanced_model=False # TODO: Consider making this configurable
                 )
             )
 
-            # 3. Validate and Process LLM Response
+            # 4. Validate and Process LLM Response
             if (
                 not isinstance(evolved_hta_response, HTAEvolveResponse)
                 or not evolved_hta_response.hta_root
@@ -514,6 +545,61 @@ class HTAService(HTAServiceProtocol):
             )
             return None  # Evolution failed
 
+    def _use_patch_evolution(self, tree: HTATree) -> bool:
+        """Patch evolution is used for trees of at least HTA_PATCH_MIN_NODES nodes."""
+        mode = getattr(settings, "HTA_EVOLUTION_MODE", "patch")
+        if mode != "patch" or not hta_patch_import_ok:
+            return False
+        if not hasattr(self.llm_client, "request_hta_patch"):
+            return False
+        min_nodes = getattr(settings, "HTA_PATCH_MIN_NODES", 25)
+        return subtree_size(tree.root) >= min_nodes
+
+    async def _evolve_tree_with_patch(
+        self, tree: HTATree, evolution_goal: str
+    ) -> Optional[HTATree]:
+        """
+        Evolves the tree by asking the LLM for add/remove/update/move operations
+        on the focus subtree (plus an outline of the rest) and applying them.
+
+        Returns:
+            The patched tree, or None if the request or the patch failed.
+        """
+        focus = select_focus_node(
+            tree, max_nodes=getattr(settings, "HTA_PATCH_FOCUS_MAX_NODES", 60)
+        )
+        if focus is None:
+            return None
+        outline = build_outline(
+            tree,
+            focus_id=focus.id,
+            max_nodes=getattr(settings, "HTA_PATCH_OUTLINE_MAX_NODES", 200),
+        )
+        try:
+            patch = await self.llm_client.request_hta_patch(
+                outline=outline,
+                focus_subtree_json=json.dumps(focus.to_dict()),
+                evolution_goal=evolution_goal,
+            )
+            result = apply_patch(tree, patch.operations)
+        except HTAPatchError as patch_err:
+            logger.warning("Rejected HTA patch: %s", patch_err)
+            return None
+        except (LLMError, LLMValidationError) as llm_err:
+            logger.error("LLM/Validation Error during HTA patch request: %s", llm_err)
+            return None
+        except Exception as patch_err:
+            logger.exception("Unexpected error during HTA patch evolution: %s", patch_err)
+            return None
+
+        logger.info(
+            "Applied HTA patch on focus '%s' (%d nodes): %s",
+            focus.id,
+            subtree_size(focus),
+            result.counts or "no changes",
+        )
+        return result.tree
+
     async def update_task_completion(
         self, task_id: str, completion_data: Dict[str, Any]
     ) -> Dict[str, Any]:
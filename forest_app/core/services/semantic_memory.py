@@ -152,8 +152,8 @@ class SemanticMemoryManager(SemanticMemoryManagerBase):
 
     def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between two vectors."""
-        vec1 = np.array(vec1)
-        vec2 = np.array(vec2)
+        vec1 = np.asarray(vec1)  # Loaded embeddings are float32 arrays already
+        vec2 = np.asarray(vec2)
         return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
 
     async def get_memory_stats(self) -> Dict[str, Any]:
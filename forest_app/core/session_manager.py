@@ -7,9 +7,12 @@ Manages per-user Forest sessions: state storage, heartbeat tasks, and concurrenc
 import asyncio
 import logging
 import threading
+import weakref
 from typing import Any, Callable, Dict, Optional
 from uuid import UUID
 
+from forest_app.integrations.deadline import no_deadline
+
 try:
     from forest_app.core.onboarding import onboard_user
     from forest_app.core.session_management import run_forest_session_async
@@ -55,6 +58,10 @@ class SessionManager:
 
     def __init__(self):
         self._sessions: Dict[UUID, SessionInfo] = {}
+        # Dropped once no coroutine holds or waits for them
+        self._user_locks: "weakref.WeakValueDictionary[Any, asyncio.Lock]" = (
+            weakref.WeakValueDictionary()
+        )
 
     def start_session(
         self,
@@ -70,9 +77,11 @@ class SessionManager:
         if user_id in self._sessions:
             return
         info = SessionInfo(user_id, initial_snapshot, save_snapshot, baselines)
-        info.task = asyncio.create_task(
-            run_forest_session_async(info.snapshot, info.save_snapshot, info.lock)
-        )
+        # The heartbeat outlives the request that started it
+        with no_deadline():
+            info.task = asyncio.create_task(
+                run_forest_session_async(info.snapshot, info.save_snapshot, info.lock)
+            )
         self._sessions[user_id] = info
         logger.info("Started session for user '%s'", user_id)
 
@@ -105,6 +114,19 @@ class SessionManager:
         info = self.get_session_info(user_id)
         return info.lock if info else None
 
+    def get_user_lock(self, user_id: UUID) -> asyncio.Lock:
+        """
+        Retrieve the asyncio.Lock serializing snapshot changes for a user.
+
+        Held by commands from snapshot load to save and by the snapshot
+        write-behind flusher; independent of heartbeat sessions.
+        """
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._user_locks[user_id] = lock
+        return lock
+
     def get_snapshot(self, user_id: UUID) -> Optional[Dict[str, Any]]:
         """
         Retrieve the live snapshot for a user. Use get_session_lock() to guard modifications.
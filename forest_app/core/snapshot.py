@@ -53,6 +53,10 @@ class MemorySnapshot:
         self.task_backlog: List[Dict[str, Any]] = []
         self.task_footprints: List[Dict[str, Any]] = []
         self.conversation_history: List[Dict[str, str]] = []
+        # Rolling summaries of turns compacted out of the lists above
+        self.history_archive: Dict[str, Dict[str, Any]] = {}
+        # Compacted segments awaiting persistence (not serialized)
+        self.pending_history_segments: List[Dict[str, Any]] = []
         self.feature_flags: Dict[str, bool] = {}
         self.current_frontier_batch_ids: List[str] = []
         self.current_batch_reflections: List[str] = []
@@ -134,6 +138,7 @@ class MemorySnapshot:
             "task_backlog": self.task_backlog,
             "task_footprints": self.task_footprints,
             "conversation_history": self.conversation_history,
+            "history_archive": self.history_archive,
             "feature_flags": self.feature_flags,
             "current_frontier_batch_ids": self.current_frontier_batch_ids,
             "current_batch_reflections": self.current_batch_reflections,
@@ -177,6 +182,7 @@ class MemorySnapshot:
             "last_ritual_mode",
             "timestamp",
             "conversation_history",
+            "history_archive",
             "feature_flags",
             "current_frontier_batch_ids",
             "current_batch_reflections",
@@ -200,6 +206,7 @@ class MemorySnapshot:
                     "template_metadata",
                     "semantic_memories",
                     "memory_context",
+                    "history_archive",
                 ]:
                     expected_type = dict
                     default_value = {}
@@ -0,0 +1,448 @@
+"""
+Background codenames for memory snapshots.
+
+Every snapshot save used to wait for an LLM call that only picks a cosmetic
+name for the snapshot. Saves now store a provisional codename straight away
+and, once the transaction has committed, hand the snapshot to the
+``CodenameScheduler``:
+
+- requests are buffered and named in batches, one LLM call per batch, by a
+  coalesced low-priority ``TaskQueue`` task;
+- names are cached by a hash of the codename context (the pruned snapshot
+  state the name is derived from), so identical states never call the LLM
+  twice;
+- snapshots whose names could not be generated are buffered again and
+  retried with the task queue's backoff, up to its ``max_attempts``;
+- the generated name is written back with a compare-and-set on the
+  provisional codename, so a newer name set in the meantime is never
+  overwritten (through the sync session when no async driver is available).
+
+Saves whose codename context did not change keep their current name and
+schedule nothing.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+PROVISIONAL_PREFIX = "Snapshot_"
+FLUSH_DEDUP_KEY = "snapshot-codenames"
+FLUSH_PRIORITY = 8  # Behind user-facing background work
+SESSION_INFO_KEY = "snapshot_codename_requests"  # Requests waiting for a commit
+# Key of the saved codename context's hash in a snapshot row's section_hashes
+CONTEXT_HASH_KEY = "codename_context"
+
+
+@dataclass
+class CodenameRequest:
+    """A committed snapshot waiting for its codename."""
+
+    snapshot_id: Any
+    provisional: Optional[str]
+    context: Dict[str, Any]
+    context_hash: str
+    attempts: int = 0  # Failed generations so far
+
+
+def provisional_codename(now: Optional[datetime] = None) -> str:
+    """Timestamp name stored until the generated codename is written back."""
+    now = now or datetime.now(timezone.utc)
+    return f"{PROVISIONAL_PREFIX}{now.strftime('%Y%m%d-%H%M%S')}"
+
+
+def codename_context(
+    snapshot_data: Optional[Dict[str, Any]],
+    prune: Callable[[Dict[str, Any]], Dict[str, Any]],
+    default_theme: str = "neutral",
+) -> Dict[str, Any]:
+    """
+    Build the state a codename is derived from.
+
+    Floats are rounded to one decimal so small score drifts between turns do
+    not count as a meaningful change.
+
+    Args:
+        snapshot_data: Serialized snapshot
+        prune: Context pruning function (``prune_context``)
+        default_theme: Resonance theme used when the snapshot has none
+
+    Returns:
+        JSON-serializable context dict
+    """
+    if not isinstance(snapshot_data, dict):
+        return {}
+    context = dict(prune(snapshot_data))
+    theme = default_theme
+    component_state = snapshot_data.get("component_state")
+    if isinstance(component_state, dict):
+        theme = component_state.get("last_resonance_theme", theme)
+    context["resonance_theme"] = theme
+    return {
+        key: round(value, 1) if isinstance(value, float) else value
+        for key, value in context.items()
+    }
+
+
+def context_hash(context: Dict[str, Any]) -> str:
+    """Stable content hash of a codename context."""
+    encoded = json.dumps(context, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def build_batch_prompt(contexts: Dict[str, Dict[str, Any]]) -> str:
+    """Prompt naming several snapshot states in one call, keyed by request key."""
+    listed = json.dumps(contexts, indent=2, default=str, sort_keys=True)
+    return (
+        "You are a helpful assistant specialized in creating concise, evocative codenames "
+        "(2-5 words) for user growth journey snapshots based on their current state. "
+        "Use title case.\n"
+        f"Each key below identifies one snapshot context:\n{listed}\n"
+        "Based *only* on each context, generate a suitable codename for every key. "
+        'Return ONLY a valid JSON object in the format: {"codenames": '
+        '[{"key": "<key>", "codename": "Generated Codename Here"}]}'
+    )
+
+
+class CodenameScheduler:
+    """Buffers codename requests and names them in batches on the TaskQueue."""
+
+    def __init__(
+        self,
+        batch_size: int = 16,
+        batch_window: float = 2.0,
+        cache_size: int = 1024,
+        max_length: int = 60,
+        task_queue: Any = None,
+        session_factory: Optional[Callable[[], Any]] = None,
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            batch_size: Maximum snapshots named per LLM call
+            batch_window: Seconds a flush waits for more requests to batch
+            cache_size: Codenames kept per context hash (0 disables the cache)
+            max_length: Maximum codename length
+            task_queue: TaskQueue that runs flushes (defaults to the global
+                queue); its retry settings apply to failed generations
+            session_factory: AsyncSession factory for write-back (defaults to
+                ``AsyncSessionLocal``, or ``SessionLocal`` without an async driver)
+        """
+        self.batch_size = max(1, batch_size)
+        self.batch_window = max(0.0, batch_window)
+        self.cache_size = max(0, cache_size)
+        self.max_length = max_length
+        self.task_queue = task_queue
+        self.session_factory = session_factory
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._pending: Dict[Any, CodenameRequest] = {}
+        self._llm_client: Any = None
+        self._kicks: Set[asyncio.Task] = set()
+        self._metrics = {
+            "scheduled": 0,
+            "batches": 0,
+            "llm_failures": 0,
+            "retries": 0,
+            "abandoned": 0,
+            "cache_hits": 0,
+            "applied": 0,
+            "stale": 0,
+        }
+
+    def attach_queue(self, task_queue: Any) -> None:
+        """Run flushes on ``task_queue`` (the application's started queue)."""
+        self.task_queue = task_queue
+
+    def cached(self, content_hash: str) -> Optional[str]:
+        """Codename previously generated for the same context, if any."""
+        codename = self._cache.get(content_hash)
+        if codename is not None:
+            self._cache.move_to_end(content_hash)
+            self._metrics["cache_hits"] += 1
+        return codename
+
+    def _remember(self, content_hash: str, codename: str) -> None:
+        if not self.cache_size:
+            return
+        self._cache[content_hash] = codename
+        self._cache.move_to_end(content_hash)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def schedule_after_commit(
+        self, db: Any, model: Any, request: CodenameRequest, llm_client: Any
+    ) -> None:
+        """
+        Submit ``request`` once the session's transaction commits.
+
+        Nothing is scheduled if the transaction rolls back, so only snapshots
+        that exist in the database are renamed.
+
+        Args:
+            db: Session or AsyncSession the snapshot was saved with
+            model: The saved MemorySnapshotModel (its id is read at commit)
+            request: Codename request (``snapshot_id`` is filled in at commit)
+            llm_client: Client used to generate the codename
+        """
+        _install_session_hooks()
+        session = getattr(db, "sync_session", db)
+        session.info.setdefault(SESSION_INFO_KEY, []).append(
+            (self, model, request, llm_client)
+        )
+
+    def submit(self, request: CodenameRequest, llm_client: Any) -> None:
+        """Buffer a request (replacing an older one for the same snapshot)."""
+        self._pending[request.snapshot_id] = request
+        self._llm_client = llm_client
+        self._metrics["scheduled"] += 1
+        self._kick()
+
+    def _kick(self, delay: float = 0.0) -> None:
+        """Enqueue a flush (after ``delay`` seconds) from the running loop."""
+        try:
+            kick = asyncio.get_running_loop().create_task(self._enqueue_flush(delay))
+        except RuntimeError:
+            logger.debug("No running event loop; codename flush deferred to next save.")
+            return
+        self._kicks.add(kick)
+        kick.add_done_callback(self._kicks.discard)
+
+    def _resolve_queue(self) -> Any:
+        if self.task_queue is None:
+            from forest_app.core.task_queue import TaskQueue
+
+            self.task_queue = TaskQueue.get_instance()
+        return self.task_queue
+
+    async def _enqueue_flush(self, delay: float = 0.0) -> None:
+        if delay:
+            await asyncio.sleep(delay)
+        queue = self._resolve_queue()
+        if queue is None or not getattr(queue, "running", False):
+            logger.warning(
+                "Task queue not running; %d snapshot(s) keep provisional codenames.",
+                len(self._pending),
+            )
+            return
+        try:
+            # Pending flushes merge, so requests made meanwhile share one batch
+            await queue.enqueue(
+                self.flush,
+                priority=FLUSH_PRIORITY,
+                dedup_key=FLUSH_DEDUP_KEY,
+                metadata={"type": "snapshot_codenames"},
+            )
+        except Exception as e:
+            logger.error("Failed to enqueue snapshot codename flush: %s", e)
+
+    async def flush(self) -> int:
+        """
+        Name one batch of pending snapshots and write the codenames back.
+
+        Returns:
+            Number of snapshots renamed
+        """
+        if self.batch_window:
+            await asyncio.sleep(self.batch_window)
+        if not self._pending:
+            return 0
+        keys = list(self._pending)[: self.batch_size]
+        batch = [self._pending.pop(key) for key in keys]
+        if self._pending:
+            await self._enqueue_flush()
+
+        names: Dict[str, str] = {}
+        missing: Dict[str, Dict[str, Any]] = {}
+        for request in batch:
+            codename = self.cached(request.context_hash)
+            if codename:
+                names[request.context_hash] = codename
+            else:
+                missing[request.context_hash] = request.context
+        if missing:
+            names.update(await self._generate(missing))
+            unnamed = [request for request in batch if request.context_hash not in names]
+            if unnamed and self._llm_client is not None:
+                self._retry_later(unnamed)
+        return await self._apply(batch, names)
+
+    def _retry_later(self, requests: List[CodenameRequest]) -> None:
+        """Buffer requests whose codenames were not generated for another flush."""
+        queue = self._resolve_queue()
+        max_attempts = getattr(queue, "max_attempts", 3)
+        retried = 0
+        for request in requests:
+            request.attempts += 1
+            if request.attempts >= max_attempts:
+                self._metrics["abandoned"] += 1
+                logger.warning(
+                    "Giving up on a codename for snapshot %s after %d attempts.",
+                    request.snapshot_id,
+                    request.attempts,
+                )
+                continue
+            # A newer request for the same snapshot takes precedence
+            self._pending.setdefault(request.snapshot_id, request)
+            retried = max(retried, request.attempts)
+        if retried:
+            self._metrics["retries"] += 1
+            delay = min(
+                getattr(queue, "retry_backoff", 2.0) * 2 ** (retried - 1),
+                getattr(queue, "max_retry_delay", 300.0),
+            )
+            self._kick(delay)
+
+    async def _generate(self, contexts: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        """One LLM call naming every context; returns names by context hash."""
+        from forest_app.integrations.llm import SnapshotCodenameBatchResponse
+        from forest_app.integrations.llm_rate_limiter import LLMPriority, llm_priority
+
+        if self._llm_client is None:
+            return {}
+        hashes = list(contexts)
+        keyed = {str(i + 1): contexts[h] for i, h in enumerate(hashes)}
+        self._metrics["batches"] += 1
+        try:
+            with llm_priority(LLMPriority.BACKGROUND):
+                response = await self._llm_client.generate(
+                    prompt_parts=[build_batch_prompt(keyed)],
+                    response_model=SnapshotCodenameBatchResponse,
+                )
+        except Exception as e:
+            self._metrics["llm_failures"] += 1
+            logger.warning("Codename generation failed: %s", e)
+            return {}
+
+        names = {}
+        for item in getattr(response, "codenames", None) or []:
+            codename = (item.codename or "").strip()[: self.max_length]
+            if not codename or not item.key.isdigit():
+                continue
+            index = int(item.key) - 1
+            if 0 <= index < len(hashes):
+                names[hashes[index]] = codename
+                self._remember(hashes[index], codename)
+        logger.info("Generated %d codename(s) for %d context(s).", len(names), len(hashes))
+        return names
+
+    async def _apply(self, batch: List[CodenameRequest], names: Dict[str, str]) -> int:
+        """Write codenames over the provisional ones they were generated for."""
+        from sqlalchemy import update
+
+        from forest_app.persistence.models import MemorySnapshotModel
+
+        updates = [
+            (request, names[request.context_hash])
+            for request in batch
+            if names.get(request.context_hash)
+            and names[request.context_hash] != request.provisional
+        ]
+        if not updates:
+            return 0
+        statements = [
+            update(MemorySnapshotModel)
+            .where(
+                MemorySnapshotModel.id == request.snapshot_id,
+                MemorySnapshotModel.codename == request.provisional,
+            )
+            # A rename is not a content change; keep the snapshot order
+            .values(codename=codename, updated_at=MemorySnapshotModel.updated_at)
+            .execution_options(synchronize_session=False)
+            for request, codename in updates
+        ]
+
+        factory = self.session_factory
+        if factory is None:
+            from forest_app.persistence import database
+
+            factory = database.AsyncSessionLocal
+            if factory is None and database.engine is not None:
+                # No async driver: write back through the sync engine in a thread
+                rowcounts = await asyncio.to_thread(
+                    _execute_sync, database.SessionLocal, statements
+                )
+                return self._count_applied(rowcounts)
+        if factory is None:
+            logger.error("Database unavailable; cannot store snapshot codenames.")
+            return 0
+
+        async with factory() as db:
+            rowcounts = [(await db.execute(statement)).rowcount for statement in statements]
+            await db.commit()
+        return self._count_applied(rowcounts)
+
+    def _count_applied(self, rowcounts: List[int]) -> int:
+        applied = sum(1 for rowcount in rowcounts if rowcount)
+        self._metrics["applied"] += applied
+        self._metrics["stale"] += len(rowcounts) - applied
+        return applied
+
+    def get_metrics(self) -> Dict[str, int]:
+        """Counters for monitoring, plus current buffer and cache sizes."""
+        return {**self._metrics, "pending": len(self._pending), "cached": len(self._cache)}
+
+
+def _execute_sync(session_factory: Callable[[], Any], statements: List[Any]) -> List[int]:
+    """Run the codename updates in one sync-session transaction."""
+    with session_factory() as db:
+        rowcounts = [db.execute(statement).rowcount for statement in statements]
+        db.commit()
+    return rowcounts
+
+
+def _after_commit(session: Any) -> None:
+    from sqlalchemy import inspect
+
+    for scheduler, model, request, llm_client in session.info.pop(SESSION_INFO_KEY, []):
+        identity = inspect(model).identity
+        if identity:
+            request.snapshot_id = identity[0]
+            scheduler.submit(request, llm_client)
+
+
+def _after_rollback(session: Any) -> None:
+    session.info.pop(SESSION_INFO_KEY, None)
+
+
+_hooks_installed = False
+
+
+def _install_session_hooks() -> None:
+    """Listen for commits and rollbacks on every ORM session (once)."""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+    _hooks_installed = True
+
+
+_scheduler: Optional[CodenameScheduler] = None
+
+
+def get_codename_scheduler() -> CodenameScheduler:
+    """Return the process-wide CodenameScheduler configured from settings."""
+    global _scheduler
+    if _scheduler is None:
+        try:
+            from forest_app.config.settings import settings
+
+            _scheduler = CodenameScheduler(
+                batch_size=settings.SNAPSHOT_CODENAME_BATCH_SIZE,
+                batch_window=settings.SNAPSHOT_CODENAME_BATCH_WINDOW_SECONDS,
+                cache_size=settings.SNAPSHOT_CODENAME_CACHE_SIZE,
+            )
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"Codename settings unavailable, using defaults: {e}")
+            _scheduler = CodenameScheduler()
+    return _scheduler
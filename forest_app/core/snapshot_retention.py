@@ -0,0 +1,324 @@
+"""
+Retention for the ``memory_snapshots`` table.
+
+Saves create and update snapshot rows and nothing used to remove old ones, so
+the table and its indexes grew without bound per user. A
+``SnapshotRetentionPolicy`` decides which of a user's snapshots stay live:
+
+- the ``keep_last`` most recently updated ones;
+- daily checkpoints: the newest snapshot of each of the last
+  ``daily_checkpoints`` days;
+- weekly checkpoints: the newest snapshot of each of the last
+  ``weekly_checkpoints`` ISO weeks.
+
+Everything else is archived: moved to ``memory_snapshot_archive`` as a
+compressed document (see ``persistence/snapshot_archive.py``), from where
+``/snapshots/session/load`` can still restore it.
+
+Archival runs in the background. ``SnapshotRetention.start`` enqueues a
+coalesced, low-priority ``run`` on the ``TaskQueue`` every ``interval``
+seconds. A run handles at most ``max_users_per_run`` users with more than
+``keep_last`` snapshots, moving ``batch_size`` snapshots per transaction and
+pausing ``batch_pause`` seconds between batches so it never holds the
+database for long. Runs page through those users in ``user_id`` order,
+continuing after the last user of the previous run and starting over once
+they reach the end, so users whose extra snapshots are all checkpoints
+cannot hold every run's places.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DEDUP_KEY = "snapshot-retention"
+RETENTION_PRIORITY = 9  # Behind every other background task
+
+
+def _as_utc_naive(value: datetime) -> datetime:
+    """Compare stored timestamps as naive UTC (SQLite returns them naive)."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+@dataclass
+class SnapshotRetentionPolicy:
+    """Which of a user's snapshots stay in ``memory_snapshots``."""
+
+    keep_last: int = 50
+    daily_checkpoints: int = 30
+    weekly_checkpoints: int = 52
+
+    @classmethod
+    def from_settings(cls) -> "SnapshotRetentionPolicy":
+        """Build the policy from application settings, falling back to defaults."""
+        try:
+            from forest_app.config.settings import settings
+
+            return cls(
+                keep_last=settings.SNAPSHOT_RETENTION_KEEP_LAST,
+                daily_checkpoints=settings.SNAPSHOT_RETENTION_DAILY_CHECKPOINTS,
+                weekly_checkpoints=settings.SNAPSHOT_RETENTION_WEEKLY_CHECKPOINTS,
+            )
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"Snapshot retention settings unavailable, using defaults: {e}")
+            return cls()
+
+    def select_expired(
+        self,
+        snapshots: Sequence[Tuple[Any, Optional[datetime]]],
+        now: Optional[datetime] = None,
+    ) -> List[Any]:
+        """
+        Pick the snapshots to archive.
+
+        Args:
+            snapshots: ``(id, updated_at)`` of all of a user's snapshots,
+                most recently updated first
+            now: Reference time for the checkpoint windows (defaults to now)
+
+        Returns:
+            Ids of the snapshots the policy does not keep, in input order
+        """
+        today = _as_utc_naive(now or datetime.now(timezone.utc)).date()
+        this_week = today - timedelta(days=today.weekday())
+        # The latest snapshot is the live session; it is always kept
+        keep = {snapshot_id for snapshot_id, _ in snapshots[: max(1, self.keep_last)]}
+        days, weeks = set(), set()
+        for snapshot_id, updated_at in snapshots:
+            if updated_at is None:
+                continue
+            day = _as_utc_naive(updated_at).date()
+            if (today - day).days < self.daily_checkpoints and day not in days:
+                days.add(day)
+                keep.add(snapshot_id)
+            week = day - timedelta(days=day.weekday())
+            if (this_week - week).days // 7 < self.weekly_checkpoints and week not in weeks:
+                weeks.add(week)
+                keep.add(snapshot_id)
+        return [snapshot_id for snapshot_id, _ in snapshots if snapshot_id not in keep]
+
+
+class SnapshotRetention:
+    """Archives snapshots the retention policy no longer keeps, in the background."""
+
+    def __init__(
+        self,
+        policy: Optional[SnapshotRetentionPolicy] = None,
+        enabled: bool = True,
+        interval: float = 21600.0,
+        batch_size: int = 20,
+        batch_pause: float = 0.5,
+        max_users_per_run: int = 100,
+        task_queue: Any = None,
+        session_factory: Optional[Callable[[], Any]] = None,
+    ):
+        """
+        Initialize the retention job.
+
+        Args:
+            policy: Retention policy (defaults to ``SnapshotRetentionPolicy()``)
+            enabled: Whether ``start`` schedules runs
+            interval: Seconds between scheduled runs
+            batch_size: Snapshots archived per transaction
+            batch_pause: Seconds to wait between batches (rate limit)
+            max_users_per_run: Users handled per run; the rest wait for the next
+            task_queue: TaskQueue that runs the job (defaults to the global queue)
+            session_factory: AsyncSession factory (defaults to ``AsyncSessionLocal``)
+        """
+        self.policy = policy or SnapshotRetentionPolicy()
+        self.enabled = enabled
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.batch_pause = batch_pause
+        self.max_users_per_run = max(1, max_users_per_run)
+        self.task_queue = task_queue
+        self.session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+        self._user_cursor: Any = None  # Last user_id handled; None starts over
+        self._metrics = {"runs": 0, "users": 0, "archived": 0, "batches": 0, "failures": 0}
+
+    def attach_queue(self, task_queue: Any) -> None:
+        """Run jobs on ``task_queue`` (the application's started queue)."""
+        self.task_queue = task_queue
+
+    def start(self, task_queue: Any = None) -> None:
+        """Schedule a run every ``interval`` seconds (no-op when disabled)."""
+        if task_queue is not None:
+            self.attach_queue(task_queue)
+        if not self.enabled or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._schedule_loop())
+
+    async def stop(self) -> None:
+        """Stop scheduling runs (a run already queued still completes)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _schedule_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.schedule()
+
+    async def schedule(self) -> None:
+        """Enqueue a run; a run still waiting in the queue absorbs this one."""
+        queue = self.task_queue
+        if queue is None:
+            from forest_app.core.task_queue import TaskQueue
+
+            queue = self.task_queue = TaskQueue.get_instance()
+        if queue is None or not getattr(queue, "running", False):
+            logger.warning("Task queue not running; snapshot retention run skipped.")
+            return
+        try:
+            await queue.enqueue(
+                self.run,
+                priority=RETENTION_PRIORITY,
+                dedup_key=RETENTION_DEDUP_KEY,
+                metadata={"type": "snapshot_retention"},
+            )
+        except Exception as e:
+            logger.error("Failed to enqueue snapshot retention run: %s", e)
+
+    def _factory(self) -> Optional[Callable[[], Any]]:
+        if self.session_factory is not None:
+            return self.session_factory
+        from forest_app.persistence import database
+
+        return database.AsyncSessionLocal
+
+    async def run(self, now: Optional[datetime] = None) -> int:
+        """
+        Archive expired snapshots of the next users over the ``keep_last`` limit.
+
+        Returns:
+            Number of snapshots archived
+        """
+        from sqlalchemy import func, select
+
+        from forest_app.persistence.models import MemorySnapshotModel
+
+        factory = self._factory()
+        if factory is None:
+            logger.error("Async database unavailable; snapshot retention skipped.")
+            return 0
+        self._metrics["runs"] += 1
+        over_limit = (
+            select(MemorySnapshotModel.user_id)
+            .group_by(MemorySnapshotModel.user_id)
+            .having(func.count() > max(1, self.policy.keep_last))
+            .order_by(MemorySnapshotModel.user_id)
+        )
+        async with factory() as db:
+            cursor = self._user_cursor
+            query = over_limit
+            if cursor is not None:
+                query = query.where(MemorySnapshotModel.user_id > cursor)
+            result = await db.execute(query.limit(self.max_users_per_run))
+            user_ids = list(result.scalars().all())
+            if cursor is not None and len(user_ids) < self.max_users_per_run:
+                # Reached the last user: fill the run from the start
+                result = await db.execute(
+                    over_limit.where(MemorySnapshotModel.user_id <= cursor).limit(
+                        self.max_users_per_run - len(user_ids)
+                    )
+                )
+                user_ids.extend(result.scalars().all())
+        self._user_cursor = user_ids[-1] if user_ids else None
+
+        archived = 0
+        for user_id in user_ids:
+            try:
+                archived += await self.archive_user(user_id, now)
+            except Exception as e:
+                self._metrics["failures"] += 1
+                logger.error("Snapshot retention failed for user %s: %s", user_id, e)
+        if archived:
+            logger.info("Archived %d snapshot(s) of %d user(s).", archived, len(user_ids))
+        return archived
+
+    async def archive_user(self, user_id: Any, now: Optional[datetime] = None) -> int:
+        """
+        Archive one user's expired snapshots, ``batch_size`` per transaction.
+
+        Returns:
+            Number of snapshots archived
+        """
+        from sqlalchemy import select
+
+        from forest_app.persistence.models import MemorySnapshotModel
+        from forest_app.persistence.snapshot_archive import archive_snapshot
+
+        factory = self._factory()
+        if factory is None:
+            return 0
+        async with factory() as db:
+            result = await db.execute(
+                select(MemorySnapshotModel.id, MemorySnapshotModel.updated_at)
+                .where(MemorySnapshotModel.user_id == user_id)
+                .order_by(MemorySnapshotModel.updated_at.desc(), MemorySnapshotModel.id.desc())
+            )
+            expired = self.policy.select_expired([tuple(row) for row in result.all()], now)
+
+        archived = 0
+        for start in range(0, len(expired), self.batch_size):
+            if start:
+                await asyncio.sleep(self.batch_pause)
+            batch = expired[start : start + self.batch_size]
+            async with factory() as db:
+                try:
+                    result = await db.execute(
+                        select(MemorySnapshotModel).where(
+                            MemorySnapshotModel.user_id == user_id,
+                            MemorySnapshotModel.id.in_(batch),
+                        )
+                    )
+                    models = list(result.scalars().all())
+                    for model in models:
+                        db.add(archive_snapshot(model))
+                        await db.delete(model)
+                    await db.commit()
+                except Exception:
+                    await db.rollback()
+                    raise
+            archived += len(models)
+            self._metrics["batches"] += 1
+            self._metrics["archived"] += len(models)
+        self._metrics["users"] += 1
+        return archived
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return dict(self._metrics)
+
+
+_retention: Optional[SnapshotRetention] = None
+
+
+def get_snapshot_retention() -> SnapshotRetention:
+    """Return the process-wide SnapshotRetention configured from settings."""
+    global _retention
+    if _retention is None:
+        try:
+            from forest_app.config.settings import settings
+
+            _retention = SnapshotRetention(
+                policy=SnapshotRetentionPolicy.from_settings(),
+                enabled=settings.SNAPSHOT_RETENTION_ENABLED,
+                interval=settings.SNAPSHOT_RETENTION_INTERVAL_SECONDS,
+                batch_size=settings.SNAPSHOT_RETENTION_BATCH_SIZE,
+                batch_pause=settings.SNAPSHOT_RETENTION_BATCH_PAUSE_SECONDS,
+                max_users_per_run=settings.SNAPSHOT_RETENTION_MAX_USERS_PER_RUN,
+            )
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"Snapshot retention settings unavailable, using defaults: {e}")
+            _retention = SnapshotRetention()
+    return _retention
@@ -0,0 +1,404 @@
+"""
+Write-behind persistence for command snapshots.
+
+By default every ``/core/command`` loads the user's snapshot, processes the
+command and saves and commits the snapshot before responding, so a burst of
+commands from one user writes the snapshot once per command. With
+``SNAPSHOT_WRITE_BEHIND`` enabled:
+
+- the command path keeps the live snapshot in a per-user in-memory cache and
+  stages it there instead of saving it;
+- a background flusher writes a user's snapshot once it has been dirty for
+  ``SNAPSHOT_WRITE_BEHIND_WINDOW_SECONDS``, so all commands in that window
+  cost one database write;
+- loads by the command path are served from the cache.
+
+Concurrency: a per-user ``asyncio.Lock`` from ``SessionManager.get_user_lock``
+is held by the command path from load to staging and by the flusher while it
+writes, so a flush never sees a half-processed command. The flusher skips
+users whose lock is held, unless their changes are older than
+``SNAPSHOT_WRITE_BEHIND_MAX_DELAY_SECONDS``, in which case it waits for it.
+
+Other code that reads or writes a user's snapshot from the database must
+call ``flush_pending_snapshot(user_id)`` first; it writes pending changes and
+drops the cached copy, so the database is current and the cache does not
+overwrite the other write later.
+
+Multiple workers: the cache is per process, so another worker (or process)
+may write a user's snapshot while this one has it cached. Each flush checks
+that the stored row's ``(id, updated_at)`` is still the one the cache last
+loaded or wrote; if not, the cached snapshot and its staged changes are
+dropped (counted as ``conflicts``) rather than overwriting the newer row,
+and the next command loads it from the database. Commands that one worker
+processed on the stale copy are lost, so route a user's commands to one
+worker (or run a single worker) when enabling write-behind.
+
+Guarantees:
+
+- Shutdown: ``stop()`` (called from the application's shutdown event) writes
+  every pending snapshot before the database engine is disposed.
+- Crash: changes staged in the last ``MAX_DELAY`` seconds (normally the last
+  ``WINDOW`` seconds) are lost if the process dies without shutting down; the
+  database keeps the last flushed state, never a partial one, since each
+  flush is a single transaction.
+- A failed flush leaves the changes staged; they are retried next round.
+"""
+
+import asyncio
+import contextlib
+import copy
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingSnapshot:
+    """A user's cached live snapshot and its unflushed changes."""
+
+    snapshot: Any
+    llm_client: Any
+    model: Any = None  # Last saved MemorySnapshotModel (detached)
+    staged_state: Optional[Dict[str, Any]] = None  # Copy of the last staged snapshot
+    staged_segments: List[Dict[str, Any]] = field(default_factory=list)
+    version: int = 0
+    flushed_version: int = 0
+    dirty_since: Optional[float] = None
+    last_used: float = field(default_factory=time.monotonic)
+
+    @property
+    def dirty(self) -> bool:
+        return self.version != self.flushed_version
+
+    def keep_copy(self) -> None:
+        """Copy the snapshot and its unwritten history segments for ``restore``."""
+        # Deep copy: to_dict shares the snapshot's lists and dicts
+        self.staged_state = copy.deepcopy(self.snapshot.to_dict())
+        # Segments are not serialized, and are cleared only when a save commits
+        self.staged_segments = list(getattr(self.snapshot, "pending_history_segments", None) or [])
+
+    def restore(self) -> None:
+        """Replace the snapshot with the copy taken by ``keep_copy``."""
+        from forest_app.core.snapshot import MemorySnapshot
+
+        snapshot = MemorySnapshot.from_dict(copy.deepcopy(self.staged_state))
+        snapshot.pending_history_segments = list(self.staged_segments)
+        self.snapshot = snapshot
+
+
+class SnapshotWriteBehind:
+    """Per-user snapshot cache with a coalescing background flusher."""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        window: float = 2.0,
+        max_delay: float = 10.0,
+        idle_seconds: float = 300.0,
+        session_factory: Optional[Callable[[], Any]] = None,
+        lock_provider: Optional[Callable[[Any], asyncio.Lock]] = None,
+    ):
+        """
+        Initialize the write-behind cache.
+
+        Args:
+            enabled: Stage command snapshots instead of saving them
+            window: Seconds a snapshot stays dirty before it is flushed
+            max_delay: Seconds after which a flush waits for a busy user
+            idle_seconds: Seconds a clean entry stays cached without use
+            session_factory: AsyncSession factory for flushes (defaults to
+                ``AsyncSessionLocal``)
+            lock_provider: Per-user lock lookup (defaults to
+                ``SessionManager.get_user_lock``)
+        """
+        self.enabled = enabled
+        self.window = max(0.0, window)
+        self.max_delay = max(self.window, max_delay)
+        self.idle_seconds = idle_seconds
+        self.session_factory = session_factory
+        self.lock_provider = lock_provider
+        self._entries: Dict[Any, PendingSnapshot] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._metrics = {
+            "staged": 0,
+            "coalesced": 0,
+            "flushes": 0,
+            "flush_failures": 0,
+            "cache_hits": 0,
+            "evicted": 0,
+            "conflicts": 0,
+        }
+
+    def user_lock(self, user_id: Any) -> asyncio.Lock:
+        if self.lock_provider is None:
+            from forest_app.core.session_manager import session_manager
+
+            self.lock_provider = session_manager.get_user_lock
+        return self.lock_provider(user_id)
+
+    @contextlib.asynccontextmanager
+    async def command_scope(self, user_id: Any) -> AsyncIterator[None]:
+        """
+        Holds the user's lock from snapshot load to staging (if enabled).
+
+        If the command fails, it may have changed the cached snapshot
+        partway. A clean one is dropped, so the next load reads the
+        database; a dirty one is restored to its last staged state, so
+        earlier commands are not lost.
+        """
+        if not self.enabled:
+            yield
+            return
+        async with self.user_lock(user_id):
+            try:
+                yield
+            except BaseException:
+                entry = self._entries.get(user_id)
+                if entry is not None:
+                    self._discard_changes(user_id, entry)
+                raise
+
+    def _discard_changes(self, user_id: Any, entry: PendingSnapshot) -> None:
+        """Undo a failed command's changes to a cached snapshot."""
+        if not entry.dirty or entry.staged_state is None:
+            self._entries.pop(user_id, None)
+            return
+        try:
+            entry.restore()
+        except Exception as e:
+            logger.error("Could not restore staged snapshot for %s; dropping it: %s", user_id, e)
+            self._entries.pop(user_id, None)
+
+    def get(self, user_id: Any) -> Optional[PendingSnapshot]:
+        """The cached entry for a user, if any (call inside ``command_scope``)."""
+        entry = self._entries.get(user_id) if self.enabled else None
+        if entry is not None:
+            entry.last_used = time.monotonic()
+            self._metrics["cache_hits"] += 1
+        return entry
+
+    def stage(self, user_id: Any, snapshot: Any, llm_client: Any, model: Any = None) -> None:
+        """Record a processed snapshot to be written by the flusher."""
+        now = time.monotonic()
+        entry = self._entries.get(user_id)
+        if entry is None:
+            entry = self._entries[user_id] = PendingSnapshot(snapshot, llm_client, model)
+        elif entry.dirty:
+            self._metrics["coalesced"] += 1
+        entry.snapshot = snapshot
+        entry.keep_copy()
+        entry.llm_client = llm_client
+        entry.model = model if model is not None else entry.model
+        entry.version += 1
+        entry.last_used = now
+        if entry.dirty_since is None:
+            entry.dirty_since = now
+        self._metrics["staged"] += 1
+        self._ensure_flusher()
+
+    def _ensure_flusher(self) -> None:
+        if self._task is None or self._task.done():
+            from forest_app.integrations.deadline import no_deadline
+
+            # The flusher outlives the request that started it
+            with no_deadline():
+                self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(max(self.window / 2, 0.01))
+            try:
+                await self.flush_due()
+            except Exception as e:  # Never let the flusher die
+                logger.exception("Snapshot write-behind flush round failed: %s", e)
+
+    async def flush_due(self, now: Optional[float] = None) -> int:
+        """Flush entries dirty for at least ``window``; evict idle clean ones."""
+        now = time.monotonic() if now is None else now
+        flushed = 0
+        for user_id, entry in list(self._entries.items()):
+            if not entry.dirty:
+                if now - entry.last_used > self.idle_seconds:
+                    self._entries.pop(user_id, None)
+                    self._metrics["evicted"] += 1
+                continue
+            age = now - (entry.dirty_since or now)
+            if age < self.window:
+                continue
+            lock = self.user_lock(user_id)
+            if lock.locked() and age < self.max_delay:
+                continue  # A command is running; it will stage again
+            async with lock:
+                flushed += await self._flush_entry(user_id, entry)
+        return flushed
+
+    async def write_now(self, user_id: Any) -> Optional[Any]:
+        """
+        Write a user's cached snapshot now, even if unchanged (explicit saves).
+
+        The caller must hold the user's lock (inside ``command_scope``).
+
+        Returns:
+            The saved model, or None if the user is not cached or the write
+            failed (the flusher then retries it like any staged change)
+        """
+        entry = self._entries.get(user_id) if self.enabled else None
+        if entry is None:
+            return None
+        entry.version += 1
+        if entry.dirty_since is None:
+            entry.dirty_since = time.monotonic()
+        if not await self._flush_entry(user_id, entry):
+            return None
+        return entry.model
+
+    async def release(self, user_id: Any) -> None:
+        """Flush a user's pending changes and drop the cached snapshot."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return
+        async with self.user_lock(user_id):
+            await self._flush_entry(user_id, entry)
+            if not entry.dirty:
+                self._entries.pop(user_id, None)
+
+    async def _flush_entry(self, user_id: Any, entry: PendingSnapshot) -> int:
+        """Write one entry in its own transaction (caller holds the user lock)."""
+        if not entry.dirty:
+            return 0
+        from forest_app.helpers import save_snapshot_with_codename
+        from forest_app.persistence.async_repository import (
+            AsyncMemorySnapshotRepository,
+            get_latest_snapshot_model,
+        )
+
+        factory = self.session_factory
+        if factory is None:
+            from forest_app.persistence import database
+
+            factory = database.AsyncSessionLocal
+        if factory is None:
+            logger.error("Async database unavailable; snapshot for %s stays pending.", user_id)
+            self._metrics["flush_failures"] += 1
+            return 0
+
+        version = entry.version
+        try:
+            async with factory() as db:
+                try:
+                    stored_model = await get_latest_snapshot_model(user_id, db)
+                    if _row_version(stored_model) != _row_version(entry.model):
+                        self._drop_stale(user_id, entry, stored_model)
+                        return 0
+                    saved = await save_snapshot_with_codename(
+                        db,
+                        AsyncMemorySnapshotRepository(db),
+                        user_id,
+                        entry.snapshot,
+                        entry.llm_client,
+                        stored_model,
+                    )
+                    if saved is None:
+                        raise RuntimeError("snapshot save returned no model")
+                    await db.commit()
+                    # The next flush compares the stored row against this one
+                    await db.refresh(
+                        saved, attribute_names=["codename", "created_at", "updated_at"]
+                    )
+                except Exception:
+                    await db.rollback()
+                    raise
+        except Exception as e:
+            self._metrics["flush_failures"] += 1
+            logger.error("Write-behind flush failed for %s (will retry): %s", user_id, e)
+            # The save compacted the history; its segments stay pending for the retry
+            entry.keep_copy()
+            return 0
+        entry.keep_copy()  # Compacted, with the written segments cleared
+        entry.model = saved
+        entry.flushed_version = version
+        entry.dirty_since = None
+        self._metrics["flushes"] += 1
+        return 1
+
+    def _drop_stale(self, user_id: Any, entry: PendingSnapshot, stored_model: Any) -> None:
+        """Drop an entry whose stored row was replaced by another writer."""
+        if self._entries.get(user_id) is entry:
+            self._entries.pop(user_id, None)
+        self._metrics["conflicts"] += 1
+        logger.warning(
+            "Snapshot of %s changed in the database (now %s, cached %s); "
+            "dropping %d staged change(s) instead of overwriting it.",
+            user_id,
+            _row_version(stored_model),
+            _row_version(entry.model),
+            entry.version - entry.flushed_version,
+        )
+
+    async def flush_all(self) -> int:
+        """Write every pending snapshot, waiting for busy users."""
+        flushed = 0
+        for user_id, entry in list(self._entries.items()):
+            if entry.dirty:
+                async with self.user_lock(user_id):
+                    flushed += await self._flush_entry(user_id, entry)
+        return flushed
+
+    async def stop(self) -> None:
+        """Stop the flusher and write everything still pending (shutdown)."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        flushed = await self.flush_all()
+        pending = sum(entry.dirty for entry in self._entries.values())
+        if pending:
+            logger.error("%d snapshot(s) could not be written at shutdown.", pending)
+        logger.info("Write-behind stopped; %d snapshot(s) flushed at shutdown.", flushed)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Counters plus the number of cached and dirty snapshots."""
+        dirty = sum(entry.dirty for entry in self._entries.values())
+        return {**self._metrics, "cached": len(self._entries), "dirty": dirty}
+
+
+def _row_version(model: Any) -> Optional[Tuple[Any, Any]]:
+    """``(id, updated_at)`` of a snapshot row, or None without one."""
+    if model is None:
+        return None
+    return model.id, model.__dict__.get("updated_at")
+
+
+_write_behind: Optional[SnapshotWriteBehind] = None
+
+
+def get_snapshot_write_behind() -> SnapshotWriteBehind:
+    """Return the process-wide SnapshotWriteBehind configured from settings."""
+    global _write_behind
+    if _write_behind is None:
+        try:
+            from forest_app.config.settings import settings
+
+            _write_behind = SnapshotWriteBehind(
+                enabled=settings.SNAPSHOT_WRITE_BEHIND,
+                window=settings.SNAPSHOT_WRITE_BEHIND_WINDOW_SECONDS,
+                max_delay=settings.SNAPSHOT_WRITE_BEHIND_MAX_DELAY_SECONDS,
+            )
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"Write-behind settings unavailable, write-behind disabled: {e}")
+            _write_behind = SnapshotWriteBehind()
+    return _write_behind
+
+
+async def flush_pending_snapshot(user_id: Any) -> None:
+    """
+    Make the database current for a user before reading or writing their
+    snapshot outside the command path. No-op unless write-behind is enabled.
+    """
+    write_behind = get_snapshot_write_behind()
+    if write_behind.enabled:
+        await write_behind.release(user_id)
@@ -4,19 +4,63 @@ Background Task Queue for Forest App
 This module implements an asynchronous background task queue system to handle
 intensive operations without blocking the user experience. It ensures the
 journey remains responsive even during complex analysis or processing.
+
+Tasks live in process memory by default. When a durable TaskStore is supplied,
+tasks registered with ``register_task`` are persisted instead so they survive
+restarts and can be drained by several worker processes.
 """
 
 import asyncio
 import functools
+import heapq
+import json
 import logging
 import traceback
 import uuid
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Any, Callable, Dict, List, Optional, Set
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from forest_app.core.task_store import TaskStatus, TaskStore
 
 logger = logging.getLogger(__name__)
 
+# Coalescing modes for tasks enqueued with a dedup key
+COALESCE_MERGE = "merge"  # Reuse the pending task and ignore the new arguments
+COALESCE_SUPERSEDE = "supersede"  # Replace the pending task with the new arguments
+
+# Registry of task functions that can be persisted by name
+_TASK_REGISTRY: Dict[str, Callable[..., Any]] = {}
+
+
+def register_task(name: Optional[str] = None):
+    """
+    Register a function so it can be enqueued durably by name.
+
+    Durable tasks are stored as a name plus JSON arguments, so any worker
+    process that imports the defining module can execute them.
+
+    Args:
+        name: Registry name (defaults to ``module.qualname``)
+
+    Returns:
+        Decorator that registers and returns the function unchanged
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        task_name = name or f"{func.__module__}.{func.__qualname__}"
+        _TASK_REGISTRY[task_name] = func
+        func.__task_name__ = task_name
+        return func
+
+    return decorator
+
+
+def get_registered_task(name: str) -> Optional[Callable[..., Any]]:
+    """Return the function registered under ``name``, if any."""
+    return _TASK_REGISTRY.get(name)
+
+
 class TaskQueue:
     """
     An asynchronous task queue for processing intensive background operations.
@@ -26,21 +70,40 @@ class TaskQueue:
     - Scheduled task execution
     - Result caching
     - Failure handling with exponential backoff
+    - Optional durable storage with leases, retries and dead-lettering
     """
 
-    def __init__(self, max_workers: int = 10, result_ttl: int = 300):
+    def __init__(
+        self,
+        max_workers: int = 10,
+        result_ttl: int = 300,
+        store: Optional[TaskStore] = None,
+        visibility_timeout: float = 300.0,
+        max_attempts: int = 3,
+        retry_backoff: float = 2.0,
+        max_retry_delay: float = 300.0,
+        poll_interval: float = 1.0,
+    ):
         """
         Initialize the task queue.
 
         Args:
             max_workers: Maximum number of worker tasks to run simultaneously
             result_ttl: Time (in seconds) to keep task results in cache
+            store: Optional durable task store shared between processes
+            visibility_timeout: Lease length (seconds) for claimed durable tasks
+            max_attempts: Attempts before a durable task is dead-lettered
+            retry_backoff: Base delay (seconds) for exponential retry backoff
+            max_retry_delay: Upper bound for the retry delay
+            poll_interval: How often idle workers poll the durable store
         """
         self.queue = asyncio.PriorityQueue()
         self.processing: Set[str] = set()  # Currently processing task IDs
         self.results: Dict[str, Any] = {}  # Task results
         # When results were stored
         self.result_timestamps: Dict[str, float] = {}
+        # Min-heap of (expiry, task_id) so cleanup only touches expired results
+        self._expiry_heap: List[Tuple[float, str]] = []
         self.max_workers = max_workers
         self.result_ttl = result_ttl
         self.running = False
@@ -50,12 +113,71 @@ class TaskQueue:
         # Task metadata for better monitoring
         self.task_metadata: Dict[str, Dict[str, Any]] = {}
 
+        # Coalescing state: dedup key -> pending task ID, plus alias IDs whose
+        # waiters receive another task's result
+        self._pending_by_key: Dict[str, str] = {}
+        self._aliases: Dict[str, str] = {}
+        self._alias_groups: Dict[str, List[str]] = {}
+        self._superseded: Set[str] = set()
+
+        # Durable storage settings
+        self.store = store
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_retry_delay = max_retry_delay
+        self.poll_interval = poll_interval
+
         logger.info(
-            "TaskQueue initialized with %d workers and %ds result TTL",
+            "TaskQueue initialized with %d workers, %ds result TTL and %s store",
             max_workers,
             result_ttl,
+            "durable" if store is not None else "in-memory",
+        )
+
+    async def _run_in_thread(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking call (such as a store operation) in the thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.thread_pool, functools.partial(func, *args, **kwargs)
         )
 
+    async def _execute(self, func: Callable[..., Any], args, kwargs) -> Any:
+        """Execute a task function, offloading sync functions to the thread pool."""
+        if asyncio.iscoroutinefunction(func):
+            return await func(*args, **kwargs)
+        return await self._run_in_thread(func, *args, **kwargs)
+
+    def _store_result(self, task_id: str, result: Dict[str, Any]) -> None:
+        """Record a local result, share it with aliases and schedule expiry."""
+        now = asyncio.get_event_loop().time()
+        for result_id in [task_id] + self._alias_groups.pop(task_id, []):
+            self._aliases.pop(result_id, None)
+            self.results[result_id] = result
+            self.result_timestamps[result_id] = now
+            heapq.heappush(self._expiry_heap, (now + self.result_ttl, result_id))
+
+    def _resolve_alias(self, task_id: str) -> str:
+        """Return the task ID that will produce the result for ``task_id``."""
+        return self._aliases.get(task_id, task_id)
+
+    def _add_alias(self, alias_id: str, target_id: str) -> None:
+        """Make ``alias_id`` (and anything aliased to it) resolve to ``target_id``."""
+        group = self._alias_groups.setdefault(target_id, [])
+        for moved in [alias_id] + self._alias_groups.pop(alias_id, []):
+            self._aliases[moved] = target_id
+            group.append(moved)
+
+    def _release_dedup_key(self, task_id: str) -> None:
+        """Stop coalescing new tasks into ``task_id`` once it has started."""
+        dedup_key = self.task_metadata.get(task_id, {}).get("dedup_key")
+        if dedup_key and self._pending_by_key.get(dedup_key) == task_id:
+            del self._pending_by_key[dedup_key]
+
+    def _retry_delay(self, attempts: int) -> float:
+        """Exponential backoff delay for the given attempt count."""
+        return min(self.retry_backoff * (2 ** max(attempts - 1, 0)), self.max_retry_delay)
+
     async def start(self):
         """Start the task queue workers."""
         if self.running:
@@ -96,23 +218,50 @@ class TaskQueue:
         """
         Background worker to process tasks from the queue.
 
+        With a durable store, a free worker alternates between claiming from
+        the store and taking an in-memory task, and keeps claiming while
+        claims succeed and no in-memory task is waiting. After an empty claim
+        the store is polled again every ``poll_interval`` seconds.
+
         Args:
             worker_id: Identifier for this worker
         """
         logger.debug("Worker %d started", worker_id)
+        loop = asyncio.get_running_loop()
+        claim_next = True  # Whether the store's turn comes before the queue's
+        next_claim_at = 0.0  # Loop time before which the store is known empty
 
         while self.running:
             try:
+                if (
+                    self.store is not None
+                    and (claim_next or self.queue.empty())
+                    and loop.time() >= next_claim_at
+                ):
+                    claim_next = False
+                    if await self._process_durable_task(worker_id):
+                        continue
+                    next_claim_at = loop.time() + self.poll_interval
+
                 # Get task from queue with timeout
                 try:
                     priority, task_id, func, args, kwargs = await asyncio.wait_for(
-                        self.queue.get(), timeout=1.0
+                        self.queue.get(),
+                        timeout=self.poll_interval if self.store else 1.0,
                     )
                 except asyncio.TimeoutError:
                     continue
+                claim_next = True
+
+                # Skip tasks replaced by a newer task with the same dedup key
+                if task_id in self._superseded:
+                    self._superseded.discard(task_id)
+                    self.queue.task_done()
+                    continue
 
-                # Mark task as processing
+                # Mark task as processing; later duplicates start a new task
                 self.processing.add(task_id)
+                self._release_dedup_key(task_id)
 
                 # Update task metadata
                 self.task_metadata[task_id]["status"] = "processing"
@@ -129,17 +278,10 @@ class TaskQueue:
 
                 # Execute the task
                 try:
-                    if asyncio.iscoroutinefunction(func):
-                        result = await func(*args, **kwargs)
-                    else:
-                        # Run sync functions in thread pool
-                        loop = asyncio.get_running_loop()
-                        result = await loop.run_in_executor(
-                            self.thread_pool, functools.partial(func, *args, **kwargs)
-                        )
+                    result = await self._execute(func, args, kwargs)
 
                     # Store the result
-                    self.results[task_id] = {"status": "completed", "result": result}
+                    self._store_result(task_id, {"status": "completed", "result": result})
 
                     # Update task metadata
                     self.task_metadata[task_id]["status"] = "completed"
@@ -156,7 +298,7 @@ class TaskQueue:
                     }
 
                     # Store the error
-                    self.results[task_id] = {"status": "failed", "error": error_details}
+                    self._store_result(task_id, {"status": "failed", "error": error_details})
 
                     # Update task metadata
                     self.task_metadata[task_id]["status"] = "failed"
@@ -167,9 +309,6 @@ class TaskQueue:
 
                     logger.error("Task %s failed: %s", task_id, e)
 
-                # Record timestamp for cache expiration
-                self.result_timestamps[task_id] = asyncio.get_event_loop().time()
-
                 # Remove from processing set
                 self.processing.remove(task_id)
 
@@ -185,27 +324,90 @@ class TaskQueue:
 
         logger.debug("Worker %d stopped", worker_id)
 
+    async def _renew_lease(self, task_id: str, lease_owner: str):
+        """Keep a durable task's lease alive while it is executing."""
+        interval = max(self.visibility_timeout / 3, 0.1)
+        while True:
+            await asyncio.sleep(interval)
+            renewed = await self._run_in_thread(
+                self.store.renew_lease, task_id, lease_owner, self.visibility_timeout
+            )
+            if not renewed:
+                logger.warning("Could not renew lease for task %s", task_id)
+                return
+
+    async def _process_durable_task(self, worker_id: int) -> bool:
+        """
+        Claim and execute one task from the durable store.
+
+        Args:
+            worker_id: Identifier for the claiming worker
+
+        Returns:
+            True if a task was claimed, False if the store had nothing runnable
+        """
+        record = await self._run_in_thread(self.store.claim, self.visibility_timeout)
+        if record is None:
+            return False
+
+        task_id = record["id"]
+        lease_owner = record["lease_owner"]
+        func = get_registered_task(record["task_name"])
+
+        logger.debug(
+            "Worker %d claimed durable task %s (attempt %d/%d)",
+            worker_id,
+            task_id,
+            record["attempts"],
+            record["max_attempts"],
+        )
+
+        self.processing.add(task_id)
+        heartbeat = asyncio.create_task(self._renew_lease(task_id, lease_owner))
+        try:
+            if func is None:
+                raise LookupError(f"No task registered as '{record['task_name']}'")
+
+            result = await self._execute(
+                func, record.get("args") or [], record.get("kwargs") or {}
+            )
+            await self._run_in_thread(
+                self.store.complete, task_id, lease_owner, result, self.result_ttl
+            )
+            logger.info("Durable task %s completed successfully", task_id)
+
+        except Exception as e:
+            error_details = {"error": str(e), "traceback": traceback.format_exc()}
+            status = await self._run_in_thread(
+                self.store.fail,
+                task_id,
+                lease_owner,
+                error_details,
+                self._retry_delay(record["attempts"]),
+                self.result_ttl,
+            )
+            if status == TaskStatus.DEAD:
+                logger.error("Durable task %s dead-lettered: %s", task_id, e)
+            else:
+                logger.warning("Durable task %s failed, will retry: %s", task_id, e)
+
+        finally:
+            heartbeat.cancel()
+            self.processing.discard(task_id)
+
+        return True
+
     async def _cleanup_results(self):
         """Periodically clean up expired results."""
         while self.running:
             try:
-                current_time = asyncio.get_event_loop().time()
-                expired_tasks = []
-
-                # Find expired results
-                for task_id, timestamp in self.result_timestamps.items():
-                    if current_time - timestamp > self.result_ttl:
-                        expired_tasks.append(task_id)
-
-                # Remove expired results
-                for task_id in expired_tasks:
-                    if task_id in self.results:
-                        del self.results[task_id]
-                    if task_id in self.result_timestamps:
-                        del self.result_timestamps[task_id]
-                    if task_id in self.task_metadata:
-                        # Archive metadata if needed instead of deleting
-                        self.task_metadata[task_id]["archived"] = True
+                expired_tasks = self._pop_expired_results()
+
+                # Expired durable results are removed through the TTL index
+                if self.store is not None:
+                    purged = await self._run_in_thread(self.store.purge_expired)
+                    if purged:
+                        logger.debug("Purged %d expired durable task results", purged)
 
                 if expired_tasks:
                     logger.debug(
@@ -222,33 +424,162 @@ class TaskQueue:
                 logger.error("Error in result cleanup: %s", e)
                 await asyncio.sleep(60)  # Still sleep on error
 
+    def _pop_expired_results(self) -> List[str]:
+        """
+        Remove results whose TTL has passed.
+
+        Only the expired prefix of the expiry heap is visited, so the cost is
+        proportional to the number of expired results rather than all results.
+
+        Returns:
+            IDs of the tasks whose results were removed
+        """
+        current_time = asyncio.get_event_loop().time()
+        expired_tasks = []
+
+        while self._expiry_heap and self._expiry_heap[0][0] <= current_time:
+            expiry, task_id = heapq.heappop(self._expiry_heap)
+
+            # Skip stale heap entries for results that were stored again later
+            timestamp = self.result_timestamps.get(task_id)
+            if timestamp is None or timestamp + self.result_ttl > expiry:
+                continue
+
+            expired_tasks.append(task_id)
+            self.results.pop(task_id, None)
+            del self.result_timestamps[task_id]
+            if task_id in self.task_metadata:
+                # Archive metadata if needed instead of deleting
+                self.task_metadata[task_id]["archived"] = True
+
+        return expired_tasks
+
+    def _durable_task_name(
+        self, func: Union[Callable[..., Any], str], args, kwargs
+    ) -> Optional[str]:
+        """
+        Return the registry name to persist a task under, or None.
+
+        A task is stored durably only when a store is configured, the function
+        is registered and its arguments are JSON-serializable.
+        """
+        if self.store is None:
+            return None
+
+        task_name = func if isinstance(func, str) else getattr(func, "__task_name__", None)
+        if task_name is None or get_registered_task(task_name) is None:
+            return None
+
+        try:
+            json.dumps([list(args), kwargs])
+        except (TypeError, ValueError):
+            logger.warning(
+                "Task %s has non-JSON arguments; keeping it in memory only", task_name
+            )
+            return None
+
+        return task_name
+
     async def enqueue(
         self,
-        func: Callable[..., Any],
+        func: Union[Callable[..., Any], str],
         *args,
         priority: int = 5,
         task_id: Optional[str] = None,
         metadata: Optional[Dict[str, Any]] = None,
+        dedup_key: Optional[str] = None,
+        coalesce: str = COALESCE_MERGE,
         **kwargs,
     ) -> str:
         """
         Add a task to the queue.
 
+        Registered tasks (see ``register_task``) are written to the durable
+        store when one is configured; everything else runs from memory.
+
+        When ``dedup_key`` matches a task that is still queued (not yet
+        started), the two are coalesced: with ``"merge"`` the pending task is
+        kept as-is, with ``"supersede"`` the new arguments replace it. Either
+        way, waiters on both task IDs receive the same result.
+
         Args:
-            func: The function to execute
+            func: The function to execute, or the name of a registered task
             *args: Positional arguments for the function
             priority: Priority level (lower numbers = higher priority)
             task_id: Optional custom task ID (generates UUID if not provided)
             metadata: Optional task metadata
+            dedup_key: Optional idempotency key for coalescing duplicate work
+            coalesce: ``"merge"`` or ``"supersede"`` (see above)
             **kwargs: Keyword arguments for the function
 
         Returns:
             Task ID that can be used to get the result
+
+        Raises:
+            ValueError: If ``coalesce`` is not a supported mode
         """
+        if coalesce not in (COALESCE_MERGE, COALESCE_SUPERSEDE):
+            raise ValueError(f"Unsupported coalesce mode: {coalesce}")
+
+        durable_name = self._durable_task_name(func, args, kwargs)
+        if durable_name is not None:
+            # A merge returns the caller's ID, recorded as coalesced into the
+            # queued task, or the queued task's ID if the caller gave none
+            task_id = await self._run_in_thread(
+                self.store.enqueue,
+                task_id,
+                durable_name,
+                list(args),
+                kwargs,
+                priority=priority,
+                max_attempts=self.max_attempts,
+                metadata=metadata,
+                dedup_key=dedup_key,
+                supersede=coalesce == COALESCE_SUPERSEDE,
+            )
+            logger.info(
+                "Task %s persisted to durable store with priority %d", task_id, priority
+            )
+            return task_id
+
+        pending_id = self._pending_by_key.get(dedup_key) if dedup_key else None
+
+        if pending_id is not None and coalesce == COALESCE_MERGE:
+            if task_id is None or task_id == pending_id:
+                logger.debug("Task with key %s merged into %s", dedup_key, pending_id)
+                return pending_id
+            self._add_alias(task_id, pending_id)
+            self.task_metadata[task_id] = {
+                "id": task_id,
+                "status": "coalesced",
+                "coalesced_into": pending_id,
+                "dedup_key": dedup_key,
+                "queued_at": datetime.now(timezone.utc).isoformat(),
+                "user_metadata": metadata or {},
+            }
+            logger.debug("Task %s merged into pending task %s", task_id, pending_id)
+            return task_id
+
         # Generate task ID if not provided
         if task_id is None:
             task_id = str(uuid.uuid4())
 
+        if isinstance(func, str):
+            registered = get_registered_task(func)
+            if registered is None:
+                raise KeyError(f"No task registered as '{func}'")
+            func = registered
+
+        if pending_id is not None:
+            # Supersede: the newer task inherits the pending task's waiters and
+            # keeps the more urgent of the two priorities
+            priority = min(priority, self.task_metadata[pending_id]["priority"])
+            self._superseded.add(pending_id)
+            self.task_metadata[pending_id]["status"] = "superseded"
+            self.task_metadata[pending_id]["superseded_by"] = task_id
+            self._add_alias(pending_id, task_id)
+            logger.debug("Task %s superseded by %s", pending_id, task_id)
+
         # Store task metadata
         self.task_metadata[task_id] = {
             "id": task_id,
@@ -259,6 +590,9 @@ class TaskQueue:
             "queued_at": datetime.now(timezone.utc).isoformat(),
             "user_metadata": metadata or {},
         }
+        if dedup_key:
+            self.task_metadata[task_id]["dedup_key"] = dedup_key
+            self._pending_by_key[dedup_key] = task_id
 
         # Add task to queue
         await self.queue.put((priority, task_id, func, args, kwargs))
@@ -290,6 +624,23 @@ class TaskQueue:
             if task_id in self.results:
                 return self.results[task_id]
 
+            # Coalesced tasks wait on the task that will produce their result
+            if task_id in self._aliases:
+                await asyncio.sleep(0.1)
+                continue
+
+            # Durable tasks live in the store rather than local state
+            if self.store is not None and task_id not in self.task_metadata:
+                record = await self._run_in_thread(self.store.get, task_id)
+                if record is None:
+                    raise KeyError(f"Task {task_id} not found")
+                if record["status"] == TaskStatus.COMPLETED:
+                    return {"status": "completed", "result": record["result"]}
+                if record["status"] == TaskStatus.DEAD:
+                    return {"status": "failed", "error": record["error"]}
+                await asyncio.sleep(self.poll_interval / 10)
+                continue
+
             # Check if task exists but is still processing
             if task_id in self.processing or any(
                 task_id == item[1] for item in self.queue._queue
@@ -330,13 +681,30 @@ class TaskQueue:
         Returns:
             Dictionary with queue statistics
         """
-        return {
+        status = {
             "running": self.running,
             "workers": len(self.worker_tasks),
             "queue_size": self.queue.qsize(),
             "processing": len(self.processing),
             "completed_results": len(self.results),
         }
+        if self.store is not None:
+            status["durable"] = await self._run_in_thread(self.store.stats)
+        return status
+
+    async def get_dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Get durable tasks that exhausted their retries.
+
+        Args:
+            limit: Maximum number of records to return
+
+        Returns:
+            List of dead-lettered task records (empty without a store)
+        """
+        if self.store is None:
+            return []
+        return await self._run_in_thread(self.store.list_dead_letters, limit)
 
     async def wait_for_task(
         self, task_id: str, timeout: Optional[float] = None
@@ -360,14 +728,7 @@ class TaskQueue:
     @classmethod
     def get_instance(cls):
         """Return the global singleton instance of TaskQueue."""
-        try:
-            from forest_app.core.task_queue import TaskQueue
-        except ImportError as e:
-            logging.error(f"Failed to import TaskQueue: {e}")
-            class DummyTaskQueue:
-                pass
-            return DummyTaskQueue()
-        return TaskQueue
+        return task_queue
 
 
 task_queue = TaskQueue()
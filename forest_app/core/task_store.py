@@ -0,0 +1,515 @@
+"""
+Durable Task Store for Forest App
+
+This module provides the optional persistence layer behind the TaskQueue. When a
+store is configured, queued tasks survive deploys and crashes, several worker
+processes can drain the same queue, and finished results expire through a TTL
+index instead of an in-process scan.
+
+Claiming uses leases with a visibility timeout: a worker that takes a task owns
+it until the lease expires, after which any other worker may reclaim it. Failed
+tasks are retried with exponential backoff and moved to a dead-letter state once
+their attempts are exhausted.
+
+A task whose ``dedup_key`` matches one that is queued and not yet started is
+folded into it: at most one such task exists per key (a partial unique index
+enforces this across workers), and the duplicate is recorded as a
+``coalesced`` row, so callers can wait on whichever ID they were given.
+"""
+
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from enum import Enum
+from typing import Any, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class TaskStoreBackend(Enum):
+    """Supported task store backend types."""
+
+    MEMORY = "memory"  # In-process queue only (no durability)
+    SQL = "sql"  # SQLite/PostgreSQL table
+
+
+class TaskStatus:
+    """Status values recorded for durable tasks."""
+
+    QUEUED = "queued"
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    DEAD = "dead"
+    # A duplicate folded into a queued task; resolves to that task's record
+    COALESCED = "coalesced"
+
+
+class TaskStore(ABC):
+    """
+    Interface for durable task storage.
+
+    Implementations are synchronous; the TaskQueue calls them from its thread
+    pool so they never block the event loop.
+    """
+
+    @abstractmethod
+    def enqueue(
+        self,
+        task_id: Optional[str],
+        task_name: str,
+        args: List[Any],
+        kwargs: Dict[str, Any],
+        priority: int = 5,
+        max_attempts: int = 3,
+        metadata: Optional[Dict[str, Any]] = None,
+        delay: float = 0.0,
+        dedup_key: Optional[str] = None,
+        supersede: bool = False,
+    ) -> str:
+        """
+        Persist a new task so any worker can claim it.
+
+        If ``dedup_key`` matches a task that is queued and not yet started, no
+        new task is written: the queued task is kept as-is, or updated with the
+        new arguments when ``supersede`` is set, and ``task_id`` (if given) is
+        recorded as coalesced into it.
+
+        Returns:
+            ``task_id`` (generated when None), or the queued task's ID when a
+            duplicate without an ID of its own was coalesced
+        """
+        pass
+
+    @abstractmethod
+    def claim(self, visibility_timeout: float) -> Optional[Dict[str, Any]]:
+        """Lease the next runnable task, returning its record or None."""
+        pass
+
+    @abstractmethod
+    def renew_lease(
+        self, task_id: str, lease_owner: str, visibility_timeout: float
+    ) -> bool:
+        """Extend a lease held by ``lease_owner``."""
+        pass
+
+    @abstractmethod
+    def complete(
+        self, task_id: str, lease_owner: str, result: Any, result_ttl: float
+    ) -> bool:
+        """Record a successful result for a leased task."""
+        pass
+
+    @abstractmethod
+    def fail(
+        self,
+        task_id: str,
+        lease_owner: str,
+        error: Dict[str, Any],
+        retry_delay: float,
+        result_ttl: float,
+    ) -> str:
+        """Record a failure, returning the resulting status."""
+        pass
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the stored record for a task, or None.
+
+        A coalesced task resolves to the record of the task it was folded into.
+        """
+        pass
+
+    @abstractmethod
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """Delete finished tasks whose results have expired (and their aliases)."""
+        pass
+
+    @abstractmethod
+    def list_dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return tasks that exhausted their retries."""
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """Return task counts by status."""
+        pass
+
+
+class SQLTaskStore(TaskStore):
+    """
+    Task store backed by the ``task_queue_entries`` table.
+
+    Claims are made with a conditional UPDATE so that only one worker can win a
+    given row, which works the same way on SQLite and PostgreSQL.
+    """
+
+    # How many candidate rows to try per claim before giving up
+    CLAIM_BATCH = 5
+
+    def __init__(self, db_url: Optional[str] = None, engine=None):
+        """
+        Initialize the SQL task store.
+
+        Args:
+            db_url: Database URL (ignored when ``engine`` is given)
+            engine: Optional existing SQLAlchemy engine to reuse
+        """
+        from sqlalchemy import create_engine
+
+        from forest_app.persistence.models import TaskQueueEntryModel
+
+        if engine is None:
+            if not db_url:
+                raise ValueError("A database URL or engine is required for SQL task store")
+            engine = create_engine(db_url, pool_pre_ping=True)
+
+        self.engine = engine
+        self.table = TaskQueueEntryModel.__table__
+        self.table.create(bind=self.engine, checkfirst=True)
+
+        logger.info("SQL task store initialized")
+
+    def _row_to_dict(self, row) -> Dict[str, Any]:
+        return dict(row._mapping)
+
+    def enqueue(
+        self,
+        task_id: Optional[str],
+        task_name: str,
+        args: List[Any],
+        kwargs: Dict[str, Any],
+        priority: int = 5,
+        max_attempts: int = 3,
+        metadata: Optional[Dict[str, Any]] = None,
+        delay: float = 0.0,
+        dedup_key: Optional[str] = None,
+        supersede: bool = False,
+    ) -> str:
+        from sqlalchemy.exc import IntegrityError
+
+        now = time.time()
+        for attempt in range(2):
+            if dedup_key:
+                coalesced_id = self._coalesce(
+                    task_id, task_name, dedup_key, args, kwargs, priority, supersede, now
+                )
+                if coalesced_id is not None:
+                    return coalesced_id
+
+            new_id = task_id or str(uuid.uuid4())
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(
+                        self.table.insert().values(
+                            id=new_id,
+                            task_name=task_name,
+                            args=list(args),
+                            kwargs=dict(kwargs),
+                            task_metadata=metadata or {},
+                            dedup_key=dedup_key,
+                            priority=priority,
+                            status=TaskStatus.QUEUED,
+                            attempts=0,
+                            max_attempts=max_attempts,
+                            available_at=now + delay,
+                            created_at=now,
+                            updated_at=now,
+                        )
+                    )
+            except IntegrityError:
+                if not dedup_key or attempt:
+                    raise
+                # Another worker queued the same key first; coalesce into it
+                logger.debug("Task with key %s queued concurrently; coalescing", dedup_key)
+                continue
+            return new_id
+
+    def _coalesce(
+        self,
+        task_id: Optional[str],
+        task_name: str,
+        dedup_key: str,
+        args: List[Any],
+        kwargs: Dict[str, Any],
+        priority: int,
+        supersede: bool,
+        now: float,
+    ) -> Optional[str]:
+        """
+        Fold a duplicate into a pending task with the same key, if there is one.
+
+        Returns:
+            The ID to give the caller, or None if nothing pending was found
+        """
+        from sqlalchemy import and_, func, select
+
+        t = self.table
+        is_pending = and_(
+            t.c.dedup_key == dedup_key,
+            t.c.status == TaskStatus.QUEUED,
+            t.c.attempts == 0,
+        )
+
+        with self.engine.begin() as conn:
+            existing_id = conn.execute(select(t.c.id).where(is_pending)).scalar()
+            if existing_id is None:
+                return None
+
+            if supersede:
+                # Only replace arguments if no worker claimed the task meanwhile
+                updated = conn.execute(
+                    t.update()
+                    .where(and_(t.c.id == existing_id, is_pending))
+                    .values(
+                        args=list(args),
+                        kwargs=dict(kwargs),
+                        priority=func.min(t.c.priority, priority)
+                        if conn.dialect.name == "sqlite"
+                        else func.least(t.c.priority, priority),
+                        updated_at=now,
+                    )
+                )
+                if updated.rowcount != 1:
+                    return None
+
+            if task_id is None or task_id == existing_id:
+                return existing_id
+
+            # Keep the caller's ID resolvable to the task doing the work
+            conn.execute(
+                t.insert().values(
+                    id=task_id,
+                    task_name=task_name,
+                    dedup_key=dedup_key,
+                    coalesced_into=existing_id,
+                    priority=priority,
+                    status=TaskStatus.COALESCED,
+                    attempts=0,
+                    max_attempts=0,
+                    available_at=now,
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+        return task_id
+
+    def claim(self, visibility_timeout: float) -> Optional[Dict[str, Any]]:
+        from sqlalchemy import and_, or_, select
+
+        t = self.table
+        now = time.time()
+        runnable = or_(
+            and_(t.c.status == TaskStatus.QUEUED, t.c.available_at <= now),
+            and_(t.c.status == TaskStatus.PROCESSING, t.c.lease_expires_at < now),
+        )
+
+        with self.engine.begin() as conn:
+            candidates = conn.execute(
+                select(t.c.id, t.c.status, t.c.attempts, t.c.max_attempts)
+                .where(runnable)
+                .order_by(t.c.priority, t.c.available_at)
+                .limit(self.CLAIM_BATCH)
+            ).fetchall()
+
+        for candidate in candidates:
+            lease_owner = uuid.uuid4().hex
+            with self.engine.begin() as conn:
+                # A reclaimed lease that already used its last attempt is dead
+                if (
+                    candidate.status == TaskStatus.PROCESSING
+                    and candidate.attempts >= candidate.max_attempts
+                ):
+                    conn.execute(
+                        t.update()
+                        .where(and_(t.c.id == candidate.id, runnable))
+                        .values(
+                            status=TaskStatus.DEAD,
+                            lease_owner=None,
+                            lease_expires_at=None,
+                            error={"error": "Lease expired on final attempt"},
+                            updated_at=now,
+                        )
+                    )
+                    logger.warning("Task %s dead-lettered after lease expiry", candidate.id)
+                    continue
+
+                updated = conn.execute(
+                    t.update()
+                    .where(and_(t.c.id == candidate.id, runnable))
+                    .values(
+                        status=TaskStatus.PROCESSING,
+                        lease_owner=lease_owner,
+                        lease_expires_at=now + visibility_timeout,
+                        attempts=t.c.attempts + 1,
+                        updated_at=now,
+                    )
+                )
+                if updated.rowcount != 1:
+                    # Another worker won this row
+                    continue
+
+                row = conn.execute(select(t).where(t.c.id == candidate.id)).fetchone()
+                return self._row_to_dict(row)
+
+        return None
+
+    def renew_lease(
+        self, task_id: str, lease_owner: str, visibility_timeout: float
+    ) -> bool:
+        from sqlalchemy import and_
+
+        t = self.table
+        now = time.time()
+        with self.engine.begin() as conn:
+            updated = conn.execute(
+                t.update()
+                .where(and_(t.c.id == task_id, t.c.lease_owner == lease_owner))
+                .values(lease_expires_at=now + visibility_timeout, updated_at=now)
+            )
+        return updated.rowcount == 1
+
+    def complete(
+        self, task_id: str, lease_owner: str, result: Any, result_ttl: float
+    ) -> bool:
+        from sqlalchemy import and_
+
+        t = self.table
+        now = time.time()
+        with self.engine.begin() as conn:
+            updated = conn.execute(
+                t.update()
+                .where(and_(t.c.id == task_id, t.c.lease_owner == lease_owner))
+                .values(
+                    status=TaskStatus.COMPLETED,
+                    result=result,
+                    lease_owner=None,
+                    lease_expires_at=None,
+                    expires_at=now + result_ttl,
+                    updated_at=now,
+                )
+            )
+        if updated.rowcount != 1:
+            logger.warning("Lost lease on task %s before completion was recorded", task_id)
+            return False
+        return True
+
+    def fail(
+        self,
+        task_id: str,
+        lease_owner: str,
+        error: Dict[str, Any],
+        retry_delay: float,
+        result_ttl: float,
+    ) -> str:
+        from sqlalchemy import and_, select
+
+        t = self.table
+        now = time.time()
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                select(t.c.attempts, t.c.max_attempts).where(
+                    and_(t.c.id == task_id, t.c.lease_owner == lease_owner)
+                )
+            ).fetchone()
+            if row is None:
+                logger.warning("Lost lease on task %s before failure was recorded", task_id)
+                return TaskStatus.PROCESSING
+
+            if row.attempts < row.max_attempts:
+                values = {
+                    "status": TaskStatus.QUEUED,
+                    "available_at": now + retry_delay,
+                }
+            else:
+                # Dead letters keep no expiry so they remain available for inspection
+                values = {"status": TaskStatus.DEAD}
+
+            conn.execute(
+                t.update()
+                .where(and_(t.c.id == task_id, t.c.lease_owner == lease_owner))
+                .values(
+                    error=error,
+                    lease_owner=None,
+                    lease_expires_at=None,
+                    updated_at=now,
+                    **values,
+                )
+            )
+        return values["status"]
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        from sqlalchemy import select
+
+        t = self.table
+        with self.engine.connect() as conn:
+            row = conn.execute(select(t).where(t.c.id == task_id)).fetchone()
+            if row is not None and row.status == TaskStatus.COALESCED:
+                row = conn.execute(select(t).where(t.c.id == row.coalesced_into)).fetchone()
+        return self._row_to_dict(row) if row is not None else None
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        from sqlalchemy import and_, select
+
+        t = self.table
+        now = now if now is not None else time.time()
+        with self.engine.begin() as conn:
+            deleted = conn.execute(
+                t.delete().where(and_(t.c.expires_at.isnot(None), t.c.expires_at < now))
+            )
+            # Coalesced duplicates go with the task they were folded into
+            conn.execute(
+                t.delete().where(
+                    and_(
+                        t.c.status == TaskStatus.COALESCED,
+                        t.c.coalesced_into.notin_(select(t.c.id)),
+                    )
+                )
+            )
+        return deleted.rowcount or 0
+
+    def list_dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        from sqlalchemy import select
+
+        t = self.table
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(t)
+                .where(t.c.status == TaskStatus.DEAD)
+                .order_by(t.c.updated_at.desc())
+                .limit(limit)
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        from sqlalchemy import func, select
+
+        t = self.table
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(t.c.status, func.count()).group_by(t.c.status)
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+
+def create_task_store(
+    backend: Union[TaskStoreBackend, str], db_url: Optional[str] = None
+) -> Optional[TaskStore]:
+    """
+    Build a task store for the given backend.
+
+    Args:
+        backend: Which backend to use (enum member or its string value)
+        db_url: Database URL for the SQL backend
+
+    Returns:
+        TaskStore instance, or None for the in-memory backend
+    """
+    backend = TaskStoreBackend(backend)
+    if backend == TaskStoreBackend.MEMORY:
+        return None
+    if backend == TaskStoreBackend.SQL:
+        return SQLTaskStore(db_url=db_url)
+    raise ValueError(f"Unsupported task store backend: {backend}")
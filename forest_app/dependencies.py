@@ -9,14 +9,21 @@ from sqlalchemy.orm import Session  # Import Session for type hinting
 
 # Import request context
 try:
-    from forest_app.core.request_context import RequestContext
+    from forest_app.core.request_context import (
+        RequestContext,
+        current_request_context,
+    )
 except ImportError as e:
     logging.error(f"Failed to import RequestContext: {e}")
     class RequestContext:
-        def __init__(self, user_id=None, trace_id=None, feature_flags=None):
+        def __init__(self, user_id=None, trace_id=None, feature_flags=None, deadline=None):
             self.user_id = user_id
             self.trace_id = trace_id
             self.feature_flags = feature_flags or {}
+            self.deadline = deadline
+
+    def current_request_context():
+        return None
 
 # Import centralized error handling
 try:
@@ -149,12 +156,17 @@ async def get_request_context(
     # Try to get user_id from auth - implementation will need to be extended when auth is implemented
     user_id = None
 
-    # Use provided trace_id or generate a new one
-    trace_id = UUID(x_trace_id) if x_trace_id else None
+    # Reuse the trace_id and deadline bound by DeadlineMiddleware, if any
+    bound = current_request_context()
+    context_fields = {}
+    if bound is not None:
+        context_fields.update(trace_id=bound.trace_id, deadline=bound.deadline)
+    if x_trace_id:
+        context_fields["trace_id"] = UUID(x_trace_id)
 
     # Create and return the context
     return RequestContext(
-        user_id=user_id, trace_id=trace_id, feature_flags=feature_flags
+        user_id=user_id, feature_flags=feature_flags, **context_fields
     )
 
 
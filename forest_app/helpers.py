@@ -4,7 +4,6 @@
 
 import json
 import logging
-from datetime import datetime, timezone
 from typing import Dict, Optional, Any
 from uuid import UUID
 
@@ -68,27 +67,11 @@ except ImportError as e:
 # --- LLM & Pydantic Imports ---
 # Assume these imports are correct based on your provided code
 try:
-    from forest_app.integrations.llm import (
-        LLMClient,
-        LLMConfigurationError,
-        LLMConnectionError,
-        LLMError,
-        LLMValidationError,
-        SnapshotCodenameResponse,
-    )
+    from forest_app.integrations.llm import LLMClient
 except ImportError as e:
     logging.error(f"Failed to import LLM classes: {e}")
     class LLMClient:
-        async def generate(self, *args, **kwargs):
-            class Dummy:
-                codename = "Dummy Codename"
-            return Dummy()
-    class LLMConfigurationError(Exception): pass
-    class LLMConnectionError(Exception): pass
-    class LLMError(Exception): pass
-    class LLMValidationError(Exception): pass
-    class SnapshotCodenameResponse:
-        codename = "Dummy Codename"
+        pass
 
 try:
     from forest_app.models import MemorySnapshotModel
@@ -100,11 +83,50 @@ except ImportError as e:
 # --- Persistence Components ---
 # Assume these imports are correct
 try:
-    from forest_app.persistence.repository import MemorySnapshotRepository
+    from forest_app.persistence.repository import (
+        ConversationSummaryRepository,
+        MemorySnapshotRepository,
+    )
 except ImportError as e:
     logging.error(f"Failed to import MemorySnapshotRepository: {e}")
     class MemorySnapshotRepository:
         pass
+    ConversationSummaryRepository = None
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from forest_app.persistence.async_repository import (
+        AsyncConversationSummaryRepository,
+    )
+except ImportError as e:
+    logging.error(f"Failed to import AsyncConversationSummaryRepository: {e}")
+    AsyncSession = None
+    AsyncConversationSummaryRepository = None
+
+from forest_app.core.snapshot_codename import (
+    CONTEXT_HASH_KEY,
+    CodenameRequest,
+    codename_context,
+    context_hash,
+    get_codename_scheduler,
+    provisional_codename,
+)
+
+try:
+    from forest_app.core.history_retention import (
+        clear_segments_after_commit,
+        compact_history,
+        pending_segments,
+    )
+except ImportError as e:
+    logging.error(f"Failed to import history_retention: {e}")
+    def compact_history(snapshot, policy=None, summarizer=None):
+        return []
+    def pending_segments(snapshot):
+        return []
+    def clear_segments_after_commit(db, snapshot, segments):
+        return None
 
 # --- Constants ---
 try:
@@ -146,7 +168,7 @@ def find_node_in_dict(
 
 # --- Updated Helper Function Signature ---
 async def save_snapshot_with_codename(
-    db: Session,
+    db: Session,  # Or AsyncSession together with AsyncMemorySnapshotRepository
     repo: MemorySnapshotRepository,
     user_id: UUID,
     snapshot: MemorySnapshot,  # Input is the full MemorySnapshot object
@@ -154,7 +176,13 @@ async def save_snapshot_with_codename(
     stored_model: Optional[MemorySnapshotModel],
     force_create_new: bool = False,
 ) -> Optional[MemorySnapshotModel]:
-    """TODO: Add docstring."""
+    """
+    Adds the snapshot to the session (create or update) without committing.
+
+    The snapshot keeps its current codename, or gets a provisional timestamp
+    name, and is named by the codename scheduler once the caller commits;
+    saves that don't change the codename context schedule nothing.
+    """
 
     # --- CRITICAL: Record feature flags BEFORE serializing ---
     try:
@@ -166,6 +194,12 @@ async def save_snapshot_with_codename(
         logger.error("Error calling record_feature_flags(): %s", ff_err, exc_info=True)
     # --- End Feature Flag Recording ---
 
+    # --- Keep history bounded: older turns move to conversation_summaries ---
+    try:
+        compact_history(snapshot)
+    except Exception as compact_err:
+        logger.error("Error compacting snapshot history: %s", compact_err, exc_info=True)
+
     # --- Serialize the snapshot ONCE after recording flags ---
     try:
         updated_data = snapshot.to_dict()
@@ -205,68 +239,51 @@ async def save_snapshot_with_codename(
     except Exception as log_err:
         logger.error("SAVE_SNAPSHOT: Error logging snapshot data: %s", log_err)
 
-    generated_codename: str = (
-        # Fallback
-        f"Snapshot_{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}"
-    )
+    # --- Codename: provisional now, generated in the background after commit ---
+    new_or_updated_model: Optional[MemorySnapshotModel] = None
+    action = "create" if force_create_new or not stored_model else "update"
+    log_action_verb = "Prepared new" if action == "create" else "Prepared update for"
 
-    # --- Generate codename (Use injected LLMClient) ---
+    codename_scheduler = get_codename_scheduler()
+    codename_request: Optional[CodenameRequest] = None
+    current_codename = getattr(stored_model, "codename", None) if action == "update" else None
+    generated_codename: str = current_codename or provisional_codename()
+    content_hash: Optional[str] = None
     try:
-        logger.info("Attempting to generate codename for snapshot via LLMClient...")
-        # Use the already serialized data for pruning context
-        prompt_context = prune_context(updated_data)  # Use updated_data
-        theme = constants.DEFAULT_RESONANCE_THEME
-        # Access component_state from the serialized dict
-        if isinstance(updated_data.get("component_state"), dict):
-            theme = updated_data["component_state"].get("last_resonance_theme", theme)
-        prompt_context["resonance_theme"] = theme
-
-        codename_prompt = (
-            f"You are a helpful assistant specialized in creating concise, evocative codenames (2-5 words) "
-            f"for user growth journey snapshots based on their current state. Use title case. "
-            # Added default=str
-            f"Analyze the provided context:\n{json.dumps(prompt_context, indent=2, default=str)}\n"
-            f"Based *only* on the context, generate a suitable codename. "
-            f'Return ONLY a valid JSON object in the format: {{"codename": "Generated Codename Here"}}'
+        context = codename_context(
+            updated_data, prune_context, constants.DEFAULT_RESONANCE_THEME
         )
-
-        llm_response: Optional[SnapshotCodenameResponse] = await llm_client.generate(
-            prompt_parts=[codename_prompt], response_model=SnapshotCodenameResponse
+        content_hash = context_hash(context)
+        cached_codename = codename_scheduler.cached(content_hash)
+        # Compare with the stored context's hash; rows saved before it was
+        # recorded compare the context itself, if their data is loaded
+        stored_hashes = getattr(stored_model, "section_hashes", None)
+        stored_hash = (
+            stored_hashes.get(CONTEXT_HASH_KEY) if isinstance(stored_hashes, dict) else None
         )
-
-        if isinstance(llm_response, SnapshotCodenameResponse) and llm_response.codename:
-            temp_codename = llm_response.codename.strip()[
-                : constants.MAX_CODENAME_LENGTH
-            ]
-            if temp_codename:
-                generated_codename = temp_codename
-                logger.info("LLM generated codename: '%s'", generated_codename)
-            else:
-                logger.warning(
-                    "LLM returned an empty codename after stripping. Using fallback."
-                )
+        if current_codename is None:
+            unchanged = False
+        elif stored_hash is not None:
+            unchanged = stored_hash == content_hash
         else:
-            logger.warning(
-                "LLM did not return a valid SnapshotCodenameResponse object or codename was empty. Using fallback."
+            unchanged = "core_data" in vars(stored_model) and codename_context(
+                getattr(stored_model, "snapshot_data", None),
+                prune_context,
+                constants.DEFAULT_RESONANCE_THEME,
+            ) == context
+        if cached_codename:
+            generated_codename = cached_codename[: constants.MAX_CODENAME_LENGTH]
+        elif not unchanged:
+            codename_request = CodenameRequest(
+                snapshot_id=None,
+                provisional=generated_codename,
+                context=context,
+                context_hash=content_hash,
             )
-
-    except (
-        LLMError,
-        LLMValidationError,
-        LLMConfigurationError,
-        LLMConnectionError,
-    ) as llm_e:
-        logger.warning(
-            "LLM call for codename failed: %s. Using fallback.", llm_e, exc_info=False
-        )
     except Exception as e:
-        logger.exception("Unexpected error generating codename: %s. Using fallback.", e)
+        logger.exception("Unexpected error preparing codename: %s. Using fallback.", e)
 
     # --- Save or Update Snapshot Model Object ---
-    new_or_updated_model: Optional[MemorySnapshotModel] = None
-    action = "create" if force_create_new or not stored_model else "update"
-    log_action_verb = "Prepared new" if action == "create" else "Prepared update for"
-
     # <<< --- ADDED LOGGING --- >>>
     try:
         # Extract the HTA node ID from the context if possible (this is brittle)
@@ -314,6 +331,27 @@ async def save_snapshot_with_codename(
                 stored_model, updated_data, generated_codename
             )
 
+        saved_hashes = getattr(new_or_updated_model, "section_hashes", None)
+        if isinstance(saved_hashes, dict) and content_hash is not None:
+            new_or_updated_model.section_hashes = {**saved_hashes, CONTEXT_HASH_KEY: content_hash}
+
+        # Store compacted history in the same transaction as the snapshot;
+        # the segments stay pending on the snapshot until it commits
+        segments = pending_segments(snapshot)
+        summary_repo_class = (
+            AsyncConversationSummaryRepository
+            if AsyncSession is not None and isinstance(db, AsyncSession)
+            else ConversationSummaryRepository
+        )
+        if segments and summary_repo_class is not None:
+            summary_repo_class(db).add_segments(user_id, segments)
+            clear_segments_after_commit(db, snapshot, segments)
+
+        if new_or_updated_model and codename_request is not None:
+            codename_scheduler.schedule_after_commit(
+                db, new_or_updated_model, codename_request, llm_client
+            )
+
         if new_or_updated_model:
             model_id_for_log = getattr(new_or_updated_model, "id", "N/A")
             logger.info(
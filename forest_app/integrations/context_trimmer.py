@@ -5,9 +5,12 @@ This module implements a context trimming service that ensures prompts and conte
 sent to LLMs don't exceed token limits while preserving the most relevant information.
 """
 
+import bisect
+import functools
+import itertools
 import logging
 import re
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import tiktoken
 from pydantic import BaseModel, Field
@@ -16,6 +19,37 @@ from pydantic import BaseModel, Field
 logger = logging.getLogger(__name__)
 
 
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+_SUMMARY_LINE_MAX_CHARS = 160
+
+
+def summary_lines(messages: List[Dict[str, Any]]) -> List[str]:
+    """
+    Extractive summary lines for chat turns.
+
+    Keeps the first sentence of each non-empty turn, prefixed by its role and
+    cut to 160 characters, in input order.
+
+    Args:
+        messages: Turns with 'role' and 'content' keys (other items are skipped)
+
+    Returns:
+        One ``"- role: sentence"`` line per non-empty turn
+    """
+    lines = []
+    for msg in messages:
+        if not isinstance(msg, dict):
+            continue
+        content = " ".join(str(msg.get("content", "")).split())
+        if not content:
+            continue
+        first_sentence = _SENTENCE_END_RE.split(content, maxsplit=1)[0]
+        if len(first_sentence) > _SUMMARY_LINE_MAX_CHARS:
+            first_sentence = first_sentence[: _SUMMARY_LINE_MAX_CHARS - 3] + "..."
+        lines.append(f"- {msg.get('role', 'user')}: {first_sentence}")
+    return lines
+
+
 class TrimmerConfig(BaseModel):
     """Configuration for the ContextTrimmer."""
 
@@ -39,6 +73,77 @@ class TrimmerConfig(BaseModel):
         default=["##", "===", "---", "*****"],
         description="Markers used to identify logical sections in content",
     )
+    token_cache_size: int = Field(
+        default=8192,
+        description="Number of token counts memoized (fragments and chat messages)",
+    )
+    token_cache_max_chars: int = Field(
+        default=32_000,
+        description="Only fragments up to this length are memoized",
+    )
+    evicted_summary_max_tokens: int = Field(
+        default=200,
+        description="Token budget for the summary of turns evicted from a message array",
+    )
+
+
+# Approximate tokens of per-message metadata (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_HIGH_PRIORITY_KEYWORDS = ("summary", "important", "critical", "key")
+_MEDIUM_PRIORITY_KEYWORDS = ("context", "background", "detail")
+_NON_SPACE_RE = re.compile(r"\S")
+
+
+# Byte length of every token id, per encoding (built once per process)
+_TOKEN_BYTE_LENGTHS: Dict[str, List[int]] = {}
+
+
+def _token_byte_lengths(encoder: Any) -> List[int]:
+    lengths = _TOKEN_BYTE_LENGTHS.get(encoder.name)
+    if lengths is None:
+        lengths = []
+        for token in range(encoder.n_vocab):
+            try:
+                lengths.append(len(encoder.decode_single_token_bytes(token)))
+            except KeyError:  # gaps in the vocabulary
+                lengths.append(0)
+        _TOKEN_BYTE_LENGTHS[encoder.name] = lengths
+    return lengths
+
+
+class _TokenIndex:
+    """
+    Token offsets for a text encoded once.
+
+    Maps character spans to token counts and token budgets back to character
+    positions, so any substring can be measured or truncated without
+    re-encoding it.
+    """
+
+    def __init__(self, text: str, encoder: Any):
+        tokens = encoder.encode(text)
+        self.total = len(tokens)
+        if text.isascii():
+            # One byte per character: offsets are cumulative token lengths
+            lengths = map(_token_byte_lengths(encoder).__getitem__, tokens)
+            self.offsets = [0, *itertools.accumulate(lengths)][:-1]
+        else:
+            _, self.offsets = encoder.decode_with_offsets(tokens)
+
+    def _token_at(self, char_pos: int) -> int:
+        return bisect.bisect_left(self.offsets, char_pos)
+
+    def count(self, start: int, end: int) -> int:
+        """Number of tokens that start within text[start:end]."""
+        return self._token_at(end) - self._token_at(start)
+
+    def cut(self, start: int, end: int, token_limit: int) -> int:
+        """Largest position p <= end such that text[start:p] has token_limit tokens or fewer."""
+        index = self._token_at(start) + max(0, token_limit)
+        if index >= self._token_at(end):
+            return end
+        return self.offsets[index]
 
 
 class ContextSection(BaseModel):
@@ -65,21 +170,32 @@ class ContextTrimmer:
 
     This service analyzes content, divides it into logical sections, and intelligently
     trims it while preserving the most important information to stay within token limits.
+
+    Long content is encoded only once per trim; sections are measured and cut by
+    token offsets. Counts for short, repeated fragments (system prompts, templates)
+    are memoized.
     """
 
-    def __init__(self, config: Optional[TrimmerConfig] = None):
+    def __init__(self, config: Optional[TrimmerConfig] = None, encoder: Any = None):
         """
         Initialize the ContextTrimmer.
 
         Args:
             config: Optional custom configuration for the trimmer
+            encoder: Optional tiktoken Encoding (defaults to config.tiktoken_model)
         """
         self.config = config or TrimmerConfig()
-        self.encoder = tiktoken.get_encoding(self.config.tiktoken_model)
+        self.encoder = encoder or tiktoken.get_encoding(self.config.tiktoken_model)
+        self._cached_count = functools.lru_cache(maxsize=self.config.token_cache_size)(
+            self._encode_count
+        )
         logger.info(
             f"ContextTrimmer initialized with max_tokens={self.config.max_tokens}"
         )
 
+    def _encode_count(self, text: str) -> int:
+        return len(self.encoder.encode(text))
+
     def count_tokens(self, text: str) -> int:
         """
         Count the number of tokens in a text string.
@@ -92,7 +208,74 @@ class ContextTrimmer:
         """
         if not text:
             return 0
-        return len(self.encoder.encode(text))
+        if len(text) <= self.config.token_cache_max_chars:
+            return self._cached_count(text)
+        return self._encode_count(text)
+
+    def token_cache_info(self) -> Dict[str, int]:
+        """Return hit/miss statistics for the memoized token counts."""
+        info = self._cached_count.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+
+    def _section_spans(
+        self, text: str, start: int = 0
+    ) -> List[Tuple[Optional[Tuple[int, int]], Tuple[int, int]]]:
+        """
+        Locate logical sections in text[start:] without copying them.
+
+        Returns:
+            (title_span, body_span) pairs; title_span is None for untitled
+            sections. Spans index into ``text``.
+        """
+        pattern = "|".join(re.escape(marker) for marker in self.config.section_markers)
+        if not pattern:
+            return [(None, (start, len(text)))]
+
+        spans = []
+        title: Optional[Tuple[int, int]] = None
+        position = start
+        for match in re.compile(f"(?:{pattern}).*(?:\\n|$)").finditer(text, start):
+            if match.start() == match.end():
+                continue
+            spans.append((title, (position, match.start())))
+            title = _strip_span(text, match.start(), match.end())
+            position = match.end()
+        spans.append((title, (position, len(text))))
+
+        # Drop empty bodies (their titles are dropped with them)
+        return [
+            (title, body)
+            for title, body in spans
+            if _NON_SPACE_RE.search(text, body[0], body[1])
+        ]
+
+    @staticmethod
+    def _section_priority(
+        lowered: str, title: Optional[Tuple[int, int]], body: Tuple[int, int]
+    ) -> int:
+        """
+        Higher priority for sections with important keywords.
+
+        ``lowered`` is the lower-cased content, computed once for all sections.
+        """
+        spans = [body] if title is None else [title, body]
+
+        def contains(keywords):
+            return any(lowered.find(kw, s, e) != -1 for kw in keywords for s, e in spans)
+
+        if contains(_HIGH_PRIORITY_KEYWORDS):
+            return 3
+        if contains(_MEDIUM_PRIORITY_KEYWORDS):
+            return 2
+        return 1
+
+    @staticmethod
+    def _section_text(
+        text: str, title: Optional[Tuple[int, int]], body: Tuple[int, int]
+    ) -> str:
+        if title is None:
+            return text[body[0] : body[1]]
+        return f"{text[title[0]:title[1]]}\n{text[body[0]:body[1]]}"
 
     def identify_sections(self, text: str) -> List[ContextSection]:
         """
@@ -107,63 +290,45 @@ class ContextTrimmer:
         if not text:
             return []
 
-        # Create pattern to find section breaks
-        pattern = "|".join(re.escape(marker) for marker in self.config.section_markers)
-
-        # If no sections are found, treat the whole text as one section
-        if not pattern or not re.search(pattern, text):
-            token_count = self.count_tokens(text)
-            return [
-                ContextSection(
-                    content=text, token_count=token_count, priority=1, keep_ratio=1.0
-                )
-            ]
-
-        # Split on section markers
-        sections = re.split(f"({pattern}.*(?:\\n|$))", text)
+        index = _TokenIndex(text, self.encoder)
+        lowered = _lower_same_length(text)
         result = []
-
-        section_title = ""
-
-        for i, section in enumerate(sections):
-            # If this is a section marker, it becomes the title for the next section
-            if i % 2 == 1:
-                section_title = section.strip()
-                continue
-
-            if section.strip():
-                if section_title:
-                    content = f"{section_title}\n{section}"
-                else:
-                    content = section
-
-                token_count = self.count_tokens(content)
-
-                # Determine priority - higher for sections with important keywords
-                priority = 1
-                lower_content = content.lower()
-                if any(
-                    kw in lower_content
-                    for kw in ["summary", "important", "critical", "key"]
-                ):
-                    priority = 3
-                elif any(
-                    kw in lower_content for kw in ["context", "background", "detail"]
-                ):
-                    priority = 2
-
-                result.append(
-                    ContextSection(
-                        content=content,
-                        token_count=token_count,
-                        priority=priority,
-                        keep_ratio=1.0,
-                    )
+        for title, body in self._section_spans(text):
+            token_count = index.count(*body) + (index.count(*title) if title else 0)
+            result.append(
+                ContextSection(
+                    content=self._section_text(text, title, body),
+                    token_count=token_count,
+                    priority=self._section_priority(lowered, title, body),
+                    keep_ratio=1.0,
                 )
+            )
+        return result
 
-            section_title = ""
+    def _find_header(self, content: str) -> Optional[Tuple[int, int]]:
+        """
+        Find the section header to preserve when trimming.
 
-        return result
+        Preference order: a header using the first marker, then a short
+        standalone line (like "Section1"), then headers using later markers.
+        """
+        for i, marker in enumerate(self.config.section_markers):
+            for match in re.finditer(f"{re.escape(marker)}.*?(?:\n|$)", content):
+                span = _strip_span(content, match.start(), match.end())
+                if span[0] < span[1]:
+                    return span
+            if i == 0:
+                position = 0
+                for line in content.split("\n"):
+                    stripped = line.strip()
+                    if (
+                        stripped
+                        and len(stripped) < 30
+                        and not any(c.isspace() for c in stripped)
+                    ):
+                        return _strip_span(content, position, position + len(line))
+                    position += len(line) + 1
+        return None
 
     def trim_content(
         self, content: str, max_tokens: Optional[int] = None
@@ -184,48 +349,33 @@ class ContextTrimmer:
         max_tokens = max_tokens or self.config.max_tokens
         available_tokens = max_tokens - self.config.buffer_tokens
 
-        # Quick check if trimming is needed
-        token_count = self.count_tokens(content)
+        # Quick check if trimming is needed (memoized for short fragments)
+        if len(content) <= self.config.token_cache_max_chars:
+            if self.count_tokens(content) <= available_tokens:
+                return content, self.count_tokens(content)
+
+        # Encode once; everything below is measured against these offsets
+        index = _TokenIndex(content, self.encoder)
+        token_count = index.total
         if token_count <= available_tokens:
             return content, token_count
 
-        # Extract section headers to ensure preservation
-        section_headers = []
-        for marker in self.config.section_markers:
-            # Find all section headers using each marker
-            import re
-
-            pattern = f"({re.escape(marker)}.*?(?:\n|$))"
-            headers = re.findall(pattern, content)
-            section_headers.extend([h.strip() for h in headers if h.strip()])
-
-            # Also find any standalone headers (like "Section1")
-            lines = content.split("\n")
-            for line in lines:
-                if (
-                    line.strip()
-                    and len(line.strip()) < 30
-                    and not any(c.isspace() for c in line.strip())
-                ):
-                    if line.strip() not in section_headers:
-                        section_headers.append(line.strip())
-
         # Preserve at least the first section header if possible
-        preserved_header = section_headers[0] if section_headers else ""
-        preserved_header_tokens = (
-            self.count_tokens(preserved_header) if preserved_header else 0
-        )
+        header_span = self._find_header(content)
+        preserved_header = content[header_span[0] : header_span[1]] if header_span else ""
+        preserved_header_tokens = index.count(*header_span) if header_span else 0
 
         # If we can't fit even one section header, we'll need to truncate it
         if preserved_header and preserved_header_tokens > available_tokens:
-            preserved_header = self._truncate_to_token_limit(
-                preserved_header, available_tokens // 2
+            preserved_header = self._truncate_span(
+                content, index, header_span[0], header_span[1], available_tokens // 2
             )
-            preserved_header_tokens = self.count_tokens(preserved_header)
+            preserved_header_tokens = self._encode_count(preserved_header)
 
         # Preserve the first n characters as they're usually important
-        first_part = content[: self.config.preserve_first_n_chars]
-        first_part_tokens = self.count_tokens(first_part)
+        first_end = min(self.config.preserve_first_n_chars, len(content))
+        first_part = content[:first_end]
+        first_part_tokens = index.count(0, first_end)
 
         remaining_tokens = available_tokens - first_part_tokens
 
@@ -237,29 +387,26 @@ class ContextTrimmer:
                 # If we can't fit both, just use the header
                 return preserved_header, preserved_header_tokens
 
-            first_part = self._truncate_to_token_limit(
-                first_part, first_part_max_tokens
-            )
-            first_part_tokens = self.count_tokens(first_part)
-            return first_part + "\n" + preserved_header, self.count_tokens(
-                first_part + "\n" + preserved_header
-            )
+            first_part = self._truncate_span(content, index, 0, first_end, first_part_max_tokens)
+            combined = first_part + "\n" + preserved_header
+            return combined, self._encode_count(combined)
         elif remaining_tokens <= 0:
             # If no sections and first part is too long, trim it
             logger.warning(
                 f"First part of content exceeds token limit: {first_part_tokens} tokens"
             )
             return (
-                self._truncate_to_token_limit(first_part, available_tokens),
+                self._truncate_span(content, index, 0, first_end, available_tokens),
                 available_tokens,
             )
 
-        # Get sections from the rest of the content
-        rest = content[self.config.preserve_first_n_chars :]
-        sections = self.identify_sections(rest)
-
-        # Sort sections by priority (descending)
-        sections.sort(key=lambda s: s.priority, reverse=True)
+        # Get sections from the rest of the content, sorted by priority (descending)
+        lowered = _lower_same_length(content)
+        sections = [
+            (self._section_priority(lowered, title, body), title, body)
+            for title, body in self._section_spans(content, first_end)
+        ]
+        sections.sort(key=lambda s: s[0], reverse=True)
 
         # Calculate how many tokens we can allocate
         remaining_content = []
@@ -271,23 +418,29 @@ class ContextTrimmer:
                 remaining_content.append(preserved_header)
                 used_tokens += preserved_header_tokens
 
-        for section in sections:
+        for _, title, body in sections:
+            # +1 for the newline that joins the section to the previous piece
+            section_tokens = 1 + index.count(*body)
+            if title:
+                section_tokens += index.count(*title) + 1
+
             # Skip if this section is just the header we already preserved
-            if preserved_header and section.content.strip() == preserved_header.strip():
+            if preserved_header and _section_equals(
+                content, title, body, preserved_header.strip()
+            ):
                 continue
 
-            if used_tokens + section.token_count <= available_tokens:
+            if used_tokens + section_tokens <= available_tokens:
                 # Can include the whole section
-                remaining_content.append(section.content)
-                used_tokens += section.token_count
+                remaining_content.append(self._section_text(content, title, body))
+                used_tokens += section_tokens
             else:
                 # Need to trim this section
-                tokens_for_section = available_tokens - used_tokens
+                tokens_for_section = available_tokens - used_tokens - 1
                 if tokens_for_section > 20:  # Lower threshold to include more content
-                    truncated = self._truncate_to_token_limit(
-                        section.content, tokens_for_section
+                    remaining_content.append(
+                        self._truncate_section(content, index, title, body, tokens_for_section)
                     )
-                    remaining_content.append(truncated)
                     used_tokens = available_tokens
                 break
 
@@ -306,13 +459,46 @@ class ContextTrimmer:
                 )
                 remaining_content.append(truncated_header)
 
-        # Combine the result
+        # Combine the result; only the (bounded) result is re-encoded
         trimmed = first_part + "\n".join(remaining_content)
-        final_token_count = self.count_tokens(trimmed)
+        final_token_count = self._encode_count(trimmed)
+        if final_token_count > available_tokens:
+            # Token boundaries can shift where pieces are joined
+            trimmed = self._truncate_to_token_limit(trimmed, available_tokens)
+            final_token_count = self._encode_count(trimmed)
 
         logger.info(f"Trimmed content from {token_count} to {final_token_count} tokens")
         return trimmed, final_token_count
 
+    @staticmethod
+    def _truncate_span(
+        text: str, index: _TokenIndex, start: int, end: int, token_limit: int
+    ) -> str:
+        """Truncate text[start:end] to a token limit using precomputed offsets."""
+        if index.count(start, end) <= token_limit:
+            return text[start:end]
+        # Leave room for ellipsis
+        return text[start : index.cut(start, end, token_limit - 3)] + "..."
+
+    def _truncate_section(
+        self,
+        text: str,
+        index: _TokenIndex,
+        title: Optional[Tuple[int, int]],
+        body: Tuple[int, int],
+        token_limit: int,
+    ) -> str:
+        """Truncate a (title, body) section to a token limit without re-encoding."""
+        if title is None:
+            return self._truncate_span(text, index, body[0], body[1], token_limit)
+        title_tokens = index.count(*title)
+        if title_tokens + 1 >= token_limit - 3:
+            return self._truncate_span(text, index, title[0], title[1], token_limit)
+        body_text = self._truncate_span(
+            text, index, body[0], body[1], token_limit - title_tokens - 1
+        )
+        return f"{text[title[0]:title[1]]}\n{body_text}"
+
     def _truncate_to_token_limit(self, text: str, token_limit: int) -> str:
         """
         Truncate text to fit exactly within a token limit.
@@ -332,24 +518,61 @@ class ContextTrimmer:
             return text
 
         # Leave room for ellipsis
-        truncated_encoding = encoding[: token_limit - 3]
+        truncated_encoding = encoding[: max(0, token_limit - 3)]
         truncated = self.encoder.decode(truncated_encoding)
 
         # Add ellipsis to show it was truncated
         return truncated + "..."
 
+    def _message_tokens(self, message: Dict[str, Any]) -> int:
+        """Tokens for one chat message, including ~4 tokens of role metadata."""
+        return self.count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+    def summarize_turns(self, messages: List[Dict[str, Any]], max_tokens: int) -> str:
+        """
+        Build a short extractive summary of chat turns.
+
+        Keeps the first sentence of each turn, most recent turns last, and cuts
+        the result to the token budget. Used for evicted turns when no
+        custom summarizer is supplied.
+
+        Args:
+            messages: Turns to summarize, oldest first
+            max_tokens: Token budget for the summary
+
+        Returns:
+            The summary text (empty if there is nothing to summarize)
+        """
+        lines = summary_lines(messages)
+        if not lines:
+            return ""
+        summary = "Summary of earlier conversation:\n" + "\n".join(lines)
+        return self._truncate_to_token_limit(summary, max_tokens)
+
     def trim_message_array(
-        self, messages: List[Dict[str, Any]], max_tokens: Optional[int] = None
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: Optional[int] = None,
+        summarize_evicted: bool = False,
+        summarizer: Optional[Callable[[List[Dict[str, Any]], int], str]] = None,
     ) -> List[Dict[str, Any]]:
         """
         Trim an array of chat messages to fit within token limits.
 
+        System messages are always kept; the most recent other messages are
+        kept until the budget runs out. Each message is counted once (counts
+        for repeated contents are memoized), and order is restored by index.
+
         Args:
             messages: List of message dictionaries with 'role' and 'content' keys
             max_tokens: Optional custom token limit for this specific trim operation
+            summarize_evicted: Replace dropped turns with a single summary message
+                (placed after the system messages) instead of discarding them
+            summarizer: Optional ``(evicted_messages, max_tokens) -> str``;
+                defaults to ``summarize_turns``
 
         Returns:
-            The trimmed message list
+            The trimmed message list (input messages are never modified)
         """
         if not messages:
             return []
@@ -357,79 +580,107 @@ class ContextTrimmer:
         max_tokens = max_tokens or self.config.max_tokens
         available_tokens = max_tokens - self.config.buffer_tokens
 
-        # Count total tokens in messages
-        token_count = 0
-        for msg in messages:
-            token_count += self.count_tokens(msg.get("content", ""))
-            # Account for message metadata (role, etc.) - approximately 4 tokens per message
-            token_count += 4
-
-        if token_count <= available_tokens:
+        # Count every message exactly once
+        counts = [self._message_tokens(msg) for msg in messages]
+        if sum(counts) <= available_tokens:
             return messages
 
         # Preserve system messages and most recent messages
-        system_messages = [msg for msg in messages if msg.get("role") == "system"]
-        non_system = [msg for msg in messages if msg.get("role") != "system"]
-
-        # Count tokens in system messages
-        system_tokens = 0
-        for msg in system_messages:
-            system_tokens += self.count_tokens(msg.get("content", "")) + 4
+        system_indexes = [i for i, msg in enumerate(messages) if msg.get("role") == "system"]
+        other_indexes = [i for i, msg in enumerate(messages) if msg.get("role") != "system"]
+        kept: Dict[int, Dict[str, Any]] = {i: messages[i] for i in system_indexes}
+        system_tokens = sum(counts[i] for i in system_indexes)
 
-        # Determine tokens available for non-system messages
-        available_for_non_system = available_tokens - system_tokens
-
-        if available_for_non_system <= 0:
+        if available_tokens - system_tokens <= 0:
             # Need to trim system messages too
             logger.warning("System messages exceed token limit, trimming required")
-            for i, msg in enumerate(system_messages):
-                content = msg.get("content", "")
-                if content:
-                    trimmed, _ = self.trim_content(
-                        content, available_tokens // len(system_messages)
-                    )
-                    system_messages[i]["content"] = trimmed
-
-            # Recalculate system tokens
+            share = available_tokens // len(system_indexes)
             system_tokens = 0
-            for msg in system_messages:
-                system_tokens += self.count_tokens(msg.get("content", "")) + 4
-
-            available_for_non_system = available_tokens - system_tokens
+            for i in system_indexes:
+                content = messages[i].get("content", "")
+                if content:
+                    trimmed, trimmed_tokens = self.trim_content(content, share)
+                    kept[i] = {**messages[i], "content": trimmed}
+                    counts[i] = trimmed_tokens + MESSAGE_OVERHEAD_TOKENS
+                system_tokens += counts[i]
 
-        if available_for_non_system <= 0:
+        if available_tokens - system_tokens <= 0:
             # Even with trimming, system messages take all tokens
             logger.warning("No tokens available for non-system messages")
-            return system_messages
+            return [kept[i] for i in system_indexes]
+
+        # Reserve room for the summary of evicted turns
+        summary_budget = 0
+        if summarize_evicted:
+            summary_budget = min(
+                self.config.evicted_summary_max_tokens,
+                (available_tokens - system_tokens) // 4,
+            )
 
-        # For non-system messages, keep most recent ones
-        result = system_messages.copy()
+        # Single backward pass from the most recent message
+        tokens_used = system_tokens + summary_budget
+        evicted_until = 0  # other_indexes[:evicted_until] are dropped
+        for position in range(len(other_indexes) - 1, -1, -1):
+            i = other_indexes[position]
+            if tokens_used + counts[i] <= available_tokens:
+                kept[i] = messages[i]
+                tokens_used += counts[i]
+                continue
 
-        # Start from most recent and work backwards
-        tokens_used = system_tokens
-        for msg in reversed(non_system):
-            content = msg.get("content", "")
-            msg_tokens = self.count_tokens(content) + 4
+            # Need to trim this message
+            tokens_for_msg = available_tokens - tokens_used
+            evicted_until = position + 1
+            if tokens_for_msg > 20:  # Only add if we can include something meaningful
+                trimmed, _ = self.trim_content(
+                    messages[i].get("content", ""), tokens_for_msg - MESSAGE_OVERHEAD_TOKENS
+                )
+                kept[i] = {**messages[i], "content": trimmed}
+                evicted_until = position
+            break
 
-            if tokens_used + msg_tokens <= available_tokens:
-                # Can include the whole message
-                result.append(msg)
-                tokens_used += msg_tokens
-            else:
-                # Need to trim this message
-                tokens_for_msg = available_tokens - tokens_used
-                if (
-                    tokens_for_msg > 20
-                ):  # Only add if we can include something meaningful
-                    trimmed, _ = self.trim_content(content, tokens_for_msg - 4)
-                    trimmed_msg = msg.copy()
-                    trimmed_msg["content"] = trimmed
-                    result.append(trimmed_msg)
-                break
+        # Restore the original message order by index
+        result = [kept[i] for i in sorted(kept)]
 
-        # Restore the original message order
-        result.sort(
-            key=lambda msg: messages.index(msg) if msg in messages else len(messages)
-        )
+        evicted = [messages[i] for i in other_indexes[:evicted_until]]
+        if summarize_evicted and evicted and summary_budget > MESSAGE_OVERHEAD_TOKENS:
+            summary = (summarizer or self.summarize_turns)(
+                evicted, summary_budget - MESSAGE_OVERHEAD_TOKENS
+            )
+            if summary:
+                result.insert(
+                    len(system_indexes), {"role": "system", "content": summary}
+                )
 
         return result
+
+
+def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    """Narrow text[start:end] to exclude leading and trailing whitespace."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _section_equals(
+    text: str, title: Optional[Tuple[int, int]], body: Tuple[int, int], other: str
+) -> bool:
+    """Compare a section's stripped text with ``other`` without building it first."""
+    if title is None:
+        start, end = _strip_span(text, *body)
+        return end - start == len(other) and text[start:end] == other
+    _, body_end = _strip_span(text, *body)
+    length = (title[1] - title[0]) + 1 + (body_end - body[0])
+    return length == len(other) and (
+        f"{text[title[0]:title[1]]}\n{text[body[0]:body_end]}" == other
+    )
+
+
+def _lower_same_length(text: str) -> str:
+    """Lower-case text, keeping character positions aligned with the original."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # A few characters expand when lower-cased; lower them one at a time
+    return "".join(c.lower()[0] for c in text)
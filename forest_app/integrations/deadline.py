@@ -0,0 +1,124 @@
+"""
+Request deadlines for outbound calls.
+
+A deadline is an absolute point in time (``time.monotonic()``) by which the
+work done on behalf of a request must finish. It is carried in a context
+variable, so it follows the request through every await and into tasks
+spawned from it, and LLM calls deep in the service layers can size their
+timeouts and retries to the time that is actually left:
+
+    with deadline_scope(30):
+        await service.generate_text(...)  # attempts and backoff fit in 30s
+
+Nested scopes can only shorten the deadline. ``no_deadline`` detaches
+long-running background work from the request that started it; work shared by
+several requests runs under it, and each request waits for the shared result
+with ``wait_within_deadline`` for no longer than its own time allows.
+"""
+
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_current_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "request_deadline", default=None
+)
+
+
+class DeadlineExceededError(asyncio.TimeoutError):
+    """Raised when there is no time left before the request deadline."""
+
+
+@contextmanager
+def deadline_scope(timeout: Optional[float]) -> Iterator[Optional[float]]:
+    """
+    Run the enclosed block with a deadline ``timeout`` seconds from now.
+
+    An enclosing, earlier deadline is kept. ``None`` keeps the current one.
+
+    Yields:
+        The effective deadline (monotonic seconds), or None
+    """
+    deadline = _current_deadline.get()
+    if timeout is not None:
+        candidate = time.monotonic() + timeout
+        deadline = candidate if deadline is None else min(deadline, candidate)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+@contextmanager
+def deadline_at(deadline: Optional[float]) -> Iterator[Optional[float]]:
+    """Like ``deadline_scope`` for an absolute monotonic deadline."""
+    timeout = None if deadline is None else deadline - time.monotonic()
+    with deadline_scope(timeout) as effective:
+        yield effective
+
+
+@contextmanager
+def no_deadline() -> Iterator[None]:
+    """Run the enclosed block (and tasks created in it) without a deadline."""
+    token = _current_deadline.set(None)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    """The current deadline (monotonic seconds), or None if there is none."""
+    return _current_deadline.get()
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the deadline (may be negative), or None."""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def attempt_timeout(timeout: Optional[float]) -> Optional[float]:
+    """
+    Timeout for one attempt: ``timeout`` capped by the time left.
+
+    Raises:
+        DeadlineExceededError: If the deadline has already passed
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceededError(
+            f"Request deadline exceeded by {-remaining:.2f}s"
+        )
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+async def wait_within_deadline(future: "asyncio.Future[T]") -> T:
+    """
+    Wait for a shared future, for no longer than the time left.
+
+    The future itself is never cancelled: other callers may still be waiting
+    for it, so only this caller gives up when its deadline passes.
+
+    Raises:
+        DeadlineExceededError: If the deadline passes first
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return await asyncio.shield(future)
+    if remaining > 0:
+        done, _ = await asyncio.wait({future}, timeout=remaining)
+        if done:
+            return future.result()
+    raise DeadlineExceededError(
+        f"Request deadline exceeded by {-(remaining_time() or 0):.2f}s"
+    )
@@ -10,21 +10,37 @@ and distilling user reflections.
 from __future__ import annotations
 
 # ────────────────────────────── Std-lib ──────────────────────────────
+import asyncio
+import inspect
 import json
 import logging
 import re
+from contextlib import nullcontext
 
 # MODIFIED: Added List for type hinting
-from typing import Any, List, Optional, Type, TypeVar, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Type,
+    TypeVar,
+    Union,
+    get_args,
+)
 
 from pydantic import BaseModel as PydanticBaseModel
 from pydantic import Field
 from pydantic import ValidationError as PydanticValidationError
+from pydantic import model_validator
 from tenacity import (
     AsyncRetrying,
     RetryError,
     retry_if_exception_type,
     stop_after_attempt,
+    stop_any,
     wait_fixed,
 )
 
@@ -116,33 +132,16 @@ def generate_response(prompt: str) -> str:
 
 # --- Import pybreaker ---
 try:
-    from pybreaker import CircuitBreaker, CircuitBreakerError
-
-    pybreaker_import_ok = True
+    # Base class of forest_app.core.circuit_breaker.CircuitOpenError
+    from pybreaker import CircuitBreakerError
 except ImportError:
     logging.getLogger(__name__).error(
-        "pybreaker library not found. Circuit breaking disabled. Run 'pip install pybreaker'"
+        "pybreaker library not found. Run 'pip install pybreaker'"
     )
-    pybreaker_import_ok = False
 
-    # Dummy classes/functions if pybreaker is not installed
     class CircuitBreakerError(Exception):
         pass
 
-    class CircuitBreaker:
-        def __init__(self, *args, **kwargs):
-            pass
-
-        def __call__(self, func):
-            import functools
-
-            @functools.wraps(func)
-            async def wrapper(*args, **kwargs):
-                # Basic pass-through for the dummy
-                return await func(*args, **kwargs)
-
-            return wrapper  # Return the async wrapper
-
 
 # ────────────────────────────── Project ──────────────────────────────
 # --- Import Central Settings Object ---
@@ -155,6 +154,8 @@ try:
     _gemini_model_name = settings.GEMINI_MODEL_NAME
     _gemini_advanced_model_name = settings.GEMINI_ADVANCED_MODEL_NAME
     _llm_temperature = settings.LLM_TEMPERATURE
+    _micro_batch_window_ms = settings.LLM_MICRO_BATCH_WINDOW_MS
+    _micro_batch_max_size = settings.LLM_MICRO_BATCH_MAX_SIZE
 except ImportError as e:
     logging.getLogger(__name__).critical(
         f"CRITICAL: Failed to import central settings from forest_app.config.settings: {e}"
@@ -164,6 +165,8 @@ except ImportError as e:
     _gemini_model_name = "gemini-1.5-flash-latest"
     _gemini_advanced_model_name = "gemini-1.5-pro-latest"
     _llm_temperature = 0.7
+    _micro_batch_window_ms = 0
+    _micro_batch_max_size = 8
 except AttributeError as e:
     logging.getLogger(__name__).critical(
         f"CRITICAL: Missing required attribute in settings object: {e}"
@@ -173,13 +176,41 @@ except AttributeError as e:
     _gemini_model_name = "gemini-1.5-flash-latest"
     _gemini_advanced_model_name = "gemini-1.5-pro-latest"
     _llm_temperature = 0.7
+    _micro_batch_window_ms = 0
+    _micro_batch_max_size = 8
 # --- END IMPORT ---
 
+from forest_app.integrations.deadline import (
+    DeadlineExceededError,
+    attempt_timeout,
+    remaining_time,
+)
+from forest_app.integrations.llm_batching import MicroBatcher
+from forest_app.integrations.llm_streaming import (
+    IncrementalJsonParser,
+    JsonPath,
+    JsonStreamError,
+    LLMStream,
+)
+from forest_app.integrations.llm_rate_limiter import (
+    LLMRateLimiter,
+    estimate_tokens,
+    get_rate_limiter,
+)
+from forest_app.integrations.llm_replay import LLMReplayProvider, get_replay_provider
+from forest_app.integrations.prompt_cache import (
+    TREE_SECTION_TEMPLATE,
+    AssembledPrompt,
+    PromptAssembler,
+    get_prompt_assembler,
+)
+
 # --- HTA Model Imports with TYPE_CHECKING to avoid circular imports ---
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     # Import the base HTA models only for type checking to avoid circular imports
+    from forest_app.core.circuit_breaker import CircuitBreakerRegistry
     from forest_app.modules.hta_models import HTANodeModel, HTAResponseModel
     hta_models_import_ok = True
 else:
@@ -237,6 +268,20 @@ class LLMConfigurationError(LLMError):
     """Error in LLM client configuration."""
 
 
+class LLMPromptCacheError(LLMError):
+    """The provider rejected a cached prompt prefix (not found or expired)."""
+
+
+def _is_prompt_cache_error(error: Exception) -> bool:
+    """Whether a Google API error is about the request's cached content."""
+    message = str(error).lower().replace("_", "").replace(" ", "")
+    return "cachedcontent" in message
+
+
+class LLMDeadlineExceededError(LLMError):
+    """The request deadline passed before the LLM call could be (re)tried."""
+
+
 class LLMGenerationError(LLMError):
     """Error during the LLM generation process (e.g., empty/blocked response)."""
 
@@ -267,6 +312,15 @@ class SnapshotCodenameResponse(PydanticBaseModel):
     codename: str
 
 
+class SnapshotCodenameBatchItem(PydanticBaseModel):
+    key: str
+    codename: str
+
+
+class SnapshotCodenameBatchResponse(PydanticBaseModel):
+    codenames: List[SnapshotCodenameBatchItem] = Field(default_factory=list)
+
+
 # --- HTA Evolution Specific Model ---
 class HTAEvolveResponse(PydanticBaseModel):
     """
@@ -277,6 +331,34 @@ class HTAEvolveResponse(PydanticBaseModel):
     hta_root: Optional[HTANodeModel] = Field(None, validation_alias="hta_root")
 
 
+# --- HTA Patch Evolution Models ---
+class HTAPatchOperation(PydanticBaseModel):
+    """One edit of a patch-based HTA evolution (see modules/hta_patch.py)."""
+
+    op: Literal["add", "remove", "update", "move"]
+    node_id: str
+    parent_id: Optional[str] = None  # add / move: new parent
+    position: Optional[int] = None  # add / move: index among the parent's children
+    node: Optional[Dict[str, Any]] = None  # add: the new node (may include children)
+    fields: Optional[Dict[str, Any]] = None  # update: changed fields only
+
+    @model_validator(mode="after")
+    def _check_required_fields(self) -> "HTAPatchOperation":
+        if self.op in ("add", "move") and not self.parent_id:
+            raise ValueError(f"'{self.op}' operation requires parent_id")
+        if self.op == "add" and not (self.node and self.node.get("title")):
+            raise ValueError("'add' operation requires a node with a title")
+        if self.op == "update" and not self.fields:
+            raise ValueError("'update' operation requires fields")
+        return self
+
+
+class HTAPatchResponse(PydanticBaseModel):
+    """Response expected from a patch-based HTA evolution request."""
+
+    operations: List[HTAPatchOperation] = Field(default_factory=list)
+
+
 # --- Response model for Reflection Distillation ---
 class DistilledReflectionResponse(PydanticBaseModel):
     """
@@ -289,6 +371,29 @@ class DistilledReflectionResponse(PydanticBaseModel):
     )
 
 
+def _is_hta_node_path(path: JsonPath) -> bool:
+    """True for the HTA root (``hta_root`` or a dynamic ``root_...`` key) and its descendants."""
+    if not path or not isinstance(path[0], str):
+        return False
+    if path[0] != "hta_root" and not path[0].startswith("root_"):
+        return False
+    rest = path[1:]
+    return len(rest) % 2 == 0 and all(
+        rest[i] == "children" and isinstance(rest[i + 1], int)
+        for i in range(0, len(rest), 2)
+    )
+
+
+def _hta_node_model(response_model: Type[Any]) -> Type[PydanticBaseModel]:
+    """Returns the node model used by ``response_model.hta_root``."""
+    field = getattr(response_model, "model_fields", {}).get("hta_root")
+    candidates = (field.annotation,) + get_args(field.annotation) if field else ()
+    for candidate in candidates:
+        if isinstance(candidate, type) and issubclass(candidate, PydanticBaseModel):
+            return candidate
+    return HTANodeModel
+
+
 # ──────────────────── JSON Repair Function ────────────────────────
 # [fix_json function remains unchanged from previous version]
 def fix_json(text: str) -> str:
@@ -323,18 +428,12 @@ def fix_json(text: str) -> str:
 
 
 # ──────────────────── Prompt Templates ─────────────────────────────
-# [HTA_EVOLVE_PROMPT_TEMPLATE remains unchanged from previous version]
-HTA_EVOLVE_PROMPT_TEMPLATE = """
+# Static instructions come first so they can be cached as a prompt prefix;
+# the tree and the per-call text follow (see prompt_cache.PromptAssembler).
+HTA_EVOLVE_PROMPT_PREFIX = """
 You are an expert in Hierarchical Task Analysis (HTA).
 Your task is to evolve the provided HTA based on a specific goal or a summary of recent user reflections.
-
-**Current HTA Structure (JSON format):**
-```json
-{current_hta_json}
-```
-
-**Evolution Goal / Distilled Reflections:**
-{evolution_goal}
+The current HTA structure (JSON format) and the evolution goal / distilled reflections are given after these instructions.
 
 **Instructions:**
 1. Analyze the current HTA structure and the evolution goal/distilled reflections.
@@ -348,38 +447,102 @@ Your task is to evolve the provided HTA based on a specific goal or a summary of
 
 **Evolved HTA Structure (JSON format):**
 ```json
-{{
-  "hta_root": {{
+{
+  "hta_root": {
     "id": "...",
     "title": "...", // or "label" depending on your model
     "priority": 0.5, // Added/Corrected
     "magnitude": 5.0, // Added/Corrected
     "children": [ ... ] // Recursively nested structure with enriched nodes
-  }}
-}}
+  }
+}
+```
+"""
+
+HTA_EVOLVE_GOAL_TEMPLATE = """**Evolution Goal / Distilled Reflections:**
+{evolution_goal}"""
+
+# Patch-based evolution: the model sees one subtree in full plus an outline of
+# the rest, and answers with edit operations instead of a whole tree.
+HTA_PATCH_PROMPT_PREFIX = """
+You are an expert in Hierarchical Task Analysis (HTA).
+Your task is to evolve the user's HTA based on a specific goal or a summary of recent user reflections, by returning a small list of edit operations.
+After these instructions you receive an outline of the whole HTA (one line per node: id, title and status), the focus subtree in full (JSON), and the evolution goal / distilled reflections.
+
+**Instructions:**
+1. Analyze the focus subtree, the outline and the evolution goal/distilled reflections.
+2. Express every change as one of these operations, applied in order:
+   - {"op": "add", "node_id": "<new unique id>", "parent_id": "<existing id>", "position": <index or null>, "node": {"title": "...", "description": "...", "priority": 0.5, "magnitude": 5.0, "children": [...]}}
+   - {"op": "remove", "node_id": "<id>"} (removes the node and its subtree)
+   - {"op": "update", "node_id": "<id>", "fields": {<only the changed fields among title, description, priority, magnitude, is_milestone, depends_on, estimated_energy, estimated_time, status>}}
+   - {"op": "move", "node_id": "<id>", "parent_id": "<new parent id>", "position": <index or null>}
+3. Only reference ids that appear in the outline or the focus subtree, or that an earlier "add" created. Never remove the root.
+4. Prefer changing the focus subtree; touch the rest of the tree only when the goal clearly requires it.
+5. Generate unique IDs for new nodes (e.g., using a UUID format like `node_xxxxxxxx`). Use a `priority` between 0.0 and 1.0 (default 0.5) and a numeric `magnitude` (default 5.0).
+6. If no changes are necessary, return an empty list of operations.
+7. Output *only* a single JSON object with the key "operations".
+
+```json
+{
+  "operations": [ { "op": "update", "node_id": "...", "fields": { "priority": 0.8 } } ]
+}
 ```
 """
 
+HTA_PATCH_BODY_TEMPLATE = """**HTA Outline:**
+{outline}
+
+**Focus Subtree (JSON format):**
+```json
+{focus_subtree_json}
+```
+
+**Evolution Goal / Distilled Reflections:**
+{evolution_goal}"""
+
 # --- Prompt template for distilling reflections ---
-DISTILL_REFLECTIONS_PROMPT_TEMPLATE = """
+DISTILL_REFLECTIONS_PROMPT_PREFIX = """
 You are an AI assistant helping a user manage their personal growth plan using Hierarchical Task Analysis (HTA).
 The user has provided several reflections during their last work cycle (completing a batch of tasks).
 Your task is to distill these reflections into a concise summary (1-3 sentences) highlighting the key themes, insights, blockers, or desired changes relevant for potentially updating their HTA plan.
 Focus on information that would inform *structural* changes or significant re-prioritization in their plan. Ignore minor status updates or transient feelings unless they indicate a larger shift.
 
-**User Reflections (provided as a list):**
-{reflection_list_str}
-
 **Output:**
 Provide ONLY a single valid JSON object containing the distilled summary, using the key "distilled_text".
 
 ```json
-{{
+{
   "distilled_text": "Concise summary of key points relevant for HTA evolution..."
+}
+```
+"""
+
+DISTILL_REFLECTIONS_BODY_TEMPLATE = """**User Reflections (provided as a list):**
+{reflection_list_str}"""
+
+# --- Prompt template for packing several small requests into one call ---
+BATCH_PROMPT_TEMPLATE = """
+You will receive {count} independent requests. Answer each one on its own; do not let one request influence another.
+
+{requests}
+
+**Output:**
+Provide ONLY a single valid JSON object with the key "results": a list of exactly {count} answers, in the same order as the requests. Each answer must be the JSON object its request asks for.
+
+```json
+{{
+  "results": [ {{ ... answer 1 ... }}, {{ ... answer 2 ... }} ]
 }}
 ```
 """
 
+
+class BatchedResponse(PydanticBaseModel):
+    """Envelope for a multi-part response produced from BATCH_PROMPT_TEMPLATE."""
+
+    results: List[Any]
+
+
 # Generic type for validated Pydantic responses
 T = TypeVar("T", bound=PydanticBaseModel)
 
@@ -397,6 +560,8 @@ class LLMClient:
     - Optional JSON repair for slightly malformed outputs.
     - Selection between standard and advanced Gemini models.
     - Specific methods for HTA evolution and reflection distillation.
+    - Optional micro-batching of small calls (sentiment, codenames).
+    - Process-wide concurrency and per-model RPM/TPM limits with priorities.
     """
 
     # [Constants DEFAULT_SAFETY_SETTINGS, DEFAULT_RETRY_EXCEPTIONS remain unchanged]
@@ -426,14 +591,45 @@ class LLMClient:
 
     # [__init__ method remains unchanged]
     def __init__(
-        self, fail_max: int = 5, reset_timeout: int = 60, api_timeout: int = 180
+        self,
+        fail_max: int = 5,
+        reset_timeout: int = 60,
+        api_timeout: int = 180,
+        micro_batch_window_ms: Optional[int] = None,
+        micro_batch_max_size: Optional[int] = None,
+        rate_limiter: Optional[LLMRateLimiter] = None,
+        prompt_assembler: Optional[PromptAssembler] = None,
+        circuit_breakers: Optional["CircuitBreakerRegistry"] = None,
+        replay: Optional[LLMReplayProvider] = None,
     ):
         """
         Initializes the LLMClient, configures Google GenAI, and sets up
-        the circuit breaker.
+        the circuit breakers.
+
+        ``micro_batch_window_ms`` (default from settings; 0 disables) controls how
+        long small calls wait to be packed into a single multi-part request.
+        ``rate_limiter`` defaults to the process-wide limiter shared with
+        BaseLLMService, and ``prompt_assembler`` to the process-wide prompt
+        prefix cache. Each (model, operation) pair gets its own circuit
+        breaker from ``circuit_breakers``; by default they open when at
+        least ``fail_max`` calls are in the window and the failure or slow-call
+        rate (``LLM_CIRCUIT_*`` settings) is exceeded, and probe again after
+        ``reset_timeout`` seconds. ``replay`` (default: set by
+        ``LLM_REPLAY_MODE``) records model calls to a cassette, or answers
+        them from one without network access.
         """
         logger.debug("Initializing LLMClient...")
         self.api_timeout = api_timeout
+        self.micro_batch_window_ms = (
+            micro_batch_window_ms
+            if micro_batch_window_ms is not None
+            else _micro_batch_window_ms
+        )
+        self.micro_batch_max_size = micro_batch_max_size or _micro_batch_max_size
+        self._batchers: dict[str, MicroBatcher] = {}
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.prompt_assembler = prompt_assembler or get_prompt_assembler()
+        self.replay = replay or get_replay_provider()
 
         if not google_import_ok:
             raise ImportError("google.generativeai library is required but not found.")
@@ -471,23 +667,51 @@ class LLMClient:
                 f"Google GenAI configuration failed: {e}"
             ) from e
 
-        # --- Setup Circuit Breaker ---
-        if pybreaker_import_ok:
-            self.circuit_breaker = CircuitBreaker(
-                fail_max=fail_max, reset_timeout=reset_timeout
+        # --- Setup Circuit Breakers (one per model and operation) ---
+        if circuit_breakers is None:
+            # Imported here: importing forest_app.core loads modules that need this one
+            from forest_app.core.circuit_breaker import CircuitBreakerRegistry
+
+            circuit_breakers = CircuitBreakerRegistry.from_settings(
+                "LLM_CIRCUIT_",
+                name="llm",
+                failure_threshold=fail_max,
+                recovery_timeout=reset_timeout,
+                # Only transient provider errors say something about endpoint health
+                expected_exceptions=[*self.DEFAULT_RETRY_EXCEPTIONS, asyncio.TimeoutError],
+                # Running out of the caller's time budget is not the endpoint's fault
+                ignored_exceptions=[DeadlineExceededError],
             )
-            logger.info(
-                f"Circuit Breaker enabled (fail_max={fail_max}, reset_timeout={reset_timeout}s)."
-            )
-        else:
-            self.circuit_breaker = CircuitBreaker()  # Dummy
-            logger.warning("Circuit Breaker is disabled (pybreaker not installed).")
+        self.circuit_breakers = circuit_breakers
 
         logger.debug("LLMClient initialized successfully.")
 
     # --- Core Private Helper Methods ---
     # [_get_model_instance, _create_generation_config, _execute_gemini_request,
     #  _process_response, _parse_and_validate_json methods remain unchanged]
+    def _model_name(self, use_advanced_model: bool) -> str:
+        """Name of the model a request is sent to."""
+        if use_advanced_model and self.advanced_model_name:
+            return self.advanced_model_name
+        return self.standard_model_name
+
+    def _circuit_breaker(self, use_advanced_model: bool, operation: str):
+        """Circuit breaker guarding ``operation`` on the selected model."""
+        return self.circuit_breakers.get(self._model_name(use_advanced_model), operation)
+
+    def get_circuit_metrics(self) -> dict[str, dict[str, Any]]:
+        """Returns state, window rates and counters of every circuit breaker."""
+        return self.circuit_breakers.get_metrics()
+
+    def _model_for_request(
+        self, use_advanced_model: bool, cached_content: Any = None
+    ) -> genai.GenerativeModel:
+        """Returns the model instance, bound to a cached prompt prefix if given."""
+        if cached_content is not None:
+            model = self.prompt_assembler.backend.model_for(cached_content)
+            return self.replay.wrap(model) if self.replay else model
+        return self._get_model_instance(use_advanced_model)
+
     def _get_model_instance(self, use_advanced_model: bool) -> genai.GenerativeModel:
         """Selects and returns the configured Gemini model instance."""
         model_name_to_use = self.standard_model_name
@@ -505,7 +729,7 @@ class LLMClient:
             logger.debug("Using STANDARD Gemini model: %s", model_name_to_use)
 
         try:
-            return genai.GenerativeModel(model_name_to_use)
+            model = genai.GenerativeModel(model_name_to_use)
         except Exception as e:
             logger.exception(
                 f"Failed to instantiate GenerativeModel '{model_name_to_use}'"
@@ -513,6 +737,7 @@ class LLMClient:
             raise LLMConfigurationError(
                 f"Failed to create Gemini model instance '{model_name_to_use}': {e}"
             ) from e
+        return self.replay.wrap(model) if self.replay else model
 
     def _create_generation_config(
         self,
@@ -545,26 +770,53 @@ class LLMClient:
         safety_settings: dict,
         retries: int,
         retry_wait: int,
+        breaker: Any = None,
     ) -> GenerateContentResponse:
         """
         Executes the asynchronous call to the Gemini API with retry logic.
         Handles specific Google API exceptions and wraps them in LLMError types.
+        Every attempt is recorded by ``breaker`` (if given), timed from when
+        the rate limiter admits it; an open circuit stops the retries.
+        Attempt timeouts are capped by the request deadline, and no retry is
+        made once waiting for it would pass the deadline.
         """
+
+        def _deadline_too_close(retry_state) -> bool:
+            remaining = remaining_time()
+            return remaining is not None and remaining <= retry_wait
+
         retryer = AsyncRetrying(
-            stop=stop_after_attempt(retries + 1),
+            stop=stop_any(stop_after_attempt(retries + 1), _deadline_too_close),
             wait=wait_fixed(retry_wait),
             retry=retry_if_exception_type(self.DEFAULT_RETRY_EXCEPTIONS),
             reraise=True,
         )
+        prompt_tokens = estimate_tokens(prompt_parts)
+
+        async def _send() -> GenerateContentResponse:
+            attempt_timeout(self.api_timeout)  # Fail fast once the deadline has passed
+            # Checked before queueing, so an open circuit does not use up budget
+            with breaker.guard() if breaker is not None else nullcontext() as permit:
+                # Every attempt (including retries) counts against the limits
+                async with self.rate_limiter.limit(model.model_name, prompt_tokens):
+                    if permit is not None:
+                        permit.mark_started()
+                    return await model.generate_content_async(
+                        prompt_parts,
+                        generation_config=generation_config,
+                        safety_settings=safety_settings,
+                        request_options={"timeout": attempt_timeout(self.api_timeout)},
+                    )
+
         try:
-            response: GenerateContentResponse = await retryer(
-                model.generate_content_async,
-                prompt_parts,
-                generation_config=generation_config,
-                safety_settings=safety_settings,
-                request_options={"timeout": self.api_timeout},
-            )
+            response: GenerateContentResponse = await retryer(_send)
             return response
+        except CircuitBreakerError:
+            raise
+        except DeadlineExceededError as e:
+            raise LLMDeadlineExceededError(
+                f"No time left for the request to '{model.model_name}': {e}"
+            ) from e
         except RetryError as e:
             logger.error(f"LLM request failed after {retries} retries: {e.cause}")
             final_exception = e.cause
@@ -592,6 +844,8 @@ class LLMClient:
                     f"Unhandled retryable error after retries: {final_exception}"
                 ) from final_exception
         except google_api_exceptions.InvalidArgument as e:
+            if _is_prompt_cache_error(e):
+                raise LLMPromptCacheError(f"Cached prompt prefix rejected: {e}") from e
             if "API key not valid" in str(e):
                 raise LLMConfigurationError("Invalid Google API key provided.") from e
             if "model" in str(e).lower() and "not found" in str(e).lower():
@@ -609,14 +863,20 @@ class LLMClient:
                 f"Invalid argument passed to Google API: {e}"
             ) from e
         except google_api_exceptions.PermissionDenied as e:
+            if _is_prompt_cache_error(e):
+                raise LLMPromptCacheError(f"Cached prompt prefix rejected: {e}") from e
             raise LLMConfigurationError(f"Google API permission denied: {e}") from e
         except google_api_exceptions.NotFound as e:
+            if _is_prompt_cache_error(e):
+                raise LLMPromptCacheError(f"Cached prompt prefix not found: {e}") from e
             raise LLMConfigurationError(
                 f"Google API resource not found (check model name '{model.model_name}'): {e}"
             ) from e
         except google_api_exceptions.Unauthenticated as e:
             raise LLMConfigurationError(f"Google API authentication failed: {e}") from e
         except google_api_exceptions.GoogleAPIError as e:
+            if _is_prompt_cache_error(e):
+                raise LLMPromptCacheError(f"Cached prompt prefix rejected: {e}") from e
             logger.error(f"Unhandled Google API error: {type(e).__name__} - {e}")
             raise LLMError(f"A Google API error occurred: {e}") from e
         except Exception as e:
@@ -781,8 +1041,15 @@ class LLMClient:
                     data={"original": cleaned_text, "repaired": repaired_json_text},
                 ) from repair_error
 
+        return self._validate_response_data(data, response_model)
+
+    def _validate_response_data(self, data: Any, response_model: Type[T]) -> T:
+        """
+        Validates already-parsed JSON data against the Pydantic model,
+        normalizing HTA root keys first.
+        """
         # --- Special Handling for HTA Models ---
-        is_hta_target_model = False
+        is_hta_target_model = "hta_root" in getattr(response_model, "model_fields", {})
         if hta_models_import_ok:
             if (
                 response_model is HTAEvolveResponse
@@ -859,10 +1126,14 @@ class LLMClient:
         retries: int = 3,
         retry_wait: int = 2,
         attempt_json_repair: bool = True,
+        cached_content: Any = None,
+        operation: Optional[str] = None,
     ) -> T:
         """
         Generates content using the configured Gemini model, applying retry,
-        circuit breaking, and Pydantic validation.
+        circuit breaking, and Pydantic validation. ``cached_content`` is a
+        cached prompt prefix that ``prompt_parts`` continue. ``operation``
+        selects the circuit breaker (default: the response model's name).
         """
         if not google_import_ok:
             raise ImportError(
@@ -873,8 +1144,12 @@ class LLMClient:
                 "A 'response_model' was provided, but 'json_mode' is False. Set json_mode=True for validation."
             )
 
+        breaker = self._circuit_breaker(
+            use_advanced_model, operation or response_model.__name__
+        )
+
         async def _protected_generation():
-            model = self._get_model_instance(use_advanced_model)
+            model = self._model_for_request(use_advanced_model, cached_content)
             effective_temp = (
                 temperature if temperature is not None else self.default_temperature
             )
@@ -899,6 +1174,7 @@ class LLMClient:
                 safety_settings=safety_settings,
                 retries=retries,
                 retry_wait=retry_wait,
+                breaker=breaker,
             )
             response_text = self._process_response(raw_response)
             validated_response = self._parse_and_validate_json(
@@ -912,14 +1188,7 @@ class LLMClient:
             return validated_response
 
         try:
-            if (
-                pybreaker_import_ok
-                and isinstance(self.circuit_breaker, CircuitBreaker)
-                and not isinstance(self.circuit_breaker, type(CircuitBreaker()))
-            ):
-                return await self.circuit_breaker.call_async(_protected_generation)
-            else:
-                return await _protected_generation()
+            return await _protected_generation()
         except CircuitBreakerError as cbe:
             logger.error(f"LLM Circuit Breaker is OPEN. Request rejected: {cbe}")
             raise
@@ -931,6 +1200,239 @@ class LLMClient:
             )
             raise LLMError(f"Unexpected error during generation: {e}") from e
 
+    # --- Public Method: generate_stream ---
+    def generate_stream(
+        self,
+        prompt_parts: list[Union[str, ContentDict]],
+        response_model: Type[T],
+        *,
+        stream_field: Optional[str] = None,
+        use_advanced_model: bool = False,
+        temperature: Optional[float] = None,
+        top_p: float = 1.0,
+        top_k: int = 32,
+        max_output_tokens: int = 8192,
+        attempt_json_repair: bool = True,
+    ) -> LLMStream[T]:
+        """
+        Streams a structured response as it is generated.
+
+        Iterating the returned LLMStream yields text deltas (the decoded value
+        of ``stream_field`` if given, e.g. ``"narrative"``); afterwards
+        ``stream.result`` holds the validated ``response_model``.
+
+        Unlike ``generate`` there are no retries: once text has been forwarded
+        to the caller a request cannot be transparently replayed. The rate
+        limiter slot is held until the stream finishes.
+        """
+        if not google_import_ok:
+            raise ImportError(
+                "Cannot generate content, google.generativeai library not available."
+            )
+
+        def _parse(text: str) -> T:
+            return self._parse_and_validate_json(
+                raw_text=text,
+                response_model=response_model,
+                attempt_repair=attempt_json_repair,
+            )
+
+        chunks = self._stream_chunks(
+            prompt_parts,
+            response_model,
+            use_advanced_model=use_advanced_model,
+            temperature=temperature,
+            top_p=top_p,
+            top_k=top_k,
+            max_output_tokens=max_output_tokens,
+        )
+        return LLMStream(chunks, _parse, stream_field=stream_field)
+
+    async def _stream_chunks(
+        self,
+        prompt_parts: list[Union[str, ContentDict]],
+        response_model: Type[Any],
+        *,
+        use_advanced_model: bool = False,
+        temperature: Optional[float] = None,
+        top_p: float = 1.0,
+        top_k: int = 32,
+        max_output_tokens: int = 8192,
+        cached_content: Any = None,
+        operation: Optional[str] = None,
+    ):
+        """
+        Yields the raw text chunks of a streamed JSON-mode Gemini response.
+
+        The whole stream counts as one call for the circuit breaker of
+        ``operation`` (default: the response model's name).
+        """
+        breaker = self._circuit_breaker(
+            use_advanced_model, operation or response_model.__name__
+        )
+        model = self._model_for_request(use_advanced_model, cached_content)
+        gen_config = self._create_generation_config(
+            temperature=(
+                temperature if temperature is not None else self.default_temperature
+            ),
+            top_p=top_p,
+            top_k=top_k,
+            max_output_tokens=max_output_tokens,
+            json_mode=True,
+        )
+        logger.info(
+            f"Streaming request to Gemini ({model.model_name}) -> {response_model.__name__}."
+        )
+        try:
+            attempt_timeout(self.api_timeout)
+        except DeadlineExceededError as e:
+            raise LLMDeadlineExceededError(f"No time left to stream: {e}") from e
+        with breaker.guard() as permit:
+            async with self.rate_limiter.limit(
+                model.model_name, estimate_tokens(prompt_parts)
+            ):
+                permit.mark_started()
+                streamed = False
+                try:
+                    response = await model.generate_content_async(
+                        prompt_parts,
+                        generation_config=gen_config,
+                        safety_settings=self.DEFAULT_SAFETY_SETTINGS,
+                        stream=True,
+                        # Bounds the whole stream; capped by the request deadline
+                        request_options={"timeout": attempt_timeout(self.api_timeout)},
+                    )
+                    async for chunk in response:
+                        streamed = True
+                        yield self._chunk_text(chunk)
+                except LLMError:
+                    raise
+                except DeadlineExceededError as e:
+                    raise LLMDeadlineExceededError(f"No time left to stream: {e}") from e
+                except google_api_exceptions.GoogleAPIError as e:
+                    # Only safe to resend without the cache before any text went out
+                    if not streamed and _is_prompt_cache_error(e):
+                        raise LLMPromptCacheError(f"Cached prompt prefix rejected: {e}") from e
+                    raise LLMConnectionError(f"Streaming API call failed: {e}") from e
+                except Exception as e:
+                    logger.exception("Unexpected error during streamed Gemini call.")
+                    raise LLMError(f"Unexpected error while streaming: {e}") from e
+
+    async def _generate_hta_streaming(
+        self,
+        prompt_parts: list[Union[str, ContentDict]],
+        response_model: Type[T],
+        *,
+        on_node: Optional[Callable[[Any, JsonPath], Any]] = None,
+        use_advanced_model: bool = False,
+        temperature: Optional[float] = None,
+        max_output_tokens: int = 8192,
+        retries: int = 3,
+        retry_wait: int = 2,
+        attempt_json_repair: bool = True,
+        cached_content: Any = None,
+        operation: str = "hta_generation",
+    ) -> T:
+        """
+        Generates an HTA tree while parsing the streamed JSON incrementally.
+
+        Each node is validated against the model of ``response_model.hta_root``
+        as soon as its subtree closes and replaces the raw dict, so the final
+        model is assembled from already-validated nodes rather than re-parsed. ``on_node(node, path)``
+        (sync or async) is called for every validated node, children before
+        parents, while generation is still running. Connection errors are
+        retried only until the first node has been handed out. A truncated or
+        malformed response is repaired unless ``attempt_json_repair`` is False.
+        """
+        node_model = _hta_node_model(response_model)
+        validated: List[tuple] = []
+        invalid_nodes = 0
+
+        def _on_object(path: JsonPath, obj: dict) -> Any:
+            nonlocal invalid_nodes
+            if not _is_hta_node_path(path):
+                return obj
+            try:
+                node = node_model.model_validate(obj)
+            except PydanticValidationError as e:
+                # Left as a dict; the final validation reports it in context
+                invalid_nodes += 1
+                logger.warning(f"Streamed HTA node at {path} failed validation: {e}")
+                return obj
+            validated.append((node, path))
+            return node
+
+        emitted: set = set()
+
+        async def _emit_ready() -> None:
+            while validated:
+                node, path = validated.pop(0)
+                if on_node is None or path in emitted:
+                    continue
+                emitted.add(path)
+                try:
+                    result = on_node(node, path)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    logger.error(f"HTA on_node callback failed for {path}: {e}")
+
+        for attempt in range(retries + 1):
+            parser = IncrementalJsonParser(_on_object, repair=attempt_json_repair)
+            validated.clear()
+            try:
+                async for chunk in self._stream_chunks(
+                    prompt_parts,
+                    response_model,
+                    use_advanced_model=use_advanced_model,
+                    temperature=temperature,
+                    max_output_tokens=max_output_tokens,
+                    cached_content=cached_content,
+                    operation=operation,
+                ):
+                    parser.feed(chunk)
+                    await _emit_ready()
+                break
+            except LLMConnectionError as e:
+                if emitted or attempt == retries:
+                    raise
+                logger.warning(
+                    f"Streamed HTA request failed ({e}); retry {attempt + 1}/{retries}."
+                )
+                await asyncio.sleep(retry_wait)
+
+        try:
+            data = parser.close()
+        except JsonStreamError as e:
+            raise LLMValidationError(
+                f"Invalid JSON in streamed HTA response: {e}", data=parser.text
+            ) from e
+        await _emit_ready()
+        if parser.repaired:
+            logger.info("Streamed HTA response required tail repair.")
+        if invalid_nodes:
+            logger.warning(f"{invalid_nodes} streamed HTA node(s) failed validation.")
+        return self._validate_response_data(data, response_model)
+
+    @staticmethod
+    def _chunk_text(chunk: Any) -> str:
+        """Extracts the text of one streamed chunk, raising if it was blocked."""
+        try:
+            return chunk.text or ""
+        except ValueError as e:
+            feedback = getattr(chunk, "prompt_feedback", None)
+            reason = getattr(feedback, "block_reason", None)
+            if reason:
+                raise LLMGenerationError(
+                    f"Gemini request blocked by API. Reason: {getattr(reason, 'name', reason)}",
+                    raw_response=chunk,
+                ) from e
+            if not getattr(chunk, "candidates", None):
+                return ""
+            raise LLMGenerationError(
+                f"Streamed chunk has no text: {e}", raw_response=chunk
+            ) from e
+
     # --- Public Method: request_hta_evolution ---
     # [request_hta_evolution method remains unchanged]
     async def request_hta_evolution(
@@ -943,9 +1445,18 @@ class LLMClient:
         retries: int = 3,
         retry_wait: int = 2,
         attempt_json_repair: bool = True,
+        on_node: Optional[Callable[[Any, JsonPath], Any]] = None,
+        tree_key: Optional[str] = None,
     ) -> HTAEvolveResponse:
         """
         Requests the LLM to evolve a given HTA structure based on a goal.
+
+        The response is parsed while it streams; ``on_node`` receives each
+        validated node as soon as its subtree is complete. ``tree_key``
+        identifies the tree across calls so that, while its cached prompt
+        prefix is alive, only the nodes changed since are sent. With
+        ``attempt_json_repair`` a truncated or malformed response is repaired
+        instead of raising ``LLMValidationError``.
         """
         if not hta_models_import_ok:
             raise LLMConfigurationError(
@@ -954,35 +1465,122 @@ class LLMClient:
         logger.info(f"Requesting HTA evolution. Goal: '{evolution_goal[:50]}...'")
         try:
             try:
-                json.loads(current_hta_json)
+                current_hta = json.loads(current_hta_json)
             except json.JSONDecodeError as json_err:
                 logger.error(f"Invalid JSON provided for current_hta_json: {json_err}")
                 raise ValueError(
                     "The provided current_hta_json is not valid JSON."
                 ) from json_err
-            prompt = HTA_EVOLVE_PROMPT_TEMPLATE.format(
-                current_hta_json=current_hta_json, evolution_goal=evolution_goal
+            tree_section = TREE_SECTION_TEMPLATE.format(tree_json=current_hta_json)
+            body = HTA_EVOLVE_GOAL_TEMPLATE.format(evolution_goal=evolution_goal)
+            is_tree = isinstance(current_hta, dict)
+            assembled = self.prompt_assembler.assemble(
+                "hta_evolution",
+                self._model_name(use_advanced_model),
+                HTA_EVOLVE_PROMPT_PREFIX,
+                body if is_tree else f"{tree_section}\n\n{body}",
+                tree=current_hta if is_tree else None,
+                tree_key=tree_key if is_tree else None,
+                baseline_parts=[HTA_EVOLVE_PROMPT_PREFIX, tree_section, body],
             )
-            prompt_parts = [prompt]
         except Exception as e:
             logger.exception("Failed to format HTA evolution prompt.")
             raise LLMConfigurationError(
                 f"Error formatting HTA evolution prompt: {e}"
             ) from e
 
-        evolved_hta_response = await self.generate(
-            prompt_parts=prompt_parts,
-            response_model=HTAEvolveResponse,
-            use_advanced_model=use_advanced_model,
-            temperature=temperature,
-            max_output_tokens=8192,
-            retries=retries,
-            retry_wait=retry_wait,
-            attempt_json_repair=attempt_json_repair,
-            json_mode=True,
-        )
+        async def _evolve(prompt_parts, cached_content):
+            return await self._generate_hta_streaming(
+                prompt_parts,
+                HTAEvolveResponse,
+                on_node=on_node,
+                use_advanced_model=use_advanced_model,
+                temperature=temperature,
+                max_output_tokens=8192,
+                retries=retries,
+                retry_wait=retry_wait,
+                attempt_json_repair=attempt_json_repair,
+                cached_content=cached_content,
+                operation="hta_evolution",
+            )
+
+        evolved_hta_response = await self._call_with_prompt_cache(assembled, _evolve)
         return evolved_hta_response
 
+    async def _call_with_prompt_cache(
+        self,
+        assembled: AssembledPrompt,
+        call: Callable[[List[str], Any], Any],
+    ) -> Any:
+        """
+        Runs ``call(prompt_parts, cached_content)`` for an assembled prompt.
+
+        If the provider rejects the cached prefix (e.g. it expired early), the
+        handle is dropped and the complete prompt is sent once without it.
+        Only ``LLMPromptCacheError`` does this: it is raised before any
+        response text, so streamed nodes are never delivered twice. Other
+        errors propagate unchanged.
+        """
+        if assembled.cached_content is None:
+            return await call(assembled.prompt_parts, None)
+        try:
+            return await call(assembled.prompt_parts, assembled.cached_content)
+        except LLMPromptCacheError as e:
+            logger.warning(
+                f"Request on cached prompt prefix failed ({e}); resending the full prompt."
+            )
+            self.prompt_assembler.discard(assembled)
+            return await call(assembled.full_parts, None)
+
+    async def request_hta_patch(
+        self,
+        outline: str,
+        focus_subtree_json: str,
+        evolution_goal: str,
+        *,
+        use_advanced_model: bool = False,
+        temperature: Optional[float] = 0.4,
+        max_output_tokens: int = 2048,
+        retries: int = 3,
+        retry_wait: int = 2,
+        attempt_json_repair: bool = True,
+    ) -> HTAPatchResponse:
+        """
+        Requests a patch (add/remove/update/move operations) that evolves an HTA.
+
+        Only the focus subtree is sent in full, with a compact outline of the
+        rest, and the answer contains only the changes, so prompt and output
+        size stay bounded however large the tree grows.
+        """
+        logger.info(f"Requesting HTA patch. Goal: '{evolution_goal[:50]}...'")
+        assembled = self.prompt_assembler.assemble(
+            "hta_patch",
+            self._model_name(use_advanced_model),
+            HTA_PATCH_PROMPT_PREFIX,
+            HTA_PATCH_BODY_TEMPLATE.format(
+                outline=outline,
+                focus_subtree_json=focus_subtree_json,
+                evolution_goal=evolution_goal,
+            ),
+        )
+
+        async def _patch(prompt_parts, cached_content):
+            return await self.generate(
+                prompt_parts=prompt_parts,
+                response_model=HTAPatchResponse,
+                use_advanced_model=use_advanced_model,
+                temperature=temperature,
+                max_output_tokens=max_output_tokens,
+                retries=retries,
+                retry_wait=retry_wait,
+                attempt_json_repair=attempt_json_repair,
+                json_mode=True,
+                cached_content=cached_content,
+                operation="hta_patch",
+            )
+
+        return await self._call_with_prompt_cache(assembled, _patch)
+
     # --- MODIFIED: Added Method for Reflection Distillation ---
     async def distill_reflections(
         self,
@@ -1023,20 +1621,24 @@ class LLMClient:
             logger.warning("Filtered reflections list is empty.")
             return None  # Nothing to distill
 
-        # 1. Format the prompt
+        # 1. Format the prompt (the static instructions may be a cached prefix)
         try:
-            prompt = DISTILL_REFLECTIONS_PROMPT_TEMPLATE.format(
-                reflection_list_str=reflection_list_str
+            assembled = self.prompt_assembler.assemble(
+                "distill_reflections",
+                self._model_name(use_advanced_model),
+                DISTILL_REFLECTIONS_PROMPT_PREFIX,
+                DISTILL_REFLECTIONS_BODY_TEMPLATE.format(
+                    reflection_list_str=reflection_list_str
+                ),
             )
-            prompt_parts = [prompt]
         except Exception:
             logger.exception("Failed to format reflection distillation prompt.")
             # Return None or raise specific error? Returning None for now.
             return None
 
         # 2. Call the generic generate method
-        try:
-            distilled_response = await self.generate(
+        async def _distill(prompt_parts, cached_content):
+            return await self.generate(
                 prompt_parts=prompt_parts,
                 response_model=DistilledReflectionResponse,  # Use the new response model
                 use_advanced_model=use_advanced_model,
@@ -1046,7 +1648,12 @@ class LLMClient:
                 retry_wait=retry_wait,
                 attempt_json_repair=attempt_json_repair,
                 json_mode=True,  # Required for Pydantic validation
+                cached_content=cached_content,
+                operation="distill_reflections",
             )
+
+        try:
+            distilled_response = await self._call_with_prompt_cache(assembled, _distill)
             logger.info("Successfully received distilled reflection response from LLM.")
             return distilled_response
         except LLMError as e:
@@ -1060,8 +1667,109 @@ class LLMClient:
 
     # --- END MODIFIED ---
 
+    # --- Micro-batching of small requests ---
+    async def generate_batch(
+        self,
+        prompts: List[str],
+        response_model: Type[T],
+        *,
+        temperature: Optional[float] = None,
+        max_output_tokens: int = 8192,
+    ) -> List[T]:
+        """
+        Answers several independent prompts with a single request.
+
+        Args:
+            prompts: Prompts that each expect a ``response_model`` JSON object.
+            response_model: Model every answer is validated against.
+            temperature: Generation temperature.
+            max_output_tokens: Token budget for the combined answer.
+
+        Returns:
+            One validated answer per prompt, in order.
+
+        Raises:
+            LLMValidationError: If the number of answers does not match.
+        """
+        requests = "\n\n".join(
+            f"### Request {i}\n{prompt.strip()}" for i, prompt in enumerate(prompts, 1)
+        )
+        batch_prompt = BATCH_PROMPT_TEMPLATE.format(
+            count=len(prompts), requests=requests
+        )
+        batched = await self.generate(
+            [batch_prompt],
+            BatchedResponse,
+            use_advanced_model=False,
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+            operation="batch",
+        )
+        if len(batched.results) != len(prompts):
+            raise LLMValidationError(
+                f"Expected {len(prompts)} batched answers, got {len(batched.results)}",
+                data=batched.results,
+            )
+        try:
+            return [response_model.model_validate(item) for item in batched.results]
+        except PydanticValidationError as e:
+            raise LLMValidationError(
+                f"Batched answer failed validation against {response_model.__name__}",
+                validation_error=e,
+                data=batched.results,
+            ) from e
+
+    def _get_batcher(
+        self, name: str, response_model: Type[T], temperature: float
+    ) -> Optional[MicroBatcher]:
+        """Returns the micro-batcher for a small-call type, or None if disabled."""
+        if self.micro_batch_window_ms <= 0:
+            return None
+        batcher = self._batchers.get(name)
+        if batcher is None:
+            batcher = MicroBatcher(
+                batch_fn=lambda prompts: self.generate_batch(
+                    prompts, response_model, temperature=temperature
+                ),
+                single_fn=lambda prompt: self.generate(
+                    [prompt],
+                    response_model,
+                    use_advanced_model=False,
+                    temperature=temperature,
+                    operation=name,
+                ),
+                window_seconds=self.micro_batch_window_ms / 1000.0,
+                max_batch_size=self.micro_batch_max_size,
+                name=name,
+            )
+            self._batchers[name] = batcher
+        return batcher
+
+    async def _generate_small(
+        self, name: str, prompt: str, response_model: Type[T], temperature: float
+    ) -> T:
+        """Generates a small response, micro-batched when enabled."""
+        batcher = self._get_batcher(name, response_model, temperature)
+        if batcher is not None:
+            try:
+                return await batcher.submit(prompt)
+            except DeadlineExceededError as e:
+                raise LLMDeadlineExceededError(
+                    f"Gave up waiting for the batched {name} request: {e}"
+                ) from e
+        return await self.generate(
+            [prompt],
+            response_model,
+            use_advanced_model=False,
+            temperature=temperature,
+            operation=name,
+        )
+
+    def get_batching_metrics(self) -> dict[str, dict[str, int]]:
+        """Returns micro-batching counters (including calls saved) per call type."""
+        return {name: b.get_metrics() for name, b in self._batchers.items()}
+
     # --- Other existing methods (get_sentiment, get_snapshot_codename, etc.) ---
-    # [Implementations remain unchanged from previous version]
     async def get_sentiment(self, text: str) -> Optional[SentimentResponseModel]:
         logger.info("Requesting sentiment analysis.")
         prompt = f"""
@@ -1069,11 +1777,8 @@ Analyze the sentiment of the following text. Output as JSON: {{"sentiment_score"
 Text: {text}
 JSON Output: ```json {{ ... json ... }} ```"""
         try:
-            return await self.generate(
-                [prompt],
-                SentimentResponseModel,
-                use_advanced_model=False,
-                temperature=0.2,
+            return await self._generate_small(
+                "sentiment", prompt, SentimentResponseModel, temperature=0.2
             )
         except LLMError as e:
             logger.error(f"LLMError: {e}")
@@ -1088,11 +1793,8 @@ Generate a short (2-3 words) codename for a project state based on context. Exam
 Context: {context}
 JSON Output: ```json {{ ... json ... }} ```"""
         try:
-            return await self.generate(
-                [prompt],
-                SnapshotCodenameResponse,
-                use_advanced_model=False,
-                temperature=0.8,
+            return await self._generate_small(
+                "codename", prompt, SnapshotCodenameResponse, temperature=0.8
             )
         except LLMError as e:
             logger.error(f"LLMError: {e}")
@@ -1111,12 +1813,21 @@ JSON Output: ```json {{ ... json ... }} ```"""
                 use_advanced_model=False,
                 temperature=0.7,
                 max_output_tokens=1024,
+                operation="narrative",
             )
         except LLMError as e:
             logger.error(f"LLMError: {e}")
             return None
 
-    async def generate_hta_tree(self, context: str) -> Optional[HTAResponseModel]:
+    async def generate_hta_tree(
+        self,
+        context: str,
+        on_node: Optional[Callable[[Any, JsonPath], Any]] = None,
+    ) -> Optional[HTAResponseModel]:
+        """
+        Generates an initial HTA tree, streaming and validating nodes as they
+        complete (see ``_generate_hta_streaming`` for ``on_node``).
+        """
         logger.info("Requesting initial HTA generation.")
         prompt = f"""
 Create an HTA tree for the goal in the context. Output as JSON with key "hta_root". Nodes need "id", "label", "children". Optional: "description", "priority", "magnitude", "depends_on", "is_milestone".
@@ -1126,9 +1837,10 @@ JSON Output: ```json {{"hta_root": {{ ... tree ... }} }} ```"""
         if not hta_models_import_ok:
             raise LLMConfigurationError("HTA models not imported.")
         try:
-            return await self.generate(
+            return await self._generate_hta_streaming(
                 [prompt],
                 HTAResponseModel,
+                on_node=on_node,
                 use_advanced_model=True,
                 temperature=0.6,
                 max_output_tokens=8192,
@@ -1258,8 +1970,6 @@ async def example_usage():
 
 
 if __name__ == "__main__":
-    import asyncio
-
     # [Dummy Settings Setup remains unchanged]
     if not settings_import_successful:
         logger.warning(
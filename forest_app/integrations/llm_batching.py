@@ -0,0 +1,174 @@
+"""
+Micro-batching for small, independent LLM calls.
+
+Requests such as sentiment analysis or snapshot codenames are cheap to answer
+but each one costs a full provider round-trip. The MicroBatcher collects such
+requests for a short window and sends them as one multi-part request, then
+hands each caller its own answer. Identical prompts inside a window are sent
+only once.
+
+If the batched call fails or returns the wrong number of answers, every item
+falls back to an individual call so callers never see a batching artefact.
+
+A batch serves several requests, so it runs without any one request's
+deadline; each caller waits for its answer within its own deadline instead.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from forest_app.integrations.deadline import no_deadline, wait_within_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Collects prompts for a short window and resolves them with one call."""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[str]], Awaitable[List[Any]]],
+        single_fn: Optional[Callable[[str], Awaitable[Any]]] = None,
+        window_seconds: float = 0.02,
+        max_batch_size: int = 8,
+        name: str = "batch",
+    ):
+        """
+        Initialize the micro-batcher.
+
+        Args:
+            batch_fn: Resolves a list of prompts with one provider call and
+                returns one answer per prompt, in order
+            single_fn: Resolves one prompt on its own (used for batches of one
+                and as the fallback when a batched call fails)
+            window_seconds: How long to wait for more prompts after the first
+            max_batch_size: Flush immediately once this many prompts are pending
+            name: Name used in logs and metrics
+        """
+        self.batch_fn = batch_fn
+        self.single_fn = single_fn
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self.name = name
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Running flushes; the event loop keeps only weak references to tasks
+        self._flushes: Set[asyncio.Task] = set()
+        self._metrics = {
+            "submitted": 0,
+            "provider_calls": 0,
+            "batches": 0,
+            "deduplicated": 0,
+            "fallbacks": 0,
+        }
+
+    async def submit(self, prompt: str) -> Any:
+        """
+        Queue a prompt and wait for its answer.
+
+        Args:
+            prompt: The prompt to resolve
+
+        Returns:
+            The answer for this prompt
+
+        Raises:
+            DeadlineExceededError: If the request deadline passes first
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((prompt, future))
+        self._metrics["submitted"] += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._schedule_flush(0)
+        elif self._flush_handle is None:
+            self._schedule_flush(self.window_seconds)
+
+        try:
+            return await wait_within_deadline(future)
+        except BaseException:
+            future.cancel()  # The flush skips prompts nobody waits for
+            raise
+
+    def _schedule_flush(self, delay: float) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        loop = asyncio.get_running_loop()
+        # call_later runs the flush in a copy of this caller's context
+        with no_deadline():
+            self._flush_handle = loop.call_later(delay, self._start_flush)
+
+    def _start_flush(self) -> None:
+        flush = asyncio.ensure_future(self._flush())
+        self._flushes.add(flush)
+        flush.add_done_callback(self._flushes.discard)
+
+    async def _flush(self) -> None:
+        """Resolve everything pending with as few provider calls as possible."""
+        self._flush_handle = None
+        batch, self._pending = self._pending, []
+        # Skip prompts whose callers have given up
+        batch = [(prompt, future) for prompt, future in batch if not future.done()]
+        if not batch:
+            return
+
+        # Identical prompts in the same window share one answer
+        waiters: Dict[str, List[asyncio.Future]] = {}
+        for prompt, future in batch:
+            waiters.setdefault(prompt, []).append(future)
+        prompts = list(waiters)
+        self._metrics["deduplicated"] += len(batch) - len(prompts)
+
+        results = await self._resolve(prompts)
+
+        for prompt, result in zip(prompts, results):
+            for future in waiters[prompt]:
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def _resolve(self, prompts: List[str]) -> List[Any]:
+        """Return one result (or exception) per prompt."""
+        if len(prompts) == 1 and self.single_fn is not None:
+            return await self._resolve_individually(prompts)
+
+        self._metrics["batches"] += 1
+        self._metrics["provider_calls"] += 1
+        try:
+            results = await self.batch_fn(prompts)
+            if not isinstance(results, list) or len(results) != len(prompts):
+                raise ValueError(
+                    f"Batched call returned {len(results) if isinstance(results, list) else 'no'}"
+                    f" results for {len(prompts)} prompts"
+                )
+            logger.debug("%s: resolved %d prompts in one call", self.name, len(prompts))
+            return results
+        except Exception as e:
+            if self.single_fn is None:
+                return [e] * len(prompts)
+            logger.warning(
+                "%s: batched call failed (%s); falling back to individual calls",
+                self.name,
+                e,
+            )
+            self._metrics["fallbacks"] += 1
+            return await self._resolve_individually(prompts)
+
+    async def _resolve_individually(self, prompts: List[str]) -> List[Any]:
+        self._metrics["provider_calls"] += len(prompts)
+        return await asyncio.gather(
+            *(self.single_fn(prompt) for prompt in prompts), return_exceptions=True
+        )
+
+    def get_metrics(self) -> Dict[str, int]:
+        """Return batching counters, including provider calls saved."""
+        return dict(
+            self._metrics,
+            saved_calls=self._metrics["submitted"] - self._metrics["provider_calls"],
+        )
@@ -0,0 +1,232 @@
+"""
+LLM Response Cache for Forest OS.
+
+An LRU cache with per-entry TTL used by BaseLLMService to avoid repeating
+identical LLM calls. Entries are keyed by a hash of everything that determines
+the response (model, operation, normalized prompt, generation parameters and
+response schema), and the cache is bounded by both entry count and approximate
+byte size rather than by prompt length.
+
+The cache can optionally be backed by the shared CacheService so that several
+workers reuse each other's responses. Hit rates are tracked per operation.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import re
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse insignificant whitespace so trivially different prompts share a key."""
+    return _WHITESPACE_RE.sub(" ", prompt).strip()
+
+
+def build_cache_key(
+    model: str,
+    operation: str,
+    prompt: str,
+    params: Optional[Dict[str, Any]] = None,
+    response_schema: Optional[Any] = None,
+) -> str:
+    """
+    Build a stable cache key for an LLM request.
+
+    Args:
+        model: Model name the request is sent to
+        operation: Service operation (e.g. "generate_text")
+        prompt: The prompt text
+        params: Generation parameters that affect the output
+        response_schema: JSON schema (or model name) the response must match
+
+    Returns:
+        Hex digest identifying the request
+    """
+    payload = json.dumps(
+        [model, operation, normalize_prompt(prompt), params or {}, response_schema],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _estimate_size(value: Any) -> int:
+    """Approximate the memory cost of a cached value in bytes."""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if hasattr(value, "model_dump_json"):
+        return len(value.model_dump_json())
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+def copy_cached_value(value: Any) -> Any:
+    """Return a copy of mutable cached values so callers cannot alter the cache."""
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    if hasattr(value, "model_copy"):
+        return value.model_copy(deep=True)
+    return value
+
+
+class LLMResponseCache:
+    """
+    Size-bounded LRU cache with TTL for LLM responses.
+
+    Local lookups are synchronous-cheap; the optional shared backend is only
+    consulted on a local miss.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 16 * 1024 * 1024,
+        ttl_seconds: float = 3600.0,
+        shared_backend: Optional[Any] = None,
+        namespace: str = "llm:",
+    ):
+        """
+        Initialize the response cache.
+
+        Args:
+            max_entries: Maximum number of cached responses
+            max_bytes: Maximum approximate size of all cached responses
+            ttl_seconds: Time-to-live for each entry
+            shared_backend: Optional CacheService used as a second level
+            namespace: Key prefix used in the shared backend
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.shared_backend = shared_backend
+        self.namespace = namespace
+
+        # key -> (value, expires_at, size)
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._metrics: Dict[str, Dict[str, int]] = {}
+
+    def _record(self, operation: str, event: str) -> None:
+        stats = self._metrics.setdefault(
+            operation,
+            {"hits": 0, "misses": 0, "shared_hits": 0, "evictions": 0, "expirations": 0},
+        )
+        stats[event] += 1
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._total_bytes -= size
+
+    def _store_local(self, key: str, value: Any, operation: str, ttl: float) -> None:
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            logger.debug("Response for %s too large to cache (%d bytes)", operation, size)
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, time.monotonic() + ttl, size)
+        self._total_bytes += size
+
+        # Evict least recently used entries until within both limits
+        while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._record(operation, "evictions")
+
+    async def get(self, key: str, operation: str) -> Optional[Any]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Key from ``build_cache_key``
+            operation: Operation name for metrics
+
+        Returns:
+            Cached value or None on a miss
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at, _ = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._record(operation, "hits")
+                return copy_cached_value(value)
+            self._remove(key)
+            self._record(operation, "expirations")
+
+        if self.shared_backend is not None:
+            try:
+                value = await self.shared_backend.get(f"{self.namespace}{key}")
+            except Exception as e:
+                logger.warning("Shared LLM cache lookup failed: %s", e)
+                value = None
+            if value is not None:
+                self._store_local(key, value, operation, self.ttl_seconds)
+                self._record(operation, "shared_hits")
+                return copy_cached_value(value)
+
+        self._record(operation, "misses")
+        return None
+
+    async def set(
+        self, key: str, value: Any, operation: str, ttl: Optional[float] = None
+    ) -> None:
+        """
+        Store a response.
+
+        Args:
+            key: Key from ``build_cache_key``
+            value: Response to cache
+            operation: Operation name for metrics
+            ttl: Optional TTL override in seconds
+        """
+        ttl = ttl if ttl is not None else self.ttl_seconds
+        self._store_local(key, value, operation, ttl)
+
+        if self.shared_backend is not None:
+            try:
+                await self.shared_backend.set(f"{self.namespace}{key}", value, int(ttl))
+            except Exception as e:
+                logger.warning("Shared LLM cache store failed: %s", e)
+
+    def clear(self) -> None:
+        """Drop all local entries (shared entries expire on their own)."""
+        self._entries.clear()
+        self._total_bytes = 0
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Report cache usage and per-operation hit rates.
+
+        Returns:
+            Dictionary with size information and per-operation counters
+        """
+        operations = {}
+        for operation, stats in self._metrics.items():
+            lookups = stats["hits"] + stats["shared_hits"] + stats["misses"]
+            operations[operation] = dict(
+                stats,
+                hit_rate=(stats["hits"] + stats["shared_hits"]) / lookups if lookups else 0.0,
+            )
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "operations": operations,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
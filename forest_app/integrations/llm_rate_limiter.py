@@ -0,0 +1,322 @@
+"""
+Process-wide admission control for outbound LLM requests.
+
+Every provider call made through LLMClient or BaseLLMService first acquires a
+slot from the LLMRateLimiter:
+
+- a global concurrency limit caps the number of requests on the wire;
+- a token bucket per model enforces requests-per-minute (RPM) and
+  tokens-per-minute (TPM) budgets, with tokens estimated from prompt size;
+- waiters are admitted in priority order, so interactive calls (e.g. reflection
+  processing) go ahead of background work (node expansion, discovery journey).
+
+Priorities are carried in a context variable so that background code paths can
+mark all LLM calls they make without threading a parameter through every layer:
+
+    with llm_priority(LLMPriority.BACKGROUND):
+        await service.generate_text(...)
+
+Queue depth and wait times are exposed through ``get_metrics`` for monitoring.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LLMPriority(IntEnum):
+    """Admission priority for LLM calls (lower values are admitted first)."""
+
+    INTERACTIVE = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+
+_current_priority: contextvars.ContextVar[LLMPriority] = contextvars.ContextVar(
+    "llm_priority", default=LLMPriority.NORMAL
+)
+
+
+@contextmanager
+def llm_priority(priority: LLMPriority):
+    """Run the enclosed LLM calls with the given admission priority."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_llm_priority() -> LLMPriority:
+    """Return the priority of the current context."""
+    return _current_priority.get()
+
+
+def estimate_tokens(parts: Iterable[Any]) -> int:
+    """
+    Roughly estimate the token count of a prompt.
+
+    Uses the common ~4 characters per token heuristic, which is close enough
+    for budgeting without paying for a real tokenizer on every call.
+
+    Args:
+        parts: Prompt strings (non-string parts are counted by their str())
+
+    Returns:
+        Estimated number of tokens (at least 1)
+    """
+    chars = sum(len(p if isinstance(p, str) else str(p)) for p in parts)
+    return max(1, chars // 4)
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``per_minute / 60`` per second."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 if available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)  # oversized requests wait for a full bucket
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    model: str = field(compare=False)
+    tokens: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+class LLMRateLimiter:
+    """Global concurrency limit plus per-model RPM/TPM token buckets."""
+
+    def __init__(
+        self,
+        max_concurrency: int = 0,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        model_limits: Optional[Dict[str, Dict[str, int]]] = None,
+    ):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            max_concurrency: Maximum requests in flight across all models (0 = unlimited)
+            requests_per_minute: Default RPM budget per model (0 = unlimited)
+            tokens_per_minute: Default TPM budget per model (0 = unlimited)
+            model_limits: Per-model overrides, e.g.
+                ``{"gemini-1.5-pro-latest": {"rpm": 2, "tpm": 32000}}``
+        """
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.model_limits = model_limits or {}
+
+        self._active = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._max_queue_depth = 0
+        self._stats: Dict[str, Dict[str, float]] = {
+            p.name.lower(): {"admitted": 0, "total_wait": 0.0, "max_wait": 0.0}
+            for p in LLMPriority
+        }
+
+    def _model_buckets(self, model: str) -> Dict[str, TokenBucket]:
+        buckets = self._buckets.get(model)
+        if buckets is None:
+            limits = self.model_limits.get(model, {})
+            rpm = limits.get("rpm", self.requests_per_minute)
+            tpm = limits.get("tpm", self.tokens_per_minute)
+            buckets = {}
+            if rpm:
+                buckets["rpm"] = TokenBucket(rpm)
+            if tpm:
+                buckets["tpm"] = TokenBucket(tpm)
+            self._buckets[model] = buckets
+        return buckets
+
+    def _delay_for(self, waiter: _Waiter, now: float) -> float:
+        buckets = self._model_buckets(waiter.model)
+        delays = [0.0]
+        if "rpm" in buckets:
+            delays.append(buckets["rpm"].delay_for(1, now))
+        if "tpm" in buckets:
+            delays.append(buckets["tpm"].delay_for(waiter.tokens, now))
+        return max(delays)
+
+    def _admit(self, waiter: _Waiter, now: float) -> None:
+        buckets = self._model_buckets(waiter.model)
+        if "rpm" in buckets:
+            buckets["rpm"].consume(1)
+        if "tpm" in buckets:
+            buckets["tpm"].consume(waiter.tokens)
+        self._active += 1
+
+        waited = now - waiter.enqueued_at
+        stats = self._stats[LLMPriority(waiter.priority).name.lower()]
+        stats["admitted"] += 1
+        stats["total_wait"] += waited
+        stats["max_wait"] = max(stats["max_wait"], waited)
+        waiter.future.set_result(None)
+
+    def _dispatch(self) -> None:
+        """Admit waiters in priority order while capacity allows."""
+        now = time.monotonic()
+        next_delay: Optional[float] = None
+        blocked: List[_Waiter] = []
+
+        while self._waiters:
+            if self.max_concurrency and self._active >= self.max_concurrency:
+                break
+            waiter = heapq.heappop(self._waiters)
+            if waiter.future.done():  # cancelled while waiting
+                continue
+            delay = self._delay_for(waiter, now)
+            if delay > 0:
+                # This model is out of budget; let other models' waiters through
+                blocked.append(waiter)
+                next_delay = delay if next_delay is None else min(next_delay, delay)
+                continue
+            self._admit(waiter, now)
+
+        for waiter in blocked:
+            heapq.heappush(self._waiters, waiter)
+
+        if next_delay is not None:
+            self._schedule(next_delay)
+
+    def _schedule(self, delay: float) -> None:
+        loop = asyncio.get_running_loop()
+        if self._timer is not None and self._timer_loop is loop:
+            self._timer.cancel()
+        self._timer_loop = loop
+        self._timer = loop.call_later(delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    async def acquire(
+        self, model: str, tokens: int = 1, priority: Optional[LLMPriority] = None
+    ) -> None:
+        """
+        Wait for a slot for one request.
+
+        Args:
+            model: Model the request is sent to
+            tokens: Estimated prompt tokens
+            priority: Admission priority (defaults to the context priority)
+        """
+        if priority is None:
+            priority = current_llm_priority()
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(
+            priority=int(priority),
+            seq=next(self._seq),
+            model=model,
+            tokens=tokens,
+            future=loop.create_future(),
+            enqueued_at=time.monotonic(),
+        )
+        heapq.heappush(self._waiters, waiter)
+        self._max_queue_depth = max(self._max_queue_depth, len(self._waiters))
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release()  # admitted just as we were cancelled
+            raise
+
+    def release(self) -> None:
+        """Return a concurrency slot and admit the next waiter."""
+        self._active = max(0, self._active - 1)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def limit(
+        self, model: str, tokens: int = 1, priority: Optional[LLMPriority] = None
+    ):
+        """Hold a slot for the duration of one provider call."""
+        await self.acquire(model, tokens, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Report limiter state.
+
+        Returns:
+            Active requests, current and peak queue depth, and per-priority
+            admission counts with average and maximum wait times (seconds)
+        """
+        priorities = {}
+        for name, stats in self._stats.items():
+            admitted = stats["admitted"]
+            priorities[name] = {
+                "admitted": int(admitted),
+                "avg_wait": stats["total_wait"] / admitted if admitted else 0.0,
+                "max_wait": stats["max_wait"],
+            }
+        return {
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": sum(1 for w in self._waiters if not w.future.done()),
+            "max_queue_depth": self._max_queue_depth,
+            "priorities": priorities,
+        }
+
+
+_rate_limiter: Optional[LLMRateLimiter] = None
+
+
+def get_rate_limiter() -> LLMRateLimiter:
+    """Return the process-wide limiter, configured from settings on first use."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        try:
+            from forest_app.config.settings import settings
+
+            _rate_limiter = LLMRateLimiter(
+                max_concurrency=settings.LLM_MAX_CONCURRENCY,
+                requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+                tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+                model_limits=settings.LLM_MODEL_RATE_LIMITS,
+            )
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"Rate limiter settings unavailable, using defaults: {e}")
+            _rate_limiter = LLMRateLimiter()
+    return _rate_limiter
@@ -0,0 +1,543 @@
+"""
+Record/replay of Gemini calls for offline load testing.
+
+``LLMReplayProvider`` sits between the LLM clients (``LLMClient`` and
+``GoogleGeminiService``) and the Gemini model objects they create:
+
+- in ``record`` mode every ``generate_content_async`` call goes to the real
+  model, and the request, the response text (or streamed chunks), the latency
+  and any error are appended to a JSONL cassette;
+- in ``replay`` mode no request leaves the process. Each call is answered from
+  the cassette with the recorded text, after a latency taken from the
+  recording (optionally scaled, or sampled from the recorded distribution),
+  and a configurable share of calls fails with a transient provider error.
+
+Replay is deterministic: which recording answers a request, its latency and
+whether an error is injected depend only on the request, how many times it
+has been seen and the seed, not on the interleaving of concurrent calls.
+Requests that were not recorded get a recording of the same model and prompt
+template (unless ``strict``), so load tests can use generated inputs.
+
+Enable it with settings, e.g. for a load test of ``/core/command``:
+
+    LLM_REPLAY_MODE=record LLM_REPLAY_PATH=cassette.jsonl  # capture real traffic
+    LLM_REPLAY_MODE=replay LLM_REPLAY_PATH=cassette.jsonl LLM_REPLAY_ERROR_RATE=0.02
+"""
+
+import asyncio
+import dataclasses
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+try:
+    from google.api_core import exceptions as google_api_exceptions
+    from google.generativeai import protos
+
+    _FINISH_STOP = protos.Candidate.FinishReason.STOP
+except ImportError:
+    google_api_exceptions = None
+    _FINISH_STOP = 1
+
+logger = logging.getLogger(__name__)
+
+MODE_OFF = "off"
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+LATENCY_RECORDED = "recorded"  # The latency of the recording that answers the call
+LATENCY_SAMPLED = "sampled"  # Drawn from all latencies recorded for the model
+LATENCY_NONE = "none"
+
+# Leading prompt characters identifying its template (the static instructions)
+TEMPLATE_PREFIX_CHARS = 200
+
+
+class LLMReplayError(Exception):
+    """A replayed call failed (recorded non-provider error, or injected error
+    without google-api-core)."""
+
+
+class LLMReplayMissError(LLMReplayError, LookupError):
+    """No recording can answer a request."""
+
+
+@dataclass
+class Interaction:
+    """One recorded model call."""
+
+    key: str
+    model: str
+    template: str
+    stream: bool
+    request: Dict[str, Any]
+    text: str = ""
+    chunks: List[str] = field(default_factory=list)
+    latency: float = 0.0  # Seconds until the response (or error) was complete
+    first_chunk_latency: Optional[float] = None
+    error: Optional[Dict[str, str]] = None  # {"type": ..., "message": ...}
+    recorded_at: float = field(default_factory=time.time)
+
+
+def _jsonable(value: Any) -> Any:
+    """Plain JSON form of prompt parts and generation configs."""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        value = dataclasses.asdict(value)
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def _prompt_text(contents: Any) -> str:
+    """Concatenated text of the prompt parts."""
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, dict):
+        return _prompt_text(contents.get("parts", contents.get("text", "")))
+    if isinstance(contents, (list, tuple)):
+        return "".join(_prompt_text(part) for part in contents)
+    return str(getattr(contents, "text", ""))
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:32]
+
+
+def describe_request(
+    model_name: str, contents: Any, generation_config: Any, stream: bool
+) -> Dict[str, Any]:
+    """The recorded form of a request (safety settings and timeouts excluded)."""
+    return {
+        "model": model_name,
+        "contents": _jsonable(contents),
+        "generation_config": _jsonable(generation_config) or {},
+        "stream": stream,
+    }
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """Stable key of a request described by ``describe_request``."""
+    return _digest(json.dumps(request, sort_keys=True, ensure_ascii=False))
+
+
+def template_key(request: Dict[str, Any]) -> str:
+    """Key of the prompt template: the model, the output format and the prompt start."""
+    config = request.get("generation_config") or {}
+    head = _prompt_text(request.get("contents"))[:TEMPLATE_PREFIX_CHARS]
+    return _digest(
+        "\n".join(
+            [request["model"], str(config.get("response_mime_type")), head]
+        )
+    )
+
+
+class Cassette:
+    """Recorded interactions, stored one JSON object per line."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._by_key: Dict[str, List[Interaction]] = {}
+        self._by_template: Dict[str, List[Interaction]] = {}
+        self._by_model: Dict[str, List[Interaction]] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            self._load()
+
+    def _load(self) -> None:
+        with self.path.open(encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    self._index(Interaction(**json.loads(line)))
+                except (TypeError, ValueError) as e:
+                    logger.warning(f"Skipping invalid cassette line {self.path}:{number}: {e}")
+        logger.info(f"Loaded {len(self)} LLM interactions from {self.path}")
+
+    def _index(self, interaction: Interaction) -> None:
+        self._by_key.setdefault(interaction.key, []).append(interaction)
+        self._by_template.setdefault(interaction.template, []).append(interaction)
+        self._by_model.setdefault(interaction.model, []).append(interaction)
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._by_key.values())
+
+    def append(self, interaction: Interaction) -> None:
+        """Add an interaction and write it to the cassette file."""
+        line = json.dumps(dataclasses.asdict(interaction), ensure_ascii=False)
+        with self._lock:
+            self._index(interaction)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def exact(self, key: str) -> List[Interaction]:
+        return self._by_key.get(key, [])
+
+    def similar(self, request: Dict[str, Any]) -> List[Interaction]:
+        """Recordings of the same prompt template, else of the same model."""
+        stream = request["stream"]
+        for candidates in (
+            self._by_template.get(template_key(request), []),
+            self._by_model.get(request["model"], []),
+        ):
+            matching = [i for i in candidates if i.stream == stream] or candidates
+            if matching:
+                return matching
+        return []
+
+    def latencies(self, model: str) -> List[float]:
+        return sorted(
+            i.latency for i in self._by_model.get(model, []) if i.error is None
+        )
+
+    def requests(self) -> List[Dict[str, Any]]:
+        """Every recorded request, in recording order."""
+        interactions = [i for items in self._by_key.values() for i in items]
+        interactions.sort(key=lambda i: i.recorded_at)
+        return [i.request for i in interactions]
+
+
+def _response(text: str) -> Any:
+    """A stand-in for GenerateContentResponse with one finished candidate."""
+    candidate = SimpleNamespace(
+        finish_reason=_FINISH_STOP,
+        content=SimpleNamespace(parts=[SimpleNamespace(text=text)]),
+        safety_ratings=[],
+    )
+    return SimpleNamespace(text=text, candidates=[candidate], prompt_feedback=None)
+
+
+def _provider_error(error_type: str, message: str) -> Exception:
+    """Recreates a recorded error, as a google-api-core exception if possible."""
+    error_class = getattr(google_api_exceptions, error_type, None)
+    if isinstance(error_class, type) and issubclass(error_class, Exception):
+        return error_class(message)
+    return LLMReplayError(f"{error_type}: {message}")
+
+
+class _RecordingModel:
+    """Forwards calls to a real model and records them."""
+
+    def __init__(self, model: Any, provider: "LLMReplayProvider"):
+        self._model = model
+        self._provider = provider
+        self.model_name = model.model_name
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._model, name)
+
+    async def generate_content_async(
+        self, contents: Any, *, generation_config: Any = None, stream: bool = False, **kwargs
+    ) -> Any:
+        request = describe_request(self.model_name, contents, generation_config, stream)
+        started = time.monotonic()
+        try:
+            response = await self._model.generate_content_async(
+                contents, generation_config=generation_config, stream=stream, **kwargs
+            )
+        except Exception as e:
+            self._provider.record(request, started, error=e)
+            raise
+        if stream:
+            return self._record_stream(request, started, response)
+        try:
+            text = response.text
+        except ValueError:  # Blocked or empty; replays as an empty response
+            text = ""
+        self._provider.record(request, started, text=text)
+        return response
+
+    async def _record_stream(
+        self, request: Dict[str, Any], started: float, response: Any
+    ) -> AsyncIterator[Any]:
+        chunks: List[str] = []
+        first_chunk: Optional[float] = None
+        try:
+            async for chunk in response:
+                if first_chunk is None:
+                    first_chunk = time.monotonic() - started
+                try:
+                    chunks.append(chunk.text or "")
+                except ValueError:
+                    chunks.append("")
+                yield chunk
+        except Exception as e:
+            self._provider.record(request, started, chunks=chunks, error=e)
+            raise
+        self._provider.record(request, started, chunks=chunks, first_chunk=first_chunk)
+
+
+class _ReplayModel:
+    """Answers calls from the cassette without network access."""
+
+    def __init__(self, model_name: str, provider: "LLMReplayProvider"):
+        self.model_name = model_name
+        self._provider = provider
+
+    async def generate_content_async(
+        self,
+        contents: Any,
+        *,
+        generation_config: Any = None,
+        stream: bool = False,
+        request_options: Optional[Dict[str, Any]] = None,
+        **kwargs,
+    ) -> Any:
+        request = describe_request(self.model_name, contents, generation_config, stream)
+        timeout = (request_options or {}).get("timeout")
+        return await self._provider.replay(request, timeout)
+
+
+class LLMReplayProvider:
+    """
+    Records Gemini calls to a cassette, or replays them from it.
+
+    Clients pass every model they create through ``wrap``; metrics of the
+    replayed traffic are available from ``get_metrics``.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        mode: str = MODE_REPLAY,
+        latency: Union[str, float] = LATENCY_RECORDED,
+        latency_scale: float = 1.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        strict: bool = False,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        """
+        Initialize the provider.
+
+        Args:
+            path: Cassette file (JSONL); created when recording
+            mode: ``"record"`` or ``"replay"``
+            latency: Replayed latency: ``"recorded"``, ``"sampled"`` (from the
+                model's recorded latency distribution), ``"none"``, or a
+                fixed number of seconds
+            latency_scale: Multiplier applied to replayed latencies
+            error_rate: Share of replayed calls failing with a transient
+                provider error (ServiceUnavailable)
+            seed: Seed of the choices made during replay
+            strict: Raise LLMReplayMissError for requests that were not
+                recorded instead of answering with a similar recording
+            sleep: Awaitable used to wait out latencies (for tests)
+        """
+        if mode not in (MODE_RECORD, MODE_REPLAY):
+            raise ValueError(f"Unknown LLM replay mode: {mode!r}")
+        if isinstance(latency, str) and latency not in (
+            LATENCY_RECORDED,
+            LATENCY_SAMPLED,
+            LATENCY_NONE,
+        ):
+            latency = float(latency)
+        self.mode = mode
+        self.cassette = Cassette(path)
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.error_rate = error_rate
+        self.seed = seed
+        self.strict = strict
+        self._sleep = sleep
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._metrics = {
+            "recorded": 0,
+            "replayed": 0,
+            "exact_hits": 0,
+            "similar_hits": 0,
+            "misses": 0,
+            "recorded_errors": 0,
+            "injected_errors": 0,
+            "timeouts": 0,
+        }
+        if mode == MODE_REPLAY and not len(self.cassette):
+            logger.warning(f"LLM replay cassette {self.cassette.path} is empty")
+
+    def wrap(self, model: Any) -> Any:
+        """The object to call instead of ``model`` (a Gemini GenerativeModel)."""
+        if self.mode == MODE_RECORD:
+            return _RecordingModel(model, self)
+        return _ReplayModel(model.model_name, self)
+
+    def record(
+        self,
+        request: Dict[str, Any],
+        started: float,
+        *,
+        text: str = "",
+        chunks: Optional[List[str]] = None,
+        first_chunk: Optional[float] = None,
+        error: Optional[Exception] = None,
+    ) -> None:
+        """Append a finished call to the cassette."""
+        interaction = Interaction(
+            key=request_key(request),
+            model=request["model"],
+            template=template_key(request),
+            stream=request["stream"],
+            request=request,
+            text="".join(chunks) if chunks is not None else text,
+            chunks=chunks or [],
+            latency=time.monotonic() - started,
+            first_chunk_latency=first_chunk,
+            error=(
+                {"type": type(error).__name__, "message": str(error)}
+                if error is not None
+                else None
+            ),
+        )
+        try:
+            self.cassette.append(interaction)
+        except OSError as e:
+            logger.warning(f"Could not record LLM interaction: {e}")
+            return
+        self._count("recorded")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._metrics[name] += 1
+
+    def _select(self, request: Dict[str, Any]) -> Tuple[Interaction, random.Random]:
+        """Pick the recording answering ``request``; returns it and the call's RNG."""
+        key = request_key(request)
+        with self._lock:
+            occurrence = self._seen.get(key, 0)
+            self._seen[key] = occurrence + 1
+        rng = random.Random(f"{self.seed}:{key}:{occurrence}")
+
+        candidates = self.cassette.exact(key)
+        if candidates:
+            self._count("exact_hits")
+            return candidates[occurrence % len(candidates)], rng
+        if not self.strict:
+            candidates = self.cassette.similar(request)
+            if candidates:
+                self._count("similar_hits")
+                return rng.choice(candidates), rng
+        self._count("misses")
+        raise LLMReplayMissError(
+            f"No recorded response for {request['model']} request {key} "
+            f"in {self.cassette.path}"
+        )
+
+    def _latency(self, interaction: Interaction, rng: random.Random) -> float:
+        if self.latency == LATENCY_NONE:
+            return 0.0
+        if self.latency == LATENCY_RECORDED:
+            seconds = interaction.latency
+        elif self.latency == LATENCY_SAMPLED:
+            recorded = self.cassette.latencies(interaction.model)
+            seconds = rng.choice(recorded) if recorded else interaction.latency
+        else:
+            seconds = float(self.latency)
+        return max(0.0, seconds * self.latency_scale)
+
+    async def _wait(self, seconds: float, timeout: Optional[float]) -> None:
+        """Sleep ``seconds``, failing like the provider if ``timeout`` is shorter."""
+        if timeout is not None and seconds > timeout:
+            await self._sleep(timeout)
+            self._count("timeouts")
+            raise _provider_error("DeadlineExceeded", "Replayed call exceeded its timeout")
+        await self._sleep(seconds)
+
+    async def replay(self, request: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        """Answer ``request`` from the cassette (a response or a chunk stream)."""
+        interaction, rng = self._select(request)
+        self._count("replayed")
+        latency = self._latency(interaction, rng)
+
+        if rng.random() < self.error_rate:
+            self._count("injected_errors")
+            await self._wait(rng.uniform(0.0, latency), timeout)
+            raise _provider_error("ServiceUnavailable", "Error injected by LLM replay")
+        if interaction.error is not None:
+            self._count("recorded_errors")
+            await self._wait(latency, timeout)
+            raise _provider_error(interaction.error["type"], interaction.error["message"])
+
+        if request["stream"]:
+            return self._replay_stream(interaction, latency, timeout)
+        await self._wait(latency, timeout)
+        return _response(interaction.text)
+
+    async def _replay_stream(
+        self, interaction: Interaction, latency: float, timeout: Optional[float]
+    ) -> AsyncIterator[Any]:
+        chunks = interaction.chunks or [interaction.text]
+        if interaction.first_chunk_latency is not None and interaction.latency > 0:
+            first = latency * min(1.0, interaction.first_chunk_latency / interaction.latency)
+        else:
+            first = latency / len(chunks)
+        gap = (latency - first) / max(1, len(chunks) - 1)
+        elapsed = 0.0
+        for index, text in enumerate(chunks):
+            wait = first if index == 0 else gap
+            await self._wait(wait, None if timeout is None else timeout - elapsed)
+            elapsed += wait
+            yield _response(text)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Counters of recorded and replayed calls."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics.update(
+            mode=self.mode,
+            cassette=str(self.cassette.path),
+            interactions=len(self.cassette),
+        )
+        return metrics
+
+
+_replay_provider: Optional[LLMReplayProvider] = None
+_replay_configured = False
+
+
+def get_replay_provider() -> Optional[LLMReplayProvider]:
+    """Return the process-wide provider, or None unless LLM_REPLAY_MODE is set."""
+    global _replay_provider, _replay_configured
+    if not _replay_configured:
+        _replay_configured = True
+        try:
+            from forest_app.config.settings import settings
+
+            mode = settings.LLM_REPLAY_MODE
+            if mode and mode != MODE_OFF:
+                _replay_provider = LLMReplayProvider(
+                    settings.LLM_REPLAY_PATH,
+                    mode=mode,
+                    latency=settings.LLM_REPLAY_LATENCY,
+                    latency_scale=settings.LLM_REPLAY_LATENCY_SCALE,
+                    error_rate=settings.LLM_REPLAY_ERROR_RATE,
+                    seed=settings.LLM_REPLAY_SEED,
+                    strict=settings.LLM_REPLAY_STRICT,
+                )
+                logger.warning(
+                    f"LLM calls are in {mode} mode (cassette {settings.LLM_REPLAY_PATH})"
+                )
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"LLM replay settings unavailable, replay disabled: {e}")
+    return _replay_provider
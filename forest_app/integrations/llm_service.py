@@ -16,15 +16,18 @@ import logging
 import time
 import uuid
 from abc import ABC, abstractmethod
+from collections import deque
 from datetime import datetime
 from typing import (
     Any,
     Awaitable,
     Callable,
+    Deque,
     Dict,
     Generic,
     List,
     Optional,
+    Tuple,
     Type,
     TypeVar,
 )
@@ -33,6 +36,26 @@ import aiohttp
 import backoff
 from pydantic import BaseModel, Field
 
+from forest_app.integrations.deadline import (
+    DeadlineExceededError,
+    attempt_timeout,
+    no_deadline,
+    remaining_time,
+    wait_within_deadline,
+)
+from forest_app.integrations.llm_cache import (
+    LLMResponseCache,
+    build_cache_key,
+    copy_cached_value,
+)
+from forest_app.integrations.llm_rate_limiter import (
+    LLMRateLimiter,
+    estimate_tokens,
+    get_rate_limiter,
+)
+from forest_app.integrations.llm_replay import LLMReplayProvider, get_replay_provider
+from forest_app.integrations.prompt_cache import PromptAssembler, get_prompt_assembler
+
 # Import auxiliary services
 try:
     from forest_app.integrations.context_trimmer import ContextTrimmer
@@ -85,6 +108,11 @@ logger = logging.getLogger(__name__)
 T = TypeVar("T", bound=BaseModel)
 
 
+def _percentile(ordered: List[float], percentile: float) -> float:
+    """Nearest-rank percentile of an ascending, non-empty list."""
+    return ordered[int(percentile * (len(ordered) - 1))]
+
+
 # Detailed request logging model
 class LLMRequestLog(BaseModel):
     """Log entry for an LLM request."""
@@ -177,13 +205,21 @@ class BaseLLMService(ABC, Generic[T]):
     Features:
     - Fully async operation for non-blocking API calls
     - Robust retry with exponential backoff for transient errors
-    - Timeout controls to prevent hanging requests
-    - Fallback service support for high availability
+    - Timeout controls to prevent hanging requests, bounded by the request
+      deadline (attempts and backoff never outlive it)
+    - Fallback service support for high availability, optionally hedged: a
+      fallback request races the primary once it passes its p95 latency
     - Token tracking and management
     - Comprehensive audit logging
-    - Lightweight caching for identical, repeatable calls
+    - LRU + TTL response caching for identical, repeatable calls
+    - Single-flight deduplication of identical in-flight calls
+    - Shared concurrency and RPM/TPM limits with priority admission
+    - Cached static prompt prefixes for templates (where the provider supports it)
     """
 
+    # Providers whose generate_text accepts a ``cached_content`` prefix handle
+    supports_prompt_cache = False
+
     def __init__(
         self,
         service_name: str,
@@ -193,6 +229,15 @@ class BaseLLMService(ABC, Generic[T]):
         enable_logging: bool = True,
         context_trimmer: Optional["ContextTrimmer"] = None,
         prompt_augmentation: Optional["PromptAugmentationService"] = None,
+        cache_max_entries: int = 256,
+        cache_max_bytes: int = 16 * 1024 * 1024,
+        cache_ttl_seconds: float = 3600.0,
+        shared_cache: Optional[Any] = None,
+        rate_limiter: Optional[LLMRateLimiter] = None,
+        prompt_assembler: Optional[PromptAssembler] = None,
+        hedge_requests: Optional[bool] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: Optional[int] = None,
     ):
         """
         Initialize the BaseLLMService.
@@ -205,6 +250,21 @@ class BaseLLMService(ABC, Generic[T]):
             enable_logging: Whether to enable comprehensive request logging
             context_trimmer: Optional ContextTrimmer instance
             prompt_augmentation: Optional PromptAugmentationService instance
+            cache_max_entries: Maximum number of cached responses
+            cache_max_bytes: Maximum approximate size of cached responses
+            cache_ttl_seconds: Time-to-live for cached responses
+            shared_cache: Optional CacheService to share responses across workers
+            rate_limiter: Admission control for provider calls (defaults to the
+                process-wide limiter)
+            prompt_assembler: Prompt prefix cache for templates (defaults to the
+                process-wide assembler; only tracks savings if the provider
+                cannot use cached prefixes)
+            hedge_requests: Race the first fallback service against a slow
+                primary call (defaults to LLM_HEDGE_REQUESTS)
+            hedge_percentile: Latency percentile of an operation after which
+                the hedge is sent (defaults to LLM_HEDGE_PERCENTILE)
+            hedge_min_samples: Latencies recorded for an operation before it
+                is hedged (defaults to LLM_HEDGE_MIN_SAMPLES)
         """
         self.service_name = service_name
         self.default_model = default_model
@@ -239,17 +299,52 @@ class BaseLLMService(ABC, Generic[T]):
         # Set up fallback chains
         self.fallback_services: List["BaseLLMService"] = []
 
-        # Simple cache for identical, small, repeatable calls
-        self._cache: Dict[str, Any] = {}
-        self._cache_hits = 0
-        self._cache_misses = 0
+        # LRU + TTL cache for identical, repeatable calls
         self._cache_enabled = True
-        self._cache_max_size = 100  # Maximum number of items to cache
+        self.response_cache = LLMResponseCache(
+            max_entries=cache_max_entries,
+            max_bytes=cache_max_bytes,
+            ttl_seconds=cache_ttl_seconds,
+            shared_backend=shared_cache,
+        )
+
+        # Single-flight: identical concurrent requests share one provider call
+        self._single_flight_enabled = True
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._coalesced_requests = 0
+
+        # Hedged requests, triggered by the latency history of each operation
+        self.hedge_requests = self._setting(hedge_requests, "LLM_HEDGE_REQUESTS", False)
+        self.hedge_percentile = self._setting(
+            hedge_percentile, "LLM_HEDGE_PERCENTILE", 0.95
+        )
+        self.hedge_min_samples = self._setting(
+            hedge_min_samples, "LLM_HEDGE_MIN_SAMPLES", 20
+        )
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._hedged_requests = 0
+        self._hedge_wins = 0
+
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.prompt_assembler = prompt_assembler or (
+            get_prompt_assembler()
+            if self.supports_prompt_cache
+            else PromptAssembler(max_entries=0)
+        )
 
         logger.info(
             f"Initialized {service_name} LLM service with default model {default_model}"
         )
 
+    @staticmethod
+    def _setting(value: Any, name: str, default: Any) -> Any:
+        """Return ``value``, or the named setting (``default`` if unavailable)."""
+        if value is not None:
+            return value
+        if settings_import_ok:
+            return getattr(settings, name, default)
+        return default
+
     def add_fallback(self, service: "BaseLLMService") -> None:
         """
         Add a fallback service to use if this service fails.
@@ -287,21 +382,38 @@ class BaseLLMService(ABC, Generic[T]):
             #     # Send metrics to monitoring system
             #     pass
 
-    def _cache_key(self, operation: str, prompt: str, **kwargs) -> str:
-        """Generate a cache key for a request."""
-        # Only cache if prompt is relatively small
-        if not self._cache_enabled or len(prompt) > 500:
-            return None
+    def _cache_key(
+        self,
+        operation: str,
+        prompt: str,
+        model: Optional[str] = None,
+        response_schema: Optional[Any] = None,
+        **params,
+    ) -> Optional[str]:
+        """
+        Generate a cache key for a request.
 
-        # Create a deterministic cache key from the operation, prompt, and relevant kwargs
-        key_parts = [operation, prompt]
+        Args:
+            operation: Name of the operation
+            prompt: The prompt being sent
+            model: Model name (defaults to the service's default model)
+            response_schema: Schema the response must conform to, if any
+            **params: Generation parameters that affect the output
 
-        # Add relevant parameters to the cache key
-        for k, v in sorted(kwargs.items()):
-            if k in ("temperature", "max_tokens"):
-                key_parts.append(f"{k}={v}")
+        Returns:
+            Hashed key identifying the request (used for caching and
+            single-flight deduplication)
+        """
+        return build_cache_key(
+            model or self.default_model, operation, prompt, params, response_schema
+        )
 
-        return "|".join(key_parts)
+    def get_cache_metrics(self) -> Dict[str, Any]:
+        """Return response cache size, per-operation hit rates and coalescing."""
+        metrics = self.response_cache.get_metrics()
+        metrics["coalesced_requests"] = self._coalesced_requests
+        metrics["in_flight"] = len(self._in_flight)
+        return metrics
 
     async def _with_retry_and_fallback(
         self,
@@ -330,19 +442,78 @@ class BaseLLMService(ABC, Generic[T]):
             LLMServiceError: If all attempts and fallbacks fail
         """
         # Check cache first if a cache key is provided
-        if cache_key and cache_key in self._cache:
-            self._cache_hits += 1
-            logger.debug(
-                f"Cache hit for {operation} ({self._cache_hits} hits, {self._cache_misses} misses)"
+        if cache_key and self._cache_enabled:
+            cached = await self.response_cache.get(cache_key, operation)
+            if cached is not None:
+                logger.debug(f"Cache hit for {operation}")
+                return cached
+
+        if not cache_key or not self._single_flight_enabled:
+            return await self._execute_with_retry_and_fallback(
+                operation, model, func, prompt, cache_key, log
             )
-            return self._cache[cache_key]
-        elif cache_key:
-            self._cache_misses += 1
 
+        # Join an identical request that is already on the wire
+        in_flight = self._in_flight.get(cache_key)
+        if in_flight is not None:
+            self._coalesced_requests += 1
+            logger.debug(f"Coalesced {operation} with an identical in-flight request")
+            return copy_cached_value(await self._wait_for_shared(in_flight))
+
+        # The call runs in its own task, so cancelling the caller that started
+        # it (client gone, deadline hit) does not cancel it for the others.
+        # It is not bound by that caller's deadline either; every caller
+        # waits for it within its own.
+        with no_deadline():
+            in_flight = asyncio.ensure_future(
+                self._execute_with_retry_and_fallback(
+                    operation, model, func, prompt, cache_key, log
+                )
+            )
+        self._in_flight[cache_key] = in_flight
+        in_flight.add_done_callback(lambda call: self._forget_in_flight(cache_key, call))
+        return await self._wait_for_shared(in_flight)
+
+    async def _wait_for_shared(self, call: asyncio.Future) -> Any:
+        """Wait for a coalesced call within the caller's own deadline."""
+        try:
+            return await wait_within_deadline(call)
+        except DeadlineExceededError as e:
+            raise LLMTimeoutError(
+                f"Gave up waiting for {self.service_name}: {e}"
+            ) from e
+
+    def _forget_in_flight(self, cache_key: str, call: asyncio.Future) -> None:
+        """Stop coalescing into a finished call."""
+        if self._in_flight.get(cache_key) is call:
+            del self._in_flight[cache_key]
+        # Mark the outcome as retrieved even if every caller went away
+        if not call.cancelled():
+            call.exception()
+
+    async def _execute_with_retry_and_fallback(
+        self,
+        operation: str,
+        model: str,
+        func: Callable[[], Awaitable[Any]],
+        prompt: str,
+        cache_key: Optional[str],
+        log: Optional[LLMRequestLog],
+    ) -> Any:
+        """
+        Run the operation with retry, timeout and fallback, then cache it.
+
+        Each attempt's timeout is capped by the time left before the request
+        deadline, and no retry is started (or backoff slept) past it. With
+        hedging enabled, a request to the first fallback service is started
+        once the primary has run longer than its usual (p95) latency; the
+        first successful response wins and the other call is cancelled.
+        """
         if log is None:
             log = self._create_request_log(operation, model, prompt)
 
         start_time = time.time()
+        prompt_tokens = estimate_tokens([prompt])
 
         # Define which exceptions should trigger retry
         retry_exceptions = (
@@ -365,22 +536,42 @@ class BaseLLMService(ABC, Generic[T]):
             backoff.expo,
             retry_exceptions,
             max_tries=self.max_retries + 1,  # +1 because first try is not a retry
+            max_time=remaining_time,  # Re-read per call; None without a deadline
             giveup=lambda e: isinstance(e, permanent_exceptions),
             on_backoff=lambda details: setattr(
                 log, "retry_count", details.get("tries", 0)
             ),
         )
         async def execute_with_retry():
+            timeout = self.timeout_seconds
             try:
-                # Set timeout for the operation
-                return await asyncio.wait_for(func(), self.timeout_seconds)
+                # Every attempt (including retries) counts against the limits
+                async with self.rate_limiter.limit(model, prompt_tokens):
+                    # Set timeout for the operation, within the request deadline
+                    timeout = attempt_timeout(self.timeout_seconds)
+                    return await asyncio.wait_for(func(), timeout)
+            except DeadlineExceededError as e:
+                raise LLMTimeoutError(
+                    f"Request to {self.service_name} not sent: {e}"
+                ) from e
             except asyncio.TimeoutError:
                 raise LLMTimeoutError(
-                    f"Request to {self.service_name} timed out after {self.timeout_seconds}s"
+                    f"Request to {self.service_name} timed out after {timeout:.1f}s"
                 )
 
+        hedge = self._hedge_target(operation, prompt)
+        tried_fallbacks: List["BaseLLMService"] = []
         try:
-            result = await execute_with_retry()
+            primary_start = time.monotonic()
+            if hedge is None:
+                result = await execute_with_retry()
+                winner = None
+            else:
+                result, winner = await self._race_with_hedge(
+                    operation, execute_with_retry, hedge, tried_fallbacks
+                )
+            if winner is None:
+                self._record_latency(operation, time.monotonic() - primary_start)
             log.complete(
                 str(result)
                 if isinstance(result, (str, dict))
@@ -388,13 +579,9 @@ class BaseLLMService(ABC, Generic[T]):
             )
             self._record_metrics(log)
 
-            # Cache the result if appropriate
-            if cache_key and self._cache_enabled:
-                if len(self._cache) >= self._cache_max_size:
-                    # Simple cache eviction - remove a random item
-                    if self._cache:
-                        self._cache.pop(next(iter(self._cache)))
-                self._cache[cache_key] = result
+            # Cache the result if appropriate (hedged answers come from another model)
+            if winner is None and cache_key and self._cache_enabled:
+                await self.response_cache.set(cache_key, result, operation)
 
             return result
         except Exception as e:
@@ -405,25 +592,23 @@ class BaseLLMService(ABC, Generic[T]):
                 f"retries: {type(e).__name__}: {str(e)}"
             )
 
-            # Try fallback services if available
-            if self.fallback_services:
+            # Try fallback services if available and there is time left
+            remaining = remaining_time()
+            if remaining is not None and remaining <= 0:
+                logger.warning("Request deadline exhausted; not trying fallback services.")
+            else:
                 for fallback in self.fallback_services:
+                    if fallback in tried_fallbacks:
+                        continue
                     logger.info(f"Trying fallback service: {fallback.service_name}")
                     try:
-                        if operation == "generate_text":
-                            return await fallback.generate_text(prompt)
-                        elif operation == "generate_json":
-                            # This is incomplete - in a real implementation we would pass all params
+                        call = self._fallback_call(fallback, operation, prompt)
+                        if call is None:
+                            # In a real implementation we would pass all params
                             raise NotImplementedError(
-                                "Fallback for generate_json not fully implemented"
+                                f"Fallback for {operation} not fully implemented"
                             )
-                        elif operation == "generate_structured_output":
-                            # This is incomplete - in a real implementation we would pass all params
-                            raise NotImplementedError(
-                                "Fallback for generate_structured_output not fully implemented"
-                            )
-                        else:
-                            raise ValueError(f"Unknown operation: {operation}")
+                        return await call()
                     except Exception as fallback_error:
                         logger.warning(
                             f"Fallback service {fallback.service_name} also failed: "
@@ -434,6 +619,129 @@ class BaseLLMService(ABC, Generic[T]):
             self._record_metrics(log)
             raise
 
+    @staticmethod
+    def _fallback_call(
+        fallback: "BaseLLMService", operation: str, prompt: str
+    ) -> Optional[Callable[[], Awaitable[Any]]]:
+        """The call that repeats ``operation`` on a fallback, if supported."""
+        if operation == "generate_text":
+            return lambda: fallback.generate_text(prompt)
+        return None
+
+    def _hedge_target(
+        self, operation: str, prompt: str
+    ) -> Optional[Tuple["BaseLLMService", Callable[[], Awaitable[Any]], float]]:
+        """
+        The fallback to hedge ``operation`` with and the delay before doing so.
+
+        Returns None if hedging is disabled, no fallback supports the
+        operation, or too few latencies have been recorded for it yet.
+        """
+        if not self.hedge_requests or not self.fallback_services:
+            return None
+        delay = self.latency_percentile(operation, self.hedge_percentile)
+        if delay is None:
+            return None
+        for fallback in self.fallback_services:
+            call = self._fallback_call(fallback, operation, prompt)
+            if call is not None:
+                return fallback, call, delay
+        return None
+
+    async def _race_with_hedge(
+        self,
+        operation: str,
+        primary_call: Callable[[], Awaitable[Any]],
+        hedge: Tuple["BaseLLMService", Callable[[], Awaitable[Any]], float],
+        tried_fallbacks: List["BaseLLMService"],
+    ) -> Tuple[Any, Optional["BaseLLMService"]]:
+        """
+        Run the primary call, racing the hedge against it once it is slow.
+
+        Returns:
+            The first successful result and the fallback service that produced
+            it (None for the primary)
+
+        Raises:
+            Exception: The primary's error if both calls fail
+        """
+        fallback, hedge_call, delay = hedge
+        primary = asyncio.ensure_future(primary_call())
+        secondary: Optional[asyncio.Future] = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result(), None
+
+            logger.info(
+                f"{operation} on {self.service_name} passed its p{self.hedge_percentile * 100:.0f} "
+                f"latency ({delay:.2f}s); hedging with {fallback.service_name}"
+            )
+            self._hedged_requests += 1
+            tried_fallbacks.append(fallback)
+            secondary = asyncio.ensure_future(hedge_call())
+            pending = {primary, secondary}
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        if task is secondary:
+                            self._hedge_wins += 1
+                            return task.result(), fallback
+                        return task.result(), None
+                    logger.warning(
+                        f"{'Hedged' if task is secondary else 'Primary'} {operation} "
+                        f"failed: {type(error).__name__}: {error}"
+                    )
+            raise primary.exception()
+        finally:
+            losers = [
+                task for task in (primary, secondary)
+                if task is not None and not task.done()
+            ]
+            for task in losers:
+                task.cancel()
+            if losers:
+                # Let the losing call unwind (and release its rate-limit slot)
+                await asyncio.gather(*losers, return_exceptions=True)
+
+    def _record_latency(self, operation: str, seconds: float) -> None:
+        """Remember how long a successful primary call of ``operation`` took."""
+        samples = self._latencies.get(operation)
+        if samples is None:
+            samples = self._latencies[operation] = deque(maxlen=200)
+        samples.append(seconds)
+
+    def latency_percentile(self, operation: str, percentile: float) -> Optional[float]:
+        """
+        Latency percentile (seconds) of recent successful ``operation`` calls.
+
+        Returns None until ``hedge_min_samples`` latencies have been recorded.
+        """
+        samples = self._latencies.get(operation)
+        if not samples or len(samples) < max(1, self.hedge_min_samples):
+            return None
+        return _percentile(sorted(samples), percentile)
+
+    def get_latency_metrics(self) -> Dict[str, Any]:
+        """Return p50/p95 latency per operation and hedging counters."""
+        operations = {}
+        for operation, samples in self._latencies.items():
+            ordered = sorted(samples)
+            operations[operation] = {
+                "samples": len(ordered),
+                "p50": _percentile(ordered, 0.5),
+                "p95": _percentile(ordered, 0.95),
+            }
+        return {
+            "operations": operations,
+            "hedged_requests": self._hedged_requests,
+            "hedge_wins": self._hedge_wins,
+        }
+
     def trim_prompt_if_needed(self, prompt: str, max_tokens: int) -> str:
         """
         Trim a prompt to fit within token limits if needed.
@@ -575,15 +883,32 @@ class BaseLLMService(ABC, Generic[T]):
         if not self.prompt_augmentation:
             raise ValueError("Prompt augmentation service not available")
 
-        messages = self.prompt_augmentation.format_with_template(
+        # The chat messages are sent as a single prompt; the system prompt and
+        # examples form a static prefix that can be cached by the provider
+        prefix, body = self.prompt_augmentation.split_with_template(
             template_name, **template_params
         )
+        assembled = self.prompt_assembler.assemble(
+            f"template:{template_name}", self.default_model, prefix, body
+        )
 
-        # Convert the chat messages to a single prompt for now
-        # In a real implementation, we would use a different method that accepts messages directly
-        prompt = "\n\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
+        if assembled.cached_content is not None:
+            try:
+                return await self.generate_text(
+                    assembled.text,
+                    temperature,
+                    max_tokens,
+                    cached_content=assembled.cached_content,
+                )
+            except LLMServiceError as e:
+                logger.warning(
+                    f"Template request on cached prefix failed ({e}); resending in full."
+                )
+                self.prompt_assembler.discard(assembled)
 
-        return await self.generate_text(prompt, temperature, max_tokens)
+        return await self.generate_text(
+            "\n\n".join(assembled.full_parts), temperature, max_tokens
+        )
 
 
 class GoogleGeminiService(BaseLLMService):
@@ -599,6 +924,8 @@ class GoogleGeminiService(BaseLLMService):
     - All BaseLLMService features (retry, timeout, etc.)
     """
 
+    supports_prompt_cache = True
+
     def __init__(
         self,
         api_key: Optional[str] = None,
@@ -610,6 +937,8 @@ class GoogleGeminiService(BaseLLMService):
         enable_logging: bool = True,
         context_trimmer: Optional["ContextTrimmer"] = None,
         prompt_augmentation: Optional["PromptAugmentationService"] = None,
+        replay: Optional[LLMReplayProvider] = None,
+        **cache_options,
     ):
         """
         Initialize the GoogleGeminiService.
@@ -624,6 +953,10 @@ class GoogleGeminiService(BaseLLMService):
             enable_logging: Whether to enable comprehensive request logging
             context_trimmer: Optional ContextTrimmer instance
             prompt_augmentation: Optional PromptAugmentationService instance
+            replay: Records calls to, or answers them from, a cassette
+                (defaults to the provider configured by LLM_REPLAY_MODE)
+            **cache_options: Response cache options forwarded to BaseLLMService
+                (cache_max_entries, cache_max_bytes, cache_ttl_seconds, shared_cache)
 
         Raises:
             LLMConfigError: If the API key is missing or there's an error configuring the library
@@ -669,8 +1002,11 @@ class GoogleGeminiService(BaseLLMService):
             enable_logging=enable_logging,
             context_trimmer=context_trimmer,
             prompt_augmentation=prompt_augmentation,
+            **cache_options,
         )
 
+        self.replay = replay or get_replay_provider()
+
         # Configure the Google Generative AI library
         try:
             genai.configure(api_key=self.api_key)
@@ -695,9 +1031,10 @@ class GoogleGeminiService(BaseLLMService):
         """Get the Gemini model instance, optionally using the advanced model."""
         try:
             model_name = self.advanced_model_name if use_advanced else self.model_name
-            return genai.GenerativeModel(model_name)
+            model = genai.GenerativeModel(model_name)
         except Exception as e:
             raise LLMConfigError(f"Failed to create Gemini model instance: {e}")
+        return self.replay.wrap(model) if self.replay else model
 
     def _create_generation_config(
         self, temperature: float = 0.7, max_tokens: int = 1000, json_mode: bool = False
@@ -772,6 +1109,7 @@ class GoogleGeminiService(BaseLLMService):
         timeout: Optional[float] = None,
         retry_count: Optional[int] = None,
         use_advanced_model: bool = False,
+        cached_content: Optional[Any] = None,
     ) -> str:
         """
         Generate text from the Gemini model asynchronously.
@@ -783,6 +1121,7 @@ class GoogleGeminiService(BaseLLMService):
             timeout: Custom timeout for this specific request (in seconds)
             retry_count: Custom retry count for this specific request
             use_advanced_model: Whether to use the advanced model for this request
+            cached_content: Cached prompt prefix that ``prompt`` continues
 
         Returns:
             The generated text as a string
@@ -808,14 +1147,20 @@ class GoogleGeminiService(BaseLLMService):
         cache_key = self._cache_key(
             "generate_text",
             prompt,
+            model=self.advanced_model_name if use_advanced_model else self.model_name,
             temperature=temperature,
             max_tokens=max_tokens,
-            advanced=use_advanced_model,
+            cached_prefix=getattr(cached_content, "name", None),
         )
 
         # Prepare our async operation to retry
         async def execute_llm_call():
-            model = self._get_model(use_advanced=use_advanced_model)
+            if cached_content is not None:
+                model = self.prompt_assembler.backend.model_for(cached_content)
+                if self.replay:
+                    model = self.replay.wrap(model)
+            else:
+                model = self._get_model(use_advanced=use_advanced_model)
             generation_config = self._create_generation_config(
                 temperature=temperature, max_tokens=max_tokens, json_mode=False
             )
@@ -912,7 +1257,15 @@ class GoogleGeminiService(BaseLLMService):
                 augmented_prompt, max_tokens=8000
             )  # Adjust based on model limits
 
-        # We don't cache JSON generation due to its complexity and likelihood of unique requests
+        # The schema is already part of the prompt, but key on it explicitly too
+        cache_key = self._cache_key(
+            "generate_json",
+            augmented_prompt,
+            model=self.advanced_model_name if use_advanced_model else self.model_name,
+            response_schema=f"{response_model.__module__}.{response_model.__qualname__}",
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
 
         # Prepare our async operation to retry
         async def execute_llm_call():
@@ -954,7 +1307,7 @@ class GoogleGeminiService(BaseLLMService):
                 model=model_name,
                 func=execute_llm_call,
                 prompt=augmented_prompt,
-                cache_key=None,  # No caching for JSON generation
+                cache_key=cache_key,
             )
 
             return result
@@ -1027,6 +1380,15 @@ class GoogleGeminiService(BaseLLMService):
                 structured_prompt, max_tokens=8000
             )  # Adjust based on model limits
 
+        cache_key = self._cache_key(
+            "generate_structured_output",
+            structured_prompt,
+            model=self.advanced_model_name if use_advanced_model else self.model_name,
+            response_schema=structure_name,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+
         # Prepare our async operation to retry
         async def execute_llm_call():
             model = self._get_model(use_advanced=use_advanced_model)
@@ -1064,7 +1426,7 @@ class GoogleGeminiService(BaseLLMService):
                 model=model_name,
                 func=execute_llm_call,
                 prompt=structured_prompt,
-                cache_key=None,  # No caching for structured output generation
+                cache_key=cache_key,
             )
         except json.JSONDecodeError as e:
             raise LLMResponseError(f"Failed to parse JSON from response: {e}")
@@ -1152,8 +1514,19 @@ def get_llm_service() -> BaseLLMService:
         provider = settings.LLM_PROVIDER
 
     api_key = None
+    cache_options: Dict[str, Any] = {}
     if settings_import_ok:
         if provider.lower() == "gemini" and hasattr(settings, "GOOGLE_API_KEY"):
             api_key = settings.GOOGLE_API_KEY
 
-    return create_llm_service(provider=provider, api_key=api_key)
+        cache_options = {
+            "cache_max_entries": getattr(settings, "LLM_CACHE_MAX_ENTRIES", 256),
+            "cache_max_bytes": getattr(settings, "LLM_CACHE_MAX_BYTES", 16 * 1024 * 1024),
+            "cache_ttl_seconds": getattr(settings, "LLM_CACHE_TTL_SECONDS", 3600.0),
+        }
+        if getattr(settings, "LLM_CACHE_SHARED", False):
+            from forest_app.core.cache_service import CacheService
+
+            cache_options["shared_cache"] = CacheService.get_instance()
+
+    return create_llm_service(provider=provider, api_key=api_key, **cache_options)
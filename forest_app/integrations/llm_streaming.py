@@ -0,0 +1,513 @@
+"""
+Streaming support for LLM responses.
+
+Structured responses (e.g. the arbiter's ``{"narrative": ..., "task": ...}``)
+arrive as JSON, but the user-facing part is a single string field. The helpers
+here let callers forward that field as it is generated instead of waiting for
+the complete document:
+
+- ``JsonStringFieldExtractor`` scans streamed JSON text and returns the decoded
+  characters of one top-level string field as they arrive;
+- ``LLMStream`` wraps a chunk iterator, yields text deltas, and exposes the
+  validated response model once the stream is exhausted.
+
+Large structured outputs (HTA trees) are parsed while they stream with
+``IncrementalJsonParser``: every character is scanned once, each object is
+handed to a callback as soon as it closes (so nodes can be validated and
+rendered early), and repair is applied only to the unfinished tail.
+"""
+
+import json
+import logging
+import re
+from json.decoder import scanstring
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class JsonStringFieldExtractor:
+    """
+    Incrementally extracts one top-level string field from streamed JSON.
+
+    Anything before the opening brace (such as a markdown fence) is ignored.
+    Nested objects are skipped, so only ``field`` of the outermost object is
+    reported.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._string_buf: List[str] = []  # current key (depth 1 only)
+        self._last_key: Optional[str] = None
+        self._await_value = False  # matching key seen, waiting for its value
+        self._emitting = False
+        self._unicode: Optional[str] = None  # hex digits of a \\u escape
+        self._high_surrogate: Optional[int] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        """
+        Consume a chunk of the response.
+
+        Args:
+            chunk: Next piece of raw response text
+
+        Returns:
+            Newly decoded characters of the field's value (may be empty)
+        """
+        out: List[str] = []
+        for ch in chunk:
+            if self._emitting:
+                self._feed_value_char(ch, out)
+            elif self._in_string:
+                self._feed_string_char(ch)
+            else:
+                self._feed_structure_char(ch)
+        return "".join(out)
+
+    def _feed_value_char(self, ch: str, out: List[str]) -> None:
+        if self._unicode is not None:
+            self._unicode += ch
+            if len(self._unicode) == 4:
+                self._emit_code_unit(int(self._unicode, 16), out)
+                self._unicode = None
+        elif self._escape:
+            self._escape = False
+            if ch == "u":
+                self._unicode = ""
+            else:
+                out.append(_SIMPLE_ESCAPES.get(ch, ch))
+        elif ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            self._emitting = False
+            self.done = True
+        else:
+            out.append(ch)
+
+    def _emit_code_unit(self, code: int, out: List[str]) -> None:
+        if 0xD800 <= code <= 0xDBFF:
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        out.append(chr(code))
+
+    def _feed_string_char(self, ch: str) -> None:
+        if self._escape:
+            self._escape = False
+        elif ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            self._in_string = False
+            if self._depth == 1 and self._expect_key:
+                self._last_key = "".join(self._string_buf)
+                self._expect_key = False
+            return
+        if self._depth == 1 and self._expect_key:
+            self._string_buf.append(ch)
+
+    def _feed_structure_char(self, ch: str) -> None:
+        if ch in "{[":
+            self._depth += 1
+            if self._depth == 1:
+                self._expect_key = ch == "{"
+            self._await_value = False
+        elif ch in "}]":
+            self._depth -= 1
+            self._await_value = False
+        elif self._depth != 1:
+            if ch == '"' and self._depth > 1:
+                self._in_string = True
+        elif ch == '"':
+            if self._await_value:
+                self._await_value = False
+                self._emitting = not self.done
+                if not self._emitting:
+                    self._in_string = True
+            else:
+                self._in_string = True
+                if self._expect_key:
+                    self._string_buf = []
+        elif ch == ":":
+            self._await_value = self._last_key == self.field
+            self._last_key = None
+        elif ch == ",":
+            self._expect_key = True
+            self._await_value = False
+        elif not ch.isspace():
+            self._await_value = False  # non-string value
+
+
+JsonPath = Tuple[Union[str, int], ...]
+
+_NUMBER_RE = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?")
+_NUMBER_CHARS = frozenset("+-0123456789.eE")
+_LITERALS = {"true": True, "false": False, "null": None}
+_WHITESPACE = " \t\r\n"
+_MISSING = object()
+
+
+class JsonStreamError(ValueError):
+    """Raised when streamed JSON cannot be parsed, even after repair."""
+
+    def __init__(self, message: str, pos: Optional[int] = None):
+        super().__init__(message if pos is None else f"{message} (char {pos})")
+        self.pos = pos
+
+
+class _Frame:
+    """An open object or array."""
+
+    __slots__ = ("container", "path", "expect", "key", "resume")
+
+    def __init__(self, container: Union[dict, list], path: JsonPath, resume: int):
+        self.container = container
+        self.path = path
+        self.expect = "key" if isinstance(container, dict) else "value"
+        self.key: Optional[str] = None
+        self.resume = resume  # offset just after the last complete member
+
+
+class IncrementalJsonParser:
+    """
+    Streaming JSON parser that builds the document as chunks arrive.
+
+    Text before the first ``{``/``[`` and after the top-level value closes
+    (such as markdown fences) is ignored, and trailing commas are tolerated.
+    ``on_object(path, obj)`` is called when each object closes and its return
+    value replaces the object in the document, which lets callers validate or
+    convert subtrees (and start using them) before the stream ends.
+
+    If the stream ends early, only the unfinished tail is repaired and merged
+    into what was already parsed; a syntax error in the middle falls back to
+    repairing the whole text. Objects materialized by repair are passed to
+    ``on_object`` too, so a path may be reported twice after a fallback. With
+    ``repair=False``, ``close`` raises instead of repairing.
+    """
+
+    def __init__(
+        self,
+        on_object: Optional[Callable[[JsonPath, dict], Any]] = None,
+        repair: bool = True,
+    ):
+        self.on_object = on_object
+        self.repair = repair
+        self._buf = ""
+        self._pos = 0
+        self._offset = 0  # absolute offset of _buf[0]
+        self._parts: List[str] = []
+        self._stack: List[_Frame] = []
+        self._root: Any = _MISSING
+        self.error: Optional[JsonStreamError] = None
+        self.repaired = False
+
+    @property
+    def done(self) -> bool:
+        """True once the top-level value has been closed."""
+        return self._root is not _MISSING
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> None:
+        """Consume the next chunk of text."""
+        if not chunk:
+            return
+        self._parts.append(chunk)
+        if self.done or self.error is not None:
+            return
+        self._offset += self._pos
+        self._buf = self._buf[self._pos :] + chunk
+        self._pos = 0
+        try:
+            self._parse(final=False)
+        except JsonStreamError as e:
+            logger.debug("Streamed JSON syntax error, will repair at close: %s", e)
+            self.error = e
+
+    def close(self) -> Any:
+        """
+        Finish parsing and return the document.
+
+        Raises:
+            JsonStreamError: If the text is not JSON even after repair (or at
+                all, when repair is disabled)
+        """
+        if not self.done and self.error is None:
+            try:
+                self._parse(final=True)
+            except JsonStreamError as e:
+                self.error = e
+        if self.done:
+            return self._root
+        if not self.repair:
+            raise self.error or JsonStreamError("Streamed JSON ended early")
+        self.repaired = True
+        if self.error is None and self._stack:
+            result = self._repair_tail()
+            if result is not _MISSING:
+                return result
+        return self._repair_all()
+
+    # --- Parsing ---
+
+    def _parse(self, final: bool) -> None:
+        buf = self._buf
+        n = len(buf)
+        i = self._pos
+        stack = self._stack
+        while i < n and not self.done:
+            ch = buf[i]
+            if ch in _WHITESPACE:
+                i += 1
+                continue
+            if not stack:
+                if ch in "{[":
+                    stack.append(_Frame({} if ch == "{" else [], (), self._offset + i + 1))
+                i += 1  # anything else before the document starts is ignored
+                continue
+
+            frame = stack[-1]
+            expect = frame.expect
+            if ch == "}" or ch == "]":
+                is_dict = isinstance(frame.container, dict)
+                if (ch == "}") != is_dict or expect in ("colon",) or (
+                    is_dict and expect == "value"
+                ):
+                    raise JsonStreamError(f"Unexpected '{ch}'", self._offset + i)
+                i += 1
+                self._close_frame(self._offset + i)
+            elif ch == ",":
+                if expect != "comma":
+                    raise JsonStreamError("Unexpected ','", self._offset + i)
+                frame.expect = "key" if isinstance(frame.container, dict) else "value"
+                i += 1
+            elif ch == ":":
+                if expect != "colon":
+                    raise JsonStreamError("Unexpected ':'", self._offset + i)
+                frame.expect = "value"
+                i += 1
+            elif expect == "key":
+                if ch != '"':
+                    raise JsonStreamError("Expected a key", self._offset + i)
+                end = self._scan_string(buf, i, final)
+                if end is None:
+                    break
+                frame.key, i = end
+                frame.expect = "colon"
+            elif expect == "value":
+                if ch in "{[":
+                    member = frame.key if isinstance(frame.container, dict) else len(frame.container)
+                    stack.append(
+                        _Frame(
+                            {} if ch == "{" else [],
+                            frame.path + (member,),
+                            self._offset + i + 1,
+                        )
+                    )
+                    i += 1
+                    continue
+                scalar = self._scan_scalar(buf, i, final)
+                if scalar is None:
+                    break
+                value, i = scalar
+                self._attach(frame, value, self._offset + i)
+            else:
+                raise JsonStreamError(f"Unexpected '{ch}'", self._offset + i)
+        self._pos = i
+
+    def _scan_string(self, buf: str, i: int, final: bool) -> Optional[Tuple[str, int]]:
+        try:
+            return scanstring(buf, i + 1, False)
+        except json.JSONDecodeError as e:
+            if not final and (e.msg.startswith("Unterminated") or e.pos >= len(buf) - 6):
+                return None  # wait for the rest of the string
+            raise JsonStreamError(e.msg, self._offset + e.pos) from e
+
+    def _scan_scalar(self, buf: str, i: int, final: bool) -> Optional[Tuple[Any, int]]:
+        ch = buf[i]
+        if ch == '"':
+            return self._scan_string(buf, i, final)
+        if ch in _NUMBER_CHARS:
+            end = i
+            while end < len(buf) and buf[end] in _NUMBER_CHARS:
+                end += 1
+            if end == len(buf) and not final:
+                return None  # the number may continue in the next chunk
+            text = buf[i:end]
+            if not _NUMBER_RE.fullmatch(text):
+                raise JsonStreamError(f"Invalid number {text!r}", self._offset + i)
+            return (float(text) if any(c in text for c in ".eE") else int(text)), end
+        rest = buf[i : i + 5]
+        for literal, value in _LITERALS.items():
+            if rest.startswith(literal):
+                return value, i + len(literal)
+            if not final and literal.startswith(rest) and i + len(rest) == len(buf):
+                return None
+        raise JsonStreamError("Expected a value", self._offset + i)
+
+    def _attach(self, frame: _Frame, value: Any, resume: int) -> None:
+        if isinstance(frame.container, dict):
+            frame.container[frame.key] = value
+            frame.key = None
+        else:
+            frame.container.append(value)
+        frame.expect = "comma"
+        frame.resume = resume
+
+    def _close_frame(self, resume: int) -> None:
+        frame = self._stack.pop()
+        value = frame.container
+        if isinstance(value, dict) and self.on_object is not None:
+            value = self.on_object(frame.path, value)
+        if self._stack:
+            self._attach(self._stack[-1], value, resume)
+        else:
+            self._root = value
+
+    # --- Repair ---
+
+    def _finish(self, value: Any, path: JsonPath) -> Any:
+        """Apply ``on_object`` bottom-up to a value produced by repair."""
+        if isinstance(value, dict):
+            for key in value:
+                value[key] = self._finish(value[key], path + (key,))
+            return self.on_object(path, value) if self.on_object else value
+        if isinstance(value, list):
+            return [self._finish(item, path + (idx,)) for idx, item in enumerate(value)]
+        return value
+
+    def _repair_tail(self) -> Any:
+        """Repair only the text after the last complete member, innermost first."""
+        from forest_app.integrations.llm import fix_json
+
+        text = self.text
+        while self._stack:
+            frame = self._stack[-1]
+            is_dict = isinstance(frame.container, dict)
+            tail = text[frame.resume :].strip().lstrip(",")
+            opener, closer = ("{", "}") if is_dict else ("[", "]")
+            try:
+                if tail.strip(_WHITESPACE + "`"):
+                    members = json.loads(fix_json(opener + tail))
+                else:
+                    members = {} if is_dict else []
+                if not isinstance(members, type(frame.container)):
+                    raise ValueError("repaired tail has the wrong type")
+            except (ValueError, TypeError) as e:
+                logger.debug("Tail repair failed at depth %d: %s", len(self._stack), e)
+                self._stack.pop()  # widen the tail to the enclosing container
+                continue
+
+            if is_dict:
+                for key, value in members.items():
+                    frame.container[key] = self._finish(value, frame.path + (key,))
+            else:
+                start = len(frame.container)
+                for idx, value in enumerate(members, start):
+                    frame.container.append(self._finish(value, frame.path + (idx,)))
+            logger.info("Repaired truncated JSON tail (%d chars).", len(tail))
+            while self._stack:
+                self._close_frame(len(text))
+            return self._root
+        return _MISSING
+
+    def _repair_all(self) -> Any:
+        from forest_app.integrations.llm import fix_json
+
+        text = self.text
+        logger.warning("Streamed JSON invalid (%s); repairing full text.", self.error)
+        try:
+            value = json.loads(fix_json(text))
+        except (ValueError, TypeError) as e:
+            raise JsonStreamError(f"Invalid JSON even after repair: {e}") from e
+        self._stack.clear()
+        self._root = self._finish(value, ())
+        return self._root
+
+
+class LLMStream(Generic[T]):
+    """
+    Async iterator over the text of a streamed LLM response.
+
+    Iterating yields text deltas: the decoded value of ``stream_field`` when
+    one is given, otherwise the raw response text. Once iteration finishes,
+    ``text`` holds the complete response and ``result`` the parsed value.
+    """
+
+    def __init__(
+        self,
+        chunks: AsyncIterator[str],
+        parse: Callable[[str], T],
+        stream_field: Optional[str] = None,
+    ):
+        """
+        Initialize the stream.
+
+        Args:
+            chunks: Raw response text chunks, in order
+            parse: Turns the complete response text into the result
+            stream_field: Top-level JSON string field to stream
+        """
+        self._chunks = chunks
+        self._parse = parse
+        self._extractor = JsonStringFieldExtractor(stream_field) if stream_field else None
+        self._parts: List[str] = []
+        self._consumed = False
+        self.result: Optional[T] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[str]:
+        if self._consumed:
+            raise RuntimeError("LLMStream can only be iterated once.")
+        self._consumed = True
+        async for chunk in self._chunks:
+            if not chunk:
+                continue
+            self._parts.append(chunk)
+            delta = self._extractor.feed(chunk) if self._extractor else chunk
+            if delta:
+                yield delta
+        self.result = self._parse(self.text)
+
+    async def collect(self) -> T:
+        """Consume the stream without handling deltas and return the result."""
+        async for _ in self:
+            pass
+        return self.result  # type: ignore[return-value]
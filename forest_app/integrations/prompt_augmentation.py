@@ -6,7 +6,7 @@ with contextual information, examples, and formatting to improve response qualit
 """
 
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from pydantic import BaseModel, Field
 
@@ -52,6 +52,16 @@ class AugmentationTemplate(BaseModel):
             logger.error(f"Error formatting prompt: {e}")
             raise ValueError(f"Error formatting prompt: {e}")
 
+    def split_prompt(self, **kwargs) -> Tuple[str, str]:
+        """
+        Format the prompt as text, split into its static prefix (system
+        prompt and examples, identical on every call) and the per-call part.
+        """
+        messages = [
+            f"{msg['role']}: {msg['content']}" for msg in self.format_prompt(**kwargs)
+        ]
+        return "\n\n".join(messages[:-1]), messages[-1]
+
 
 class PromptAugmentationService:
     """
@@ -250,6 +260,19 @@ class PromptAugmentationService:
 
         return template.format_prompt(**kwargs)
 
+    def split_with_template(self, template_name: str, **kwargs) -> Tuple[str, str]:
+        """
+        Format a prompt with a registered template as (static prefix, per-call text).
+
+        Raises:
+            ValueError: If the template doesn't exist or there's an error formatting
+        """
+        template = self.get_template(template_name)
+        if not template:
+            raise ValueError(f"Template '{template_name}' not found")
+
+        return template.split_prompt(**kwargs)
+
     def augment_prompt(
         self, prompt: str, context: Optional[Dict[str, Any]] = None
     ) -> str:
@@ -0,0 +1,456 @@
+"""
+Prompt prefix caching for large, mostly static prompts.
+
+The HTA evolution and reflection distillation prompts (and the
+PromptAugmentationService templates) start with a long block of instructions
+that never changes, followed by per-call data such as the serialized tree.
+``PromptAssembler`` builds those prompts from their static prefix, an optional
+tree and the per-call body:
+
+- when the provider supports context caching and the prefix (plus tree) is
+  large enough to qualify, the prefix is kept as a cached-content handle and
+  only the remaining parts are sent;
+- the tree is cached together with the prefix, keyed by ``tree_key``; while
+  that handle is alive, later calls send only the nodes that changed since;
+- otherwise the whole prompt is sent, with the tree serialized compactly.
+
+Each assembled prompt carries a ``PromptSavings`` record comparing the tokens
+sent with the tokens of the naive prompt, and the assembler keeps per-operation
+totals for monitoring:
+
+    assembled = assembler.assemble(
+        "hta_evolution", model_name, HTA_EVOLVE_PROMPT_PREFIX, goal_text,
+        tree=tree_dict, tree_key=str(tree_id),
+    )
+    model = assembler.model_for(assembled) or default_model
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from forest_app.integrations.llm_rate_limiter import estimate_tokens
+
+try:
+    import google.generativeai as genai
+    from google.generativeai import caching as genai_caching
+
+    gemini_caching_ok = True
+except ImportError:  # google-generativeai < 0.7 has no context caching
+    genai = None
+    genai_caching = None
+    gemini_caching_ok = False
+
+logger = logging.getLogger(__name__)
+
+TREE_SECTION_TEMPLATE = """**Current HTA Structure (JSON format):**
+```json
+{tree_json}
+```"""
+
+TREE_DELTA_TEMPLATE = """**Changes to the HTA since the structure above:**
+Apply these before anything else. Nodes are listed without their children, with the id of their parent and their position among its children.
+```json
+{delta_json}
+```"""
+
+MODE_FULL = "full"
+MODE_CACHED_PREFIX = "cached_prefix"
+MODE_TREE_DELTA = "tree_delta"
+
+
+@dataclass
+class PromptSavings:
+    """Token accounting for one assembled prompt."""
+
+    operation: str
+    mode: str
+    baseline_tokens: int  # Tokens of the full prompt as it used to be sent
+    sent_tokens: int  # Tokens actually sent with this request
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.baseline_tokens - self.sent_tokens)
+
+    @property
+    def saved_ratio(self) -> float:
+        return self.saved_tokens / self.baseline_tokens if self.baseline_tokens else 0.0
+
+
+@dataclass
+class AssembledPrompt:
+    """Prompt parts to send, plus the cached-content handle they extend."""
+
+    prompt_parts: List[str]
+    savings: PromptSavings
+    full_parts: List[str]  # The complete prompt, for resending without the cache
+    cached_content: Any = None
+    cache_key: Optional[Tuple[str, str, str]] = None
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(self.prompt_parts)
+
+
+def compact_json(value: Any) -> str:
+    """Serialize without insignificant whitespace."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def flatten_tree(tree: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Flatten a nested ``{"id", ..., "children": [...]}`` tree into records.
+
+    Each record holds the node's own fields plus ``parent_id`` and
+    ``position``, which is enough to rebuild the tree from the records.
+    """
+    records: Dict[str, Dict[str, Any]] = {}
+    stack: List[Tuple[Dict[str, Any], Optional[str], int]] = [(tree, None, 0)]
+    while stack:
+        node, parent_id, position = stack.pop()
+        node_id = str(node.get("id", f"{parent_id}/{position}"))
+        record = {k: v for k, v in node.items() if k != "children"}
+        record["parent_id"] = parent_id
+        record["position"] = position
+        records[node_id] = record
+        for index, child in enumerate(node.get("children") or []):
+            if isinstance(child, dict):
+                stack.append((child, node_id, index))
+    return records
+
+
+def diff_trees(
+    old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Describe how flattened tree ``new`` differs from ``old``."""
+    return {
+        "changed_nodes": [rec for node_id, rec in new.items() if old.get(node_id) != rec],
+        "removed_node_ids": [node_id for node_id in old if node_id not in new],
+    }
+
+
+class GeminiPrefixCache:
+    """Creates Gemini cached-content handles (requires google-generativeai >= 0.7)."""
+
+    @property
+    def supported(self) -> bool:
+        return gemini_caching_ok
+
+    def create(
+        self, model_name: str, prefix: str, contents: List[str], ttl_seconds: float
+    ) -> Any:
+        return genai_caching.CachedContent.create(
+            model=model_name,
+            system_instruction=prefix,
+            contents=contents or None,
+            ttl=timedelta(seconds=ttl_seconds),
+        )
+
+    def model_for(self, handle: Any) -> Any:
+        return genai.GenerativeModel.from_cached_content(cached_content=handle)
+
+    def delete(self, handle: Any) -> None:
+        handle.delete()
+
+
+@dataclass
+class _CacheEntry:
+    handle: Any
+    expires_at: float
+    tree_records: Optional[Dict[str, Dict[str, Any]]] = None
+    tree_tokens: int = 0
+
+
+@dataclass
+class _OperationStats:
+    calls: int = 0
+    baseline_tokens: int = 0
+    sent_tokens: int = 0
+    modes: Dict[str, int] = field(default_factory=dict)
+
+
+class PromptAssembler:
+    """
+    Builds prompts from a static prefix, an optional tree and a per-call body,
+    reusing provider-side cached prefixes where possible.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[Any] = None,
+        min_cache_tokens: int = 32768,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 64,
+        max_delta_ratio: float = 0.5,
+        token_counter: Callable[[List[str]], int] = estimate_tokens,
+    ):
+        """
+        Initialize the assembler.
+
+        Args:
+            backend: Provider cache (defaults to GeminiPrefixCache)
+            min_cache_tokens: Smallest cacheable prefix (provider minimum)
+            ttl_seconds: Lifetime of cached-content handles
+            max_entries: Maximum number of live handles kept
+            max_delta_ratio: Re-cache the tree once its delta exceeds this
+                fraction of the full tree
+            token_counter: Estimates the tokens of a list of prompt parts
+        """
+        self.backend = backend if backend is not None else GeminiPrefixCache()
+        self.min_cache_tokens = min_cache_tokens
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_delta_ratio = max_delta_ratio
+        self.count_tokens = token_counter
+        self._entries: "OrderedDict[Tuple[str, str, str], _CacheEntry]" = OrderedDict()
+        self._unsupported_models: set = set()
+        self._stats: Dict[str, _OperationStats] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(getattr(self.backend, "supported", False)) and self.max_entries > 0
+
+    def assemble(
+        self,
+        operation: str,
+        model_name: str,
+        prefix: str,
+        body: str,
+        *,
+        tree: Optional[Dict[str, Any]] = None,
+        tree_key: Optional[str] = None,
+        baseline_parts: Optional[List[str]] = None,
+    ) -> AssembledPrompt:
+        """
+        Assemble a prompt and record its token savings.
+
+        Args:
+            operation: Name used for logging and statistics
+            model_name: Model the prompt is sent to (handles are per model)
+            prefix: Static instructions shared by every call
+            body: Per-call text that follows the tree
+            tree: Optional nested tree sent between prefix and body
+            tree_key: Identifies the tree across calls (enables deltas)
+            baseline_parts: The prompt as it would be sent without this layer,
+                if it differs from ``[prefix, tree section, body]``
+
+        Returns:
+            The assembled prompt with its savings record
+        """
+        tree_section = (
+            TREE_SECTION_TEMPLATE.format(tree_json=compact_json(tree))
+            if tree is not None
+            else None
+        )
+        full_parts = [p for p in (prefix, tree_section, body) if p]
+        baseline = self.count_tokens(baseline_parts or full_parts)
+
+        assembled = None
+        if self.enabled and model_name not in self._unsupported_models:
+            assembled = self._assemble_cached(
+                operation, model_name, prefix, body, tree, tree_key, tree_section, baseline
+            )
+        if assembled is None:
+            assembled = AssembledPrompt(
+                full_parts,
+                PromptSavings(operation, MODE_FULL, baseline, self.count_tokens(full_parts)),
+                full_parts,
+            )
+        else:
+            assembled.full_parts = full_parts
+        self._record(assembled.savings)
+        return assembled
+
+    def model_for(self, assembled: AssembledPrompt) -> Any:
+        """Return a model bound to the prompt's cached prefix, or None."""
+        if assembled.cached_content is None:
+            return None
+        return self.backend.model_for(assembled.cached_content)
+
+    def discard(self, assembled: AssembledPrompt) -> None:
+        """Drop the handle a prompt was built on (e.g. after the provider rejected it)."""
+        if assembled.cache_key is None:
+            return
+        with self._lock:
+            entry = self._entries.get(assembled.cache_key)
+            if entry is None or entry.handle is not assembled.cached_content:
+                return
+            del self._entries[assembled.cache_key]
+        self._delete(entry)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-operation call counts, tokens sent and tokens saved."""
+        with self._lock:
+            return {
+                op: {
+                    "calls": s.calls,
+                    "baseline_tokens": s.baseline_tokens,
+                    "sent_tokens": s.sent_tokens,
+                    "saved_tokens": s.baseline_tokens - s.sent_tokens,
+                    "modes": dict(s.modes),
+                }
+                for op, s in self._stats.items()
+            }
+
+    # --- Internals ---
+
+    def _assemble_cached(
+        self,
+        operation: str,
+        model_name: str,
+        prefix: str,
+        body: str,
+        tree: Optional[Dict[str, Any]],
+        tree_key: Optional[str],
+        tree_section: Optional[str],
+        baseline: int,
+    ) -> Optional[AssembledPrompt]:
+        key = (model_name, self._digest(prefix), tree_key or "")
+        records = flatten_tree(tree) if tree is not None and tree_key else None
+        entry = self._live_entry(key)
+
+        if entry is not None and records is not None and entry.tree_records is not None:
+            delta = diff_trees(entry.tree_records, records)
+            delta_section = None
+            if delta["changed_nodes"] or delta["removed_node_ids"]:
+                delta_section = TREE_DELTA_TEMPLATE.format(delta_json=compact_json(delta))
+            parts = [p for p in (delta_section, body) if p]
+            delta_tokens = self.count_tokens([delta_section]) if delta_section else 0
+            if delta_tokens <= self.max_delta_ratio * entry.tree_tokens:
+                mode = MODE_TREE_DELTA if delta_section else MODE_CACHED_PREFIX
+                return AssembledPrompt(
+                    parts,
+                    PromptSavings(operation, mode, baseline, self.count_tokens(parts)),
+                    [],
+                    cached_content=entry.handle,
+                    cache_key=key,
+                )
+            entry = None  # Too much has changed: cache the current tree instead
+        elif entry is not None and records is None and entry.tree_records is None:
+            parts = [p for p in (tree_section, body) if p]
+            return AssembledPrompt(
+                parts,
+                PromptSavings(operation, MODE_CACHED_PREFIX, baseline, self.count_tokens(parts)),
+                [],
+                cached_content=entry.handle,
+                cache_key=key,
+            )
+
+        # Cache the prefix, together with the tree when it is tracked by key
+        cached_tree = tree_section if records is not None else None
+        cached_parts = [p for p in (prefix, cached_tree) if p]
+        if self.count_tokens(cached_parts) < self.min_cache_tokens:
+            return None
+        try:
+            handle = self.backend.create(
+                model_name, prefix, [cached_tree] if cached_tree else [], self.ttl_seconds
+            )
+        except Exception as e:
+            logger.warning(
+                "Prompt prefix caching unavailable for %s, sending full prompts: %s",
+                model_name,
+                e,
+            )
+            self._unsupported_models.add(model_name)
+            return None
+        self._store(
+            key,
+            _CacheEntry(
+                handle=handle,
+                expires_at=time.monotonic() + self.ttl_seconds,
+                tree_records=records,
+                tree_tokens=self.count_tokens([cached_tree]) if cached_tree else 0,
+            ),
+        )
+        parts = [p for p in (None if cached_tree else tree_section, body) if p]
+        return AssembledPrompt(
+            parts,
+            PromptSavings(operation, MODE_CACHED_PREFIX, baseline, self.count_tokens(parts)),
+            [],
+            cached_content=handle,
+            cache_key=key,
+        )
+
+    def _live_entry(self, key: Tuple[str, str, str]) -> Optional[_CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            # Leave a margin so a handle does not expire while the request is in flight
+            if entry.expires_at - time.monotonic() < min(60.0, self.ttl_seconds / 10):
+                del self._entries[key]
+                expired = entry
+            else:
+                self._entries.move_to_end(key)
+                return entry
+        self._delete(expired)
+        return None
+
+    def _store(self, key: Tuple[str, str, str], entry: _CacheEntry) -> None:
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                evicted.append(old)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[1])
+        for old_entry in evicted:
+            self._delete(old_entry)
+
+    def _delete(self, entry: _CacheEntry) -> None:
+        try:
+            self.backend.delete(entry.handle)
+        except Exception as e:  # The handle expires on its own anyway
+            logger.debug("Failed to delete cached prompt prefix: %s", e)
+
+    def _record(self, savings: PromptSavings) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(savings.operation, _OperationStats())
+            stats.calls += 1
+            stats.baseline_tokens += savings.baseline_tokens
+            stats.sent_tokens += savings.sent_tokens
+            stats.modes[savings.mode] = stats.modes.get(savings.mode, 0) + 1
+        logger.info(
+            "Prompt %s (%s): sent ~%d of ~%d tokens, saved ~%d (%.0f%%).",
+            savings.operation,
+            savings.mode,
+            savings.sent_tokens,
+            savings.baseline_tokens,
+            savings.saved_tokens,
+            savings.saved_ratio * 100,
+        )
+
+    @staticmethod
+    def _digest(prefix: str) -> str:
+        return hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+
+_prompt_assembler: Optional[PromptAssembler] = None
+
+
+def get_prompt_assembler() -> PromptAssembler:
+    """Return the process-wide assembler, configured from settings on first use."""
+    global _prompt_assembler
+    if _prompt_assembler is None:
+        try:
+            from forest_app.config.settings import settings
+
+            # Recorded and replayed calls must carry the whole prompt
+            replaying = settings.LLM_REPLAY_MODE not in ("", "off")
+            _prompt_assembler = PromptAssembler(
+                min_cache_tokens=settings.LLM_PROMPT_CACHE_MIN_TOKENS,
+                ttl_seconds=settings.LLM_PROMPT_CACHE_TTL_SECONDS,
+                max_entries=0 if replaying else settings.LLM_PROMPT_CACHE_MAX_ENTRIES,
+            )
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"Prompt cache settings unavailable, using defaults: {e}")
+            _prompt_assembler = PromptAssembler()
+    return _prompt_assembler
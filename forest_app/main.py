@@ -8,6 +8,7 @@ from typing import Any  # Added Any
 import sentry_sdk
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sentry_sdk.integrations.logging import LoggingIntegration
 from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
 
@@ -52,6 +53,12 @@ except ImportError as e:
     class LoggingMiddleware:
         pass
 
+try:
+    from forest_app.middleware.deadline import DeadlineMiddleware
+except ImportError as e:
+    logging.error(f"Failed to import DeadlineMiddleware: {e}")
+    DeadlineMiddleware = None
+
 try:
     from forest_app.persistence.database import init_db
 except ImportError as e:
@@ -367,6 +374,9 @@ origins = [
 origins = sorted(list(set(o for o in origins if o)))  # Filter out empty strings
 
 app.add_middleware(LoggingMiddleware)
+if DeadlineMiddleware is not None:
+    # Binds the RequestContext and its deadline for the layers inside it
+    app.add_middleware(DeadlineMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,  # Use the cleaned list
@@ -407,6 +417,14 @@ async def startup_event():
     logger.info("-----------------------------------------------------")
     # --- END Feature Flag Logging ---
 
+    # --- Open pooled database connections before serving requests ---
+    try:
+        from forest_app.persistence.database import warm_up_database
+
+        await warm_up_database()
+    except Exception as warm_up_err:
+        logger.error("Error warming up database connections: %s", warm_up_err)
+
     # --- Log architecture status ---
     if hasattr(app.state, "architecture"):
         logger.info("Enhanced architecture is active and initialized")
@@ -442,6 +460,22 @@ async def startup_event():
 async def shutdown_event():
     logger.info("Application shutdown event executing...")
 
+    # --- Write pending write-behind snapshots while the database is up ---
+    try:
+        from forest_app.core.snapshot_write_behind import get_snapshot_write_behind
+
+        await get_snapshot_write_behind().stop()
+    except Exception as write_behind_err:
+        logger.error("Error flushing pending snapshots: %s", write_behind_err)
+
+    # --- Stop scheduling snapshot retention runs ---
+    try:
+        from forest_app.core.snapshot_retention import get_snapshot_retention
+
+        await get_snapshot_retention().stop()
+    except Exception as retention_err:
+        logger.error("Error stopping snapshot retention: %s", retention_err)
+
     # --- Graceful shutdown of enhanced architecture components ---
     if hasattr(app.state, "architecture"):
         logger.info("Shutting down enhanced architecture components...")
@@ -456,6 +490,13 @@ async def shutdown_event():
                 "Error during architecture component shutdown: %s", shutdown_err
             )
 
+    try:
+        from forest_app.persistence.database import dispose_async_engine
+
+        await dispose_async_engine()
+    except Exception as db_err:
+        logger.error("Error disposing async database engine: %s", db_err)
+
     logger.info("Shutdown event complete.")
 
 
@@ -468,6 +509,19 @@ async def read_root():
     return {"message": "Welcome to the Forest OS API (Version %s)" % app.version}
 
 
+@app.get("/health/db", tags=["Status"])
+async def database_health():
+    """Database reachability plus connection pool state and checkout metrics"""
+    try:
+        from forest_app.persistence.database import check_database
+
+        result = await check_database()
+    except Exception as health_err:
+        logger.error("Database health check unavailable: %s", health_err)
+        result = {"status": "unavailable"}
+    return JSONResponse(result, status_code=200 if result["status"] == "ok" else 503)
+
+
 # --------------------------------------------------------------------------
 # Local Development Run Hook
 # --------------------------------------------------------------------------
@@ -0,0 +1,78 @@
+"""
+Request deadline middleware for FastAPI
+"""
+
+import logging
+import time
+from typing import Optional
+from uuid import UUID
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from forest_app.core.request_context import RequestContext
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_HEADER = b"x-request-timeout"
+TRACE_HEADER = b"x-trace-id"
+
+
+class DeadlineMiddleware:
+    """
+    Gives every HTTP request a deadline and binds its RequestContext.
+
+    The budget is ``default_timeout`` seconds, or the ``X-Request-Timeout``
+    header (seconds) capped at ``max_timeout``. LLM calls made while handling
+    the request shrink their timeouts and stop retrying when it runs out.
+    Implemented as plain ASGI so the context reaches the endpoint (and any
+    streamed response body) without an extra task per request.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        default_timeout: Optional[float] = None,
+        max_timeout: Optional[float] = None,
+    ):
+        self.app = app
+        try:
+            from forest_app.config.settings import settings
+
+            settings_timeout = settings.REQUEST_TIMEOUT_SECONDS
+            settings_max = settings.REQUEST_TIMEOUT_MAX_SECONDS
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"Request timeout settings unavailable, using defaults: {e}")
+            settings_timeout, settings_max = 120.0, 600.0
+        # 0 disables the default deadline / the cap
+        self.default_timeout = settings_timeout if default_timeout is None else default_timeout
+        self.max_timeout = settings_max if max_timeout is None else max_timeout
+
+    def _timeout(self, headers: dict) -> Optional[float]:
+        raw = headers.get(TIMEOUT_HEADER)
+        if raw is not None:
+            try:
+                requested = float(raw)
+                if requested > 0:
+                    return min(requested, self.max_timeout) if self.max_timeout else requested
+            except ValueError:
+                logger.debug("Ignoring invalid X-Request-Timeout header: %r", raw)
+        return self.default_timeout or None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        timeout = self._timeout(headers)
+        context_fields = {}
+        if timeout is not None:
+            context_fields["deadline"] = time.monotonic() + timeout
+        if TRACE_HEADER in headers:
+            try:
+                context_fields["trace_id"] = UUID(headers[TRACE_HEADER].decode())
+            except (ValueError, UnicodeDecodeError):
+                pass
+
+        with RequestContext(**context_fields).bind():
+            await self.app(scope, receive, send)
@@ -0,0 +1,259 @@
+# forest_app/modules/hta_patch.py
+"""
+Delta-based HTA evolution support.
+
+Instead of sending the whole tree to the LLM and getting a whole tree back,
+patch evolution sends the relevant subtree in full plus a compact outline of
+the rest of the tree, and asks for a list of operations:
+
+    {"op": "add", "node_id": "...", "parent_id": "...", "position": 0, "node": {...}}
+    {"op": "remove", "node_id": "..."}
+    {"op": "update", "node_id": "...", "fields": {"title": "...", "priority": 0.8}}
+    {"op": "move", "node_id": "...", "parent_id": "...", "position": 2}
+
+``apply_patch`` validates the operations and applies them to a copy of the
+tree through ``HTATree.add_node`` / ``HTATree.remove_node``; if any operation
+is invalid the whole patch is rejected and the original tree is left as is.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from forest_app.modules.hta_tree import HTANode, HTATree
+
+logger = logging.getLogger(__name__)
+
+# Node fields the LLM may change with an "update" operation
+UPDATABLE_FIELDS = {
+    "title",
+    "description",
+    "priority",
+    "magnitude",
+    "is_milestone",
+    "depends_on",
+    "estimated_energy",
+    "estimated_time",
+    "status",
+}
+_DONE_STATUSES = {"completed", "pruned"}
+
+
+class HTAPatchError(ValueError):
+    """Raised when a patch cannot be applied; carries every problem found."""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+@dataclass
+class PatchResult:
+    """Outcome of applying a patch."""
+
+    tree: HTATree
+    applied: int = 0
+    counts: Dict[str, int] = field(default_factory=dict)
+
+
+def subtree_size(node: HTANode) -> int:
+    """Number of nodes in the subtree rooted at ``node``."""
+    count, stack = 0, [node]
+    while stack:
+        current = stack.pop()
+        count += 1
+        stack.extend(current.children)
+    return count
+
+
+def _first_open_leaf_path(root: HTANode) -> List[HTANode]:
+    """Path from the root to the first leaf (DFS order) that is not done."""
+    stack = [(root, [root])]
+    while stack:
+        node, path = stack.pop()
+        if not node.children:
+            if node.status.lower() not in _DONE_STATUSES:
+                return path
+            continue
+        for child in reversed(node.children):
+            stack.append((child, path + [child]))
+    return [root]
+
+
+def select_focus_node(tree: HTATree, max_nodes: int = 60) -> Optional[HTANode]:
+    """
+    Pick the subtree the user is currently working in.
+
+    Starting from the branch that holds the first unfinished leaf, descend
+    along that path until the subtree has at most ``max_nodes`` nodes.
+    """
+    if not tree.root:
+        return None
+    path = _first_open_leaf_path(tree.root)
+    focus = path[1] if len(path) > 1 else path[0]
+    for node in path[2:]:
+        if subtree_size(focus) <= max_nodes:
+            break
+        focus = node
+    return focus
+
+
+def build_outline(
+    tree: HTATree, focus_id: Optional[str] = None, max_nodes: int = 200
+) -> str:
+    """
+    Render the tree as an indented ``id: title [status]`` outline.
+
+    The focus subtree is shown as a single line (it is sent in full
+    separately). Nodes are included breadth-first up to ``max_nodes``;
+    children beyond the budget are summarized as a count.
+    """
+    if not tree.root:
+        return ""
+    included: Set[str] = set()
+    queue = [tree.root]
+    while queue and len(included) < max_nodes:
+        node = queue.pop(0)
+        included.add(node.id)
+        if node.id != focus_id:
+            queue.extend(node.children)
+
+    lines: List[str] = []
+    stack = [(tree.root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        indent = "  " * depth
+        marker = " (focus subtree, given in full below)" if node.id == focus_id else ""
+        lines.append(f"{indent}- {node.id}: {node.title} [{node.status}]{marker}")
+        if node.id == focus_id:
+            continue
+        shown = [child for child in node.children if child.id in included]
+        hidden = len(node.children) - len(shown)
+        if hidden:
+            lines.append(f"{indent}  - (+{hidden} more)")
+        for child in reversed(shown):
+            stack.append((child, depth + 1))
+    return "\n".join(lines)
+
+
+def _subtree_ids(node: HTANode) -> Set[str]:
+    ids, stack = set(), [node]
+    while stack:
+        current = stack.pop()
+        ids.add(current.id)
+        stack.extend(current.children)
+    return ids
+
+
+def _place(parent: HTANode, node: HTANode, position: Optional[int]) -> None:
+    """Move ``node`` (already the last child of ``parent``) to ``position``."""
+    if position is None:
+        return
+    parent.children.remove(node)
+    position = max(0, min(int(position), len(parent.children)))
+    parent.children.insert(position, node)
+
+
+def _get(op: Any, name: str) -> Any:
+    return op.get(name) if isinstance(op, dict) else getattr(op, name, None)
+
+
+def _apply_update(node: HTANode, fields: Dict[str, Any]) -> None:
+    unknown = set(fields) - UPDATABLE_FIELDS
+    if unknown:
+        raise ValueError(f"cannot update field(s) {sorted(unknown)}")
+    for name, value in fields.items():
+        if name == "priority":
+            node.priority = max(0.0, min(1.0, float(value)))
+        elif name == "magnitude":
+            node.magnitude = float(value)
+        elif name == "depends_on":
+            node.depends_on = [str(dep) for dep in (value or [])]
+        elif name == "is_milestone":
+            node.is_milestone = bool(value)
+        elif name == "status":
+            node.update_status(str(value))
+        else:
+            setattr(node, name, "" if value is None else str(value))
+
+
+def apply_patch(tree: HTATree, operations: Iterable[Any]) -> PatchResult:
+    """
+    Apply patch operations to a copy of ``tree``.
+
+    Operations are applied in order, so later ones may refer to nodes added
+    by earlier ones. Dependencies on removed nodes are dropped.
+
+    Args:
+        tree: The current tree (not modified)
+        operations: Dicts or objects with ``op``, ``node_id`` and, depending
+            on the operation, ``parent_id``, ``position``, ``node``, ``fields``
+
+    Returns:
+        PatchResult with the patched tree
+
+    Raises:
+        HTAPatchError: If any operation is invalid
+    """
+    if not tree.root:
+        raise HTAPatchError(["tree has no root"])
+    patched = HTATree.from_dict(tree.to_dict())
+    errors: List[str] = []
+    counts: Dict[str, int] = {}
+
+    for index, op in enumerate(operations):
+        kind = _get(op, "op")
+        node_id = str(_get(op, "node_id") or "")
+        parent_id = _get(op, "parent_id")
+        position = _get(op, "position")
+        label = f"#{index} {kind} {node_id}"
+        try:
+            if kind == "add":
+                data = dict(_get(op, "node") or {})
+                data["id"] = node_id or data.get("id")
+                if not data["id"]:
+                    raise ValueError("missing node_id")
+                new_node = HTANode.from_dict(data)
+                if not parent_id or not patched.add_node(str(parent_id), new_node):
+                    raise ValueError(
+                        f"parent {parent_id!r} not found or id already exists"
+                    )
+                _place(patched.find_node_by_id(str(parent_id)), new_node, position)
+            elif kind == "remove":
+                if not patched.remove_node(node_id):
+                    raise ValueError("node not found or is the root")
+            elif kind == "update":
+                node = patched.find_node_by_id(node_id)
+                if node is None:
+                    raise ValueError("node not found")
+                _apply_update(node, dict(_get(op, "fields") or {}))
+            elif kind == "move":
+                node = patched.find_node_by_id(node_id)
+                new_parent = patched.find_node_by_id(str(parent_id))
+                if node is None or new_parent is None:
+                    raise ValueError(f"node or new parent {parent_id!r} not found")
+                if new_parent.id in _subtree_ids(node):
+                    raise ValueError("cannot move a node under itself")
+                if not patched.remove_node(node_id) or not patched.add_node(
+                    new_parent.id, node
+                ):
+                    raise ValueError("move failed")
+                _place(new_parent, node, position)
+            else:
+                raise ValueError("unknown operation")
+        except (ValueError, TypeError) as e:
+            errors.append(f"{label}: {e}")
+            continue
+        counts[kind] = counts.get(kind, 0) + 1
+
+    if errors:
+        raise HTAPatchError(errors)
+
+    node_map = patched.get_node_map()
+    for node in node_map.values():
+        dangling = [dep for dep in node.depends_on if dep not in node_map]
+        if dangling:
+            logger.info("Dropping dependencies of %s on removed nodes %s", node.id, dangling)
+            node.depends_on = [dep for dep in node.depends_on if dep in node_map]
+    patched.propagate_status()
+    return PatchResult(tree=patched, applied=sum(counts.values()), counts=counts)
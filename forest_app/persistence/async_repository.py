@@ -0,0 +1,478 @@
+# forest_app/persistence/async_repository.py
+
+"""
+AsyncSession counterparts of the repositories in ``repository.py``.
+
+They keep the method names and transaction semantics of the synchronous
+repositories. Methods that talk to the database are coroutines. Methods
+that only stage changes in the session (``create_snapshot``,
+``update_snapshot``, ``add_segments``) stay synchronous, as
+``AsyncSession.add`` does, so helpers such as
+``save_snapshot_with_codename`` work with either kind of repository.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+from sqlalchemy.orm.attributes import flag_modified
+
+from forest_app.persistence.models import (
+    ConversationSummaryModel,
+    HTATreeModel,
+    MemorySnapshotModel,
+    ReflectionLogModel,
+    TaskFootprintModel,
+    UserModel,
+)
+from forest_app.persistence.repository import stage_new_snapshot, stage_snapshot_update
+from forest_app.persistence.snapshot_listing import list_snapshot_page
+
+logger = logging.getLogger(__name__)
+
+
+def _require_async_session(db: Any) -> None:
+    if not isinstance(db, AsyncSession):
+        raise TypeError("db must be a SQLAlchemy AsyncSession")
+
+
+# === User Repository Logic ===
+
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[UserModel]:
+    """Retrieves a user by their email address."""
+    _require_async_session(db)
+    try:
+        result = await db.execute(select(UserModel).where(UserModel.email == email))
+        return result.scalars().first()
+    except SQLAlchemyError as e:
+        logger.error(
+            "Database error retrieving user by email %s: %s", email, e, exc_info=True
+        )
+        raise
+
+
+# === AsyncMemorySnapshotRepository ===
+
+
+def _latest_snapshot_query(user_id: UUID):
+    return (
+        select(MemorySnapshotModel)
+        .where(MemorySnapshotModel.user_id == user_id)
+        .order_by(MemorySnapshotModel.updated_at.desc())
+    )
+
+
+class AsyncMemorySnapshotRepository:
+    """Repository for managing MemorySnapshot persistence with an AsyncSession."""
+
+    def __init__(self, db: AsyncSession):
+        """Initializes the repository with an async database session."""
+        _require_async_session(db)
+        self.db = db
+
+    def create_snapshot(
+        self, user_id: UUID, snapshot_data: dict, codename: Optional[str] = None
+    ) -> Optional[MemorySnapshotModel]:
+        """
+        Creates a new MemorySnapshot model instance and adds it to the session.
+        **Does NOT commit the transaction.**
+        """
+        return stage_new_snapshot(self.db, user_id, snapshot_data, codename)
+
+    def update_snapshot(
+        self,
+        snapshot_model: MemorySnapshotModel,
+        new_data: dict,
+        codename: Optional[str] = None,
+    ) -> Optional[MemorySnapshotModel]:
+        """
+        Updates attributes of an existing MemorySnapshot model instance within the session.
+        **Does NOT commit the transaction.** Only changed snapshot sections are written.
+        """
+        if not isinstance(snapshot_model, MemorySnapshotModel):
+            logger.warning(
+                "Attempted to update a non-existent or invalid snapshot model."
+            )
+            return None
+        return stage_snapshot_update(self.db, snapshot_model, new_data, codename)
+
+    async def get_latest_snapshot(self, user_id: UUID) -> Optional[MemorySnapshotModel]:
+        """Retrieves the latest MemorySnapshot for the specified user."""
+        if not isinstance(user_id, UUID):
+            raise TypeError("User ID must be a UUID.")
+        try:
+            result = await self.db.execute(_latest_snapshot_query(user_id).limit(1))
+            return result.scalars().first()
+        except SQLAlchemyError as e:
+            logger.error(
+                "Database error retrieving latest snapshot for user ID %s: %s",
+                user_id,
+                e,
+                exc_info=True,
+            )
+            raise
+
+    async def list_snapshots(
+        self, user_id: UUID, limit: int = 100
+    ) -> List[MemorySnapshotModel]:
+        """Lists snapshots for a specific user, ordered by most recently created/updated first."""
+        if not isinstance(user_id, UUID):
+            logger.error("User ID must be a UUID to list snapshots.")
+            return []
+        query = _latest_snapshot_query(user_id)
+        if limit > 0:
+            query = query.limit(limit)
+        try:
+            result = await self.db.execute(query)
+            return list(result.scalars().all())
+        except SQLAlchemyError as e:
+            logger.error(
+                "Database error listing snapshots for user ID %s: %s",
+                user_id,
+                e,
+                exc_info=True,
+            )
+            raise
+
+    async def list_snapshot_infos(
+        self, user_id: UUID, limit: int = 20, before: Optional[str] = None
+    ) -> Tuple[List[Any], Optional[str]]:
+        """
+        Lists snapshot summaries newest first, one page at a time.
+
+        See ``MemorySnapshotRepository.list_snapshot_infos``.
+        """
+        return await self.db.run_sync(
+            lambda session: list_snapshot_page(session, user_id, limit, before)
+        )
+
+    async def get_snapshot_by_id(
+        self, snapshot_id: UUID, user_id: UUID
+    ) -> Optional[MemorySnapshotModel]:
+        """Retrieves a specific snapshot by its ID, ensuring it belongs to the user."""
+        if not isinstance(user_id, UUID):
+            raise TypeError("User ID must be a UUID.")
+        try:
+            result = await self.db.execute(
+                select(MemorySnapshotModel).where(
+                    MemorySnapshotModel.id == snapshot_id,
+                    MemorySnapshotModel.user_id == user_id,
+                )
+            )
+            return result.scalars().first()
+        except SQLAlchemyError as e:
+            logger.error(
+                "Database error getting snapshot id %s for user ID %s: %s",
+                snapshot_id,
+                user_id,
+                e,
+                exc_info=True,
+            )
+            raise
+
+    async def delete_snapshot_by_id(self, snapshot_id: UUID, user_id: UUID) -> bool:
+        """
+        Deletes a specific snapshot by its ID, ensuring it belongs to the user.
+        !! Commits the transaction immediately. !!
+        """
+        if not isinstance(user_id, UUID):
+            logger.error("User ID must be a UUID to delete snapshot by ID.")
+            return False
+        try:
+            snapshot_to_delete = await self.get_snapshot_by_id(snapshot_id, user_id)
+            if not snapshot_to_delete:
+                logger.warning(
+                    "Snapshot id %s not found or not owned by user ID %s for deletion.",
+                    snapshot_id,
+                    user_id,
+                )
+                return False
+            await self.db.delete(snapshot_to_delete)
+            await self.db.commit()
+            logger.info("Deleted snapshot id %s for user ID %s", snapshot_id, user_id)
+            return True
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(
+                "Database error deleting snapshot id %s: %s",
+                snapshot_id,
+                e,
+                exc_info=True,
+            )
+            return False
+
+
+async def get_latest_snapshot_model(
+    user_id: UUID, db: AsyncSession
+) -> Optional[MemorySnapshotModel]:
+    """Retrieves the latest MemorySnapshotModel for a given user ID."""
+    return await AsyncMemorySnapshotRepository(db).get_latest_snapshot(user_id)
+
+
+# === AsyncHTATreeRepository ===
+
+
+class AsyncHTATreeRepository:
+    """Repository for managing HTATreeModel persistence with idempotency support."""
+
+    def __init__(self, db: AsyncSession):
+        _require_async_session(db)
+        self.db = db
+        self.model = HTATreeModel
+
+    async def get_tree(
+        self, tree_id: Union[str, UUID], user_id: Union[str, UUID]
+    ) -> Optional[HTATreeModel]:
+        """Retrieves a tree by ID for the specified user."""
+        try:
+            result = await self.db.execute(
+                select(self.model).where(
+                    self.model.id == tree_id, self.model.user_id == user_id
+                )
+            )
+            return result.scalars().first()
+        except SQLAlchemyError as e:
+            logger.error(f"Database error retrieving tree {tree_id}: {e}")
+            raise
+
+    async def find_by_metadata(
+        self, user_id: Union[str, UUID], metadata_key: str, metadata_value: Any
+    ) -> Optional[HTATreeModel]:
+        """Finds a tree by metadata key/value for the specified user (idempotency checks)."""
+        query = select(self.model).where(self.model.user_id == user_id)
+        if self.db.bind.dialect.name == "postgresql":
+            query = query.where(self.model.manifest.has_key(metadata_key))
+        try:
+            result = await self.db.execute(query)
+        except SQLAlchemyError as e:
+            logger.error(f"Database error finding tree by metadata: {e}")
+            raise
+        for tree in result.scalars():
+            if tree.manifest and tree.manifest.get(metadata_key) == metadata_value:
+                return tree
+        return None
+
+    async def update_metadata(
+        self, tree_id: Union[str, UUID], manifest: Dict[str, Any]
+    ) -> bool:
+        """Updates the manifest for a specific tree. ** Commits the transaction. **"""
+        try:
+            result = await self.db.execute(
+                select(self.model).where(self.model.id == tree_id)
+            )
+            tree = result.scalars().first()
+            if not tree:
+                return False
+            tree.manifest = manifest
+            flag_modified(tree, "manifest")
+            tree.updated_at = datetime.utcnow()
+            await self.db.commit()
+            return True
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Database error updating tree manifest: {e}")
+            raise
+
+
+# === Event log repositories ===
+
+
+class _AsyncLogRepository:
+    """Shared create/query logic of the task footprint and reflection logs."""
+
+    model: Any = None
+    required_fields: List[str] = []
+    label = "log"
+
+    def __init__(self, db: AsyncSession):
+        _require_async_session(db)
+        self.db = db
+
+    async def create_log(self, log_data: Dict[str, Any]) -> Optional[Any]:
+        """Creates and commits a log entry; returns None if it cannot be stored."""
+        if any(field not in log_data for field in self.required_fields):
+            logger.warning(
+                f"Missing required fields for {self.model.__name__}: needed "
+                f"{self.required_fields}, got {list(log_data.keys())}"
+            )
+            return None
+        log_data.setdefault("timestamp", datetime.utcnow())
+        try:
+            log_entry = self.model(**log_data)
+        except TypeError as e:
+            logger.error(
+                "TypeError during %s instantiation: %s | Data: %s",
+                self.model.__name__,
+                e,
+                log_data,
+                exc_info=True,
+            )
+            return None
+        try:
+            self.db.add(log_entry)
+            await self.db.commit()
+            await self.db.refresh(log_entry)
+            return log_entry
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error("DB error creating %s: %s", self.label, e, exc_info=True)
+            return None
+
+    async def _logs_where(self, column: str, value: Any) -> List[Any]:
+        try:
+            result = await self.db.execute(
+                select(self.model)
+                .where(getattr(self.model, column) == value)
+                .order_by(self.model.timestamp.asc())
+            )
+            return list(result.scalars().all())
+        except SQLAlchemyError as e:
+            logger.error(
+                "DB error getting %ss for %s %s: %s",
+                self.label,
+                column,
+                value,
+                e,
+                exc_info=True,
+            )
+            raise
+
+
+class AsyncTaskEventLogRepository(_AsyncLogRepository):
+    """Repository for managing TaskFootprintModel persistence."""
+
+    model = TaskFootprintModel
+    required_fields = ["user_id", "task_id", "event_type"]
+    label = "task footprint log"
+
+    async def get_logs_for_task(self, task_id: str) -> List[TaskFootprintModel]:
+        """Retrieves all TaskFootprint logs for a given task_id, ordered by timestamp."""
+        return await self._logs_where("task_id", task_id)
+
+
+class AsyncReflectionEventLogRepository(_AsyncLogRepository):
+    """Repository for managing ReflectionLogModel persistence."""
+
+    model = ReflectionLogModel
+    required_fields = ["user_id", "reflection_text"]
+    label = "reflection log"
+
+    async def get_logs_for_reflection(
+        self, reflection_id: Union[str, int]
+    ) -> List[ReflectionLogModel]:
+        """Retrieves ReflectionLog entries by ``reflection_id``, ordered by timestamp."""
+        if not hasattr(ReflectionLogModel, "reflection_id"):
+            logger.error("ReflectionLogModel has no 'reflection_id' column to query.")
+            return []
+        return await self._logs_where("reflection_id", reflection_id)
+
+
+# === AsyncConversationSummaryRepository ===
+
+
+class AsyncConversationSummaryRepository:
+    """Repository for compacted conversation history segments."""
+
+    def __init__(self, db: AsyncSession):
+        _require_async_session(db)
+        self.db = db
+
+    def add_segments(
+        self, user_id: UUID, segments: List[Dict[str, Any]]
+    ) -> List[ConversationSummaryModel]:
+        """
+        Adds compacted history segments to the session.
+        **Does NOT commit the transaction**, so segments are saved atomically
+        with the snapshot they were removed from.
+        """
+        if not isinstance(user_id, UUID):
+            raise TypeError("User ID must be a UUID to store history segments.")
+        models = [
+            ConversationSummaryModel(
+                user_id=user_id,
+                kind=segment.get("kind", "conversation"),
+                summary=segment.get("summary") or "",
+                turns=segment.get("turns"),
+                turn_count=segment.get("turn_count", len(segment.get("turns") or [])),
+                first_turn_at=segment.get("first_turn_at"),
+                last_turn_at=segment.get("last_turn_at"),
+            )
+            for segment in segments
+        ]
+        self.db.add_all(models)
+        if models:
+            logger.info(
+                "Added %d history segment(s) for user ID %s to session.",
+                len(models),
+                user_id,
+            )
+        return models
+
+    async def list_summaries(
+        self,
+        user_id: UUID,
+        kind: Optional[str] = None,
+        limit: int = 20,
+        before_id: Optional[int] = None,
+    ) -> List[ConversationSummaryModel]:
+        """
+        Lists summaries newest first, one page at a time.
+
+        Uses keyset pagination on ``id`` (pass the last id of the previous
+        page as ``before_id``); the raw ``turns`` column is not loaded.
+        """
+        if not isinstance(user_id, UUID):
+            logger.error("User ID must be a UUID to list history summaries.")
+            return []
+        query = (
+            select(ConversationSummaryModel)
+            .options(defer(ConversationSummaryModel.turns))
+            .where(ConversationSummaryModel.user_id == user_id)
+        )
+        if kind:
+            query = query.where(ConversationSummaryModel.kind == kind)
+        if before_id is not None:
+            query = query.where(ConversationSummaryModel.id < before_id)
+        try:
+            result = await self.db.execute(
+                query.order_by(ConversationSummaryModel.id.desc()).limit(max(1, limit))
+            )
+            return list(result.scalars().all())
+        except SQLAlchemyError as e:
+            logger.error(
+                "Database error listing history summaries for user ID %s: %s",
+                user_id,
+                e,
+                exc_info=True,
+            )
+            raise
+
+    async def get_summary(
+        self, user_id: UUID, summary_id: int
+    ) -> Optional[ConversationSummaryModel]:
+        """Retrieves one summary, including its raw turns, if it belongs to the user."""
+        if not isinstance(user_id, UUID):
+            raise TypeError("User ID must be a UUID.")
+        try:
+            result = await self.db.execute(
+                select(ConversationSummaryModel).where(
+                    ConversationSummaryModel.id == summary_id,
+                    ConversationSummaryModel.user_id == user_id,
+                )
+            )
+            return result.scalars().first()
+        except SQLAlchemyError as e:
+            logger.error(
+                "Database error getting history summary %s for user ID %s: %s",
+                summary_id,
+                user_id,
+                e,
+                exc_info=True,
+            )
+            raise
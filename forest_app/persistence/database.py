@@ -1,12 +1,23 @@
 # forest_app/persistence/database.py (Refactored with get_db and Pydantic settings)
 
+import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
-from typing import Generator  # Import Generator for type hint
+from typing import Any, AsyncGenerator, Dict, Generator  # Import Generator for type hint
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
+from forest_app.persistence.pool import (
+    PoolConfig,
+    pool_state,
+    warm_up_async_pool,
+    warm_up_pool,
+)
+from forest_app.utils.json_codec import engine_json_options
+
 # --- Settings Import (Using Pydantic settings object) ---
 print(">>> DEBUG DB: Importing from Pydantic settings.py")
 try:
@@ -58,12 +69,13 @@ def _dummy_session_factory():
 # --- Initialize SessionLocal with the dummy function ---
 SessionLocal = _dummy_session_factory
 logger.info(
-    "SessionLocal initialized with a dummy factory (will be replaced upon successful DB connection)."
+    "SessionLocal initialized with a dummy factory (will be replaced once the engine is created)."
 )
 
 # --- Initialize SQLAlchemy engine and Base ---
 engine = None
 Base = declarative_base()
+pool_config = PoolConfig.from_settings()
 
 # --- Attempt to Create SQLAlchemy Engine and Redefine SessionLocal ---
 # Check if the connection string was successfully retrieved from settings
@@ -71,28 +83,17 @@ if db_connection_string:
     try:
         SQLALCHEMY_DATABASE_URL = db_connection_string  # Use the retrieved string
         engine = create_engine(
-            SQLALCHEMY_DATABASE_URL, pool_recycle=1800, pool_pre_ping=True
+            SQLALCHEMY_DATABASE_URL,
+            **pool_config.engine_options(SQLALCHEMY_DATABASE_URL),
+            **engine_json_options(),
         )
         logger.info(
             "SQLAlchemy engine creation attempt successful using URL from settings."
         )  # Log source
 
-        # Test connection immediately after creating engine
-        try:
-            with engine.connect() as connection:
-                logger.info("Database connection test successful.")
-
-            # --- IMPORTANT: Redefine SessionLocal with the working engine ---
-            SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-            logger.info("SessionLocal redefined successfully with the database engine.")
-
-        except Exception as conn_test_e:
-            logger.critical(
-                f"CRITICAL: Engine created but connection test failed: {conn_test_e}",
-                exc_info=True,
-            )
-            engine = None  # Reset engine
-            # SessionLocal remains the dummy factory
+        # Connects lazily; warm_up_database() opens connections at startup
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        logger.info("SessionLocal redefined successfully with the database engine.")
 
     except Exception as e:
         logger.critical(f"CRITICAL: Failed during engine creation: {e}", exc_info=True)
@@ -108,6 +109,62 @@ else:
     # SessionLocal remains the dummy factory
 
 
+# --- Async engine (asyncpg / aiosqlite) for the async API routers ---
+# Sync backends and the asyncio driver used in their place
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """
+    Maps a sync database URL onto the asyncio driver of the same backend.
+
+    ``postgresql://`` (any sync driver) becomes ``postgresql+asyncpg://`` and
+    ``sqlite://`` becomes ``sqlite+aiosqlite://``; asyncpg takes ``ssl``
+    instead of libpq's ``sslmode``. Other URLs are returned unchanged.
+    """
+    scheme, separator, rest = url.partition("://")
+    driver = ASYNC_DRIVERS.get(scheme.split("+", 1)[0])
+    if not separator or driver is None or scheme == driver:
+        return url
+    if driver.endswith("asyncpg"):
+        rest = rest.replace("sslmode=", "ssl=")
+    return f"{driver}://{rest}"
+
+
+async_engine = None
+AsyncSessionLocal = None
+
+if db_connection_string:
+    try:
+        ASYNC_DATABASE_URL = getattr(
+            settings, "DB_ASYNC_CONNECTION_STRING", None
+        ) or to_async_url(db_connection_string)
+        # Connects lazily; a missing driver fails here, a bad URL on first use
+        async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            **pool_config.engine_options(ASYNC_DATABASE_URL, is_async=True),
+            **engine_json_options(),
+        )
+        # Objects stay usable after commit: lazy refreshes cannot run in async code
+        AsyncSessionLocal = sessionmaker(
+            async_engine,
+            class_=AsyncSession,
+            autocommit=False,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+        logger.info("Async SQLAlchemy engine created (%s).", async_engine.dialect.driver)
+    except Exception as e:
+        logger.error(
+            "Async database engine unavailable, async endpoints will fail: %s", e
+        )
+        async_engine = None
+
+
 # +++ NEW Standard FastAPI DB Dependency Function +++
 def get_db() -> Generator[Session, None, None]:
     """
@@ -158,10 +215,26 @@ def init_db():
 # --- Async Context Manager for Transaction-Protected Sessions ---
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    FastAPI dependency that yields an AsyncSession and ensures it's closed.
+
+    Queries and commits made through it do not block the event loop.
+    """
+    if AsyncSessionLocal is None:
+        logger.error("Async database engine not available: cannot create session.")
+        raise RuntimeError(
+            "Async database connection failed or not established during startup."
+        )
+
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 @asynccontextmanager
-async def get_db_session() -> Generator[Session, None, None]:
+async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
     """
-    Async context manager that yields a SQLAlchemy session and ensures it's closed.
+    Async context manager that yields an AsyncSession and ensures it's closed.
     Used with transaction_protected decorator for async database operations.
 
     Example:
@@ -170,24 +243,96 @@ async def get_db_session() -> Generator[Session, None, None]:
             session.add(model)
             await session.commit()
     """
-    if SessionLocal is _dummy_session_factory:
-        logger.error(
-            "Database not connected: Cannot create session using dummy factory."
-        )
+    if AsyncSessionLocal is None:
+        logger.error("Async database engine not available: cannot create session.")
         raise RuntimeError(
-            "Database connection failed or not established during startup."
+            "Async database connection failed or not established during startup."
         )
 
-    db = SessionLocal()
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            logger.error(f"Error in database session context manager: {e}")
+            await db.rollback()
+            raise
+
+
+async def warm_up_database() -> bool:
+    """
+    Opens pool connections on both engines ahead of the first requests (startup).
+
+    ``DB_POOL_WARMUP_CONNECTIONS=0`` skips the warm-up; engines then connect on
+    first use.
+
+    Returns:
+        True if every engine connected (or warm-up is disabled); failures are
+        logged, not raised
+    """
+    # More than pool_size would only open overflow connections that are discarded
+    connections = min(pool_config.warmup_connections, pool_config.pool_size)
+    if connections <= 0:
+        logger.info("Database pool warm-up disabled.")
+        return True
+    healthy = True
+    if engine is not None:
+        try:
+            opened = await asyncio.to_thread(warm_up_pool, engine, connections)
+            logger.info("Database pool warmed up with %d connection(s).", opened)
+        except Exception as e:
+            healthy = False
+            logger.critical(f"CRITICAL: Database connection test failed: {e}", exc_info=True)
+    if async_engine is not None:
+        try:
+            opened = await warm_up_async_pool(async_engine, connections)
+            logger.info("Async database pool warmed up with %d connection(s).", opened)
+        except Exception as e:
+            healthy = False
+            logger.critical(f"CRITICAL: Async database connection test failed: {e}")
+    return healthy
+
+
+def get_pool_status() -> Dict[str, Any]:
+    """Pool state and checkout metrics of the sync and async engines."""
+    return {"sync": pool_state(engine), "async": pool_state(async_engine)}
+
+
+async def check_database() -> Dict[str, Any]:
+    """
+    Runs ``SELECT 1`` on the async engine (or the sync one in a thread).
+
+    Returns:
+        ``status`` ("ok" / "unavailable"), the query latency when ok, and
+        ``get_pool_status()``; error details are only logged, as the result
+        is served to unauthenticated health checks
+    """
+    start = time.perf_counter()
+    result: Dict[str, Any] = {"status": "ok"}
     try:
-        yield db
+        if async_engine is not None:
+            async with async_engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+        elif engine is not None:
+
+            def _ping() -> None:
+                with engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+
+            await asyncio.to_thread(_ping)
+        else:
+            raise RuntimeError("Database engine not initialized.")
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
     except Exception as e:
-        logger.error(f"Error in database session context manager: {e}")
-        db.rollback()
-        raise
-    finally:
-        logger.debug("Closing database session.")
-        db.close()
+        logger.error("Database health check failed: %s", e)
+        result["status"] = "unavailable"
+    result["pools"] = get_pool_status()
+    return result
+
+
+async def dispose_async_engine() -> None:
+    """Closes the async engine's pooled connections (application shutdown)."""
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
 print(
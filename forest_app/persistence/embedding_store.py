@@ -0,0 +1,180 @@
+"""
+Packed float32 storage for semantic-memory embeddings.
+
+Embeddings make up most of a snapshot's semantic memories, and as JSON float
+lists they cost about 20 bytes per value and are re-parsed into Python floats
+on every load. When a snapshot is saved, ``pack_embeddings`` moves each
+memory's ``embedding`` into one float32 blob (``embedding_data``) and leaves
+a small marker in its place. ``unpack_embeddings`` restores them on load as
+read-only NumPy arrays that are views into the blob (``np.frombuffer``, no
+copy).
+
+Blob layout: a 4-byte header (``b"EMB"`` + compression flag) followed by the
+float32 values of all embeddings in memory order, optionally zlib-compressed.
+
+``SNAPSHOT_EMBEDDING_STORAGE`` selects the format for new saves:
+
+- ``float32`` (default): packed, uncompressed
+- ``float32+zlib``: packed and zlib-compressed (smaller, slower to load)
+- ``json``: embeddings stay inline as float lists
+
+Snapshots stored with inline embeddings are read as before and packed on
+their next save. Values are stored as float32, the precision embedding
+models produce.
+"""
+
+import logging
+import zlib
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FLOAT32 = "float32"
+FLOAT32_ZLIB = "float32+zlib"
+INLINE_JSON = "json"
+STORAGE_FORMATS = (FLOAT32, FLOAT32_ZLIB, INLINE_JSON)
+
+MAGIC = b"EMB"
+_UNCOMPRESSED = b"\x00"
+_ZLIB = b"\x01"
+HEADER_SIZE = len(MAGIC) + 1
+# Marker left in a memory in place of its packed embedding
+MARKER = "__float32__"
+
+
+def _as_vector(embedding: Any) -> Optional[np.ndarray]:
+    """Embedding as a 1-D float32 array, or None if it is not a numeric vector."""
+    if isinstance(embedding, np.ndarray):
+        vector = embedding
+    elif isinstance(embedding, (list, tuple)) and embedding:
+        try:
+            vector = np.asarray(embedding, dtype=np.float32)
+        except (TypeError, ValueError):
+            return None
+    else:
+        return None
+    if vector.ndim != 1 or vector.size == 0 or vector.dtype.kind not in "fiu":
+        return None
+    return vector.astype(np.float32, copy=False)
+
+
+def pack_embeddings(
+    semantic_memories: Any, storage: str = FLOAT32
+) -> Tuple[Any, Optional[bytes]]:
+    """
+    Move the memories' embeddings into a packed float32 blob.
+
+    Args:
+        semantic_memories: ``MemorySnapshot.semantic_memories`` (not mutated)
+        storage: One of STORAGE_FORMATS
+
+    Returns:
+        ``(semantic_memories without embeddings, blob)``; the input and None
+        when there is nothing to pack or ``storage`` is ``json``
+    """
+    if storage == INLINE_JSON or not isinstance(semantic_memories, dict):
+        return semantic_memories, None
+    memories = semantic_memories.get("memories")
+    if not isinstance(memories, list):
+        return semantic_memories, None
+
+    stripped: List[Any] = []
+    vectors: List[np.ndarray] = []
+    for memory in memories:
+        vector = _as_vector(memory.get("embedding")) if isinstance(memory, dict) else None
+        if vector is None:
+            stripped.append(memory)
+            continue
+        stripped.append({**memory, "embedding": {MARKER: int(vector.size)}})
+        vectors.append(vector)
+    if not vectors:
+        return semantic_memories, None
+
+    payload = np.concatenate(vectors).tobytes()
+    if storage == FLOAT32_ZLIB:
+        blob = MAGIC + _ZLIB + zlib.compress(payload, 1)
+    else:
+        blob = MAGIC + _UNCOMPRESSED + payload
+    return {**semantic_memories, "memories": stripped}, blob
+
+
+def _payload(blob: Any) -> Any:
+    """The float32 buffer of a blob (decompressed if needed)."""
+    view = memoryview(blob)
+    if bytes(view[: len(MAGIC)]) != MAGIC:
+        raise ValueError("Not an embedding blob")
+    flag = bytes(view[len(MAGIC) : HEADER_SIZE])
+    if flag == _ZLIB:
+        return zlib.decompress(view[HEADER_SIZE:])
+    if flag == _UNCOMPRESSED:
+        return view[HEADER_SIZE:]
+    raise ValueError(f"Unknown embedding blob compression flag {flag!r}")
+
+
+def unpack_embeddings(semantic_memories: Any, blob: Any) -> Any:
+    """
+    Restore packed embeddings as read-only float32 arrays.
+
+    Args:
+        semantic_memories: Semantic memories as returned by ``pack_embeddings``
+        blob: The packed blob (bytes or memoryview); None leaves them unchanged
+
+    Returns:
+        A new semantic memories dict; the input is not mutated
+    """
+    if blob is None or not isinstance(semantic_memories, dict):
+        return semantic_memories
+    memories = semantic_memories.get("memories")
+    if not isinstance(memories, list):
+        return semantic_memories
+    try:
+        values = np.frombuffer(_payload(blob), dtype=np.float32)
+    except (ValueError, zlib.error) as e:
+        logger.error("Unreadable embedding blob, embeddings dropped: %s", e)
+        values = np.empty(0, dtype=np.float32)
+
+    restored: List[Any] = []
+    offset = 0
+    for memory in memories:
+        embedding = memory.get("embedding") if isinstance(memory, dict) else None
+        if not (isinstance(embedding, dict) and MARKER in embedding):
+            restored.append(memory)
+            continue
+        size = embedding[MARKER]
+        vector = values[offset : offset + size]
+        if len(vector) != size:
+            logger.error("Embedding blob shorter than its memories, embedding dropped.")
+            vector = None
+        restored.append({**memory, "embedding": vector})
+        offset += size
+    return {**semantic_memories, "memories": restored}
+
+
+_storage: Optional[str] = None
+
+
+def get_embedding_storage() -> str:
+    """Return the embedding storage format selected by settings."""
+    global _storage
+    if _storage is None:
+        try:
+            from forest_app.config.settings import settings
+
+            _storage = settings.SNAPSHOT_EMBEDDING_STORAGE
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"Embedding storage setting unavailable, using float32: {e}")
+            _storage = FLOAT32
+        if _storage not in STORAGE_FORMATS:
+            logger.warning("Unknown embedding storage '%s', using float32.", _storage)
+            _storage = FLOAT32
+    return _storage
+
+
+def set_embedding_storage(storage: str) -> None:
+    """Override the storage format for new saves (benchmarks and tests)."""
+    global _storage
+    if storage not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown embedding storage '{storage}'")
+    _storage = storage
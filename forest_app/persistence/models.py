@@ -6,7 +6,7 @@ from enum import Enum as PyEnum
 from typing import Any, Dict, List, Optional  # Ensure basic types are imported
 
 # --- SQLAlchemy Imports ---
-from sqlalchemy import Boolean, DateTime, ForeignKey, Index, String, Text, Column
+from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String, Text, Column, and_
 from sqlalchemy import Enum as SqlAlchemyEnum
 
 # --- ADDED/MODIFIED IMPORT for PostgreSQL types ---
@@ -22,9 +22,25 @@ from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func  # For server-side timestamp defaults
 from sqlalchemy.types import TEXT, TypeDecorator
 
+from forest_app.persistence.snapshot_sections import (
+    read_snapshot_data,
+    write_snapshot_data,
+)
+from forest_app.utils import json_codec
+
+# Dialects whose JSON column types serialize values themselves
+NATIVE_JSON_DIALECTS = ("postgresql", "sqlite")
+
 
 class JSONType(TypeDecorator):
-    """Platform-independent JSON type: uses JSONB for Postgres, JSON for SQLite, TEXT fallback."""
+    """Platform-independent JSON type: uses JSONB for Postgres, JSON for SQLite, TEXT fallback.
+
+    On JSONB and SQLite JSON columns values are passed through and encoded
+    once by the dialect (through the engine's ``json_serializer``, see
+    ``json_codec.engine_json_options``); only the TEXT fallback encodes and
+    decodes here. Rows the old type double-encoded in JSON columns are
+    unwrapped by the ``unwrap_double_encoded_json`` migration.
+    """
 
     impl = TEXT
     cache_ok = True
@@ -41,18 +57,16 @@ class JSONType(TypeDecorator):
             return dialect.type_descriptor(TEXT())
 
     def process_bind_param(self, value, dialect):
-        import json
-
-        if value is not None:
-            return json.dumps(value)
-        return None
+        if value is None:
+            return None
+        if dialect.name in NATIVE_JSON_DIALECTS:
+            return value
+        return json_codec.dumps(value)
 
     def process_result_value(self, value, dialect):
-        import json
-
-        if value is not None:
-            return json.loads(value)
-        return None
+        if value is None or dialect.name in NATIVE_JSON_DIALECTS:
+            return value  # Decoded by the dialect; a str is a JSON string value
+        return json_codec.loads(value)
 
 
 # --- Base Class ---
@@ -85,6 +99,8 @@ class UserModel(Base):
     snapshots = relationship("MemorySnapshotModel", back_populates="user", cascade="all, delete-orphan")
     task_footprints = relationship("TaskFootprintModel", back_populates="user", cascade="all, delete-orphan")
     reflection_logs = relationship("ReflectionLogModel", back_populates="user", cascade="all, delete-orphan")
+    conversation_summaries = relationship("ConversationSummaryModel", back_populates="user", cascade="all, delete-orphan")
+    archived_snapshots = relationship("ArchivedSnapshotModel", back_populates="user", cascade="all, delete-orphan")
     hta_trees = relationship("HTATreeModel", back_populates="user", cascade="all, delete-orphan")
     hta_nodes = relationship("HTANodeModel", back_populates="user", cascade="all, delete-orphan")
 
@@ -182,7 +198,13 @@ class MemorySnapshotModel(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
-    snapshot_data = Column(JSONType, nullable=True)
+    # Core document; large sections have their own columns (persistence/snapshot_sections.py)
+    core_data = Column("snapshot_data", JSONType, nullable=True)
+    hta_tree_data = Column(JSONType, nullable=True)
+    semantic_memory_data = Column(JSONType, nullable=True)
+    log_data = Column(JSONType, nullable=True)
+    embedding_data = Column(LargeBinary, nullable=True)  # Packed float32 embeddings
+    section_hashes = Column(JSONType, nullable=True)  # Content hash per section
     codename = Column(String, nullable=True)  # Added codename field
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -190,6 +212,76 @@ class MemorySnapshotModel(Base):
     # --- Relationships ---
     user = relationship("UserModel", back_populates="snapshots")
 
+    __table_args__ = (
+        # Latest snapshot per user (ORDER BY updated_at DESC LIMIT 1)
+        Index("idx_memory_snapshots_user_id_updated_at", user_id, updated_at.desc()),
+    )
+
+    @property
+    def snapshot_data(self) -> Optional[Dict[str, Any]]:
+        """The full snapshot document, reassembled from its sections."""
+        return read_snapshot_data(self)
+
+    @snapshot_data.setter
+    def snapshot_data(self, data: Optional[Dict[str, Any]]) -> None:
+        write_snapshot_data(self, data)
+
+
+# --- Archived Memory Snapshot Model ---
+class ArchivedSnapshotModel(Base):
+    """Snapshot moved out of memory_snapshots by the retention policy.
+
+    See core/snapshot_retention.py and persistence/snapshot_archive.py.
+    """
+
+    __tablename__ = "memory_snapshot_archive"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)  # The snapshot's original id
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    codename = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+    document = Column(LargeBinary, nullable=False)  # zlib-compressed JSON document
+    embedding_data = Column(LargeBinary, nullable=True)  # Packed float32 embeddings
+
+    # --- Relationships ---
+    user = relationship("UserModel", back_populates="archived_snapshots")
+
+    __table_args__ = (
+        # Paged listing of a user's archived snapshots, newest first
+        Index("idx_memory_snapshot_archive_user_id_updated_at", user_id, updated_at.desc()),
+    )
+
+
+# --- Conversation Summary Model ---
+class ConversationSummaryModel(Base):
+    """Compacted segment of a user's conversation history or reflection log.
+
+    Older turns are moved out of the snapshot into these rows so that the
+    snapshot stays bounded; the raw turns are kept for on-demand loading.
+    """
+
+    __tablename__ = "conversation_summaries"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    kind = Column(String(20), nullable=False)  # 'conversation' | 'reflection'
+    summary = Column(Text, nullable=False)
+    turns = Column(JSONType, nullable=True)
+    turn_count = Column(Integer, nullable=False, default=0)
+    first_turn_at = Column(String(64), nullable=True)
+    last_turn_at = Column(String(64), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # --- Relationships ---
+    user = relationship("UserModel", back_populates="conversation_summaries")
+
+    __table_args__ = (
+        # Paged listing, newest first, optionally filtered by kind
+        Index("idx_conversation_summaries_user_kind_id", user_id, kind, id),
+    )
+
 
 # --- Task Footprint Model ---
 class TaskFootprintModel(Base):
@@ -220,3 +312,56 @@ class ReflectionLogModel(Base):
 
     # --- Relationships ---
     user = relationship("UserModel", back_populates="reflection_logs")
+
+
+# --- Durable Task Queue Entry Model ---
+class TaskQueueEntryModel(Base):
+    """Row-per-task storage backing the durable TaskQueue store.
+
+    Timestamps that drive claiming and expiry are stored as epoch seconds so the
+    lease comparisons behave identically on SQLite and PostgreSQL.
+    """
+
+    __tablename__ = "task_queue_entries"
+
+    id = Column(String(64), primary_key=True)
+    task_name = Column(String(255), nullable=False)
+    args = Column(JSONType, nullable=True)
+    kwargs = Column(JSONType, nullable=True)
+    task_metadata = Column(JSONType, nullable=True)
+    # Optional idempotency key used to coalesce duplicate queued tasks
+    dedup_key = Column(String(255), nullable=True)
+    # For a duplicate folded into a queued task: the task producing its result
+    coalesced_into = Column(String(64), nullable=True)
+    priority = Column(Integer, nullable=False, default=5)
+    # queued | processing | completed | failed | dead | coalesced
+    status = Column(String(20), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(Float, nullable=False)
+    lease_owner = Column(String(64), nullable=True)
+    lease_expires_at = Column(Float, nullable=True)
+    result = Column(JSONType, nullable=True)
+    error = Column(JSONType, nullable=True)
+    expires_at = Column(Float, nullable=True)
+    created_at = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)
+
+    __table_args__ = (
+        # Claim scan: next runnable task by priority
+        Index("idx_task_queue_status_priority_available", status, priority, available_at),
+        # Lease reclaim scan for crashed workers
+        Index("idx_task_queue_status_lease", status, lease_expires_at),
+        # TTL index for expiring finished results
+        Index("idx_task_queue_expires_at", expires_at),
+        # Lookup of queued tasks sharing a dedup key
+        Index("idx_task_queue_dedup_key_status", dedup_key, status),
+        # At most one not-yet-started task per dedup key
+        Index(
+            "uq_task_queue_pending_dedup_key",
+            dedup_key,
+            unique=True,
+            sqlite_where=and_(status == "queued", attempts == 0),
+            postgresql_where=and_(status == "queued", attempts == 0),
+        ),
+    )
@@ -0,0 +1,233 @@
+"""
+Connection pool configuration, instrumentation and warm-up.
+
+``PoolConfig`` carries the pool parameters from settings (``DB_POOL_*``) and
+turns them into ``create_engine`` / ``create_async_engine`` keyword arguments
+with ``engine_options``. Backends that pool with ``QueuePool`` get an
+instrumented subclass that records, per engine:
+
+- checkouts, and the time each one waited for a connection (including
+  connecting and the pre-ping);
+- checkouts that gave up after ``pool_timeout`` seconds.
+
+``pool_state`` combines those metrics with the pool's current size, checked
+out and overflow connections; ``/health/db`` reports it. SQLite keeps its
+default pool and reports state only.
+
+``warm_up_pool`` / ``warm_up_async_pool`` open connections ahead of the first
+requests; the application calls them at startup rather than connecting when
+``persistence.database`` is imported.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PoolConfig:
+    """Connection pool parameters, applied to each engine separately."""
+
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    warmup_connections: int = 2
+
+    @classmethod
+    def from_settings(cls) -> "PoolConfig":
+        """Build the pool configuration from application settings, falling back to defaults."""
+        try:
+            from forest_app.config.settings import settings
+
+            return cls(
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+                pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+                pool_pre_ping=settings.DB_POOL_PRE_PING,
+                warmup_connections=settings.DB_POOL_WARMUP_CONNECTIONS,
+            )
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"Pool settings unavailable, using defaults: {e}")
+            return cls()
+
+    def engine_options(self, url: str, is_async: bool = False) -> Dict[str, Any]:
+        """
+        Pool keyword arguments for an engine on ``url``.
+
+        Args:
+            url: Database URL the engine connects to
+            is_async: Whether the options are for ``create_async_engine``
+
+        Returns:
+            Keyword arguments for ``create_engine`` / ``create_async_engine``
+        """
+        options: Dict[str, Any] = {
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping,
+        }
+        if url.split(":", 1)[0].split("+", 1)[0] == "sqlite":
+            # SQLite uses NullPool / SingletonThreadPool, which take no sizing
+            return options
+        options.update(
+            poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout,
+        )
+        return options
+
+
+class PoolMetrics:
+    """Counts pool checkouts, the time they waited and those that timed out."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._metrics = {
+                "checkouts": 0,
+                "timeouts": 0,
+                "wait_seconds": 0.0,
+                "max_wait_seconds": 0.0,
+            }
+
+    def record_checkout(self, wait: float, timed_out: bool = False) -> None:
+        with self._lock:
+            m = self._metrics
+            if timed_out:
+                m["timeouts"] += 1
+            else:
+                m["checkouts"] += 1
+                m["wait_seconds"] += wait
+            m["max_wait_seconds"] = max(m["max_wait_seconds"], wait)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Totals, plus the average wait per successful checkout."""
+        with self._lock:
+            m = dict(self._metrics)
+        m["avg_wait_seconds"] = m["wait_seconds"] / m["checkouts"] if m["checkouts"] else 0.0
+        return m
+
+
+class _InstrumentedPoolMixin:
+    """Times ``connect`` (a checkout) on a QueuePool; metrics survive ``recreate``."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def connect(self) -> Any:
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.metrics.record_checkout(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record_checkout(time.perf_counter() - start)
+        return connection
+
+    def recreate(self) -> Any:
+        # Called on dispose() and after a disconnect invalidates the pool
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    """QueuePool recording checkout metrics."""
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool recording checkout metrics."""
+
+
+def pool_state(engine: Any) -> Optional[Dict[str, Any]]:
+    """
+    Current state and checkout metrics of an engine's pool.
+
+    Args:
+        engine: ``Engine`` or ``AsyncEngine``; None if it was not created
+
+    Returns:
+        The pool class, its connection counts (QueuePool only) and metrics
+        (instrumented pools only), or None without an engine
+    """
+    if engine is None:
+        return None
+    pool = engine.pool
+    state: Dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        checked_out = pool.checkedout()
+        capacity = pool.size() + max(0, pool._max_overflow)
+        state.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=checked_out,
+            overflow=max(0, pool.overflow()),
+            utilization=checked_out / capacity if capacity else 0.0,
+        )
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        state["metrics"] = metrics.get_metrics()
+    return state
+
+
+def warm_up_pool(engine: Any, connections: int) -> int:
+    """
+    Open up to ``connections`` connections on a sync engine and return them to its pool.
+
+    Returns:
+        Number of connections opened
+
+    Raises:
+        Exception: The driver error if the database cannot be reached
+    """
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(engine.connect())
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+
+async def warm_up_async_pool(engine: Any, connections: int) -> int:
+    """
+    Open up to ``connections`` connections on an ``AsyncEngine`` concurrently.
+
+    Returns:
+        Number of connections opened
+
+    Raises:
+        Exception: The driver error if the database cannot be reached
+    """
+    opened = []
+
+    async def _open() -> None:
+        opened.append(await engine.connect().start())
+
+    try:
+        results = await asyncio.gather(
+            *(_open() for _ in range(connections)), return_exceptions=True
+        )
+    finally:
+        for connection in opened:
+            await connection.close()
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return len(opened)
@@ -2,14 +2,14 @@
 
 import logging
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Union  # <-- Add Union here
+from typing import Any, Dict, List, Optional, Tuple, Union  # <-- Add Union here
 from uuid import UUID
 
 # --- END IMPORT ---
 # Cast/String might still be needed if other parts of your app use them,
 # but removed from user_id logic here. Keeping import for now.
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, defer
 
 # --- ADD THIS IMPORT ---
 from sqlalchemy.orm.attributes import flag_modified
@@ -22,6 +22,14 @@ from forest_app.persistence.models import (
     HTANodeModel,
     TaskFootprintModel,
     ReflectionLogModel,
+    ConversationSummaryModel,
+    ArchivedSnapshotModel,
+)
+from forest_app.persistence.snapshot_cache import get_snapshot_cache
+from forest_app.persistence.snapshot_listing import list_snapshot_page
+from forest_app.persistence.snapshot_sections import (
+    session_dialect_name,
+    write_snapshot_data,
 )
 from forest_app.utils.import_fallbacks import import_with_fallback
 
@@ -151,6 +159,66 @@ def create_user(db: Session, user_data: Dict[str, Any]) -> Optional[UserModel]:
 # === MemorySnapshotRepository ===
 
 
+def stage_new_snapshot(
+    db: Any, user_id: UUID, snapshot_data: dict, codename: Optional[str] = None
+) -> MemorySnapshotModel:
+    """
+    Builds a new snapshot row and adds it to ``db`` (a Session or AsyncSession).
+
+    Shared by ``MemorySnapshotRepository`` and ``AsyncMemorySnapshotRepository``.
+    **Does NOT commit the transaction.**
+
+    Raises:
+        TypeError: If ``user_id`` is not a UUID
+    """
+    if not isinstance(user_id, UUID):
+        logger.error("User ID must be a UUID to create a snapshot.")
+        raise TypeError("User ID must be a UUID to create a snapshot.")
+    now = datetime.utcnow()
+    model = MemorySnapshotModel(
+        user_id=user_id,
+        codename=codename,
+        created_at=now,
+        # Set here too: keyset pagination and the snapshot cache compare it
+        updated_at=now,
+    )
+    write_snapshot_data(model, snapshot_data, session_dialect_name(db))
+    get_snapshot_cache().invalidate(user_id)
+    db.add(model)
+    logger.info(
+        "Added new snapshot object for user ID %s (codename: '%s') to session.",
+        user_id,
+        codename,
+    )
+    return model
+
+
+def stage_snapshot_update(
+    db: Any,
+    snapshot_model: MemorySnapshotModel,
+    new_data: dict,
+    codename: Optional[str] = None,
+) -> MemorySnapshotModel:
+    """
+    Writes the changed sections of ``new_data`` to an existing snapshot row.
+
+    Shared by ``MemorySnapshotRepository`` and ``AsyncMemorySnapshotRepository``.
+    **Does NOT commit the transaction.**
+    """
+    write_snapshot_data(snapshot_model, new_data, session_dialect_name(db))
+    get_snapshot_cache().invalidate(snapshot_model.user_id)
+    snapshot_model.updated_at = datetime.utcnow()
+    if codename is not None:  # Allow updating codename
+        snapshot_model.codename = codename
+    logger.info(
+        "Prepared update (flagged modified) for snapshot id %s for user ID %s (codename: '%s') in session.",
+        snapshot_model.id,
+        snapshot_model.user_id,
+        snapshot_model.codename,
+    )
+    return snapshot_model
+
+
 class MemorySnapshotRepository:
     """Repository for managing MemorySnapshot persistence."""
 
@@ -172,41 +240,8 @@ class MemorySnapshotRepository:
         Creates a new MemorySnapshot model instance and adds it to the session.
         **Does NOT commit the transaction.**
         """
-        if not isinstance(user_id, UUID):
-            logger.error("User ID must be a UUID to create a snapshot.")
-            # Raise TypeError for the endpoint to handle
-            raise TypeError("User ID must be a UUID to create a snapshot.")
-
-        now = datetime.utcnow()
-        try:
-            model = MemorySnapshotModel(
-                user_id=user_id,
-                snapshot_data=snapshot_data,
-                codename=codename,
-                created_at=now,
-                # 'updated_at' is typically set by the database or on update operations
-            )
-        except TypeError as e:
-            logger.error(
-                "TypeError during MemorySnapshotModel instantiation (likely import issue): %s",
-                e,
-                exc_info=True,
-            )
-            raise  # Re-raise to signal failure
-
         try:
-            self.db.add(model)
-            # --- ADDED flag_modified FOR CREATE ---
-            # Flag mutable field on add, ensuring changes are detected even if the instance
-            # isn't modified further before flush/commit.
-            flag_modified(model, "snapshot_data")
-            # --- END ADDED ---
-            logger.info(
-                "Added new snapshot object for user ID %s (codename: '%s') to session.",
-                user_id,
-                codename,
-            )
-            return model
+            return stage_new_snapshot(self.db, user_id, snapshot_data, codename)
         except SQLAlchemyError as e:
             logger.error(
                 "Database error preparing snapshot model for user ID %s: %s",
@@ -215,14 +250,6 @@ class MemorySnapshotRepository:
                 exc_info=True,
             )
             raise
-        except Exception as e:
-            logger.error(
-                "Unexpected error preparing snapshot model for user ID %s: %s",
-                user_id,
-                e,
-                exc_info=True,
-            )
-            raise
 
     def get_latest_snapshot(self, user_id: UUID) -> Optional[MemorySnapshotModel]:
         """Retrieves the latest MemorySnapshot for the specified user."""
@@ -297,7 +324,7 @@ class MemorySnapshotRepository:
     ) -> Optional[MemorySnapshotModel]:
         """
         Updates attributes of an existing MemorySnapshot model instance within the session.
-        **Does NOT commit the transaction.** Uses flag_modified for JSONB changes.
+        **Does NOT commit the transaction.** Only changed snapshot sections are written.
         """
         # Check if it's a valid model instance (and not the dummy class)
         if (
@@ -311,28 +338,7 @@ class MemorySnapshotRepository:
             return None
 
         try:
-            # Update attributes on the existing model instance
-            snapshot_model.snapshot_data = new_data  # Assign the new dictionary
-
-            # --- ADDED THIS LINE ---
-            # Explicitly mark the snapshot_data field as modified
-            # Crucial for JSON/JSONB fields where SQLAlchemy might not detect internal changes.
-            flag_modified(snapshot_model, "snapshot_data")
-            # --- END ADDED LINE ---
-
-            if hasattr(snapshot_model, "updated_at"):
-                snapshot_model.updated_at = datetime.utcnow()
-            if codename is not None:  # Allow updating codename
-                snapshot_model.codename = codename
-
-            log_user_id = snapshot_model.user_id
-            logger.info(
-                "Prepared update (flagged modified) for snapshot id %s for user ID %s (codename: '%s') in session.",
-                snapshot_model.id,
-                log_user_id,
-                snapshot_model.codename,
-            )
-            return snapshot_model
+            return stage_snapshot_update(self.db, snapshot_model, new_data, codename)
         except AttributeError as e:
             logger.error(
                 "AttributeError updating snapshot id %s (likely invalid model due to import or data issue): %s",
@@ -412,16 +418,34 @@ class MemorySnapshotRepository:
             )
             raise
 
+    def list_snapshot_infos(
+        self, user_id: UUID, limit: int = 20, before: Optional[str] = None
+    ) -> Tuple[List[Any], Optional[str]]:
+        """
+        Lists snapshot summaries newest first, one page at a time.
+
+        Only id, codename and timestamps are selected; snapshot documents
+        are never loaded. Uses keyset pagination on ``(updated_at, id)``:
+        pass the returned cursor as ``before`` to fetch the next page.
+
+        Returns:
+            ``(rows, next_cursor)``; ``next_cursor`` is None on the last page
+
+        Raises:
+            ValueError: If ``before`` is not a valid cursor
+        """
+        return list_snapshot_page(self.db, user_id, limit, before)
+
     def get_snapshot_by_id(
-        self, snapshot_id: int, user_id: UUID
+        self, snapshot_id: UUID, user_id: UUID
     ) -> Optional[MemorySnapshotModel]:
         """Retrieves a specific snapshot by its ID, ensuring it belongs to the user."""
         if not isinstance(user_id, UUID):
             logger.error("User ID must be a UUID to get snapshot by ID.")
             raise TypeError("User ID must be a UUID.")
-        if not isinstance(snapshot_id, int):
-            logger.error("Snapshot ID must be an integer.")
-            raise TypeError("Snapshot ID must be an integer.")
+        if not isinstance(snapshot_id, UUID):
+            logger.error("Snapshot ID must be a UUID.")
+            raise TypeError("Snapshot ID must be a UUID.")
 
         try:
             if not all(
@@ -462,7 +486,7 @@ class MemorySnapshotRepository:
             )
             raise
 
-    def delete_snapshot_by_id(self, snapshot_id: int, user_id: UUID) -> bool:
+    def delete_snapshot_by_id(self, snapshot_id: UUID, user_id: UUID) -> bool:
         """
         Deletes a specific snapshot by its ID, ensuring it belongs to the user.
         !! Commits the transaction immediately. !! (Keep commit here as delete is usually atomic)
@@ -470,8 +494,8 @@ class MemorySnapshotRepository:
         if not isinstance(user_id, UUID):
             logger.error("User ID must be a UUID to delete snapshot by ID.")
             return False
-        if not isinstance(snapshot_id, int):
-            logger.error("Snapshot ID must be an integer to delete snapshot.")
+        if not isinstance(snapshot_id, UUID):
+            logger.error("Snapshot ID must be a UUID to delete snapshot.")
             return False
         try:
             # Use the method above which includes user ownership check
@@ -883,3 +907,167 @@ class ReflectionEventLogRepository:
                 exc_info=True,
             )
             raise  # Propagate errors
+
+
+# === ConversationSummaryRepository ===
+class ConversationSummaryRepository:
+    """Repository for compacted conversation history segments."""
+
+    def __init__(self, db: Session):
+        if not isinstance(db, Session):
+            raise TypeError("db must be a SQLAlchemy Session")
+        if not hasattr(ConversationSummaryModel, "user_id"):
+            raise ImportError(
+                "ConversationSummaryModel appears to be incompletely imported."
+            )
+        self.db = db
+
+    def add_segments(
+        self, user_id: UUID, segments: List[Dict[str, Any]]
+    ) -> List[ConversationSummaryModel]:
+        """
+        Adds compacted history segments to the session.
+        **Does NOT commit the transaction**, so segments are saved atomically
+        with the snapshot they were removed from.
+        """
+        if not isinstance(user_id, UUID):
+            raise TypeError("User ID must be a UUID to store history segments.")
+        models = []
+        try:
+            for segment in segments:
+                model = ConversationSummaryModel(
+                    user_id=user_id,
+                    kind=segment.get("kind", "conversation"),
+                    summary=segment.get("summary") or "",
+                    turns=segment.get("turns"),
+                    turn_count=segment.get("turn_count", len(segment.get("turns") or [])),
+                    first_turn_at=segment.get("first_turn_at"),
+                    last_turn_at=segment.get("last_turn_at"),
+                )
+                self.db.add(model)
+                models.append(model)
+            if models:
+                logger.info(
+                    "Added %d history segment(s) for user ID %s to session.",
+                    len(models),
+                    user_id,
+                )
+            return models
+        except SQLAlchemyError as e:
+            logger.error(
+                "Database error adding history segments for user ID %s: %s",
+                user_id,
+                e,
+                exc_info=True,
+            )
+            raise
+
+    def list_summaries(
+        self,
+        user_id: UUID,
+        kind: Optional[str] = None,
+        limit: int = 20,
+        before_id: Optional[int] = None,
+    ) -> List[ConversationSummaryModel]:
+        """
+        Lists summaries newest first, one page at a time.
+
+        Uses keyset pagination on ``id`` (pass the last id of the previous
+        page as ``before_id``); the raw ``turns`` column is not loaded.
+        """
+        if not isinstance(user_id, UUID):
+            logger.error("User ID must be a UUID to list history summaries.")
+            return []
+        try:
+            query = (
+                self.db.query(ConversationSummaryModel)
+                .options(defer(ConversationSummaryModel.turns))
+                .filter(ConversationSummaryModel.user_id == user_id)
+            )
+            if kind:
+                query = query.filter(ConversationSummaryModel.kind == kind)
+            if before_id is not None:
+                query = query.filter(ConversationSummaryModel.id < before_id)
+            return (
+                query.order_by(ConversationSummaryModel.id.desc())
+                .limit(max(1, limit))
+                .all()
+            )
+        except SQLAlchemyError as e:
+            logger.error(
+                "Database error listing history summaries for user ID %s: %s",
+                user_id,
+                e,
+                exc_info=True,
+            )
+            raise
+
+    def get_summary(
+        self, user_id: UUID, summary_id: int
+    ) -> Optional[ConversationSummaryModel]:
+        """Retrieves one summary, including its raw turns, if it belongs to the user."""
+        if not isinstance(user_id, UUID):
+            raise TypeError("User ID must be a UUID.")
+        try:
+            return (
+                self.db.query(ConversationSummaryModel)
+                .filter(
+                    ConversationSummaryModel.id == summary_id,
+                    ConversationSummaryModel.user_id == user_id,
+                )
+                .first()
+            )
+        except SQLAlchemyError as e:
+            logger.error(
+                "Database error getting history summary %s for user ID %s: %s",
+                summary_id,
+                user_id,
+                e,
+                exc_info=True,
+            )
+            raise
+
+
+# === ArchivedSnapshotRepository ===
+class ArchivedSnapshotRepository:
+    """Repository for snapshots moved to cold storage by the retention policy."""
+
+    def __init__(self, db: Session):
+        if not isinstance(db, Session):
+            raise TypeError("db must be a SQLAlchemy Session")
+        self.db = db
+
+    def list_snapshot_infos(
+        self, user_id: UUID, limit: int = 20, before: Optional[str] = None
+    ) -> Tuple[List[Any], Optional[str]]:
+        """
+        Lists archived snapshot summaries newest first, one page at a time.
+
+        See ``MemorySnapshotRepository.list_snapshot_infos``.
+        """
+        return list_snapshot_page(self.db, user_id, limit, before, model=ArchivedSnapshotModel)
+
+    def get_archived_snapshot(
+        self, snapshot_id: UUID, user_id: UUID
+    ) -> Optional[ArchivedSnapshotModel]:
+        """Retrieves an archived snapshot by its original ID, if it belongs to the user."""
+        if not isinstance(user_id, UUID):
+            raise TypeError("User ID must be a UUID.")
+        try:
+            return (
+                self.db.query(ArchivedSnapshotModel)
+                .filter(
+                    ArchivedSnapshotModel.id == snapshot_id,
+                    ArchivedSnapshotModel.user_id == user_id,
+                )
+                .first()
+            )
+        except SQLAlchemyError as e:
+            logger.error(
+                "Database error getting archived snapshot %s for user ID %s: %s",
+                snapshot_id,
+                user_id,
+                e,
+                exc_info=True,
+            )
+            raise
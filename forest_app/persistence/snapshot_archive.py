@@ -0,0 +1,54 @@
+"""
+Cold storage for snapshots removed from ``memory_snapshots`` by retention.
+
+An archived snapshot keeps its id, owner, codename and timestamps in
+``memory_snapshot_archive``; its document (all sections reassembled, with
+embeddings still packed) is stored as one zlib-compressed JSON blob, and its
+packed embedding blob is copied as-is. ``read_archived_snapshot`` returns
+the same document ``MemorySnapshotModel.snapshot_data`` did, so an archived
+snapshot can be restored as a new session.
+"""
+
+import zlib
+from typing import Any, Dict, Optional
+
+from forest_app.persistence.embedding_store import unpack_embeddings
+from forest_app.persistence.models import ArchivedSnapshotModel
+from forest_app.persistence.snapshot_sections import (
+    EMBEDDING_COLUMN,
+    SECTION_COLUMNS,
+    assemble_snapshot,
+)
+from forest_app.utils import json_codec
+
+COMPRESSION_LEVEL = 6
+
+
+def archive_snapshot(model: Any) -> ArchivedSnapshotModel:
+    """
+    Build the archive row for a loaded MemorySnapshotModel.
+
+    The document is taken from the stored sections, so embeddings are not
+    unpacked and re-encoded.
+    """
+    sections = {section: getattr(model, column) for section, column in SECTION_COLUMNS.items()}
+    document = assemble_snapshot(model.core_data, sections)
+    return ArchivedSnapshotModel(
+        id=model.id,
+        user_id=model.user_id,
+        codename=model.codename,
+        created_at=model.created_at,
+        updated_at=model.updated_at,
+        document=zlib.compress(json_codec.dumps_bytes(document), COMPRESSION_LEVEL),
+        embedding_data=getattr(model, EMBEDDING_COLUMN),
+    )
+
+
+def read_archived_snapshot(archived: Any) -> Optional[Dict[str, Any]]:
+    """Full snapshot document of an archived snapshot."""
+    document = json_codec.loads(zlib.decompress(archived.document))
+    if isinstance(document, dict) and archived.embedding_data is not None:
+        document["semantic_memories"] = unpack_embeddings(
+            document.get("semantic_memories"), archived.embedding_data
+        )
+    return document
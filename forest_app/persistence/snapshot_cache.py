@@ -0,0 +1,223 @@
+"""
+Read-through cache of users' latest deserialized snapshots.
+
+Loading the latest snapshot fetches and decodes every snapshot section and
+rebuilds a ``MemorySnapshot`` from it, on every command. ``load_latest_snapshot``
+first runs a light query for the latest row with the section columns deferred
+(served by ``idx_memory_snapshots_user_id_updated_at``). If the row's
+``(id, updated_at)`` matches the cached entry, the cached ``MemorySnapshot``
+is returned with that light model; otherwise the sections are loaded and
+decoded as before.
+
+The returned snapshot is owned by the caller, which mutates it while
+processing a command, so a hit checks the entry out. Callers hand it back
+with ``remember`` after a successful save; a request that fails or does not
+save leaves no snapshot cached and the next load reads the database. Two
+requests for the same user therefore never share a snapshot object.
+
+Invalidation: the snapshot repositories call ``invalidate`` whenever they
+stage a write for a user, and the ``updated_at`` check catches writes made by
+other processes.
+
+Models returned on a hit have their section columns unloaded: use the
+returned snapshot, not ``model.snapshot_data``, which would load them again
+(and cannot lazy-load under an ``AsyncSession``).
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import defer
+
+from forest_app.persistence.models import MemorySnapshotModel
+from forest_app.persistence.snapshot_sections import EMBEDDING_COLUMN, SECTION_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Columns holding the snapshot document (everything a hit does not load)
+DATA_COLUMNS = ("core_data", *SECTION_COLUMNS.values(), EMBEDDING_COLUMN)
+
+
+@dataclass
+class CachedSnapshot:
+    """A user's latest snapshot as of the stored row ``(snapshot_id, updated_at)``."""
+
+    snapshot_id: Any
+    updated_at: Any
+    snapshot: Any  # None while checked out by a request
+    load_seconds: float  # What loading and decoding it from the database cost
+
+
+class SnapshotCache:
+    """LRU cache of the latest deserialized MemorySnapshot per user."""
+
+    def __init__(self, enabled: bool = True, max_entries: int = 1000):
+        """
+        Initialize the cache.
+
+        Args:
+            enabled: Serve loads from the cache; when False every load reads
+                the database
+            max_entries: Users cached before the least recently used is dropped
+        """
+        self.enabled = enabled
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Any, CachedSnapshot]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {
+            "hits": 0,
+            "misses": 0,
+            "stale": 0,
+            "invalidations": 0,
+            "load_seconds": 0.0,
+            "load_seconds_saved": 0.0,
+        }
+
+    def take(self, user_id: Any, snapshot_id: Any, updated_at: Any) -> Optional[Any]:
+        """
+        Check out the user's cached snapshot if it matches the stored row.
+
+        Returns:
+            The cached MemorySnapshot, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry.snapshot is None:
+                self._metrics["misses"] += 1
+                return None
+            snapshot, entry.snapshot = entry.snapshot, None
+            if entry.snapshot_id != snapshot_id or entry.updated_at != updated_at:
+                self._metrics["stale"] += 1
+                self._metrics["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._metrics["hits"] += 1
+            self._metrics["load_seconds_saved"] += entry.load_seconds
+            return snapshot
+
+    def record_load(self, user_id: Any, seconds: float) -> None:
+        """Record what a cache miss cost to load; a hit on the user later saves it."""
+        with self._lock:
+            self._metrics["load_seconds"] += seconds
+            if self.enabled:
+                self._store(user_id, CachedSnapshot(None, None, None, seconds))
+
+    def remember(self, user_id: Any, model: Any, snapshot: Any) -> None:
+        """
+        Cache ``snapshot`` as the user's latest, stored as ``model``.
+
+        Call only once ``model`` is committed and its ``updated_at`` loaded,
+        and stop using ``snapshot`` afterwards.
+        """
+        if not self.enabled or model is None or snapshot is None:
+            return
+        updated_at = model.__dict__.get("updated_at")
+        if updated_at is None:
+            return  # Not loaded; the next check could not match anyway
+        with self._lock:
+            previous = self._entries.get(user_id)
+            load_seconds = previous.load_seconds if previous else 0.0
+            self._store(user_id, CachedSnapshot(model.id, updated_at, snapshot, load_seconds))
+
+    def _store(self, user_id: Any, entry: CachedSnapshot) -> None:
+        self._entries[user_id] = entry
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: Any) -> None:
+        """Drop the user's cached snapshot (a write for the user was staged)."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.snapshot is not None:
+                entry.snapshot = None
+                self._metrics["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Counters, hit rate and the number of cached users."""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["cached"] = sum(e.snapshot is not None for e in self._entries.values())
+        lookups = metrics["hits"] + metrics["misses"]
+        metrics["hit_rate"] = metrics["hits"] / lookups if lookups else 0.0
+        return metrics
+
+
+_cache: Optional[SnapshotCache] = None
+
+
+def get_snapshot_cache() -> SnapshotCache:
+    """Return the process-wide SnapshotCache configured from settings."""
+    global _cache
+    if _cache is None:
+        try:
+            from forest_app.config.settings import settings
+
+            _cache = SnapshotCache(
+                enabled=settings.SNAPSHOT_CACHE_ENABLED,
+                max_entries=settings.SNAPSHOT_CACHE_MAX_USERS,
+            )
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"Snapshot cache settings unavailable, using defaults: {e}")
+            _cache = SnapshotCache()
+    return _cache
+
+
+def _light_latest_query(user_id: Any):
+    return (
+        select(MemorySnapshotModel)
+        .options(*(defer(getattr(MemorySnapshotModel, name)) for name in DATA_COLUMNS))
+        .where(MemorySnapshotModel.user_id == user_id)
+        .order_by(MemorySnapshotModel.updated_at.desc())
+        .limit(1)
+    )
+
+
+async def load_latest_snapshot(user_id: Any, db: Any) -> Tuple[Optional[Any], Optional[Any]]:
+    """
+    Load the user's latest snapshot through the cache.
+
+    Args:
+        user_id: The user's UUID
+        db: AsyncSession
+
+    Returns:
+        ``(stored_model, snapshot)``: both None if the user has no snapshot;
+        ``snapshot`` is None if the stored document is empty or cannot be
+        deserialized (the model is still returned, with its data loaded)
+    """
+    from forest_app.core.snapshot import MemorySnapshot
+
+    cache = get_snapshot_cache()
+    result = await db.execute(_light_latest_query(user_id))
+    model = result.scalars().first()
+    if model is None:
+        return None, None
+    snapshot = cache.take(user_id, model.id, model.updated_at)
+    if snapshot is not None:
+        return model, snapshot
+
+    start = time.perf_counter()
+    await db.refresh(model, attribute_names=list(DATA_COLUMNS))
+    data = model.snapshot_data
+    if not data:
+        logger.warning("Snapshot %s of user %s has no data.", model.id, user_id)
+        return model, None
+    try:
+        snapshot = MemorySnapshot.from_dict(data)
+    except Exception as e:
+        logger.error("Failed to deserialize snapshot %s: %s", model.id, e, exc_info=True)
+        return model, None
+    cache.record_load(user_id, time.perf_counter() - start)
+    return model, snapshot
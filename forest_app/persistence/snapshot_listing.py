@@ -0,0 +1,126 @@
+"""
+Paged snapshot listing without the snapshot documents.
+
+Listing snapshots only needs their id, codename and timestamps, but loading
+``MemorySnapshotModel`` rows fetches and decodes every snapshot section.
+``snapshot_page_query`` selects just those columns, newest first, and pages
+by keyset on ``(updated_at, id)`` (served by
+``idx_memory_snapshots_user_id_updated_at``), so the cost of a page depends on
+neither snapshot size nor how deep into the list it is.
+
+A page's cursor is the ``(updated_at, id)`` of its last row, encoded as an
+opaque URL-safe string by ``encode_cursor``.
+"""
+
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import literal, select, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+
+from forest_app.persistence.models import MemorySnapshotModel
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_INFO_COLUMNS = ("id", "codename", "created_at", "updated_at")
+
+
+def encode_cursor(updated_at: datetime, snapshot_id: UUID) -> str:
+    """Opaque cursor for the listing position after ``(updated_at, snapshot_id)``."""
+    raw = json.dumps([updated_at.isoformat(), str(snapshot_id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """
+    Position encoded by ``encode_cursor``.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, snapshot_id = json.loads(raw)
+        return datetime.fromisoformat(updated_at), UUID(snapshot_id)
+    except (TypeError, ValueError) as e:  # binascii.Error and JSONDecodeError included
+        raise ValueError(f"Invalid snapshot cursor: {cursor!r}") from e
+
+
+def snapshot_page_query(
+    user_id: UUID, limit: int, before: Optional[str] = None, model: Any = MemorySnapshotModel
+) -> Any:
+    """
+    Select one page of a user's snapshot summaries, newest first.
+
+    Args:
+        user_id: Owner of the snapshots
+        limit: Page size
+        before: Cursor of the previous page's last row; None for the first page
+        model: ``MemorySnapshotModel``, or ``ArchivedSnapshotModel`` to list
+            archived snapshots
+
+    Returns:
+        A ``select`` of rows with ``id``, ``codename``, ``created_at`` and
+        ``updated_at``
+
+    Raises:
+        ValueError: If ``before`` is malformed
+    """
+    columns = [getattr(model, name) for name in SNAPSHOT_INFO_COLUMNS]
+    query = select(*columns).where(model.user_id == user_id)
+    if before is not None:
+        updated_at, snapshot_id = decode_cursor(before)
+        query = query.where(
+            tuple_(model.updated_at, model.id)
+            < tuple_(literal(updated_at, model.updated_at.type), literal(snapshot_id, model.id.type))
+        )
+    return query.order_by(model.updated_at.desc(), model.id.desc()).limit(max(1, limit))
+
+
+def next_cursor(rows: Any, limit: int) -> Optional[str]:
+    """Cursor of the page after ``rows``, or None if it was the last page."""
+    if len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    return encode_cursor(last.updated_at, last.id)
+
+
+def list_snapshot_page(
+    db: Any,
+    user_id: UUID,
+    limit: int = 20,
+    before: Optional[str] = None,
+    model: Any = MemorySnapshotModel,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Run ``snapshot_page_query`` on a sync Session.
+
+    Backs every repository's ``list_snapshot_infos`` (the async repository
+    calls it through ``AsyncSession.run_sync``).
+
+    Returns:
+        ``(rows, next_cursor)``; no rows if ``user_id`` is not a UUID
+
+    Raises:
+        ValueError: If ``before`` is malformed
+    """
+    if not isinstance(user_id, UUID):
+        logger.error("User ID must be a UUID to list snapshots.")
+        return [], None
+    query = snapshot_page_query(user_id, limit, before, model=model)
+    try:
+        rows = db.execute(query).all()
+    except SQLAlchemyError as e:
+        logger.error(
+            "Database error listing %s rows for user ID %s: %s",
+            model.__tablename__,
+            user_id,
+            e,
+            exc_info=True,
+        )
+        raise
+    return rows, next_cursor(rows, limit)
@@ -0,0 +1,327 @@
+"""
+Section-wise storage for memory snapshots.
+
+A serialized MemorySnapshot used to be stored as one JSON document that was
+rewritten on every turn, including the parts that rarely change and make up
+most of its size. The document is now split into sections, each in its own
+column of ``memory_snapshots``:
+
+- ``hta_tree``: ``core_state["hta_tree"]`` (``hta_tree_data``)
+- ``semantic_memory``: ``semantic_memories`` (``semantic_memory_data``)
+- ``logs``: ``reflection_log``, ``task_footprints``, ``history_archive``
+  (``log_data``)
+- ``core``: everything else, small and changing every turn (``snapshot_data``)
+
+Semantic-memory embeddings are packed into a float32 blob in
+``embedding_data`` (see ``embedding_store``) and hashed as their own section.
+
+A content hash per section (and per top-level key of ``core``) is stored in
+``section_hashes``; a save only writes sections whose hash changed. On
+PostgreSQL, changed ``core`` keys are applied with ``jsonb_set`` instead of
+rewriting the whole document. Rows written before the split have no hashes
+and keep their full document in ``snapshot_data``; they are split on their
+next save.
+
+``MemorySnapshotModel.snapshot_data`` reassembles the full document, so
+readers are unaffected.
+"""
+
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from forest_app.persistence.embedding_store import (
+    get_embedding_storage,
+    pack_embeddings,
+    unpack_embeddings,
+)
+from forest_app.utils import json_codec
+
+logger = logging.getLogger(__name__)
+
+HTA_TREE = "hta_tree"
+SEMANTIC_MEMORY = "semantic_memory"
+LOGS = "logs"
+
+# Section -> model column holding it
+SECTION_COLUMNS: Dict[str, str] = {
+    HTA_TREE: "hta_tree_data",
+    SEMANTIC_MEMORY: "semantic_memory_data",
+    LOGS: "log_data",
+}
+# Top-level snapshot keys moved out of the core document
+SECTION_KEYS: Dict[str, Tuple[str, ...]] = {
+    SEMANTIC_MEMORY: ("semantic_memories",),
+    LOGS: ("reflection_log", "task_footprints", "history_archive"),
+}
+CORE_KEY_PREFIX = "core."
+# Packed semantic-memory embeddings: hash key and model column
+EMBEDDINGS = "embeddings"
+EMBEDDING_COLUMN = "embedding_data"
+
+
+def split_snapshot(data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Split a serialized snapshot into its core document and large sections.
+
+    Args:
+        data: Full snapshot document (``MemorySnapshot.to_dict()``)
+
+    Returns:
+        ``(core, sections)``; sections absent from ``data`` are omitted
+    """
+    core = dict(data)
+    sections: Dict[str, Any] = {}
+    core_state = core.get("core_state")
+    if isinstance(core_state, dict) and "hta_tree" in core_state:
+        core_state = dict(core_state)
+        sections[HTA_TREE] = core_state.pop("hta_tree")
+        core["core_state"] = core_state
+    for section, keys in SECTION_KEYS.items():
+        values = {key: core.pop(key) for key in keys if key in core}
+        if values:
+            sections[section] = values
+    return core, sections
+
+
+def assemble_snapshot(
+    core: Optional[Dict[str, Any]], sections: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """
+    Rebuild the full snapshot document from its core and sections.
+
+    Args:
+        core: Core document (or a pre-split full document)
+        sections: Section values by name; None values are skipped
+
+    Returns:
+        Full document, or None when there is no core document
+    """
+    if not isinstance(core, dict):
+        return core
+    data = dict(core)
+    tree = sections.get(HTA_TREE)
+    if tree is not None:
+        core_state = data.get("core_state")
+        data["core_state"] = {
+            **(core_state if isinstance(core_state, dict) else {}),
+            "hta_tree": tree,
+        }
+    for section in SECTION_KEYS:
+        values = sections.get(section)
+        if isinstance(values, dict):
+            data.update(values)
+    return data
+
+
+def fingerprint(value: Any) -> Tuple[str, int]:
+    """Content hash and serialized size (bytes) of a JSON value."""
+    encoded = json_codec.dumps_bytes(value, sort_keys=True)
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest(), len(encoded)
+
+
+class SnapshotWriteMetrics:
+    """Counts bytes written per snapshot save against a full-document rewrite."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._metrics = {
+                "saves": 0,
+                "bytes_written": 0,
+                "bytes_full": 0,
+                "sections_written": 0,
+                "sections_skipped": 0,
+                "partial_updates": 0,
+                "last_bytes_written": 0,
+            }
+
+    def record(
+        self,
+        written: int,
+        full: int,
+        sections_written: int,
+        sections_skipped: int,
+        partial: bool,
+    ) -> None:
+        with self._lock:
+            m = self._metrics
+            m["saves"] += 1
+            m["bytes_written"] += written
+            m["bytes_full"] += full
+            m["sections_written"] += sections_written
+            m["sections_skipped"] += sections_skipped
+            m["partial_updates"] += int(partial)
+            m["last_bytes_written"] = written
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Totals, plus average bytes written per save and the share saved."""
+        with self._lock:
+            m = dict(self._metrics)
+        m["avg_bytes_per_save"] = m["bytes_written"] / m["saves"] if m["saves"] else 0.0
+        m["bytes_saved_ratio"] = (
+            1 - m["bytes_written"] / m["bytes_full"] if m["bytes_full"] else 0.0
+        )
+        return m
+
+
+write_metrics = SnapshotWriteMetrics()
+
+
+def get_snapshot_write_metrics() -> Dict[str, Any]:
+    """Snapshot write metrics for this process."""
+    return write_metrics.get_metrics()
+
+
+def _jsonb_set_expression(column: Any, changes: Dict[str, Any]) -> Any:
+    """``jsonb_set(...)`` chain applying top-level ``changes`` to ``column``."""
+    from sqlalchemy import Text, cast, func, literal
+    from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+
+    expression = column
+    for key, value in changes.items():
+        expression = func.jsonb_set(
+            expression,
+            literal([key], ARRAY(Text)),
+            cast(literal(json_codec.dumps(value)), JSONB),
+        )
+    return expression
+
+
+def write_snapshot_data(
+    model: Any, data: Optional[Dict[str, Any]], dialect_name: Optional[str] = None
+) -> int:
+    """
+    Stage ``data`` on a MemorySnapshotModel, writing only changed sections.
+
+    Does not flush or commit. Changed columns are flagged as modified, since
+    snapshot objects may share (and mutate in place) the loaded dicts.
+
+    Args:
+        model: MemorySnapshotModel to update (new or loaded)
+        data: Full snapshot document
+        dialect_name: Database dialect; ``"postgresql"`` enables ``jsonb_set``
+
+    Returns:
+        Serialized bytes this save writes
+    """
+    from sqlalchemy.orm.attributes import flag_modified
+
+    if not isinstance(data, dict):
+        model.core_data = data
+        model.section_hashes = None
+        for column in (*SECTION_COLUMNS.values(), EMBEDDING_COLUMN):
+            setattr(model, column, None)
+        return 0
+
+    previous = dict(model.section_hashes or {})
+    hashes: Dict[str, str] = {}
+    core, sections = split_snapshot(data)
+    written = full = sections_written = sections_skipped = 0
+
+    blob = None
+    semantic = sections.get(SEMANTIC_MEMORY)
+    if semantic is not None:
+        memories, blob = pack_embeddings(
+            semantic.get("semantic_memories"), get_embedding_storage()
+        )
+        sections[SEMANTIC_MEMORY] = {**semantic, "semantic_memories": memories}
+    # The embedding blob is hashed and written as its own section
+    digest = None
+    if blob is not None:
+        digest = hashlib.blake2b(blob, digest_size=16).hexdigest()
+        hashes[EMBEDDINGS] = digest
+        full += len(blob)
+    if previous.get(EMBEDDINGS) != digest:
+        setattr(model, EMBEDDING_COLUMN, blob)
+        if blob is not None:
+            written += len(blob)
+            sections_written += 1
+    elif blob is not None:
+        sections_skipped += 1
+
+    for section, column in SECTION_COLUMNS.items():
+        value = sections.get(section)
+        digest, size = fingerprint(value)
+        hashes[section] = digest
+        full += size
+        if previous.get(section) == digest:
+            sections_skipped += 1
+            continue
+        setattr(model, column, value)
+        flag_modified(model, column)
+        written += size
+        sections_written += 1
+
+    core_full = 0
+    changed: Dict[str, Any] = {}
+    for key, value in core.items():
+        digest, size = fingerprint(value)
+        hashes[CORE_KEY_PREFIX + key] = digest
+        core_full += size
+        if previous.get(CORE_KEY_PREFIX + key) != digest:
+            changed[key] = (value, size)
+    full += core_full
+    dropped = any(
+        name.startswith(CORE_KEY_PREFIX) and name[len(CORE_KEY_PREFIX):] not in core
+        for name in previous
+    )
+
+    partial = False
+    if not changed and not dropped and previous:
+        sections_skipped += 1
+    elif dialect_name == "postgresql" and previous and not dropped:
+        # Split-format row: patch the changed keys in place
+        model.core_data = _jsonb_set_expression(
+            type(model).core_data, {key: value for key, (value, _) in changed.items()}
+        )
+        model._pending_snapshot_data = data
+        written += sum(size for _, size in changed.values())
+        sections_written += 1
+        partial = True
+    else:
+        model.core_data = core
+        flag_modified(model, "core_data")
+        written += core_full
+        sections_written += 1
+
+    model.section_hashes = hashes
+    write_metrics.record(written, full, sections_written, sections_skipped, partial)
+    logger.debug(
+        "Snapshot save writes %d of %d bytes (%d section(s) unchanged).",
+        written,
+        full,
+        sections_skipped,
+    )
+    return written
+
+
+def session_dialect_name(db: Any) -> Optional[str]:
+    """Dialect name of a Session or AsyncSession's bind, if it can be determined."""
+    try:
+        bind = getattr(db, "bind", None) or db.get_bind()
+        return bind.dialect.name
+    except Exception:
+        return None
+
+
+def read_snapshot_data(model: Any) -> Optional[Dict[str, Any]]:
+    """Full snapshot document of a MemorySnapshotModel."""
+    from sqlalchemy.sql.elements import ClauseElement
+
+    if isinstance(model.__dict__.get("core_data"), ClauseElement):
+        # A jsonb_set update that has not been flushed yet
+        return model.__dict__.get("_pending_snapshot_data")
+    sections = {section: getattr(model, column) for section, column in SECTION_COLUMNS.items()}
+    blob = getattr(model, EMBEDDING_COLUMN)
+    semantic = sections.get(SEMANTIC_MEMORY)
+    if blob is not None and isinstance(semantic, dict):
+        sections[SEMANTIC_MEMORY] = {
+            **semantic,
+            "semantic_memories": unpack_embeddings(semantic.get("semantic_memories"), blob),
+        }
+    return assemble_snapshot(model.core_data, sections)
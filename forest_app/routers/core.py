@@ -10,8 +10,10 @@ from typing import Any, Dict, List, Optional
 
 from dependency_injector.wiring import Provide, inject
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from forest_app.containers import Container
@@ -25,16 +27,26 @@ from forest_app.core.integrations.discovery_integration import (
 from forest_app.core.orchestrator import ForestOrchestrator
 from forest_app.core.security import get_current_active_user
 from forest_app.core.snapshot import MemorySnapshot
+from forest_app.core.snapshot_write_behind import (
+    flush_pending_snapshot,
+    get_snapshot_write_behind,
+)
 from forest_app.modules.logging_tracking import TaskFootprintLogger
 from forest_app.modules.trigger_phrase import TriggerPhraseHandler
-from forest_app.persistence.database import get_db
+from forest_app.persistence.async_repository import (
+    AsyncMemorySnapshotRepository,
+    get_latest_snapshot_model as get_latest_snapshot_model_async,
+)
+from forest_app.persistence.database import get_async_db, get_db, get_db_session
 from forest_app.persistence.models import UserModel
 from forest_app.persistence.repository import (
     MemorySnapshotRepository,
     get_latest_snapshot_model,
 )
+from forest_app.persistence.snapshot_cache import get_snapshot_cache, load_latest_snapshot
 from forest_app.routers.onboarding_helpers import save_snapshot_with_codename
 from forest_app.utils.import_fallbacks import import_with_fallback
+from forest_app.utils.sse import SSE_HEADERS, SSE_MEDIA_TYPE, EventStream, format_sse
 
 try:
     from forest_app.config import constants
@@ -122,12 +134,167 @@ def get_snapshot_id(model):
     return None
 
 
+async def _load_command_snapshot(user_id, db: AsyncSession):
+    """
+    Loads the user's latest snapshot; returns (stored_model, snapshot).
+
+    ``snapshot`` is None if the user has none or it cannot be loaded; the
+    model is kept when its data failed to load so onboarding checks can
+    inspect it without querying again.
+    """
+    cached = get_snapshot_write_behind().get(user_id)
+    if cached is not None:
+        return cached.model, cached.snapshot
+    # Served from the snapshot cache when the stored row has not changed
+    return await load_latest_snapshot(user_id, db)
+
+
+async def _handle_trigger(
+    trigger_result: Dict[str, Any],
+    db: AsyncSession,
+    repo: AsyncMemorySnapshotRepository,
+    user_id,
+    snapshot,
+    stored_model,
+    orchestrator_i: ForestOrchestrator,
+) -> RichCommandResponse:
+    """Builds the response for a command that matched a trigger phrase."""
+    action = trigger_result.get("action")
+    logger.info("Command trigger user %d. Action: %s", user_id, action)
+    if action == "save_snapshot":
+        if not snapshot or not stored_model:
+            raise HTTPException(status_code=404, detail="No active session to save.")
+        if not orchestrator_i or not orchestrator_i.llm_client:
+            raise HTTPException(status_code=500, detail="LLM service needed for save.")
+        write_behind = get_snapshot_write_behind()
+        if write_behind.get(user_id) is not None:
+            saved_model = await write_behind.write_now(user_id)
+            if saved_model is None:
+                raise HTTPException(status_code=500, detail="Save failed")
+        else:
+            saved_model = await _save_and_commit(
+                db,
+                repo,
+                user_id,
+                snapshot,
+                orchestrator_i,
+                stored_model,
+                "Save failed",
+                commit_detail="Failed finalize save.",
+            )
+        codename = saved_model.codename or f"ID {get_snapshot_id(saved_model)}"
+        return RichCommandResponse(
+            tasks=[],
+            arbiter_response=f"Snapshot saved ('{codename}')",
+            magnitude_description="N/A",
+            resonance_theme="N/A",
+            routing_score=0.0,
+        )
+    return RichCommandResponse(
+        tasks=[],
+        arbiter_response=trigger_result.get("message", "Acknowledged trigger."),
+        magnitude_description="N/A",
+        resonance_theme="N/A",
+        routing_score=0.0,
+    )
+
+
+def _require_active_session(snapshot, stored_model) -> None:
+    """Raises 403 with the onboarding step if the user has no active session."""
+    if not snapshot or not stored_model:
+        onboarding_status = constants.ONBOARDING_STATUS_NEEDS_GOAL
+        # The model loaded by _load_command_snapshot, kept if its data was unusable
+        if stored_model and get_snapshot_data(stored_model):
+            try:
+                temp_snap_data = get_snapshot_data(stored_model)
+                if isinstance(temp_snap_data, dict) and temp_snap_data.get(
+                    "activated_state", {}
+                ).get("goal_set"):
+                    onboarding_status = constants.ONBOARDING_STATUS_NEEDS_CONTEXT
+            except Exception as snap_peek_err:
+                logger.error("Error peeking snapshot: %s", snap_peek_err, exc_info=True)
+        detail = (
+            "Onboarding: Please provide context."
+            if onboarding_status == constants.ONBOARDING_STATUS_NEEDS_CONTEXT
+            else "Onboarding: Please set a goal."
+        )
+        raise HTTPException(status_code=403, detail=detail)
+    if not snapshot.activated_state.get("activated", False):
+        raise HTTPException(status_code=403, detail="Onboarding incomplete.")
+
+
+async def _save_and_commit(
+    db: AsyncSession,
+    repo: AsyncMemorySnapshotRepository,
+    user_id,
+    snapshot,
+    orchestrator_i: ForestOrchestrator,
+    stored_model,
+    failure_detail: str,
+    commit_detail: str = "Failed finalize reflection save.",
+):
+    """Saves the snapshot (with codename) and commits the transaction."""
+    saved_model = await save_snapshot_with_codename(
+        db=db,
+        repo=repo,
+        user_id=user_id,
+        snapshot=snapshot,
+        llm_client=orchestrator_i.llm_client,
+        stored_model=stored_model,
+    )
+    if not saved_model:
+        raise HTTPException(status_code=500, detail=failure_detail)
+    try:
+        await db.commit()
+        # Not the snapshot sections: the caller has the snapshot they hold
+        await db.refresh(saved_model, attribute_names=["codename", "created_at", "updated_at"])
+    except SQLAlchemyError as commit_err:
+        await db.rollback()
+        logger.exception("Failed commit: %s", commit_err)
+        raise HTTPException(status_code=500, detail=commit_detail) from commit_err
+    get_snapshot_cache().remember(user_id, saved_model, snapshot)
+    return saved_model
+
+
+def _build_command_response(result_dict: Dict[str, Any]) -> RichCommandResponse:
+    """Maps a reflection processing result onto the command response model."""
+    return RichCommandResponse(
+        tasks=result_dict.get("tasks", []),
+        arbiter_response=result_dict.get("arbiter_response", ""),
+        offering=result_dict.get("offering"),
+        mastery_challenge=result_dict.get("mastery_challenge"),
+        magnitude_description=result_dict.get("magnitude_description", "N/A"),
+        resonance_theme=result_dict.get(
+            "resonance_theme", constants.DEFAULT_RESONANCE_THEME
+        ),
+        routing_score=result_dict.get("routing_score", 0.0),
+        onboarding_status=result_dict.get("onboarding_status"),
+        action_required=result_dict.get("action_required"),
+        confirmation_details=result_dict.get("confirmation_details"),
+    )
+
+
+def _command_error_to_http(user_id, err: Exception) -> HTTPException:
+    """Maps unexpected command errors onto HTTP errors."""
+    if isinstance(err, (SQLAlchemyError, ValueError, TypeError)):
+        logger.exception("DB/Data error /command user %d: %s", user_id, err)
+        if isinstance(err, SQLAlchemyError):
+            return HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="DB error."
+            )
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid data: {err}"
+        )
+    logger.exception("Error /command user %d: %s", user_id, err)
+    return HTTPException(status_code=500, detail="Internal error.")
+
+
 @router.post("/command", response_model=RichCommandResponse, tags=["Core"])
 @inject
 async def command_endpoint(
     request_data: CommandRequest,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserModel = Depends(get_current_active_user),
     trigger_h: TriggerPhraseHandler = Depends(
         Provide[Container.trigger_phrase_handler]
@@ -138,155 +305,116 @@ async def command_endpoint(
     user_id = current_user.id
     command_text = request_data.command
     logger.info("Received command user %d: '%.50s...'", user_id, command_text)
+    write_behind = get_snapshot_write_behind()
     try:
-        repo = MemorySnapshotRepository(db)
-        stored_model = get_latest_snapshot_model(user_id, db)
-        snapshot = None
-        if stored_model and get_snapshot_data(stored_model):
-            try:
-                snapshot = MemorySnapshot.from_dict(get_snapshot_data(stored_model))
-            except Exception as load_err:
-                logger.error(
-                    "Err load snapshot user %d: %s", user_id, load_err, exc_info=True
-                )
-                stored_model = None
-        elif stored_model:
-            logger.warning("Snapshot user %d has no data.", user_id)
-            stored_model = None
-        trigger_result = trigger_h.handle_trigger_phrase(command_text, snapshot)
-        action = trigger_result.get("action")
-        if trigger_result.get("triggered"):
-            logger.info("Command trigger user %d. Action: %s", user_id, action)
-            if action == "save_snapshot":
-                if not snapshot or not stored_model:
-                    raise HTTPException(
-                        status_code=404, detail="No active session to save."
-                    )
-                if not orchestrator_i or not orchestrator_i.llm_client:
-                    raise HTTPException(
-                        status_code=500, detail="LLM service needed for save."
-                    )
-                saved_model = await save_snapshot_with_codename(
-                    db=db,
-                    repo=repo,
-                    user_id=user_id,
-                    snapshot=snapshot,
-                    llm_client=orchestrator_i.llm_client,
-                    stored_model=stored_model,
-                )
-                if not saved_model:
-                    raise HTTPException(status_code=500, detail="Save failed")
-                try:
-                    db.commit()
-                    db.refresh(saved_model)
-                except SQLAlchemyError as commit_err:
-                    db.rollback()
-                    logger.exception("Failed commit: %s", commit_err)
-                    raise HTTPException(
-                        status_code=500, detail="Failed finalize save."
-                    ) from commit_err
-                codename = saved_model.codename or f"ID {get_snapshot_id(saved_model)}"
-                return RichCommandResponse(
-                    tasks=[],
-                    arbiter_response=f"Snapshot saved ('{codename}')",
-                    magnitude_description="N/A",
-                    resonance_theme="N/A",
-                    routing_score=0.0,
+        async with write_behind.command_scope(user_id):
+            repo = AsyncMemorySnapshotRepository(db)
+            stored_model, snapshot = await _load_command_snapshot(user_id, db)
+            trigger_result = trigger_h.handle_trigger_phrase(command_text, snapshot)
+            if trigger_result.get("triggered"):
+                return await _handle_trigger(
+                    trigger_result, db, repo, user_id, snapshot, stored_model, orchestrator_i
                 )
+            _require_active_session(snapshot, stored_model)
+            logger.info("Processing command user %d as reflection.", user_id)
+            result_dict = await orchestrator_i.process_reflection(
+                user_input=command_text, snap=snapshot
+            )
+            if not orchestrator_i.llm_client:
+                raise HTTPException(status_code=500, detail="LLM service needed for save.")
+            if write_behind.enabled:
+                # Written by the write-behind flusher, coalesced with later commands
+                write_behind.stage(user_id, snapshot, orchestrator_i.llm_client, stored_model)
             else:
-                return RichCommandResponse(
-                    tasks=[],
-                    arbiter_response=trigger_result.get(
-                        "message", "Acknowledged trigger."
-                    ),
-                    magnitude_description="N/A",
-                    resonance_theme="N/A",
-                    routing_score=0.0,
+                await _save_and_commit(
+                    db,
+                    repo,
+                    user_id,
+                    snapshot,
+                    orchestrator_i,
+                    stored_model,
+                    "Failed save state after reflection.",
                 )
-        if not snapshot or not stored_model:
-            onboarding_status = constants.ONBOARDING_STATUS_NEEDS_GOAL
-            temp_stored_model = get_latest_snapshot_model(user_id, db)
-            if temp_stored_model and get_snapshot_data(temp_stored_model):
-                try:
-                    temp_snap_data = get_snapshot_data(temp_stored_model)
-                    if isinstance(temp_snap_data, dict) and temp_snap_data.get(
-                        "activated_state", {}
-                    ).get("goal_set"):
-                        onboarding_status = constants.ONBOARDING_STATUS_NEEDS_CONTEXT
-                except Exception as snap_peek_err:
-                    logger.error(
-                        "Error peeking snapshot: %s", snap_peek_err, exc_info=True
-                    )
-            detail = (
-                "Onboarding: Please provide context."
-                if onboarding_status == constants.ONBOARDING_STATUS_NEEDS_CONTEXT
-                else "Onboarding: Please set a goal."
+            return _build_command_response(result_dict)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise _command_error_to_http(user_id, e) from e
+
+
+@router.post("/command/stream", tags=["Core"])
+@inject
+async def command_stream_endpoint(
+    request_data: CommandRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserModel = Depends(get_current_active_user),
+    trigger_h: TriggerPhraseHandler = Depends(
+        Provide[Container.trigger_phrase_handler]
+    ),
+    orchestrator_i: ForestOrchestrator = Depends(Provide[Container.orchestrator]),
+):
+    """
+    Streaming variant of /command using Server-Sent Events.
+
+    Emits ``tasks`` as soon as task selection is done, ``narrative`` events
+    with arbiter text deltas as they are generated, and a final ``result``
+    event carrying the full RichCommandResponse (or ``error``). The snapshot
+    is persisted once the stream has ended (never write-behind), in its own
+    session from the producer's task, so it is saved even if the client
+    disconnected and after the request's session has been closed.
+    """
+    user_id = current_user.id
+    command_text = request_data.command
+    logger.info("Received streamed command user %d: '%.50s...'", user_id, command_text)
+    try:
+        await flush_pending_snapshot(user_id)
+        repo = AsyncMemorySnapshotRepository(db)
+        stored_model, snapshot = await _load_command_snapshot(user_id, db)
+        trigger_result = trigger_h.handle_trigger_phrase(command_text, snapshot)
+        if trigger_result.get("triggered"):
+            response = await _handle_trigger(
+                trigger_result, db, repo, user_id, snapshot, stored_model, orchestrator_i
             )
-            raise HTTPException(status_code=403, detail=detail)
-        if not snapshot.activated_state.get("activated", False):
-            raise HTTPException(status_code=403, detail="Onboarding incomplete.")
-        logger.info("Processing command user %d as reflection.", user_id)
-        result_dict = await orchestrator_i.process_reflection(
-            user_input=command_text, snap=snapshot
-        )
+            return StreamingResponse(
+                iter([format_sse("result", response.model_dump())]),
+                media_type=SSE_MEDIA_TYPE,
+                headers=SSE_HEADERS,
+            )
+        _require_active_session(snapshot, stored_model)
         if not orchestrator_i.llm_client:
             raise HTTPException(status_code=500, detail="LLM service needed for save.")
-        saved_model = await save_snapshot_with_codename(
-            db=db,
-            repo=repo,
-            user_id=user_id,
-            snapshot=snapshot,
-            llm_client=orchestrator_i.llm_client,
-            stored_model=stored_model,
-        )
-        if not saved_model:
-            raise HTTPException(
-                status_code=500, detail="Failed save state after reflection."
-            )
-        try:
-            db.commit()
-            db.refresh(saved_model)
-        except SQLAlchemyError as commit_err:
-            db.rollback()
-            logger.exception("Failed commit: %s", commit_err)
-            raise HTTPException(
-                status_code=500, detail="Failed finalize reflection save."
-            ) from commit_err
-        response_payload = {
-            "tasks": result_dict.get("tasks", []),
-            "arbiter_response": result_dict.get("arbiter_response", ""),
-            "offering": result_dict.get("offering"),
-            "mastery_challenge": result_dict.get("mastery_challenge"),
-            "magnitude_description": result_dict.get("magnitude_description", "N/A"),
-            "resonance_theme": result_dict.get(
-                "resonance_theme", constants.DEFAULT_RESONANCE_THEME
-            ),
-            "routing_score": result_dict.get("routing_score", 0.0),
-            "onboarding_status": result_dict.get("onboarding_status"),
-            "action_required": result_dict.get("action_required"),
-            "confirmation_details": result_dict.get("confirmation_details"),
-        }
-        return RichCommandResponse(**response_payload)
     except HTTPException:
         raise
-    except (SQLAlchemyError, ValueError, TypeError) as db_val_err:
-        logger.exception(
-            "DB/Data error /command user %d: %s", user_id, db_val_err, exc_info=True
-        )
-        detail = (
-            "DB error."
-            if isinstance(db_val_err, SQLAlchemyError)
-            else f"Invalid data: {db_val_err}"
-        )
-        status_code = (
-            status.HTTP_503_SERVICE_UNAVAILABLE
-            if isinstance(db_val_err, SQLAlchemyError)
-            else status.HTTP_400_BAD_REQUEST
-        )
-        raise HTTPException(status_code=status_code, detail=detail) from db_val_err
     except Exception as e:
-        logger.exception("Error /command user %d: %s", user_id, e, exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal error.") from e
+        raise _command_error_to_http(user_id, e) from e
+
+    async def persist_after_stream(result: Any) -> None:
+        # Not run if the reflection failed: nothing consistent to save
+        try:
+            async with get_db_session() as save_db:
+                await _save_and_commit(
+                    save_db,
+                    AsyncMemorySnapshotRepository(save_db),
+                    user_id,
+                    snapshot,
+                    orchestrator_i,
+                    await get_latest_snapshot_model_async(user_id, save_db),
+                    "Failed save state after reflection.",
+                )
+        except Exception as save_err:
+            logger.exception(
+                "Failed to persist streamed reflection user %d: %s", user_id, save_err
+            )
+
+    stream = EventStream(
+        lambda sink: orchestrator_i.stream_reflection(
+            command_text, snapshot, event_sink=sink
+        ),
+        result_formatter=lambda result: _build_command_response(result).model_dump(),
+        on_result=persist_after_stream,
+    ).start()
+    return StreamingResponse(stream.frames(), media_type=SSE_MEDIA_TYPE, headers=SSE_HEADERS)
 
 
 # --- ADDED: Task Completion Endpoint ---
@@ -321,6 +449,7 @@ async def complete_task_endpoint(
 
     try:
         # 1. Load the latest snapshot
+        await flush_pending_snapshot(user_id)
         repo = MemorySnapshotRepository(db)
         # REMINDER: Ensure get_latest_snapshot_model is sync if not using await
         stored_model = get_latest_snapshot_model(user_id, db)
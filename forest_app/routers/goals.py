@@ -16,6 +16,7 @@ from forest_app.config.app_constants import SEED_STATUS_COMPLETED
 from forest_app.core.orchestrator import ForestOrchestrator
 from forest_app.core.security import get_current_active_user
 from forest_app.core.snapshot import MemorySnapshot
+from forest_app.core.snapshot_write_behind import flush_pending_snapshot
 from forest_app.dependencies import get_orchestrator
 from forest_app.persistence.database import get_db
 from forest_app.persistence.models import UserModel
@@ -66,6 +67,7 @@ async def confirm_goal_completion(
     user_id = current_user.id
     logger.info("Confirm goal complete user %d seed %s", user_id, seed_id)
     try:
+        await flush_pending_snapshot(user_id)
         repo = MemorySnapshotRepository(db)
         stored_model = repo.get_latest_snapshot(user_id)
         if not stored_model or not stored_model.snapshot_data:
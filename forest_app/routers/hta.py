@@ -13,7 +13,7 @@ from fastapi import APIRouter, Depends, HTTPException
 # --- Pydantic Imports ---
 from pydantic import BaseModel  # Import base pydantic needs
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from forest_app.core.discovery_journey.integration_utils import (
     infuse_recommendations_into_snapshot,
@@ -25,12 +25,13 @@ from forest_app.core.integrations.discovery_integration import (
 from forest_app.core.orchestrator import ForestOrchestrator
 from forest_app.core.security import get_current_active_user
 from forest_app.core.snapshot import MemorySnapshot
+from forest_app.core.snapshot_write_behind import flush_pending_snapshot
 from forest_app.dependencies import get_orchestrator
 
 # --- Dependencies & Models ---
-from forest_app.persistence.database import get_db
+from forest_app.persistence.async_repository import AsyncMemorySnapshotRepository
+from forest_app.persistence.database import get_async_db
 from forest_app.persistence.models import UserModel
-from forest_app.persistence.repository import MemorySnapshotRepository
 
 # <<< --- END ADDED IMPORT --- >>>
 
@@ -79,7 +80,7 @@ def get_snapshot_id(model):
     "/state", response_model=HTAStateResponse, tags=["HTA"]
 )  # Prefix is in main.py
 async def get_hta_state(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: UserModel = Depends(get_current_active_user),
     orchestrator_i: ForestOrchestrator = Depends(get_orchestrator),
 ):
@@ -87,8 +88,9 @@ async def get_hta_state(
     user_id = current_user.id
     logger.info("Request HTA state user %d", user_id)
     try:
-        repo = MemorySnapshotRepository(db)
-        stored_model = repo.get_latest_snapshot(user_id)
+        await flush_pending_snapshot(user_id)
+        repo = AsyncMemorySnapshotRepository(db)
+        stored_model = await repo.get_latest_snapshot(user_id)
         if not stored_model:
             return HTAStateResponse(hta_tree=None, message="No active session found.")
         if not get_snapshot_data(stored_model):
@@ -21,6 +21,7 @@ from forest_app.core.orchestrator import ForestOrchestrator
 # Application imports
 from forest_app.core.security import get_current_active_user
 from forest_app.core.snapshot import MemorySnapshot
+from forest_app.core.snapshot_write_behind import flush_pending_snapshot
 from forest_app.dependencies import get_orchestrator
 from forest_app.helpers import save_snapshot_with_codename
 from forest_app.persistence.database import get_db
@@ -101,6 +102,7 @@ async def start_onboarding(
     logger.info("Processing onboarding start for user %s", user_id)
 
     try:
+        await flush_pending_snapshot(user_id)
         repo = MemorySnapshotRepository(db)
         stored_model = repo.get_latest_snapshot(user_id)
         snapshot = MemorySnapshot()
@@ -245,6 +247,7 @@ async def add_context_endpoint(
             )
         llm_client_instance = orchestrator_i.llm_client  # Get client instance
 
+        await flush_pending_snapshot(user_id)
         repo = MemorySnapshotRepository(db)
         stored_model = repo.get_latest_snapshot(user_id)
         if not stored_model or not get_snapshot_data(stored_model):
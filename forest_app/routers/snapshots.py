@@ -7,14 +7,17 @@ Implements robust error handling, logging, and dependency injection for snapshot
 
 import logging
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel, ValidationError
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
+from forest_app.core.snapshot_write_behind import flush_pending_snapshot
+from forest_app.persistence.snapshot_archive import read_archived_snapshot
+from forest_app.persistence.snapshot_listing import decode_cursor
 from forest_app.utils.import_fallbacks import import_with_fallback
 from forest_app.utils.shared_helpers import get_snapshot_data, get_snapshot_id
 
@@ -50,12 +53,33 @@ MemorySnapshotRepository = import_with_fallback(
     lambda: type('MemorySnapshotRepository', (), {
         '__init__': lambda self, *a, **k: None,
         'list_snapshots': lambda self, *a, **k: [],
+        'list_snapshot_infos': lambda self, *a, **k: ([], None),
         'get_snapshot_by_id': lambda self, *a, **k: None,
         'delete_snapshot_by_id': lambda self, *a, **k: False
     }),
     logger,
     "MemorySnapshotRepository"
 )
+ArchivedSnapshotRepository = import_with_fallback(
+    lambda: __import__('forest_app.persistence.repository', fromlist=['ArchivedSnapshotRepository']).ArchivedSnapshotRepository,
+    lambda: type('ArchivedSnapshotRepository', (), {
+        '__init__': lambda self, *a, **k: None,
+        'list_snapshot_infos': lambda self, *a, **k: ([], None),
+        'get_archived_snapshot': lambda self, *a, **k: None
+    }),
+    logger,
+    "ArchivedSnapshotRepository"
+)
+ConversationSummaryRepository = import_with_fallback(
+    lambda: __import__('forest_app.persistence.repository', fromlist=['ConversationSummaryRepository']).ConversationSummaryRepository,
+    lambda: type('ConversationSummaryRepository', (), {
+        '__init__': lambda self, *a, **k: None,
+        'list_summaries': lambda self, *a, **k: [],
+        'get_summary': lambda self, *a, **k: None
+    }),
+    logger,
+    "ConversationSummaryRepository"
+)
 save_snapshot_with_codename = import_with_fallback(
     lambda: __import__('forest_app.routers.onboarding_helpers', fromlist=['save_snapshot_with_codename']).save_snapshot_with_codename,
     lambda: (lambda *a, **k: None),
@@ -79,15 +103,23 @@ class SnapshotInfo(BaseModel):
     id: UUID
     codename: Optional[str] = None
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class SnapshotPage(BaseModel):
+    """One page of snapshot metadata, most recently updated first."""
+
+    items: List[SnapshotInfo]
+    next_before: Optional[str] = None  # Pass as ``before`` to fetch the next page
+
+
 class LoadSessionRequest(BaseModel):
     """Request model for loading a session from a snapshot."""
 
-    snapshot_id: int
+    snapshot_id: UUID
 
 
 class MessageResponse(BaseModel):
@@ -96,20 +128,74 @@ class MessageResponse(BaseModel):
     message: str
 
 
+class HistorySummaryInfo(BaseModel):
+    """Compacted segment of conversation history (without its raw turns)."""
+
+    id: int
+    kind: str
+    summary: str
+    turn_count: int
+    first_turn_at: Optional[str] = None
+    last_turn_at: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class HistorySummaryDetail(HistorySummaryInfo):
+    """Compacted segment including the archived turns."""
+
+    turns: List[Dict[str, Any]] = []
+
+
+class HistorySummaryPage(BaseModel):
+    """One page of history summaries, newest first."""
+
+    items: List[HistorySummaryInfo]
+    next_before: Optional[int] = None  # Pass as ``before`` to fetch the next page
+
+
 @router.get("/list", response_model=List[SnapshotInfo], tags=["Snapshots"])
 async def list_user_snapshots(
+    limit: int = Query(100, ge=1, le=100),
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
 ):
-    """Lists all saved snapshots for the current user."""
+    """Lists the current user's most recent snapshots (see ``/snapshots/page`` for more)."""
+    page = await list_snapshot_page(
+        limit=limit, before=None, archived=False, db=db, current_user=current_user
+    )
+    return page.items
+
+
+@router.get("/snapshots/page", response_model=SnapshotPage, tags=["Snapshots"])
+async def list_snapshot_page(
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[str] = Query(None, max_length=200),
+    archived: bool = Query(False),
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user),
+):
+    """
+    Pages through the current user's snapshots, most recently updated first.
+
+    With ``archived=true``, pages through snapshots moved to the archive by
+    the retention policy instead; they can still be loaded as a session.
+    """
     user_id = current_user.id
-    logger.info("Request list snapshots user %d", user_id)
+    logger.info("Request list snapshots user %s", user_id)
+    if before is not None:
+        try:
+            decode_cursor(before)
+        except ValueError as cursor_err:
+            raise HTTPException(status_code=400, detail=str(cursor_err)) from cursor_err
     try:
-        repo = MemorySnapshotRepository(db)
-        models = repo.list_snapshots(user_id)
-        if not models:
-            return []
-        return [SnapshotInfo.model_validate(m) for m in models]
+        await flush_pending_snapshot(user_id)
+        repo = ArchivedSnapshotRepository(db) if archived else MemorySnapshotRepository(db)
+        rows, next_before = repo.list_snapshot_infos(user_id, limit=limit, before=before)
+        items = [SnapshotInfo.model_validate(row) for row in rows]
+        return SnapshotPage(items=items, next_before=next_before)
     except SQLAlchemyError as db_err:
         logger.error(
             "DB error listing snapshots user %d: %s", user_id, db_err, exc_info=True
@@ -141,19 +227,25 @@ async def load_session_from_snapshot(
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
 ):
-    """Loads a previous snapshot as the new active session."""
+    """Loads a previous snapshot (live or archived) as the new active session."""
     user_id = current_user.id
     snapshot_id = request.snapshot_id
-    logger.info("Request load session user %d from snapshot %d", user_id, snapshot_id)
+    logger.info("Request load session user %s from snapshot %s", user_id, snapshot_id)
     try:
+        await flush_pending_snapshot(user_id)
         repo = MemorySnapshotRepository(db)
         model_to_load = repo.get_snapshot_by_id(snapshot_id, user_id)
-        if not model_to_load:
-            raise HTTPException(status_code=404, detail="Snapshot not found.")
-        if not get_snapshot_data(model_to_load):
+        if model_to_load:
+            snapshot_data = get_snapshot_data(model_to_load)
+        else:
+            archived = ArchivedSnapshotRepository(db).get_archived_snapshot(snapshot_id, user_id)
+            if not archived:
+                raise HTTPException(status_code=404, detail="Snapshot not found.")
+            snapshot_data = read_archived_snapshot(archived)
+        if not snapshot_data:
             raise HTTPException(status_code=404, detail="Snapshot empty.")
         try:
-            loaded_snapshot = MemorySnapshot.from_dict(get_snapshot_data(model_to_load))
+            loaded_snapshot = MemorySnapshot.from_dict(snapshot_data)
         except Exception as load_err:
             raise HTTPException(
                 status_code=500, detail=f"Failed parse snapshot: {load_err}"
@@ -174,7 +266,7 @@ async def load_session_from_snapshot(
             raise HTTPException(status_code=500, detail="Failed save loaded session.")
         codename = new_model.codename or f"ID {new_model.id}"
         logger.info(
-            "Loaded snap %d user %d. New ID: %d", snapshot_id, user_id, new_model.id
+            "Loaded snap %s user %s. New ID: %s", snapshot_id, user_id, new_model.id
         )
         return MessageResponse(message=f"Session loaded from '{codename}'.")
     except HTTPException:
@@ -213,13 +305,13 @@ async def load_session_from_snapshot(
     tags=["Snapshots"],
 )
 async def delete_user_snapshot(
-    snapshot_id: int,
+    snapshot_id: UUID,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
 ):
     """Deletes a specific snapshot."""
     user_id = current_user.id
-    logger.info("Request delete snap %d user %d", snapshot_id, user_id)
+    logger.info("Request delete snap %s user %s", snapshot_id, user_id)
     try:
         repo = MemorySnapshotRepository(db)
         deleted = repo.delete_snapshot_by_id(snapshot_id, user_id)
@@ -240,3 +332,76 @@ async def delete_user_snapshot(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal error."
         ) from e
+
+
+@router.get(
+    "/history/summaries", response_model=HistorySummaryPage, tags=["Snapshots"]
+)
+async def list_history_summaries(
+    kind: Optional[str] = Query(None, pattern="^(conversation|reflection)$"),
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user),
+):
+    """Pages through conversation history compacted out of the snapshot."""
+    user_id = current_user.id
+    try:
+        repo = ConversationSummaryRepository(db)
+        models = repo.list_summaries(user_id, kind=kind, limit=limit, before_id=before)
+        items = [HistorySummaryInfo.model_validate(m) for m in models]
+        next_before = items[-1].id if len(items) == limit else None
+        return HistorySummaryPage(items=items, next_before=next_before)
+    except SQLAlchemyError as db_err:
+        logger.exception("DB error listing history user %s: %s", user_id, db_err)
+        raise HTTPException(status_code=503, detail="DB error.") from db_err
+    except Exception as e:  # noqa: W0718
+        # Broad catch is intentional to ensure FastAPI endpoint robustness and to log unexpected errors.
+        logger.exception("Error listing history user %s: %s", user_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal error."
+        ) from e
+
+
+@router.get(
+    "/history/summaries/{summary_id}",
+    response_model=HistorySummaryDetail,
+    tags=["Snapshots"],
+)
+async def get_history_summary(
+    summary_id: int,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user),
+):
+    """Loads one compacted history segment, including its raw turns."""
+    user_id = current_user.id
+    try:
+        repo = ConversationSummaryRepository(db)
+        model = repo.get_summary(user_id, summary_id)
+        if not model:
+            raise HTTPException(status_code=404, detail="History summary not found.")
+        return HistorySummaryDetail.model_validate(
+            {
+                "id": model.id,
+                "kind": model.kind,
+                "summary": model.summary,
+                "turn_count": model.turn_count,
+                "first_turn_at": model.first_turn_at,
+                "last_turn_at": model.last_turn_at,
+                "created_at": model.created_at,
+                "turns": model.turns or [],
+            }
+        )
+    except HTTPException:
+        raise
+    except SQLAlchemyError as db_err:
+        logger.exception(
+            "DB error loading history %d user %s: %s", summary_id, user_id, db_err
+        )
+        raise HTTPException(status_code=503, detail="DB error.") from db_err
+    except Exception as e:  # noqa: W0718
+        # Broad catch is intentional to ensure FastAPI endpoint robustness and to log unexpected errors.
+        logger.exception("Error loading history %d user %s: %s", summary_id, user_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal error."
+        ) from e
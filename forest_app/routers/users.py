@@ -9,6 +9,7 @@ from pydantic import BaseModel, EmailStr, ValidationError
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
+from forest_app.core.snapshot_write_behind import flush_pending_snapshot
 from forest_app.utils.import_fallbacks import import_with_fallback
 from forest_app.utils.shared_helpers import get_snapshot_data, get_snapshot_id
 
@@ -88,6 +89,7 @@ async def read_users_me(
     )
     onboarding_status = constants.ONBOARDING_STATUS_NEEDS_GOAL
     try:
+        await flush_pending_snapshot(user_id)
         repo = MemorySnapshotRepository(db)
         stored_model = repo.get_latest_snapshot(user_id)
         if stored_model and get_snapshot_data(stored_model):
@@ -0,0 +1,184 @@
+"""
+Pluggable JSON codec for persisted documents.
+
+Snapshots are serialized on every save and parsed on every load, and with
+embeddings they reach several megabytes, so the stdlib ``json`` module is a
+measurable share of request time. This module picks the fastest available
+backend:
+
+- ``orjson`` (preferred)
+- ``msgspec``
+- ``json`` (stdlib, always available)
+
+``JSON_CODEC`` in settings selects one explicitly (``"auto"`` by default).
+A value the fast backend cannot encode (e.g. integers wider than 64 bits)
+falls back to the stdlib for that call, so switching backends never makes a
+save fail. NumPy arrays (e.g. embeddings loaded from packed storage) are
+encoded as lists and other non-JSON values as ``str()`` by every backend.
+
+Usage:
+    from forest_app.utils import json_codec
+
+    text = json_codec.dumps(data)
+    data = json_codec.loads(text)
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("orjson", "msgspec", "json")
+
+
+@dataclass(frozen=True)
+class JSONCodec:
+    """A JSON backend: ``encode`` returns UTF-8 bytes, ``decode`` takes str or bytes."""
+
+    name: str
+    encode: Callable[[Any], bytes]
+    encode_sorted: Callable[[Any], bytes]
+    decode: Callable[[Union[str, bytes]], Any]
+
+    def dumps(self, value: Any, sort_keys: bool = False) -> str:
+        return self.dumps_bytes(value, sort_keys).decode("utf-8")
+
+    def dumps_bytes(self, value: Any, sort_keys: bool = False) -> bytes:
+        try:
+            return (self.encode_sorted if sort_keys else self.encode)(value)
+        except (TypeError, ValueError, OverflowError) as e:
+            if self.name == "json":
+                raise
+            logger.debug("%s cannot encode value, using stdlib json: %s", self.name, e)
+            return _STDLIB.dumps_bytes(value, sort_keys)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self.decode(data)
+
+
+def _default(value: Any) -> Any:
+    """Encoding fallback for values JSON has no type for."""
+    if hasattr(value, "tolist"):  # NumPy arrays and scalars
+        return value.tolist()
+    return str(value)
+
+
+def _stdlib_codec() -> JSONCodec:
+    return JSONCodec(
+        name="json",
+        encode=lambda value: json.dumps(value, default=_default).encode("utf-8"),
+        encode_sorted=lambda value: json.dumps(
+            value, default=_default, sort_keys=True
+        ).encode("utf-8"),
+        decode=json.loads,
+    )
+
+
+def _orjson_codec() -> JSONCodec:
+    import orjson
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    return JSONCodec(
+        name="orjson",
+        encode=lambda value: orjson.dumps(value, default=_default, option=options),
+        encode_sorted=lambda value: orjson.dumps(
+            value, default=_default, option=options | orjson.OPT_SORT_KEYS
+        ),
+        decode=orjson.loads,
+    )
+
+
+def _msgspec_codec() -> JSONCodec:
+    import msgspec
+
+    encoder = msgspec.json.Encoder(enc_hook=_default)
+    sorted_encoder = msgspec.json.Encoder(enc_hook=_default, order="sorted")
+    decoder = msgspec.json.Decoder()
+    return JSONCodec(
+        name="msgspec",
+        encode=encoder.encode,
+        encode_sorted=sorted_encoder.encode,
+        decode=decoder.decode,
+    )
+
+
+_FACTORIES: Dict[str, Callable[[], JSONCodec]] = {
+    "orjson": _orjson_codec,
+    "msgspec": _msgspec_codec,
+    "json": _stdlib_codec,
+}
+_STDLIB = _stdlib_codec()
+
+
+def build_codec(name: str = "auto") -> JSONCodec:
+    """
+    Build a codec by backend name.
+
+    Args:
+        name: One of BACKENDS, or ``"auto"`` for the fastest installed one
+
+    Returns:
+        The codec; the stdlib codec if the requested backend is not installed
+    """
+    candidates = BACKENDS if name == "auto" else (name,)
+    for candidate in candidates:
+        factory = _FACTORIES.get(candidate)
+        if factory is None:
+            logger.warning("Unknown JSON codec '%s', using stdlib json.", candidate)
+            continue
+        try:
+            return factory()
+        except ImportError:
+            if name != "auto":
+                logger.warning("JSON codec '%s' not installed, using stdlib json.", name)
+    return _STDLIB
+
+
+_codec: Optional[JSONCodec] = None
+
+
+def get_json_codec() -> JSONCodec:
+    """Return the process-wide codec selected by ``JSON_CODEC`` in settings."""
+    global _codec
+    if _codec is None:
+        try:
+            from forest_app.config.settings import settings
+
+            _codec = build_codec(settings.JSON_CODEC)
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"JSON codec setting unavailable, using auto: {e}")
+            _codec = build_codec()
+        logger.info("Using '%s' JSON codec.", _codec.name)
+    return _codec
+
+
+def set_json_codec(name: str) -> JSONCodec:
+    """Replace the process-wide codec (benchmarks and tests); returns the new codec."""
+    global _codec
+    _codec = build_codec(name)
+    return _codec
+
+
+def dumps(value: Any, sort_keys: bool = False) -> str:
+    """Serialize ``value`` to a JSON string with the active codec."""
+    return get_json_codec().dumps(value, sort_keys)
+
+
+def dumps_bytes(value: Any, sort_keys: bool = False) -> bytes:
+    """Serialize ``value`` to UTF-8 JSON bytes with the active codec."""
+    return get_json_codec().dumps_bytes(value, sort_keys)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Parse a JSON document with the active codec."""
+    return get_json_codec().loads(data)
+
+
+def engine_json_options() -> Dict[str, Callable]:
+    """
+    ``create_engine`` keyword arguments routing native JSON columns through
+    the active codec (used by the PostgreSQL and SQLite dialects).
+    """
+    return {"json_serializer": dumps, "json_deserializer": loads}
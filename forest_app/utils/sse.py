@@ -0,0 +1,115 @@
+"""
+Server-Sent Events helpers.
+
+``EventStream`` runs a producer coroutine in the background and relays the
+events it emits as SSE frames, so an endpoint can start responding before the
+producer has finished:
+
+    stream = EventStream(
+        lambda sink: processor.process(text, snap, event_sink=sink), on_result=save
+    ).start()
+    return StreamingResponse(stream.frames(), media_type=SSE_MEDIA_TYPE,
+                             headers=SSE_HEADERS)
+
+The producer's return value (passed through ``result_formatter``) is sent as a
+final ``result`` event; failures are reported as an ``error`` event.
+``on_result`` then runs in the producer's task, after the stream has ended:
+unlike a response background task it runs even if the client disconnected,
+and it must not use the request's dependencies (such as its database
+session), which may already be closed.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+SSE_MEDIA_TYPE = "text/event-stream"
+# Disable proxy buffering so frames reach the client as they are produced
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+EventSink = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+_END = object()
+
+# Producers still running; the event loop keeps only weak references to tasks
+_producers: Set[asyncio.Task] = set()
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Format one SSE frame with a JSON payload."""
+    payload = json.dumps(data, default=str, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class EventStream:
+    """Relays events from a background producer as SSE frames."""
+
+    def __init__(
+        self,
+        producer: Callable[[EventSink], Awaitable[Any]],
+        result_formatter: Optional[Callable[[Any], Any]] = None,
+        error_detail: str = "Internal error.",
+        on_result: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ):
+        """
+        Initialize the stream.
+
+        Args:
+            producer: Coroutine factory receiving the event sink
+            result_formatter: Turns the producer's result into the ``result`` payload
+            error_detail: Message sent to the client if the producer fails
+            on_result: Coroutine function run with the producer's result once
+                the stream has ended (not run if the producer fails)
+        """
+        self.producer = producer
+        self.result_formatter = result_formatter
+        self.error_detail = error_detail
+        self.on_result = on_result
+        self._queue: "asyncio.Queue[Any]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _sink(self, event: str, data: Dict[str, Any]) -> None:
+        self._queue.put_nowait((event, data))
+
+    async def _run(self) -> Any:
+        try:
+            result = await self.producer(self._sink)
+            payload = self.result_formatter(result) if self.result_formatter else result
+            self._queue.put_nowait(("result", payload))
+        except Exception as e:
+            logger.exception("Streamed producer failed: %s", e)
+            self._queue.put_nowait(("error", {"detail": self.error_detail}))
+            raise
+        finally:
+            self._queue.put_nowait(_END)
+        if self.on_result is not None:
+            try:
+                await self.on_result(result)
+            except Exception as e:
+                logger.exception("Post-stream step failed: %s", e)
+        return result
+
+    def start(self) -> "EventStream":
+        """Start the producer (idempotent)."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+            _producers.add(self._task)
+            self._task.add_done_callback(_producers.discard)
+        return self
+
+    async def frames(self) -> AsyncIterator[str]:
+        """Yield SSE frames until the producer finishes."""
+        self.start()
+        while True:
+            item = await self._queue.get()
+            if item is _END:
+                return
+            yield format_sse(*item)
+
+    async def wait(self) -> Any:
+        """Wait for the producer and return its result (re-raising its error)."""
+        self.start()
+        return await self._task
@@ -7,6 +7,7 @@ import sys
 from datetime import datetime, timezone
 
 import pytest
+import pytest_asyncio
 
 if sys.platform.startswith("win"):
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
@@ -60,3 +61,72 @@ def mock_llm_client(mocker):
     mock_client = mocker.Mock()
     mock_client.generate.return_value = {"text": "Test response"}
     return mock_client
+
+
+@pytest.fixture
+def sqlite_session(tmp_path):
+    """Session on a throwaway SQLite database with the user and snapshot tables.
+
+    The persistence models use PostgreSQL UUID columns, which SQLite renders
+    as CHAR(32) here.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.dialects.postgresql import UUID
+    from sqlalchemy.ext.compiler import compiles
+    from sqlalchemy.orm import sessionmaker
+
+    from forest_app.persistence.models import Base
+
+    @compiles(UUID, "sqlite")
+    def _uuid_as_char(type_, compiler, **kw):
+        return "CHAR(32)"
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'forest.db'}")
+    tables = [
+        Base.metadata.tables[name]
+        for name in (
+            "users", "memory_snapshots", "memory_snapshot_archive", "conversation_summaries"
+        )
+    ]
+    Base.metadata.create_all(engine, tables=tables)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def async_sqlite_session(tmp_path):
+    """AsyncSession (aiosqlite) on a throwaway SQLite database.
+
+    Creates the same tables as ``sqlite_session``, with UUID columns rendered
+    as CHAR(32).
+    """
+    from sqlalchemy.dialects.postgresql import UUID
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.ext.compiler import compiles
+    from sqlalchemy.orm import sessionmaker
+
+    from forest_app.persistence.models import Base
+
+    @compiles(UUID, "sqlite")
+    def _uuid_as_char(type_, compiler, **kw):
+        return "CHAR(32)"
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'forest.db'}")
+    tables = [
+        Base.metadata.tables[name]
+        for name in (
+            "users", "memory_snapshots", "memory_snapshot_archive", "conversation_summaries"
+        )
+    ]
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=tables)
+    session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)()
+    try:
+        yield session
+    finally:
+        await session.close()
+        await engine.dispose()
@@ -0,0 +1,96 @@
+"""Tests for the AsyncSession repositories used by the async API routers."""
+
+import uuid
+from datetime import datetime
+
+import pytest
+
+from forest_app.core.snapshot import MemorySnapshot
+from forest_app.helpers import save_snapshot_with_codename
+from forest_app.persistence.async_repository import (
+    AsyncConversationSummaryRepository,
+    AsyncMemorySnapshotRepository,
+    get_latest_snapshot_model,
+)
+from forest_app.persistence.database import to_async_url
+from forest_app.persistence.models import UserModel
+
+
+class NoCodenameLLM:
+    """LLM client stand-in; codename generation falls back to a timestamp."""
+
+    async def generate(self, prompt_parts, response_model):
+        return None
+
+
+async def add_user(db):
+    user = UserModel(id=uuid.uuid4(), email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+    db.add(user)
+    await db.commit()
+    return user
+
+
+def test_async_url_uses_the_asyncio_driver_of_the_same_backend():
+    assert to_async_url("sqlite:////tmp/forest.db") == "sqlite+aiosqlite:////tmp/forest.db"
+    assert (
+        to_async_url("postgresql+psycopg2://u:p@db/forest?sslmode=require")
+        == "postgresql+asyncpg://u:p@db/forest?ssl=require"
+    )
+    assert to_async_url("postgres://u@db/forest") == "postgresql+asyncpg://u@db/forest"
+    assert to_async_url("postgresql+asyncpg://u@db/f") == "postgresql+asyncpg://u@db/f"
+    assert to_async_url("mysql://u@db/f") == "mysql://u@db/f"
+
+
+def test_repositories_reject_sync_sessions(sqlite_session):
+    with pytest.raises(TypeError):
+        AsyncMemorySnapshotRepository(sqlite_session)
+
+
+@pytest.mark.asyncio
+async def test_snapshot_lifecycle(async_sqlite_session):
+    db = async_sqlite_session
+    user = await add_user(db)
+    repo = AsyncMemorySnapshotRepository(db)
+
+    # SQLite's CURRENT_TIMESTAMP has one-second resolution; order explicitly
+    first = repo.create_snapshot(user.id, {"n": 1}, "first")
+    first.updated_at = datetime(2026, 1, 1)
+    second = repo.create_snapshot(user.id, {"n": 2}, "second")
+    second.updated_at = datetime(2026, 1, 2)
+    await db.commit()
+
+    latest = await get_latest_snapshot_model(user.id, db)
+    assert latest.id == second.id
+    repo.update_snapshot(first, {"n": 3})
+    await db.commit()
+    assert (await repo.get_latest_snapshot(user.id)).snapshot_data == {"n": 3}
+
+    assert [m.codename for m in await repo.list_snapshots(user.id)] == ["first", "second"]
+    assert await repo.get_snapshot_by_id(second.id, uuid.uuid4()) is None
+    assert await repo.delete_snapshot_by_id(second.id, user.id)
+    assert [m.id for m in await repo.list_snapshots(user.id)] == [first.id]
+
+
+@pytest.mark.asyncio
+async def test_save_with_codename_stores_segments_through_async_session(
+    async_sqlite_session,
+):
+    db = async_sqlite_session
+    user = await add_user(db)
+    snapshot = MemorySnapshot()
+    for i in range(40):
+        snapshot.conversation_history.append(
+            {"role": "user", "content": f"Turn {i}", "timestamp": f"2026-01-01T00:00:{i:02d}"}
+        )
+
+    repo = AsyncMemorySnapshotRepository(db)
+    saved = await save_snapshot_with_codename(
+        db, repo, user.id, snapshot, NoCodenameLLM(), stored_model=None
+    )
+    await db.commit()
+
+    assert saved.codename.startswith("Snapshot_")
+    stored = await repo.get_latest_snapshot(user.id)
+    assert len(stored.snapshot_data["conversation_history"]) < 40
+    summaries = await AsyncConversationSummaryRepository(db).list_summaries(user.id)
+    assert summaries and summaries[0].turn_count > 0
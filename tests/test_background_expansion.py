@@ -0,0 +1,40 @@
+"""Tests for durable background node expansion."""
+
+import uuid
+
+import pytest
+
+from forest_app.core.services.enhanced_hta.background import BackgroundTaskManager
+from forest_app.persistence.hta_tree_repository import HTATreeRepository
+
+
+def test_tree_repository_is_the_persistence_repository():
+    repository = BackgroundTaskManager()._get_tree_repository()
+    assert isinstance(repository, HTATreeRepository)
+    assert repository.session_manager is not None
+
+
+@pytest.mark.asyncio
+async def test_expand_nodes_by_id_resolves_nodes(mocker):
+    node = mocker.Mock(id=uuid.uuid4())
+    repository = mocker.Mock()
+    repository.get_node_by_id = mocker.AsyncMock(side_effect=[node, None])
+    manager = BackgroundTaskManager()
+    mocker.patch.object(manager, "_get_tree_repository", return_value=repository)
+    expand = mocker.patch.object(
+        manager, "expand_nodes_in_background", mocker.AsyncMock(return_value=True)
+    )
+    user_id = uuid.uuid4()
+
+    assert await manager.expand_nodes_by_id([str(node.id), str(uuid.uuid4())], str(user_id))
+    expand.assert_awaited_once_with([node], user_id)
+
+
+@pytest.mark.asyncio
+async def test_expand_nodes_by_id_fails_without_repository(mocker):
+    manager = BackgroundTaskManager()
+    mocker.patch.object(
+        manager, "_get_tree_repository", side_effect=RuntimeError("HTA tree repository unavailable")
+    )
+    with pytest.raises(RuntimeError):
+        await manager.expand_nodes_by_id([str(uuid.uuid4())], str(uuid.uuid4()))
@@ -0,0 +1,228 @@
+"""Tests for sliding-window circuit breakers and their use by LLMClient."""
+
+import asyncio
+
+import pybreaker
+import pytest
+from google.api_core import exceptions as google_api_exceptions
+
+from forest_app.core.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerConfig,
+    CircuitBreakerRegistry,
+    CircuitOpenError,
+    CircuitState,
+)
+from forest_app.integrations.llm import LLMClient, LLMError, SentimentResponseModel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FlakyBackend:
+    """Fails (or is slow) according to a script of outcomes."""
+
+    def __init__(self, clock, outcomes):
+        self.clock = clock
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+        if outcome == "slow":
+            self.clock.now += 10
+        elif outcome == "fail":
+            raise ConnectionError("backend down")
+        return outcome
+
+
+def make_breaker(clock, **options):
+    options.setdefault("failure_threshold", 4)
+    options.setdefault("window_size", 10)
+    options.setdefault("recovery_timeout", 30)
+    return CircuitBreaker(CircuitBreakerConfig(name="test", **options), clock=clock)
+
+
+def run(breaker, backend, times):
+    results = []
+    for _ in range(times):
+        try:
+            results.append(breaker.call(backend))
+        except CircuitOpenError:
+            results.append("rejected")
+        except ConnectionError:
+            results.append("error")
+    return results
+
+
+def test_failure_rate_opens_then_half_open_probes_close_it():
+    clock = FakeClock()
+    breaker = make_breaker(clock, half_open_max_calls=2)
+    backend = FlakyBackend(clock, ["ok", "fail", "ok", "fail", "fail"])
+
+    # 2 of 4 calls failed (50%) once the minimum number of calls is reached
+    assert run(breaker, backend, 4) == ["ok", "error", "ok", "error"]
+    assert breaker.state is CircuitState.OPEN
+    with pytest.raises(pybreaker.CircuitBreakerError):  # existing handlers still work
+        breaker.call(backend)
+    assert backend.calls == 4
+
+    clock.now += 30
+    permits = [breaker.guard(), breaker.guard()]
+    for permit in permits:
+        permit.__enter__()
+    assert breaker.state is CircuitState.HALF_OPEN
+    with pytest.raises(CircuitOpenError):  # only two probes at a time
+        breaker.call(backend)
+    for permit in permits:
+        permit.__exit__(None, None, None)
+
+    assert breaker.state is CircuitState.CLOSED
+    metrics = breaker.get_metrics()
+    assert metrics["window_calls"] == 0
+    assert metrics["rejected"] == 2 and metrics["opened"] == 1
+    assert metrics["successes"] == 4 and metrics["failures"] == 2
+
+
+def test_failed_probe_reopens_circuit():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    backend = FlakyBackend(clock, ["fail"] * 5)
+
+    assert run(breaker, backend, 5) == ["error"] * 4 + ["rejected"]
+    clock.now += 30
+    assert run(breaker, backend, 2) == ["error", "rejected"]
+    assert breaker.state is CircuitState.OPEN
+    assert breaker.get_metrics()["retry_after"] == 30
+
+
+def test_slow_calls_open_circuit():
+    clock = FakeClock()
+    breaker = make_breaker(clock, slow_call_threshold=5, slow_call_rate_threshold=0.75)
+    backend = FlakyBackend(clock, ["slow", "ok", "slow", "slow"])
+
+    assert run(breaker, backend, 5) == ["slow", "ok", "slow", "slow", "rejected"]
+    assert breaker.get_metrics()["slow_calls"] == 3
+
+
+def test_time_window_forgets_old_failures():
+    clock = FakeClock()
+    breaker = make_breaker(clock, window_type="time", window_size=60)
+    backend = FlakyBackend(clock, ["fail", "fail", "fail"])
+
+    run(breaker, backend, 3)
+    clock.now += 61
+    assert run(breaker, backend, 3) == ["ok"] * 3
+    assert breaker.get_metrics()["window_calls"] == 3
+    assert breaker.state is CircuitState.CLOSED
+
+
+def test_ignored_and_unexpected_exceptions_are_not_counted():
+    clock = FakeClock()
+    breaker = make_breaker(
+        clock, expected_exceptions=[OSError], ignored_exceptions=[ConnectionError]
+    )
+
+    def bad_input():
+        raise ValueError("caller bug")
+
+    backend = FlakyBackend(clock, ["fail"] * 10)
+    assert run(breaker, backend, 10) == ["error"] * 10
+    for _ in range(10):
+        with pytest.raises(ValueError):
+            breaker.call(bad_input)
+    assert breaker.state is CircuitState.CLOSED
+    assert breaker.get_metrics()["ignored"] == 20
+
+
+@pytest.mark.asyncio
+async def test_async_timeout_counts_as_failure_and_fallback_is_used():
+    breaker = CircuitBreaker(
+        CircuitBreakerConfig(
+            name="async", failure_threshold=1, timeout=0.01, fallback_function=lambda: "fallback"
+        )
+    )
+
+    async def hang():
+        await asyncio.sleep(1)
+
+    assert await breaker.call_async(hang) == "fallback"
+    assert breaker.state is CircuitState.OPEN
+    assert await breaker.call_async(hang) == "fallback"
+    assert breaker.get_metrics()["rejected"] == 1
+
+
+def test_registry_isolates_scopes_and_applies_overrides():
+    clock = FakeClock()
+    registry = CircuitBreakerRegistry(
+        CircuitBreakerConfig(name="llm", failure_threshold=2),
+        overrides={"hta": {"slow_call_threshold": 100}, "pro:hta": {"window_size": 5}},
+        clock=clock,
+    )
+    hta = registry.get("pro", "hta")
+    assert hta is registry.get("pro", "hta")
+    assert hta.config.name == "llm:pro:hta"
+    assert hta.config.slow_call_threshold == 100 and hta.config.window_size == 5
+    assert registry.get("flash", "sentiment").config.slow_call_threshold is None
+
+    run(hta, FlakyBackend(clock, ["fail", "fail"]), 2)
+    metrics = registry.get_metrics()
+    assert metrics["pro:hta"]["state"] == "open"
+    assert metrics["flash:sentiment"]["state"] == "closed"
+
+
+class FlakyModel:
+    """Stands in for genai.GenerativeModel; raises while ``failing``."""
+
+    model_name = "fake-model"
+
+    def __init__(self):
+        self.failing = True
+        self.calls = 0
+
+    async def generate_content_async(self, prompt_parts, **kwargs):
+        self.calls += 1
+        if self.failing:
+            raise google_api_exceptions.ServiceUnavailable("overloaded")
+        return '{"sentiment_score": 0.5, "sentiment_label": "positive", "key_phrases": []}'
+
+
+@pytest.mark.asyncio
+async def test_llm_client_breakers_are_per_operation():
+    model = FlakyModel()
+    registry = CircuitBreakerRegistry(
+        CircuitBreakerConfig(
+            name="llm",
+            failure_threshold=3,
+            expected_exceptions=list(LLMClient.DEFAULT_RETRY_EXCEPTIONS),
+        )
+    )
+    client = LLMClient(micro_batch_window_ms=0, circuit_breakers=registry)
+    client._get_model_instance = lambda use_advanced_model: model
+    client._process_response = lambda response: response
+
+    async def call(operation):
+        return await client.generate(
+            ["prompt"], SentimentResponseModel, operation=operation, retries=0, retry_wait=0
+        )
+
+    for _ in range(3):
+        with pytest.raises(LLMError) as excinfo:
+            await call("hta_patch")
+        assert not isinstance(excinfo.value, CircuitOpenError)
+    with pytest.raises(CircuitOpenError):
+        await call("hta_patch")
+    assert model.calls == 3
+
+    model.failing = False
+    result = await call("sentiment")
+    assert result.sentiment_label == "positive"
+    metrics = client.get_circuit_metrics()
+    assert metrics[f"{client.standard_model_name}:hta_patch"]["state"] == "open"
+    assert metrics[f"{client.standard_model_name}:sentiment"]["successes"] == 1
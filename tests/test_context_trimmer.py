@@ -1,6 +1,12 @@
 import sys
 
-from forest_app.integrations.context_trimmer import ContextTrimmer, TrimmerConfig
+import tiktoken
+
+from forest_app.integrations.context_trimmer import (
+    ContextTrimmer,
+    TrimmerConfig,
+    _TokenIndex,
+)
 
 print("PYTEST sys.path:", sys.path)
 
@@ -28,3 +34,147 @@ def test_trim_preserves_structure():
     assert trimmer.count_tokens(trimmed) <= config.max_tokens
     # Should preserve at least one section header, given the tight token limit
     assert "Section1" in trimmed or "Section2" in trimmed
+
+
+def byte_encoding():
+    """Byte-level tiktoken encoding that needs no downloaded vocabulary."""
+    return tiktoken.Encoding(
+        "test_bytes",
+        pat_str=r"\S+|\s+",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={},
+    )
+
+
+class CountingEncoder:
+    """Wraps an encoding and records how many characters were encoded."""
+
+    def __init__(self, encoder):
+        self._encoder = encoder
+        self.encoded_chars = 0
+
+    def encode(self, text):
+        self.encoded_chars += len(text)
+        return self._encoder.encode(text)
+
+    def __getattr__(self, name):
+        return getattr(self._encoder, name)
+
+
+def test_long_content_is_encoded_once():
+    encoder = CountingEncoder(byte_encoding())
+    trimmer = ContextTrimmer(
+        TrimmerConfig(max_tokens=2000, buffer_tokens=0, preserve_first_n_chars=100),
+        encoder=encoder,
+    )
+    content = "## Intro\n" + "".join(
+        f"## Section {i}\n" + ("detail " * 200) + "\n" for i in range(50)
+    )
+
+    trimmed, count = trimmer.trim_content(content)
+
+    # One pass over the input plus re-encoding the (bounded) result
+    assert encoder.encoded_chars <= len(content) + len(trimmed)
+    assert count == len(encoder.encode(trimmed)) <= 2000
+    assert trimmed.startswith("## Intro")
+
+
+def test_repeated_fragments_use_memoized_counts():
+    trimmer = ContextTrimmer(encoder=byte_encoding())
+    system_prompt = "You are a helpful planning assistant."
+
+    first = trimmer.count_tokens(system_prompt)
+    second = trimmer.count_tokens(system_prompt)
+
+    assert first == second == len(system_prompt)
+    assert trimmer.token_cache_info()["hits"] == 1
+
+
+def test_token_index_maps_spans_and_cuts_non_ascii_text():
+    encoder = byte_encoding()
+    text = "café ☕ déjà vu"
+    index = _TokenIndex(text, encoder)
+
+    assert index.total == len(text.encode("utf-8"))
+    assert index.count(0, 4) == len("café".encode("utf-8"))
+    cut = index.cut(0, len(text), 6)
+    assert text[:cut] == "café "
+
+
+def test_identify_sections_uses_whole_header_lines():
+    trimmer = ContextTrimmer(encoder=byte_encoding())
+    sections = trimmer.identify_sections(
+        "preamble\n## Key points\nremember this\n## Notes\nplain text\n"
+    )
+
+    assert [s.content for s in sections] == [
+        "preamble\n",
+        "## Key points\nremember this\n",
+        "## Notes\nplain text\n",
+    ]
+    assert [s.priority for s in sections] == [1, 3, 1]
+    assert sections[1].token_count == len("## Key points") + len("remember this\n")
+
+
+def make_message_trimmer(max_tokens):
+    return ContextTrimmer(
+        TrimmerConfig(max_tokens=max_tokens, buffer_tokens=0, preserve_first_n_chars=0),
+        encoder=byte_encoding(),
+    )
+
+
+def test_trim_message_array_keeps_recent_turns_in_order():
+    trimmer = make_message_trimmer(max_tokens=120)
+    messages = [{"role": "system", "content": "Be kind."}]
+    # Duplicate contents must keep their own positions
+    for i in range(20):
+        messages.append({"role": "user", "content": "same question"})
+        messages.append({"role": "assistant", "content": f"answer number {i:02d}"})
+    original = [dict(m) for m in messages]
+
+    result = trimmer.trim_message_array(messages)
+
+    assert result[0] == {"role": "system", "content": "Be kind."}
+    assert result[-1] == messages[-1]
+    kept = [m["content"] for m in result if m["role"] == "assistant"]
+    assert kept == sorted(kept)  # chronological order
+    assert sum(trimmer._message_tokens(m) for m in result) <= 120
+    assert messages == original  # input untouched
+
+
+def test_trimmed_message_stays_in_its_position():
+    trimmer = make_message_trimmer(max_tokens=60)
+    messages = [
+        {"role": "user", "content": "x" * 200},
+        {"role": "assistant", "content": "short reply"},
+    ]
+
+    result = trimmer.trim_message_array(messages)
+
+    assert [m["role"] for m in result] == ["user", "assistant"]
+    assert result[0]["content"].endswith("...")
+    assert messages[0]["content"] == "x" * 200
+
+
+def test_evicted_turns_are_summarized():
+    trimmer = make_message_trimmer(max_tokens=400)
+    messages = [{"role": "system", "content": "You are Forest."}]
+    messages += [
+        {"role": "user", "content": f"Turn {i} went well. More detail follows here."}
+        for i in range(30)
+    ]
+
+    result = trimmer.trim_message_array(messages, summarize_evicted=True)
+
+    summary = result[1]
+    assert summary["role"] == "system"
+    assert summary["content"].startswith("Summary of earlier conversation:")
+    assert "- user: Turn 0 went well." in summary["content"]
+    assert "More detail" not in summary["content"]
+    assert result[-1] == messages[-1]
+    assert sum(trimmer._message_tokens(m) for m in result) <= 400
+
+    custom = trimmer.trim_message_array(
+        messages, summarize_evicted=True, summarizer=lambda turns, _: f"{len(turns)} turns"
+    )
+    assert custom[1]["content"].endswith(" turns")
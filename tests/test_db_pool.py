@@ -0,0 +1,107 @@
+"""Tests for connection pool configuration, metrics and warm-up."""
+
+from dataclasses import replace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from forest_app.persistence import database
+from forest_app.persistence.pool import (
+    InstrumentedAsyncQueuePool,
+    InstrumentedQueuePool,
+    PoolConfig,
+    pool_state,
+    warm_up_async_pool,
+    warm_up_pool,
+)
+
+
+def queue_engine(tmp_path, **kwargs):
+    options = {"pool_size": 2, "max_overflow": 1, "pool_timeout": 0.05}
+    options.update(kwargs)
+    return create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool, **options
+    )
+
+
+def test_engine_options_size_queue_pools_only():
+    config = PoolConfig(pool_size=7, max_overflow=3, pool_timeout=2.0)
+    options = config.engine_options("postgresql://u@host/db")
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert (options["pool_size"], options["max_overflow"], options["pool_timeout"]) == (7, 3, 2.0)
+    assert config.engine_options("postgresql+asyncpg://u@host/db", is_async=True)[
+        "poolclass"
+    ] is InstrumentedAsyncQueuePool
+    assert set(config.engine_options("sqlite:///forest.db")) == {"pool_recycle", "pool_pre_ping"}
+
+
+def test_checkout_metrics_and_timeouts(tmp_path):
+    engine = queue_engine(tmp_path)
+    held = [engine.connect() for _ in range(3)]  # pool_size + max_overflow
+    state = pool_state(engine)
+    assert state["checked_out"] == 3 and state["overflow"] == 1 and state["utilization"] == 1.0
+
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    for connection in held:
+        connection.close()
+
+    metrics = pool_state(engine)["metrics"]
+    assert metrics["checkouts"] == 3 and metrics["timeouts"] == 1
+    assert metrics["max_wait_seconds"] >= 0.05
+
+    engine.dispose()  # Recreates the pool; the metrics carry over
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    assert pool_state(engine)["metrics"]["checkouts"] == 4
+    engine.dispose()
+
+
+def test_warm_up_leaves_connections_in_pool(tmp_path):
+    engine = queue_engine(tmp_path)
+    assert warm_up_pool(engine, 2) == 2
+    state = pool_state(engine)
+    assert state["checked_in"] == 2 and state["checked_out"] == 0
+    engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_async_warm_up(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=2,
+        max_overflow=0,
+    )
+    assert await warm_up_async_pool(engine, 2) == 2
+    state = pool_state(engine)
+    assert state["checked_in"] == 2 and state["metrics"]["checkouts"] == 2
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_zero_warm_up_connections_skips_warm_up(monkeypatch, mocker):
+    engine = mocker.Mock()
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "async_engine", None)
+    monkeypatch.setattr(
+        database, "pool_config", replace(database.pool_config, warmup_connections=0)
+    )
+
+    assert await database.warm_up_database() is True
+    engine.connect.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_health_check_does_not_expose_the_error(monkeypatch, mocker):
+    engine = mocker.Mock()
+    engine.connect.side_effect = RuntimeError("could not connect to secret-host:5432")
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "async_engine", None)
+
+    result = await database.check_database()
+
+    assert result["status"] == "unavailable"
+    assert "secret-host" not in str(result)
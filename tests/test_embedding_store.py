@@ -0,0 +1,99 @@
+"""Tests for packed float32 embedding storage."""
+
+import uuid
+
+import numpy as np
+import pytest
+
+from forest_app.core.snapshot import MemorySnapshot
+from forest_app.persistence import embedding_store
+from forest_app.persistence.embedding_store import (
+    FLOAT32,
+    FLOAT32_ZLIB,
+    MARKER,
+    pack_embeddings,
+    unpack_embeddings,
+)
+from forest_app.persistence.models import MemorySnapshotModel, UserModel
+from forest_app.persistence.repository import MemorySnapshotRepository
+from forest_app.persistence.snapshot_sections import write_metrics
+from forest_app.utils.json_codec import build_codec
+
+
+def memories(count=3, dim=8):
+    rng = np.random.default_rng(0)
+    return {
+        "memories": [
+            {"content": f"m{i}", "embedding": rng.standard_normal(dim).tolist()}
+            for i in range(count)
+        ]
+        + [{"content": "no vector", "embedding": None}],
+        "stats": {"total_queries": 2},
+    }
+
+
+@pytest.mark.parametrize("storage", [FLOAT32, FLOAT32_ZLIB])
+def test_pack_and_unpack_round_trip(storage):
+    original = memories()
+    stripped, blob = pack_embeddings(original, storage)
+    assert stripped["memories"][0]["embedding"] == {MARKER: 8}
+    assert stripped["memories"][-1]["embedding"] is None
+    if storage == FLOAT32:
+        assert len(blob) == 4 + 3 * 8 * 4
+    assert isinstance(original["memories"][0]["embedding"], list)  # Input untouched
+
+    restored = unpack_embeddings(stripped, blob)
+    for before, after in zip(original["memories"][:3], restored["memories"]):
+        assert after["embedding"].dtype == np.float32
+        assert not after["embedding"].flags.writeable  # A view into the blob
+        np.testing.assert_allclose(after["embedding"], before["embedding"], rtol=1e-6)
+    assert restored["stats"] == original["stats"]
+
+
+def test_inline_storage_and_unpackable_values_are_left_alone():
+    assert pack_embeddings(memories(), "json")[1] is None
+    odd = {"memories": [{"embedding": ["a", "b"]}, {"embedding": []}, "not a memory"]}
+    assert pack_embeddings(odd) == (odd, None)
+
+
+def test_loaded_embeddings_serialize_as_lists():
+    stripped, blob = pack_embeddings(memories(1, 2))
+    vector = unpack_embeddings(stripped, blob)["memories"][0]["embedding"]
+    for name in ("json", "orjson"):
+        assert build_codec(name).loads(build_codec(name).dumps({"v": vector})) == {
+            "v": pytest.approx(vector.tolist())
+        }
+
+
+def test_snapshots_store_embeddings_in_a_blob(sqlite_session, monkeypatch):
+    monkeypatch.setattr(embedding_store, "_storage", FLOAT32)
+    user = UserModel(id=uuid.uuid4(), email="e@example.com", hashed_password="x")
+    sqlite_session.add(user)
+    snapshot = MemorySnapshot()
+    snapshot.semantic_memories = memories(count=20, dim=64)
+
+    # A row saved before packing keeps its float lists inline
+    legacy = MemorySnapshotModel(user_id=user.id, core_data=snapshot.to_dict())
+    sqlite_session.add(legacy)
+    sqlite_session.commit()
+    assert legacy.snapshot_data["semantic_memories"] == snapshot.semantic_memories
+
+    repo = MemorySnapshotRepository(sqlite_session)
+    repo.update_snapshot(legacy, snapshot.to_dict())
+    sqlite_session.commit()
+    sqlite_session.expire_all()
+    model = repo.get_latest_snapshot(user.id)
+    assert len(model.embedding_data) == 4 + 20 * 64 * 4
+    stored = model.semantic_memory_data["semantic_memories"]["memories"]
+    assert stored[0]["embedding"] == {MARKER: 64}
+
+    loaded = MemorySnapshot.from_dict(model.snapshot_data)
+    vector = loaded.semantic_memories["memories"][0]["embedding"]
+    expected = snapshot.semantic_memories["memories"][0]["embedding"]
+    np.testing.assert_allclose(vector, expected, rtol=1e-6)
+
+    # Unchanged embeddings are not rewritten
+    write_metrics.reset()
+    loaded.capacity = 0.1
+    repo.update_snapshot(model, loaded.to_dict())
+    assert write_metrics.get_metrics()["sections_skipped"] == 4
@@ -0,0 +1,154 @@
+"""Tests for bounded snapshot history and the conversation summary archive."""
+
+import uuid
+
+from forest_app.core.history_retention import (
+    RetentionPolicy,
+    clear_segments_after_commit,
+    compact_history,
+    summarize_segment,
+    take_pending_segments,
+)
+from forest_app.core.snapshot import MemorySnapshot
+from forest_app.persistence.models import UserModel
+from forest_app.persistence.repository import ConversationSummaryRepository
+
+POLICY = RetentionPolicy(
+    retain_turns=4, reflection_retain=2, compact_batch=2, summary_max_chars=200
+)
+
+
+def add_turns(snapshot, start, count):
+    for i in range(start, start + count):
+        snapshot.conversation_history.append(
+            {
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": f"Turn {i} happened. Extra detail.",
+                "timestamp": f"2026-01-01T00:00:{i:02d}",
+            }
+        )
+
+
+def test_compaction_waits_for_batch_then_keeps_recent_window():
+    snapshot = MemorySnapshot()
+    add_turns(snapshot, 0, 6)  # retain + batch: nothing to do yet
+    assert compact_history(snapshot, POLICY) == []
+
+    add_turns(snapshot, 6, 1)
+    (segment,) = compact_history(snapshot, POLICY)
+
+    assert [t["content"][:6] for t in snapshot.conversation_history] == [
+        "Turn 3", "Turn 4", "Turn 5", "Turn 6"
+    ]
+    assert segment["kind"] == "conversation"
+    assert segment["turn_count"] == 3
+    assert segment["first_turn_at"] == "2026-01-01T00:00:00"
+    assert segment["last_turn_at"] == "2026-01-01T00:00:02"
+    assert segment["summary"].splitlines()[0] == "- user: Turn 0 happened."
+    assert snapshot.history_archive["conversation"]["archived"] == 3
+    assert take_pending_segments(snapshot) == [segment]
+    assert take_pending_segments(snapshot) == []
+
+
+def test_rolling_summary_is_capped_and_survives_serialization():
+    snapshot = MemorySnapshot()
+    for start in range(0, 200, 10):
+        add_turns(snapshot, start, 10)
+        compact_history(snapshot, POLICY)
+
+    archive = snapshot.history_archive["conversation"]
+    assert len(archive["summary"]) <= POLICY.summary_max_chars
+    assert archive["summary"].endswith("Turn 195 happened.")
+    assert archive["archived"] + len(snapshot.conversation_history) == 200
+
+    data = snapshot.to_dict()
+    assert "pending_history_segments" not in data
+    restored = MemorySnapshot()
+    restored.update_from_dict(data)
+    assert restored.history_archive == snapshot.history_archive
+
+
+def test_reflection_log_uses_its_own_window_and_custom_summarizer():
+    snapshot = MemorySnapshot()
+    snapshot.reflection_log = [{"content": f"reflection {i}"} for i in range(5)]
+
+    (segment,) = compact_history(
+        snapshot, POLICY, summarizer=lambda turns: f"{len(turns)} reflections"
+    )
+
+    assert segment["kind"] == "reflection"
+    assert segment["summary"] == "3 reflections"
+    assert [r["content"] for r in snapshot.reflection_log] == [
+        "reflection 3", "reflection 4"
+    ]
+
+
+def test_summarize_segment_skips_empty_turns_and_truncates():
+    summary = summarize_segment(
+        [{"role": "user", "content": "   "}, {"role": "assistant", "content": "x" * 500}]
+    )
+    assert summary.startswith("- assistant: xxx")
+    assert summary.endswith("...")
+    assert len(summary) < 200
+
+
+def test_repository_pages_newest_first(sqlite_session):
+    user = UserModel(id=uuid.uuid4(), email="a@example.com", hashed_password="x")
+    sqlite_session.add(user)
+    repo = ConversationSummaryRepository(sqlite_session)
+
+    snapshot = MemorySnapshot()
+    for start in range(0, 50, 10):
+        add_turns(snapshot, start, 10)
+        compact_history(snapshot, POLICY)
+    repo.add_segments(user.id, take_pending_segments(snapshot))
+    sqlite_session.commit()
+
+    first = repo.list_summaries(user.id, limit=2)
+    second = repo.list_summaries(user.id, limit=2, before_id=first[-1].id)
+    rest = repo.list_summaries(user.id, limit=10, before_id=second[-1].id)
+
+    ids = [m.id for m in first + second + rest]
+    assert ids == sorted(ids, reverse=True) and len(ids) == 5
+    assert repo.list_summaries(user.id, kind="reflection") == []
+
+    detail = repo.get_summary(user.id, ids[-1])
+    assert detail.turns[0]["content"].startswith("Turn 0")
+    assert repo.get_summary(uuid.uuid4(), ids[-1]) is None
+
+
+def test_segments_stay_pending_until_the_save_commits(sqlite_session):
+    user = UserModel(id=uuid.uuid4(), email="b@example.com", hashed_password="x")
+    sqlite_session.add(user)
+    sqlite_session.commit()
+    snapshot = MemorySnapshot()
+    add_turns(snapshot, 0, 10)
+    (segment,) = compact_history(snapshot, POLICY)
+
+    ConversationSummaryRepository(sqlite_session).add_segments(user.id, [segment])
+    clear_segments_after_commit(sqlite_session, snapshot, [segment])
+    sqlite_session.rollback()
+    assert snapshot.pending_history_segments == [segment]  # Kept for the retry
+
+    ConversationSummaryRepository(sqlite_session).add_segments(user.id, [segment])
+    clear_segments_after_commit(sqlite_session, snapshot, [segment])
+    sqlite_session.commit()
+    assert snapshot.pending_history_segments == []
+    assert len(ConversationSummaryRepository(sqlite_session).list_summaries(user.id)) == 1
+
+
+def test_arbiter_prompt_includes_archived_conversation_summary():
+    from forest_app.core.processors.reflection_processor import ReflectionProcessor
+
+    snapshot = MemorySnapshot()
+    add_turns(snapshot, 0, 10)
+    compact_history(snapshot, POLICY)
+    prompt = ReflectionProcessor(None, None, None)._construct_arbiter_prompt(
+        user_input="Today went well.",
+        snapshot_dict={},
+        conversation_history=snapshot.conversation_history,
+        history_archive=snapshot.history_archive,
+        primary_task={"title": "Walk"},
+        task_titles=["Walk"],
+    )
+    assert "Earlier Conversation (summary):\n- user: Turn 0 happened." in prompt
@@ -0,0 +1,143 @@
+"""Tests for patch-based HTA evolution."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pydantic import ValidationError
+
+from forest_app.core.services.hta_service import HTAService
+from forest_app.integrations.llm import HTAPatchOperation, HTAPatchResponse, LLMClient
+from forest_app.modules.hta_patch import (
+    HTAPatchError,
+    apply_patch,
+    build_outline,
+    select_focus_node,
+)
+from forest_app.modules.hta_tree import HTATree
+
+
+def node(node_id, children=(), status="pending", **extra):
+    return {
+        "id": node_id,
+        "title": f"Title {node_id}",
+        "status": status,
+        "children": list(children),
+        **extra,
+    }
+
+
+def make_tree():
+    return HTATree.from_dict(
+        {
+            "root": node(
+                "root",
+                [
+                    node("a", [node("a1", status="completed"), node("a2", status="completed")]),
+                    node("b", [node("b1"), node("b2", depends_on=["a1"])]),
+                    node("c", [node("c1")]),
+                ],
+            )
+        }
+    )
+
+
+def child_ids(tree, node_id):
+    return [child.id for child in tree.find_node_by_id(node_id).children]
+
+
+def test_apply_patch_add_update_move_remove():
+    tree = make_tree()
+    result = apply_patch(
+        tree,
+        [
+            {
+                "op": "add",
+                "node_id": "b0",
+                "parent_id": "b",
+                "position": 0,
+                "node": {"title": "Warm up", "children": [node("b0x")]},
+            },
+            {"op": "update", "node_id": "b1", "fields": {"title": "Renamed", "priority": 3}},
+            {"op": "move", "node_id": "c1", "parent_id": "b", "position": 1},
+            {"op": "remove", "node_id": "a"},
+        ],
+    )
+    patched = result.tree
+
+    assert result.counts == {"add": 1, "update": 1, "move": 1, "remove": 1}
+    assert child_ids(patched, "root") == ["b", "c"]
+    assert child_ids(patched, "b") == ["b0", "c1", "b1", "b2"]
+    assert patched.find_node_by_id("b0x") is not None
+    assert patched.find_node_by_id("b1").title == "Renamed"
+    assert patched.find_node_by_id("b1").priority == 1.0
+    assert patched.find_node_by_id("a1") is None
+    assert patched.find_node_by_id("b2").depends_on == []  # a1 was removed
+    # The original tree is untouched
+    assert child_ids(tree, "root") == ["a", "b", "c"]
+
+
+def test_invalid_patch_is_rejected_as_a_whole():
+    tree = make_tree()
+    with pytest.raises(HTAPatchError) as excinfo:
+        apply_patch(
+            tree,
+            [
+                {"op": "update", "node_id": "b1", "fields": {"title": "ok"}},
+                {"op": "remove", "node_id": "root"},
+                {"op": "move", "node_id": "b", "parent_id": "b1"},
+                {"op": "update", "node_id": "b1", "fields": {"children": []}},
+                {"op": "add", "node_id": "b1", "parent_id": "b", "node": {"title": "dup"}},
+            ],
+        )
+    assert len(excinfo.value.errors) == 4
+    assert tree.find_node_by_id("b1").title == "Title b1"
+
+
+def test_focus_and_outline():
+    tree = make_tree()
+    focus = select_focus_node(tree)
+    assert focus.id == "b"  # branch of the first unfinished leaf
+
+    outline = build_outline(tree, focus_id="b")
+    assert "- b: Title b [pending] (focus subtree" in outline
+    assert "b1" not in outline  # sent in full separately
+    assert "  - a1: Title a1 [completed]" in outline
+
+    capped = build_outline(tree, max_nodes=4)
+    assert "(+2 more)" in capped
+
+
+def test_patch_operation_requires_fields_per_op():
+    with pytest.raises(ValidationError):
+        HTAPatchOperation(op="add", node_id="x")
+    with pytest.raises(ValidationError):
+        HTAPatchOperation(op="update", node_id="x")
+    assert HTAPatchOperation(op="remove", node_id="x").parent_id is None
+
+
+@pytest.mark.asyncio
+async def test_evolve_tree_uses_patch_for_large_trees(monkeypatch):
+    import forest_app.core.services.hta_service as hta_service_module
+
+    patch_settings = MagicMock(
+        HTA_EVOLUTION_MODE="patch",
+        HTA_PATCH_MIN_NODES=5,
+        HTA_PATCH_FOCUS_MAX_NODES=60,
+        HTA_PATCH_OUTLINE_MAX_NODES=200,
+    )
+    monkeypatch.setattr(hta_service_module, "settings", patch_settings)
+    llm = MagicMock(spec=LLMClient)
+    llm.request_hta_patch = AsyncMock(
+        return_value=HTAPatchResponse(
+            operations=[{"op": "update", "node_id": "b1", "fields": {"status": "completed"}}]
+        )
+    )
+    service = HTAService(llm, MagicMock())
+
+    evolved = await service.evolve_tree(make_tree(), reflections=[])
+
+    assert evolved.find_node_by_id("b1").status == "completed"
+    kwargs = llm.request_hta_patch.await_args.kwargs
+    assert '"id": "b1"' in kwargs["focus_subtree_json"]
+    assert "c1" in kwargs["outline"]
+    llm.request_hta_evolution.assert_not_called()
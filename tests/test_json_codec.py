@@ -0,0 +1,87 @@
+"""Tests for the pluggable JSON codec and JSONType pass-through."""
+
+import importlib.util
+import json
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from forest_app.persistence.models import ConversationSummaryModel, MemorySnapshotModel, UserModel
+from forest_app.utils.json_codec import BACKENDS, build_codec, engine_json_options
+
+
+def installed_codecs():
+    return list({codec.name: codec for codec in map(build_codec, BACKENDS)}.values())
+
+
+@pytest.mark.parametrize("codec", installed_codecs(), ids=lambda codec: codec.name)
+def test_codecs_agree_with_stdlib(codec):
+    value = {"b": [1, 2.5, None, True], "a": {"é": "ü"}, "when": datetime(2024, 1, 2)}
+    decoded = codec.loads(codec.dumps(value))
+    assert decoded["b"] == [1, 2.5, None, True] and decoded["a"] == {"é": "ü"}
+    assert decoded["when"].startswith("2024-01-02")
+    assert codec.dumps({"b": 1, "a": 2}, sort_keys=True).replace(" ", "") == '{"a":2,"b":1}'
+    assert codec.loads(codec.dumps_bytes([1])) == [1]
+
+    # Values the fast backends reject fall back to the stdlib
+    assert codec.loads(codec.dumps({"big": 2**70})) == {"big": 2**70}
+
+
+def test_missing_or_unknown_backend_uses_stdlib():
+    assert build_codec("no-such-codec").name == "json"
+    assert build_codec("auto").name in BACKENDS
+
+
+def load_unwrap_migration():
+    path = Path(__file__).parents[1] / "alembic" / "versions" / "unwrap_double_encoded_json.py"
+    spec = importlib.util.spec_from_file_location("unwrap_double_encoded_json", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_sqlite_json_is_encoded_once_and_legacy_rows_are_migrated(sqlite_session):
+    user = UserModel(id=uuid.uuid4(), email="c@example.com", hashed_password="x")
+    sqlite_session.add(user)
+    model = MemorySnapshotModel(user_id=user.id, core_data={"capacity": 0.5})
+    sqlite_session.add(model)
+    sqlite_session.commit()
+
+    id_param = bindparam("id", model.id, type_=MemorySnapshotModel.__table__.c.id.type)
+    raw = sqlite_session.execute(
+        text("SELECT snapshot_data FROM memory_snapshots WHERE id = :id").bindparams(id_param)
+    ).scalar()
+    assert json.loads(raw) == {"capacity": 0.5}
+
+    # Rows written by the old type hold a JSON string inside the JSON column
+    sqlite_session.execute(
+        text("UPDATE memory_snapshots SET snapshot_data = :data WHERE id = :id").bindparams(
+            id_param, data=json.dumps(json.dumps({"capacity": 0.7}))
+        )
+    )
+    load_unwrap_migration().rewrite_json_columns(sqlite_session.connection())
+    sqlite_session.commit()
+    sqlite_session.expire_all()
+    assert sqlite_session.get(MemorySnapshotModel, model.id).snapshot_data == {"capacity": 0.7}
+
+
+def test_string_values_round_trip_unchanged(sqlite_session):
+    engine = create_engine(sqlite_session.bind.url, **engine_json_options())
+    session = sessionmaker(bind=engine)()
+    user = UserModel(id=uuid.uuid4(), email="d@example.com", hashed_password="x")
+    session.add(user)
+    values = ["123", "true", "null", '{"a": 1}', "plain"]
+    rows = [
+        ConversationSummaryModel(user_id=user.id, kind="conversation", summary="s", turns=value)
+        for value in values
+    ]
+    session.add_all(rows)
+    session.commit()
+    session.expire_all()
+    assert [session.get(ConversationSummaryModel, row.id).turns for row in rows] == values
+    session.close()
+    engine.dispose()
@@ -0,0 +1,130 @@
+"""Tests for the LLM response cache and its use in BaseLLMService."""
+
+import pytest
+
+from forest_app.core.cache_service import CacheConfig, CacheService
+from forest_app.integrations.llm_cache import LLMResponseCache, build_cache_key
+from forest_app.integrations.llm_service import BaseLLMService
+
+
+class FakeLLMService(BaseLLMService):
+    """Minimal service that counts provider calls."""
+
+    def __init__(self, **kwargs):
+        super().__init__(
+            service_name="fake",
+            default_model="fake-model",
+            context_trimmer=None,
+            prompt_augmentation=None,
+            **kwargs,
+        )
+        self.calls = 0
+
+    async def generate_text(self, prompt, temperature=0.7, max_tokens=1000, **_):
+        async def call():
+            self.calls += 1
+            return f"response {self.calls}"
+
+        return await self._with_retry_and_fallback(
+            operation="generate_text",
+            model=self.default_model,
+            func=call,
+            prompt=prompt,
+            cache_key=self._cache_key(
+                "generate_text", prompt, temperature=temperature, max_tokens=max_tokens
+            ),
+        )
+
+    async def generate_json(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def generate_structured_output(self, *args, **kwargs):
+        raise NotImplementedError
+
+
+def test_cache_key_normalizes_whitespace_and_includes_params():
+    base = build_cache_key("m", "op", "hello   world\n", {"temperature": 0.2})
+
+    assert base == build_cache_key("m", "op", "hello world", {"temperature": 0.2})
+    assert base != build_cache_key("m", "op", "hello world", {"temperature": 0.9})
+    assert base != build_cache_key("other", "op", "hello world", {"temperature": 0.2})
+    assert base != build_cache_key(
+        "m", "op", "hello world", {"temperature": 0.2}, response_schema="Model"
+    )
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_least_recently_used():
+    cache = LLMResponseCache(max_entries=2)
+    await cache.set("a", "A", "op")
+    await cache.set("b", "B", "op")
+    assert await cache.get("a", "op") == "A"  # "b" is now least recent
+    await cache.set("c", "C", "op")
+
+    assert await cache.get("b", "op") is None
+    assert await cache.get("a", "op") == "A"
+    assert cache.get_metrics()["operations"]["op"]["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl():
+    cache = LLMResponseCache(ttl_seconds=60)
+    await cache.set("fresh", "x", "op")
+    await cache.set("stale", "y", "op", ttl=-1)
+
+    assert await cache.get("fresh", "op") == "x"
+    assert await cache.get("stale", "op") is None
+    assert cache.get_metrics()["operations"]["op"]["expirations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_byte_limit_bounds_cache_size():
+    cache = LLMResponseCache(max_entries=100, max_bytes=10)
+    await cache.set("a", "12345", "op")
+    await cache.set("b", "67890", "op")
+    await cache.set("c", "abcde", "op")
+    await cache.set("huge", "x" * 11, "op")
+
+    assert len(cache) == 2
+    assert cache.get_metrics()["bytes"] <= 10
+    assert await cache.get("huge", "op") is None
+
+
+@pytest.mark.asyncio
+async def test_cached_dicts_are_copied():
+    cache = LLMResponseCache()
+    await cache.set("k", {"tasks": [1]}, "op")
+
+    (await cache.get("k", "op"))["tasks"].append(2)
+
+    assert await cache.get("k", "op") == {"tasks": [1]}
+
+
+@pytest.mark.asyncio
+async def test_shared_backend_serves_other_instances():
+    shared = CacheService(CacheConfig())
+    first = LLMResponseCache(shared_backend=shared)
+    second = LLMResponseCache(shared_backend=shared)
+
+    await first.set("k", "value", "op")
+
+    assert await second.get("k", "op") == "value"
+    assert second.get_metrics()["operations"]["op"]["shared_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_service_caches_long_prompts_and_reports_hit_rate():
+    service = FakeLLMService()
+    prompt = "Describe the next step. " * 100  # well over the old 500 char cutoff
+
+    first = await service.generate_text(prompt)
+    second = await service.generate_text(prompt)
+    different = await service.generate_text(prompt, temperature=0.1)
+
+    assert first == second == "response 1"
+    assert different == "response 2"
+    assert service.calls == 2
+    stats = service.get_cache_metrics()["operations"]["generate_text"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
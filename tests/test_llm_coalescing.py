@@ -0,0 +1,264 @@
+"""Tests for single-flight coalescing and micro-batching of LLM calls."""
+
+import asyncio
+import re
+
+import pytest
+
+from forest_app.integrations.llm import (
+    BatchedResponse,
+    LLMClient,
+    SentimentResponseModel,
+    SnapshotCodenameResponse,
+)
+from forest_app.integrations.deadline import (
+    DeadlineExceededError,
+    current_deadline,
+    deadline_scope,
+)
+from forest_app.integrations.llm_batching import MicroBatcher
+from forest_app.integrations.llm_service import BaseLLMService, LLMTimeoutError
+
+
+class SlowFakeService(BaseLLMService):
+    """Fake provider whose calls take a little while, so duplicates overlap."""
+
+    def __init__(self):
+        super().__init__(
+            service_name="fake",
+            default_model="fake-model",
+            context_trimmer=None,
+            prompt_augmentation=None,
+        )
+        self._cache_enabled = False  # isolate single-flight from the cache
+        self.calls = 0
+
+    async def generate_text(self, prompt, temperature=0.7, max_tokens=1000, **_):
+        async def call():
+            self.calls += 1
+            await asyncio.sleep(0.05)
+            if "fail" in prompt:
+                raise ValueError("provider error")
+            return {"text": prompt}
+
+        return await self._with_retry_and_fallback(
+            operation="generate_text",
+            model=self.default_model,
+            func=call,
+            prompt=prompt,
+            cache_key=self._cache_key("generate_text", prompt, temperature=temperature),
+        )
+
+    async def generate_json(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def generate_structured_output(self, *args, **kwargs):
+        raise NotImplementedError
+
+
+class FakeProvider:
+    """Stands in for LLMClient.generate and records every provider round-trip."""
+
+    def __init__(self, break_batches=False):
+        self.calls = []
+        self.break_batches = break_batches
+
+    async def generate(self, prompt_parts, response_model, **kwargs):
+        self.calls.append(response_model.__name__)
+        await asyncio.sleep(0)
+        labels = re.findall(r"(?:Text|Context): (.*)", prompt_parts[0])
+        answers = [self._answer(label) for label in labels]
+        if response_model is BatchedResponse:
+            if self.break_batches:
+                answers = answers[:-1]
+            return BatchedResponse(results=answers)
+        return response_model.model_validate(answers[0])
+
+    @staticmethod
+    def _answer(label):
+        return {
+            "sentiment_score": float(len(label)),
+            "sentiment_label": label,
+            "codename": label.title(),
+        }
+
+
+def make_client(provider, window_ms=20):
+    client = LLMClient(micro_batch_window_ms=window_ms, micro_batch_max_size=8)
+    client.generate = provider.generate
+    return client
+
+
+@pytest.mark.asyncio
+async def test_identical_in_flight_calls_share_one_provider_call():
+    service = SlowFakeService()
+
+    results = await asyncio.gather(*(service.generate_text("same") for _ in range(5)))
+    other = await service.generate_text("different")
+
+    assert service.calls == 2
+    assert all(r == {"text": "same"} for r in results)
+    assert other == {"text": "different"}
+    assert service.get_cache_metrics()["coalesced_requests"] == 4
+    assert service._in_flight == {}
+
+    # Waiters get their own copy
+    results[0]["text"] = "mutated"
+    assert results[1] == {"text": "same"}
+
+
+@pytest.mark.asyncio
+async def test_coalesced_waiters_see_the_same_failure():
+    service = SlowFakeService()
+    service.max_retries = 1
+
+    results = await asyncio.gather(
+        *(service.generate_text("fail") for _ in range(3)), return_exceptions=True
+    )
+
+    assert service.calls == 1
+    assert all(isinstance(r, Exception) for r in results)
+    assert service._in_flight == {}
+
+
+@pytest.mark.asyncio
+async def test_cancelling_the_first_caller_does_not_cancel_the_others():
+    service = SlowFakeService()
+
+    leader = asyncio.ensure_future(service.generate_text("same"))
+    await asyncio.sleep(0)
+    followers = [asyncio.ensure_future(service.generate_text("same")) for _ in range(2)]
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    results = await asyncio.gather(*followers)
+
+    assert leader.cancelled()
+    assert results == [{"text": "same"}, {"text": "same"}]
+    assert service.calls == 1
+    assert service._in_flight == {}
+
+
+@pytest.mark.asyncio
+async def test_each_coalesced_caller_waits_within_its_own_deadline():
+    service = SlowFakeService()
+
+    async def call(timeout):
+        with deadline_scope(timeout):
+            return await service.generate_text("same")
+
+    # The first caller's short deadline neither bounds nor fails the shared call
+    results = await asyncio.gather(call(0.01), call(None), call(5), return_exceptions=True)
+
+    assert isinstance(results[0], LLMTimeoutError)
+    assert results[1:] == [{"text": "same"}, {"text": "same"}]
+    assert service.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_micro_batching_saves_provider_calls():
+    provider = FakeProvider()
+    client = make_client(provider)
+    texts = ["calm", "tense", "hopeful", "calm", "tired", "calm"]
+
+    sentiments = await asyncio.gather(*(client.get_sentiment(t) for t in texts))
+    codenames = await asyncio.gather(
+        *(client.get_snapshot_codename(c) for c in ["quiet dawn", "steady ascent"])
+    )
+
+    assert [s.sentiment_label for s in sentiments] == texts
+    assert all(isinstance(s, SentimentResponseModel) for s in sentiments)
+    assert [c.codename for c in codenames] == ["Quiet Dawn", "Steady Ascent"]
+    assert all(isinstance(c, SnapshotCodenameResponse) for c in codenames)
+
+    # 8 logical requests answered with one call per call type
+    assert provider.calls == ["BatchedResponse", "BatchedResponse"]
+    metrics = client.get_batching_metrics()
+    assert metrics["sentiment"]["deduplicated"] == 2
+    assert metrics["sentiment"]["saved_calls"] == 5
+    assert metrics["codename"]["saved_calls"] == 1
+
+
+@pytest.mark.asyncio
+async def test_bad_batch_falls_back_to_individual_calls():
+    provider = FakeProvider(break_batches=True)
+    client = make_client(provider)
+
+    sentiments = await asyncio.gather(
+        *(client.get_sentiment(t) for t in ["calm", "tense", "tired"])
+    )
+
+    assert [s.sentiment_label for s in sentiments] == ["calm", "tense", "tired"]
+    assert provider.calls.count("BatchedResponse") == 1
+    assert provider.calls.count("SentimentResponseModel") == 3
+    assert client.get_batching_metrics()["sentiment"]["fallbacks"] == 1
+
+
+@pytest.mark.asyncio
+async def test_batching_disabled_by_default_window():
+    provider = FakeProvider()
+    client = make_client(provider, window_ms=0)
+
+    await asyncio.gather(*(client.get_sentiment(t) for t in ["calm", "tense"]))
+
+    assert provider.calls == ["SentimentResponseModel", "SentimentResponseModel"]
+    assert client.get_batching_metrics() == {}
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting_for_window():
+    seen = []
+
+    async def batch(prompts):
+        seen.append(list(prompts))
+        return [p.upper() for p in prompts]
+
+    batcher = MicroBatcher(batch, window_seconds=60, max_batch_size=3)
+    results = await asyncio.wait_for(
+        asyncio.gather(*(batcher.submit(p) for p in "abc")), timeout=1
+    )
+
+    assert results == ["A", "B", "C"]
+    assert seen == [["a", "b", "c"]]
+
+
+@pytest.mark.asyncio
+async def test_batcher_holds_running_flushes():
+    release = asyncio.Event()
+
+    async def batch(prompts):
+        await release.wait()
+        return list(prompts)
+
+    batcher = MicroBatcher(batch, window_seconds=0, max_batch_size=2)
+    waiters = asyncio.gather(*(batcher.submit(p) for p in "ab"))
+    await asyncio.sleep(0.01)
+
+    assert len(batcher._flushes) == 1
+    release.set()
+    assert await waiters == ["a", "b"]
+    assert batcher._flushes == set()
+
+
+@pytest.mark.asyncio
+async def test_batch_runs_without_the_first_callers_deadline():
+    deadlines = []
+
+    async def batch(prompts):
+        deadlines.append(current_deadline())
+        await asyncio.sleep(0.05)
+        return list(prompts)
+
+    batcher = MicroBatcher(batch, window_seconds=0, max_batch_size=8)
+
+    async def submit(prompt, timeout):
+        with deadline_scope(timeout):
+            return await batcher.submit(prompt)
+
+    results = await asyncio.gather(
+        submit("a", 0.01), submit("b", None), submit("c", 5), return_exceptions=True
+    )
+
+    assert isinstance(results[0], DeadlineExceededError)
+    assert results[1:] == ["b", "c"]
+    assert deadlines == [None]
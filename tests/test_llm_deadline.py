@@ -0,0 +1,160 @@
+"""Tests for request deadline propagation and hedged LLM requests."""
+
+import asyncio
+import time
+
+import pytest
+
+from forest_app.core.request_context import RequestContext, current_request_context
+from forest_app.integrations.deadline import (
+    DeadlineExceededError,
+    attempt_timeout,
+    deadline_scope,
+    no_deadline,
+    remaining_time,
+)
+from forest_app.integrations.llm_service import BaseLLMService, LLMTimeoutError
+from forest_app.middleware.deadline import DeadlineMiddleware
+
+
+class ScriptedService(BaseLLMService):
+    """Fake provider whose calls take ``delays`` seconds in turn (or fail)."""
+
+    def __init__(self, name, delays, **options):
+        super().__init__(
+            service_name=name,
+            default_model=f"{name}-model",
+            max_retries=5,
+            timeout_seconds=10.0,
+            context_trimmer=None,
+            prompt_augmentation=None,
+            **options,
+        )
+        self._cache_enabled = False
+        self.delays = list(delays)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate_text(self, prompt, temperature=0.7, max_tokens=1000, **_):
+        async def call():
+            self.calls += 1
+            delay = self.delays.pop(0) if self.delays else 0
+            try:
+                await asyncio.sleep(abs(delay))
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+            if delay < 0:
+                raise ConnectionError("provider error")
+            return f"{self.service_name}: {prompt}"
+
+        return await self._with_retry_and_fallback(
+            operation="generate_text",
+            model=self.default_model,
+            func=call,
+            prompt=prompt,
+        )
+
+    async def generate_json(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def generate_structured_output(self, *args, **kwargs):
+        raise NotImplementedError
+
+
+def test_nested_scopes_only_shorten_the_deadline():
+    assert remaining_time() is None
+    with deadline_scope(10):
+        with deadline_scope(60):
+            assert 9 < remaining_time() <= 10
+        with deadline_scope(1):
+            assert attempt_timeout(30) <= 1
+        with no_deadline():
+            assert attempt_timeout(30) == 30
+    with deadline_scope(-1):
+        with pytest.raises(DeadlineExceededError):
+            attempt_timeout(30)
+
+
+@pytest.mark.asyncio
+async def test_retries_stop_when_the_deadline_is_exhausted():
+    # Every attempt hangs past its (deadline-capped) timeout
+    service = ScriptedService("primary", [5] * 6)
+    started = time.monotonic()
+    with deadline_scope(0.3):
+        with pytest.raises(LLMTimeoutError):
+            await service.generate_text("hi")
+    elapsed = time.monotonic() - started
+    assert elapsed < 1.0
+    assert service.calls <= 2
+
+
+@pytest.mark.asyncio
+async def test_hedge_fires_after_p95_and_first_response_wins():
+    primary = ScriptedService(
+        "primary", [0.01] * 20 + [1.0], hedge_requests=True, hedge_min_samples=20
+    )
+    fallback = ScriptedService("fallback", [0.01])
+    primary.add_fallback(fallback)
+
+    for _ in range(20):
+        await primary.generate_text("warm up")
+    assert fallback.calls == 0
+
+    started = time.monotonic()
+    assert await primary.generate_text("slow") == "fallback: slow"
+    assert time.monotonic() - started < 0.5
+    assert primary.cancelled == 1  # the losing primary call is cancelled
+    metrics = primary.get_latency_metrics()
+    assert metrics["hedged_requests"] == 1 and metrics["hedge_wins"] == 1
+    assert metrics["operations"]["generate_text"]["samples"] == 20
+
+
+@pytest.mark.asyncio
+async def test_failed_hedge_falls_back_to_primary_result():
+    primary = ScriptedService(
+        "primary", [0.01] * 3 + [0.2], hedge_requests=True, hedge_min_samples=3
+    )
+    fallback = ScriptedService("fallback", [-0.01])
+    primary.add_fallback(fallback)
+    for _ in range(3):
+        await primary.generate_text("warm up")
+
+    assert await primary.generate_text("slow") == "primary: slow"
+    assert fallback.calls == 1  # hedged once, not retried serially
+    assert primary.get_latency_metrics()["hedge_wins"] == 0
+
+
+@pytest.mark.asyncio
+async def test_middleware_binds_request_context_with_deadline():
+    seen = {}
+
+    async def app(scope, receive, send):
+        context = current_request_context()
+        seen["remaining"] = context.remaining_seconds()
+        seen["deadline"] = remaining_time()
+        seen["trace_id"] = str(context.trace_id)
+
+    middleware = DeadlineMiddleware(app, default_timeout=30, max_timeout=60)
+    trace_id = "12345678-1234-5678-1234-567812345678"
+    scope = {
+        "type": "http",
+        "headers": [(b"x-request-timeout", b"5"), (b"x-trace-id", trace_id.encode())],
+    }
+    await middleware(scope, None, None)
+
+    assert 4 < seen["remaining"] <= 5
+    assert 4 < seen["deadline"] <= 5
+    assert seen["trace_id"] == trace_id
+    assert current_request_context() is None and remaining_time() is None
+
+    await middleware({"type": "http", "headers": [(b"x-request-timeout", b"900")]}, None, None)
+    assert 59 < seen["remaining"] <= 60
+
+
+def test_request_context_bind_sets_deadline():
+    context = RequestContext(deadline=time.monotonic() + 2)
+    with context.bind():
+        assert current_request_context() is context
+        assert 1 < remaining_time() <= 2
+    assert remaining_time() is None
@@ -0,0 +1,165 @@
+"""Tests for incremental parsing of streamed structured LLM output."""
+
+import json
+
+import pytest
+
+from forest_app.integrations.llm import LLMValidationError
+from forest_app.integrations.llm_streaming import IncrementalJsonParser, JsonStreamError
+from forest_app.modules.hta_models import HTANodeModel, HTAResponseModel
+from tests.test_llm_streaming import FakeModel, make_client
+
+
+def make_tree(depth=3, fanout=3, prefix="n"):
+    node = {"id": prefix, "title": f"Step {prefix}", "description": "Do the \"thing\" — now"}
+    if depth:
+        node["children"] = [
+            make_tree(depth - 1, fanout, f"{prefix}.{i}") for i in range(fanout)
+        ]
+    else:
+        node["children"] = []
+    return node
+
+
+HTA_JSON = json.dumps({"hta_root": make_tree()})
+MIXED_JSON = json.dumps(
+    {"a": [1, -2.5e3, True, None, {"b": "x\\y\n"}], "c": {}, "d": [], "e": "🌲"}
+)
+
+
+def parse_in_chunks(text, size, on_object=None):
+    parser = IncrementalJsonParser(on_object)
+    for i in range(0, len(text), size):
+        parser.feed(text[i : i + size])
+    return parser, parser.close()
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10_000])
+def test_parser_matches_json_loads_for_any_chunking(size):
+    for text in (MIXED_JSON, HTA_JSON):
+        parser, value = parse_in_chunks(text, size)
+        assert value == json.loads(text)
+        assert parser.done and not parser.repaired
+
+
+def test_on_object_reports_subtrees_post_order_and_replaces_them():
+    seen = []
+
+    def on_object(path, obj):
+        seen.append(path)
+        return ("seen", obj.get("id"))
+
+    text = json.dumps({"root": {"id": "r", "children": [{"id": "a"}, {"id": "b"}]}})
+    _, value = parse_in_chunks(text, 4, on_object)
+
+    assert seen == [
+        ("root", "children", 0),
+        ("root", "children", 1),
+        ("root",),
+        (),
+    ]
+    assert value == ("seen", None)
+
+
+def test_parser_ignores_fences_and_tolerates_trailing_commas():
+    text = 'Here you go:\n```json\n{"a": [1, 2,], "b": {"c": 3,},}\n```\nDone.'
+    _, value = parse_in_chunks(text, 5)
+    assert value == {"a": [1, 2], "b": {"c": 3}}
+
+
+def test_truncated_stream_repairs_only_the_tail():
+    seen = []
+    full = json.dumps({"items": [{"id": 1}, {"id": 2}, {"id": 3, "tags": ["x", "y"]}]})
+    truncated = full[: full.index('"y"') + 2]  # cut inside the last string
+
+    parser, value = parse_in_chunks(
+        truncated, 6, lambda path, obj: seen.append(path) or obj
+    )
+
+    assert parser.repaired
+    assert value["items"][:2] == [{"id": 1}, {"id": 2}]
+    assert value["items"][2]["id"] == 3
+    assert value["items"][2]["tags"][0] == "x"
+    # Complete objects were reported while streaming, the repaired ones at close
+    assert seen[:2] == [("items", 0), ("items", 1)]
+    assert seen[-1] == ()
+
+
+def test_syntax_error_falls_back_to_full_repair():
+    parser, value = parse_in_chunks('{"a": 1 "b": 2}', 3)
+    assert parser.repaired and parser.error is not None
+    assert value == {"a": 1, "b": 2}
+
+
+@pytest.mark.parametrize("text", ['{"a": [1, 2', '{"a": 1 "b": 2}'])
+def test_repair_can_be_disabled(text):
+    parser = IncrementalJsonParser(repair=False)
+    parser.feed(text)
+    with pytest.raises(JsonStreamError):
+        parser.close()
+
+
+def test_unrepairable_text_raises():
+    parser = IncrementalJsonParser()
+    parser.feed("no json here")
+    with pytest.raises(JsonStreamError):
+        parser.close()
+
+
+class CountingModel(FakeModel):
+    """FakeModel that records how many chunks have been streamed so far."""
+
+    def __init__(self, text, chunk_size=8):
+        super().__init__(text, chunk_size)
+        self.streamed = 0
+
+    async def generate_content_async(self, prompt_parts, stream=False, **kwargs):
+        inner = await super().generate_content_async(prompt_parts, stream, **kwargs)
+
+        async def iterate():
+            async for chunk in inner:
+                self.streamed += 1
+                yield chunk
+
+        return iterate()
+
+
+@pytest.mark.asyncio
+async def test_hta_streaming_emits_validated_nodes_before_generation_ends():
+    model = CountingModel(HTA_JSON, chunk_size=64)
+    client = make_client(model)
+    received = []
+
+    async def on_node(node, path):
+        received.append((node, path, model.streamed))
+
+    result = await client._generate_hta_streaming(
+        ["prompt"], HTAResponseModel, on_node=on_node
+    )
+
+    assert model.calls == [True]
+    assert isinstance(result, HTAResponseModel)
+    assert isinstance(result.hta_root, HTANodeModel)
+    assert result.hta_root.children[2].children[1].id == "n.2.1"
+    # 1 + 3 + 9 + 27 nodes, each delivered once, children before their parent
+    order = [node.id for node, _, _ in received]
+    assert len(order) == len(set(order)) == 40
+    assert order.index("n.0.0") < order.index("n.0") < order.index("n")
+    assert received[-1][1] == ("hta_root",)
+    assert received[-1][0] is result.hta_root
+    # The first nodes were available long before generation finished
+    assert received[0][2] < len(model.chunks) / 2
+
+
+@pytest.mark.asyncio
+async def test_hta_streaming_repairs_truncated_response_only_when_asked():
+    truncated = HTA_JSON[:-1]  # Missing the closing brace
+    repaired = await make_client(FakeModel(truncated, 64))._generate_hta_streaming(
+        ["prompt"], HTAResponseModel
+    )
+    assert repaired.hta_root.id == "n"
+
+    with pytest.raises(LLMValidationError):
+        await make_client(FakeModel(truncated, 64))._generate_hta_streaming(
+            ["prompt"], HTAResponseModel, attempt_json_repair=False
+        )
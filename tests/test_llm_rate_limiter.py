@@ -0,0 +1,122 @@
+"""Tests for LLM admission control (concurrency, RPM/TPM buckets, priorities)."""
+
+import asyncio
+
+import pytest
+
+from forest_app.integrations.llm_rate_limiter import (
+    LLMPriority,
+    LLMRateLimiter,
+    TokenBucket,
+    estimate_tokens,
+    llm_priority,
+)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped():
+    limiter = LLMRateLimiter(max_concurrency=2)
+    active = peak = 0
+
+    async def call():
+        nonlocal active, peak
+        async with limiter.limit("m"):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*(call() for _ in range(6)))
+
+    assert peak == 2
+    metrics = limiter.get_metrics()
+    assert metrics["active"] == 0
+    assert metrics["queue_depth"] == 0
+    assert metrics["max_queue_depth"] >= 4
+
+
+@pytest.mark.asyncio
+async def test_interactive_calls_jump_ahead_of_background():
+    limiter = LLMRateLimiter(max_concurrency=1)
+    order = []
+    gate = asyncio.Event()
+
+    async def call(name, priority):
+        async with limiter.limit("m", priority=priority):
+            order.append(name)
+            await gate.wait()
+
+    async def interactive():
+        with llm_priority(LLMPriority.INTERACTIVE):
+            await call("reflection", None)  # priority comes from the context
+
+    first = asyncio.ensure_future(call("first", LLMPriority.BACKGROUND))
+    await asyncio.sleep(0)
+    queued = [
+        asyncio.ensure_future(call(f"expand{i}", LLMPriority.BACKGROUND))
+        for i in range(2)
+    ]
+    queued.append(asyncio.ensure_future(interactive()))
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(first, *queued)
+
+    assert order == ["first", "reflection", "expand0", "expand1"]
+    priorities = limiter.get_metrics()["priorities"]
+    assert priorities["interactive"]["admitted"] == 1
+    assert priorities["background"]["admitted"] == 3
+    assert priorities["background"]["max_wait"] > 0
+
+
+@pytest.mark.asyncio
+async def test_requests_per_minute_delays_excess_requests():
+    limiter = LLMRateLimiter(max_concurrency=0, requests_per_minute=600)  # 10/s
+    limiter._model_buckets("m")["rpm"].tokens = 1
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await limiter.acquire("m")
+    limiter.release()
+    await limiter.acquire("m")
+    limiter.release()
+
+    assert loop.time() - start >= 0.08
+
+
+@pytest.mark.asyncio
+async def test_exhausted_model_does_not_block_other_models():
+    limiter = LLMRateLimiter(
+        max_concurrency=0, model_limits={"slow": {"tpm": 60}}
+    )
+    limiter._model_buckets("slow")["tpm"].tokens = 0
+
+    blocked = asyncio.ensure_future(limiter.acquire("slow", tokens=50))
+    await asyncio.wait_for(limiter.acquire("fast", tokens=50), timeout=0.5)
+
+    assert not blocked.done()
+    assert limiter.get_metrics()["queue_depth"] == 1
+    blocked.cancel()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_releases_its_place():
+    limiter = LLMRateLimiter(max_concurrency=1)
+    await limiter.acquire("m")
+    waiter = asyncio.ensure_future(limiter.acquire("m"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    limiter.release()
+
+    await asyncio.wait_for(limiter.acquire("m"), timeout=0.5)
+    assert limiter.get_metrics()["active"] == 1
+
+
+def test_token_bucket_and_estimates():
+    bucket = TokenBucket(per_minute=60)
+    now = bucket.updated
+    bucket.consume(60)
+
+    assert bucket.delay_for(30, now) == pytest.approx(30.0)
+    assert bucket.delay_for(1000, now) == pytest.approx(60.0)  # clamped to capacity
+    assert estimate_tokens(["x" * 400, "y" * 400]) == 200
+    assert estimate_tokens([""]) == 1
@@ -0,0 +1,177 @@
+"""Tests for the LLM record/replay provider."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from google.api_core import exceptions as google_api_exceptions
+from pydantic import BaseModel
+
+from forest_app.integrations.llm import LLMClient
+from forest_app.integrations.llm_rate_limiter import LLMRateLimiter
+from forest_app.integrations.llm_replay import (
+    MODE_RECORD,
+    LLMReplayMissError,
+    LLMReplayProvider,
+    describe_request,
+)
+
+JSON_CONFIG = {"temperature": 0.2, "response_mime_type": "application/json"}
+
+
+class FakeModel:
+    """Stands in for a GenerativeModel with canned responses."""
+
+    model_name = "models/fake-model"
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+
+    async def generate_content_async(self, contents, *, stream=False, **kwargs):
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        if stream:
+            async def chunks():
+                for text in reply:
+                    yield SimpleNamespace(text=text)
+
+            return chunks()
+        return SimpleNamespace(text=reply)
+
+
+class RecordingSleep:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, seconds):
+        self.calls.append(seconds)
+
+
+def replayer(path, **options):
+    sleep = RecordingSleep()
+    return LLMReplayProvider(path, sleep=sleep, **options), sleep
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay_returns_recorded_responses(tmp_path):
+    cassette = tmp_path / "cassette.jsonl"
+    recorder = LLMReplayProvider(cassette, mode=MODE_RECORD)
+    model = recorder.wrap(
+        FakeModel(['{"a": 1}', ["[1, ", "2]"], google_api_exceptions.ServiceUnavailable("down")])
+    )
+    response = await model.generate_content_async("prompt one", generation_config=JSON_CONFIG)
+    assert response.text == '{"a": 1}'
+    stream = await model.generate_content_async("prompt two", stream=True)
+    assert [chunk.text async for chunk in stream] == ["[1, ", "2]"]
+    with pytest.raises(google_api_exceptions.ServiceUnavailable):
+        await model.generate_content_async("prompt three")
+    assert len(cassette.read_text().splitlines()) == 3
+    assert recorder.get_metrics()["recorded"] == 3
+
+    provider, sleep = replayer(cassette, latency=0.5)
+    model = provider.wrap(FakeModel([]))
+    response = await model.generate_content_async("prompt one", generation_config=JSON_CONFIG)
+    assert response.text == '{"a": 1}'
+    assert response.candidates[0].content.parts[0].text == '{"a": 1}'
+    stream = await model.generate_content_async("prompt two", stream=True)
+    assert [chunk.text async for chunk in stream] == ["[1, ", "2]"]
+    with pytest.raises(google_api_exceptions.ServiceUnavailable):
+        await model.generate_content_async("prompt three")
+    # The stream's latency is split at the recorded time to first chunk
+    assert sleep.calls[0] == sleep.calls[3] == 0.5
+    assert sleep.calls[1] + sleep.calls[2] == pytest.approx(0.5)
+    metrics = provider.get_metrics()
+    assert metrics["exact_hits"] == 3 and metrics["recorded_errors"] == 1
+
+
+def write_cassette(path, count=20):
+    recorder = LLMReplayProvider(path, mode=MODE_RECORD)
+    model = recorder.wrap(FakeModel([json.dumps({"n": i}) for i in range(count)]))
+    return model, recorder
+
+
+@pytest.mark.asyncio
+async def test_replay_is_deterministic_with_injected_errors(tmp_path):
+    cassette = tmp_path / "cassette.jsonl"
+    model, _ = write_cassette(cassette)
+    for i in range(20):
+        await model.generate_content_async(f"Instructions...\nrequest {i}")
+
+    async def outcomes(seed):
+        provider, _ = replayer(cassette, error_rate=0.3, seed=seed)
+        model = provider.wrap(FakeModel([]))
+        results = []
+        for i in list(range(20)) * 2:
+            try:
+                response = await model.generate_content_async(f"Instructions...\nrequest {i}")
+                results.append(response.text)
+            except google_api_exceptions.ServiceUnavailable:
+                results.append("error")
+        return results
+
+    first = await outcomes(seed=1)
+    assert first == await outcomes(seed=1)
+    assert first != await outcomes(seed=2)
+    assert 0 < first.count("error") < len(first)
+
+
+@pytest.mark.asyncio
+async def test_unrecorded_requests_reuse_the_same_template(tmp_path):
+    cassette = tmp_path / "cassette.jsonl"
+    model, _ = write_cassette(cassette, count=2)
+    await model.generate_content_async("Template A: 1", generation_config=JSON_CONFIG)
+    await model.generate_content_async("Template B: 1", generation_config=JSON_CONFIG)
+
+    provider, _ = replayer(cassette, latency="none")
+    model = provider.wrap(FakeModel([]))
+    response = await model.generate_content_async("Template B: 2", generation_config=JSON_CONFIG)
+    assert response.text == '{"n": 1}'
+    assert provider.get_metrics()["similar_hits"] == 1
+
+    strict, _ = replayer(cassette, strict=True)
+    with pytest.raises(LLMReplayMissError):
+        await strict.wrap(FakeModel([])).generate_content_async("Template B: 2")
+
+
+@pytest.mark.asyncio
+async def test_replayed_latency_respects_request_timeout(tmp_path):
+    cassette = tmp_path / "cassette.jsonl"
+    model, _ = write_cassette(cassette, count=1)
+    await model.generate_content_async("slow")
+
+    provider, sleep = replayer(cassette, latency=10.0)
+    with pytest.raises(google_api_exceptions.DeadlineExceeded):
+        await provider.wrap(FakeModel([])).generate_content_async(
+            "slow", request_options={"timeout": 2.0}
+        )
+    assert sleep.calls == [2.0]
+
+
+class Answer(BaseModel):
+    n: int
+
+
+@pytest.mark.asyncio
+async def test_llm_client_replays_offline_and_retries_injected_errors(tmp_path):
+    cassette = tmp_path / "cassette.jsonl"
+    recorder = LLMReplayProvider(cassette, mode=MODE_RECORD)
+    client = LLMClient(replay=recorder, rate_limiter=LLMRateLimiter())
+    config = client._create_generation_config(
+        temperature=0.5, top_p=1.0, top_k=32, max_output_tokens=8192, json_mode=True
+    )
+    request = describe_request(
+        client._get_model_instance(False).model_name, ["What is n?"], config, False
+    )
+    recorder.record(request, started=0.0, text='{"n": 7}')
+
+    provider, _ = replayer(cassette, latency="none", error_rate=0.5, seed=3)
+    client = LLMClient(replay=provider, rate_limiter=LLMRateLimiter())
+    answers = [
+        await client.generate(["What is n?"], Answer, temperature=0.5, retries=10, retry_wait=0)
+        for _ in range(5)
+    ]
+    assert [a.n for a in answers] == [7] * 5
+    metrics = provider.get_metrics()
+    assert metrics["exact_hits"] == metrics["replayed"] >= 5
+    assert metrics["injected_errors"] == metrics["replayed"] - 5
@@ -0,0 +1,172 @@
+"""Tests for streamed LLM responses and the SSE command stream."""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from forest_app.core.processors.reflection_processor import ReflectionProcessor
+from forest_app.integrations.llm import ArbiterStandardResponse, LLMClient
+from forest_app.integrations.llm_streaming import JsonStringFieldExtractor
+from forest_app.utils.sse import EventStream, format_sse
+
+ARBITER_JSON = json.dumps(
+    {
+        "narrative": 'The path "bends" here.\nBreathe — then step \U0001F332.',
+        "task": {"title": "Walk", "description": "nested", "narrative": "ignored"},
+    }
+)
+CHUNK_DELAY = 0.02
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel with a slow streamed response."""
+
+    model_name = "fake-model"
+
+    def __init__(self, text, chunk_size=8):
+        self.chunks = [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
+        self.calls = []
+
+    async def generate_content_async(self, prompt_parts, stream=False, **kwargs):
+        self.calls.append(stream)
+
+        async def iterate():
+            for chunk in self.chunks:
+                await asyncio.sleep(CHUNK_DELAY)
+                yield FakeChunk(chunk)
+
+        return iterate()
+
+
+def make_client(model):
+    client = LLMClient(micro_batch_window_ms=0)
+    client._get_model_instance = lambda use_advanced_model: model
+    return client
+
+
+def test_field_extractor_handles_any_chunking():
+    fenced = "```json\n" + ARBITER_JSON + "\n```"
+    expected = json.loads(ARBITER_JSON)["narrative"]
+
+    for size in (1, 2, 5, 64, len(fenced)):
+        extractor = JsonStringFieldExtractor("narrative")
+        text = "".join(
+            extractor.feed(fenced[i : i + size]) for i in range(0, len(fenced), size)
+        )
+        assert text == expected
+        assert extractor.done
+
+    other = JsonStringFieldExtractor("narrative")
+    assert other.feed('{"score": 3, "label": "narrative", "narrative": null}') == ""
+
+
+@pytest.mark.asyncio
+async def test_generate_stream_yields_deltas_then_validated_result():
+    model = FakeModel(ARBITER_JSON)
+    client = make_client(model)
+
+    stream = client.generate_stream(
+        ["prompt"], ArbiterStandardResponse, stream_field="narrative"
+    )
+    deltas = [delta async for delta in stream]
+
+    assert model.calls == [True]
+    assert len(deltas) > 1
+    assert "".join(deltas) == json.loads(ARBITER_JSON)["narrative"]
+    assert isinstance(stream.result, ArbiterStandardResponse)
+    assert stream.result.task.title == "Walk"
+    assert stream.text == ARBITER_JSON
+
+
+@pytest.mark.asyncio
+async def test_command_stream_time_to_first_byte():
+    """Tasks and narrative reach the client long before generation completes."""
+    model = FakeModel(ARBITER_JSON)
+    processor = ReflectionProcessor(
+        llm_client=make_client(model), sentiment_engine=None, pattern_engine=None
+    )
+
+    async def produce(sink):
+        await sink("tasks", {"tasks": [{"id": "t1"}]})
+        arb_out = await processor._stream_arbiter("prompt", sink)
+        return {"arbiter_response": arb_out.narrative}
+
+    start = time.perf_counter()
+    stream = EventStream(produce)
+    frames, arrivals = [], []
+    async for frame in stream.frames():
+        arrivals.append(time.perf_counter() - start)
+        frames.append(frame)
+    total = time.perf_counter() - start
+
+    events = [f.split("\n", 1)[0] for f in frames]
+    assert events[0] == "event: tasks"
+    assert events[-1] == "event: result"
+    assert events.count("event: narrative") > 1
+
+    first_narrative = arrivals[events.index("event: narrative")]
+    assert arrivals[0] < CHUNK_DELAY  # tasks go out before the LLM answers
+    assert first_narrative < total / 2
+    result = json.loads(frames[-1].split("data: ", 1)[1])
+    assert result == {"arbiter_response": json.loads(ARBITER_JSON)["narrative"]}
+    assert (await stream.wait()) == result
+
+
+@pytest.mark.asyncio
+async def test_event_stream_reports_producer_failure():
+    async def produce(sink):
+        await sink("tasks", {"tasks": []})
+        raise RuntimeError("boom")
+
+    stream = EventStream(produce, error_detail="Reflection failed.")
+    frames = [frame async for frame in stream.frames()]
+
+    assert frames == [
+        format_sse("tasks", {"tasks": []}),
+        format_sse("error", {"detail": "Reflection failed."}),
+    ]
+    with pytest.raises(RuntimeError):
+        await stream.wait()
+
+
+@pytest.mark.asyncio
+async def test_on_result_runs_in_the_producer_task_without_a_consumer():
+    saved = []
+
+    async def produce(sink):
+        await sink("tasks", {"tasks": []})
+        return {"done": True}
+
+    async def save(result):
+        saved.append(result)
+
+    # Nobody reads the frames, as when the client disconnects mid-stream
+    stream = EventStream(produce, on_result=save).start()
+    assert await stream.wait() == {"done": True}
+    assert saved == [{"done": True}]
+
+
+@pytest.mark.asyncio
+async def test_on_result_is_skipped_when_the_producer_fails():
+    saved = []
+
+    async def produce(sink):
+        raise RuntimeError("boom")
+
+    async def save(result):
+        saved.append(result)
+
+    stream = EventStream(produce, on_result=save)
+    assert [frame async for frame in stream.frames()] == [
+        format_sse("error", {"detail": "Internal error."})
+    ]
+    with pytest.raises(RuntimeError):
+        await stream.wait()
+    assert saved == []
@@ -0,0 +1,190 @@
+"""Tests for prompt prefix caching and tree deltas."""
+
+import json
+
+import pytest
+
+from forest_app.integrations.llm import (
+    HTA_EVOLVE_PROMPT_PREFIX,
+    LLMClient,
+    LLMConnectionError,
+    LLMPromptCacheError,
+)
+from forest_app.integrations.prompt_augmentation import PromptAugmentationService
+from forest_app.integrations.prompt_cache import (
+    MODE_CACHED_PREFIX,
+    MODE_FULL,
+    MODE_TREE_DELTA,
+    PromptAssembler,
+    diff_trees,
+    flatten_tree,
+)
+
+
+class FakeHandle:
+    def __init__(self, name, contents):
+        self.name = name
+        self.contents = contents
+
+
+class FakeBackend:
+    supported = True
+
+    def __init__(self):
+        self.created = []
+        self.deleted = []
+
+    def create(self, model_name, prefix, contents, ttl_seconds):
+        handle = FakeHandle(f"cachedContents/{len(self.created)}", contents)
+        self.created.append(handle)
+        return handle
+
+    def model_for(self, handle):
+        return handle
+
+    def delete(self, handle):
+        self.deleted.append(handle)
+
+
+def make_tree(titles):
+    return {
+        "id": "root",
+        "title": "Goal",
+        "children": [{"id": f"n{i}", "title": t, "children": []} for i, t in enumerate(titles)],
+    }
+
+
+TITLES = [f"Step number {i} with a reasonably long title" for i in range(40)]
+
+
+def assemble(assembler, tree, body="goal"):
+    return assembler.assemble(
+        "hta_evolution", "model", HTA_EVOLVE_PROMPT_PREFIX, body, tree=tree, tree_key="t1"
+    )
+
+
+def test_without_provider_support_sends_full_prompt_and_reports_savings():
+    backend = FakeBackend()
+    backend.supported = False
+    assembler = PromptAssembler(backend=backend, min_cache_tokens=1)
+    tree = make_tree(TITLES)
+
+    assembled = assembler.assemble(
+        "hta_evolution",
+        "model",
+        HTA_EVOLVE_PROMPT_PREFIX,
+        "goal",
+        tree=tree,
+        baseline_parts=[HTA_EVOLVE_PROMPT_PREFIX, json.dumps(tree, indent=2), "goal"],
+    )
+
+    assert assembled.cached_content is None
+    assert assembled.prompt_parts == assembled.full_parts
+    assert assembled.savings.mode == MODE_FULL
+    assert assembled.savings.saved_tokens > 0  # compact tree serialization
+    assert assembler.get_stats()["hta_evolution"]["calls"] == 1
+    assert backend.created == []
+
+
+def test_cached_prefix_then_tree_delta():
+    backend = FakeBackend()
+    assembler = PromptAssembler(backend=backend, min_cache_tokens=100)
+
+    first = assemble(assembler, make_tree(TITLES))
+    assert first.savings.mode == MODE_CACHED_PREFIX
+    assert first.prompt_parts == ["goal"]
+    assert "Step number 39" in backend.created[0].contents[0]
+
+    changed = make_tree(TITLES[:-1])
+    changed["children"][3]["title"] = "Renamed"
+    second = assemble(assembler, changed, body="next goal")
+
+    assert second.savings.mode == MODE_TREE_DELTA
+    assert second.cached_content is first.cached_content
+    delta = json.loads(second.prompt_parts[0].split("```json\n", 1)[1].rsplit("```", 1)[0])
+    assert [node["id"] for node in delta["changed_nodes"]] == ["n3"]
+    assert delta["removed_node_ids"] == ["n39"]
+    assert second.prompt_parts[-1] == "next goal"
+    assert second.savings.sent_tokens < first.savings.baseline_tokens / 4
+    assert len(backend.created) == 1
+
+
+def test_large_delta_recaches_tree():
+    backend = FakeBackend()
+    assembler = PromptAssembler(backend=backend, min_cache_tokens=100, max_delta_ratio=0.5)
+    assemble(assembler, make_tree(TITLES))
+
+    rewritten = assemble(assembler, make_tree([t.upper() for t in TITLES]))
+
+    assert rewritten.savings.mode == MODE_CACHED_PREFIX
+    assert len(backend.created) == 2
+    assert backend.deleted == [backend.created[0]]
+
+
+def test_small_prefix_is_not_cached():
+    backend = FakeBackend()
+    assembler = PromptAssembler(backend=backend, min_cache_tokens=10**6)
+    assembled = assemble(assembler, make_tree(TITLES))
+    assert assembled.savings.mode == MODE_FULL
+    assert backend.created == []
+
+
+def test_flatten_and_diff_round_trip():
+    tree = make_tree(["a", "b"])
+    records = flatten_tree(tree)
+    assert records["n1"] == {"id": "n1", "title": "b", "parent_id": "root", "position": 1}
+    assert diff_trees(records, flatten_tree(tree)) == {
+        "changed_nodes": [],
+        "removed_node_ids": [],
+    }
+
+
+@pytest.mark.asyncio
+async def test_rejected_cached_prefix_falls_back_to_full_prompt():
+    backend = FakeBackend()
+    assembler = PromptAssembler(backend=backend, min_cache_tokens=100)
+    client = LLMClient(micro_batch_window_ms=0, prompt_assembler=assembler)
+    assembled = assemble(assembler, make_tree(TITLES))
+    calls = []
+
+    async def call(parts, cached_content):
+        calls.append((parts, cached_content))
+        if cached_content is not None:
+            raise LLMPromptCacheError("cached content not found")
+        return "ok"
+
+    assert await client._call_with_prompt_cache(assembled, call) == "ok"
+    assert calls[0] == (["goal"], backend.created[0])
+    assert calls[1] == (assembled.full_parts, None)
+    assert backend.deleted == [backend.created[0]]
+    # The next call caches the prefix again
+    assert assemble(assembler, make_tree(TITLES)).cached_content is backend.created[1]
+
+
+@pytest.mark.asyncio
+async def test_other_errors_on_cached_prefix_are_not_resent():
+    backend = FakeBackend()
+    assembler = PromptAssembler(backend=backend, min_cache_tokens=100)
+    client = LLMClient(micro_batch_window_ms=0, prompt_assembler=assembler)
+    assembled = assemble(assembler, make_tree(TITLES))
+    calls = []
+
+    async def call(parts, cached_content):
+        calls.append(cached_content)
+        raise LLMConnectionError("stream dropped")  # May follow streamed nodes
+
+    with pytest.raises(LLMConnectionError):
+        await client._call_with_prompt_cache(assembled, call)
+    assert calls == [backend.created[0]]
+    assert backend.deleted == []
+
+
+def test_template_split_matches_joined_messages():
+    service = PromptAugmentationService()
+    params = {"goal": "Learn guitar", "context": "Beginner", "count": 3}
+    messages = service.format_with_template("hta_node_generation", **params)
+    prefix, body = service.split_with_template("hta_node_generation", **params)
+
+    joined = "\n\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    assert f"{prefix}\n\n{body}" == joined
+    assert "Learn guitar" in body and "Learn guitar" not in prefix
@@ -0,0 +1,121 @@
+"""Tests for the latest-snapshot read-through cache."""
+
+import uuid
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+
+from forest_app.core.snapshot import MemorySnapshot
+from forest_app.helpers import save_snapshot_with_codename
+from forest_app.persistence import snapshot_cache
+from forest_app.persistence.async_repository import AsyncMemorySnapshotRepository
+from forest_app.persistence.models import UserModel
+from forest_app.persistence.snapshot_cache import SnapshotCache, load_latest_snapshot
+
+
+class NoLLM:
+    async def generate(self, prompt_parts, response_model):
+        raise AssertionError("codename generation not expected")
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = SnapshotCache()
+    monkeypatch.setattr(snapshot_cache, "_cache", cache)
+    return cache
+
+
+@pytest_asyncio.fixture
+async def user_id(async_sqlite_session):
+    user = UserModel(id=uuid.uuid4(), email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+    async_sqlite_session.add(user)
+    await async_sqlite_session.commit()
+    return user.id
+
+
+async def save(db, user_id, snapshot, stored_model=None):
+    """What /core/command does after processing: save, commit, hand back."""
+    model = await save_snapshot_with_codename(
+        db, AsyncMemorySnapshotRepository(db), user_id, snapshot, NoLLM(), stored_model
+    )
+    await db.commit()
+    await db.refresh(model, attribute_names=["codename", "updated_at"])
+    snapshot_cache.get_snapshot_cache().remember(user_id, model, snapshot)
+    return model
+
+
+def make_snapshot(capacity):
+    snapshot = MemorySnapshot()
+    snapshot.capacity = capacity
+    return snapshot
+
+
+@pytest.mark.asyncio
+async def test_unchanged_row_is_served_from_the_cache(async_sqlite_session, cache, user_id):
+    db = async_sqlite_session
+    assert await load_latest_snapshot(user_id, db) == (None, None)
+    await save(db, user_id, make_snapshot(0.4))
+    db.expunge_all()
+
+    model, snapshot = await load_latest_snapshot(user_id, db)  # Cached by the save
+    assert snapshot.capacity == pytest.approx(0.4)
+    assert "core_data" not in vars(model)  # Sections were not loaded
+
+    snapshot.capacity = 0.6
+    model = await save(db, user_id, snapshot, model)
+    db.expunge_all()
+    model, loaded = await load_latest_snapshot(user_id, db)
+    assert loaded is snapshot
+    metrics = cache.get_metrics()
+    assert metrics["hits"] == 2 and metrics["misses"] == 0 and metrics["hit_rate"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_other_writes_and_failed_requests_fall_back_to_the_database(
+    async_sqlite_session, cache, user_id
+):
+    db = async_sqlite_session
+    await save(db, user_id, make_snapshot(0.4))
+
+    # Written by another process: only updated_at tells the cache
+    await db.execute(
+        text("UPDATE memory_snapshots SET updated_at = '2030-01-01 00:00:00.000000'")
+    )
+    await db.commit()
+    db.expunge_all()
+    model, snapshot = await load_latest_snapshot(user_id, db)
+    assert cache.get_metrics()["stale"] == 1
+    assert "core_data" in vars(model) and snapshot.capacity == pytest.approx(0.4)
+    assert cache.get_metrics()["load_seconds"] > 0
+
+    # Not handed back (the request failed): the next load reads the database
+    db.expunge_all()
+    _, again = await load_latest_snapshot(user_id, db)
+    assert again is not snapshot and cache.get_metrics()["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_repository_writes_invalidate(async_sqlite_session, cache, user_id):
+    db = async_sqlite_session
+    model = await save(db, user_id, make_snapshot(0.4))
+    AsyncMemorySnapshotRepository(db).update_snapshot(model, make_snapshot(0.9).to_dict())
+    assert cache.get_metrics()["invalidations"] == 1
+    await db.commit()
+    db.expunge_all()
+    _, snapshot = await load_latest_snapshot(user_id, db)
+    assert snapshot.capacity == pytest.approx(0.9)
+
+
+@pytest.mark.asyncio
+async def test_latest_lookup_uses_the_composite_index(async_sqlite_session, user_id):
+    result = await async_sqlite_session.execute(
+        text(
+            "EXPLAIN QUERY PLAN SELECT id, updated_at FROM memory_snapshots "
+            "WHERE user_id = :user_id ORDER BY updated_at DESC LIMIT 1"
+        ),
+        {"user_id": user_id.hex},
+    )
+    plan = " ".join(str(row[-1]) for row in result)
+    assert "idx_memory_snapshots_user_id_updated_at" in plan
+    assert "TEMP B-TREE" not in plan  # No sort step
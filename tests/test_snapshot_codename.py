@@ -0,0 +1,216 @@
+"""Tests for background snapshot codename generation."""
+
+import asyncio
+import uuid
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from forest_app.core import snapshot_codename
+from forest_app.core.snapshot import MemorySnapshot
+from forest_app.core.snapshot_codename import CodenameScheduler
+from forest_app.core.task_queue import TaskQueue
+from forest_app.helpers import save_snapshot_with_codename
+from forest_app.integrations.llm import (
+    SnapshotCodenameBatchItem,
+    SnapshotCodenameBatchResponse,
+)
+from forest_app.persistence.async_repository import AsyncMemorySnapshotRepository
+from forest_app.persistence import database
+from forest_app.persistence.models import MemorySnapshotModel, UserModel
+
+
+class BatchNamingLLM:
+    """Names every key in the batch prompt, counting calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, prompt_parts, response_model):
+        self.calls += 1
+        items = [
+            SnapshotCodenameBatchItem(key=str(i), codename=f"Quiet Dawn {self.calls}.{i}")
+            for i in range(1, 10)
+        ]
+        return SnapshotCodenameBatchResponse(codenames=items)
+
+
+class FlakyNamingLLM(BatchNamingLLM):
+    """Fails the first ``failures`` calls, then names every key."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    async def generate(self, prompt_parts, response_model):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("provider unavailable")
+        return await super().generate(prompt_parts, response_model)
+
+
+@pytest_asyncio.fixture
+async def scheduler(async_sqlite_session, monkeypatch):
+    queue = TaskQueue(max_workers=1)
+    await queue.start()
+    scheduler = CodenameScheduler(
+        batch_window=0.05,
+        task_queue=queue,
+        session_factory=sessionmaker(
+            async_sqlite_session.bind, class_=AsyncSession, expire_on_commit=False
+        ),
+    )
+    monkeypatch.setattr(snapshot_codename, "_scheduler", scheduler)
+    yield scheduler
+    await queue.stop()
+
+
+async def add_user(db):
+    user = UserModel(id=uuid.uuid4(), email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+    db.add(user)
+    await db.commit()
+    return user
+
+
+def make_snapshot(capacity):
+    snapshot = MemorySnapshot()
+    snapshot.capacity = capacity
+    return snapshot
+
+
+async def save(db, user, snapshot, llm, stored_model=None):
+    return await save_snapshot_with_codename(
+        db, AsyncMemorySnapshotRepository(db), user.id, snapshot, llm, stored_model
+    )
+
+
+async def wait_for_applied(scheduler, count, timeout=5.0):
+    async def poll():
+        while scheduler.get_metrics()["applied"] < count:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+@pytest.mark.asyncio
+async def test_saves_are_named_in_one_batch_after_commit(async_sqlite_session, scheduler):
+    db = async_sqlite_session
+    llm = BatchNamingLLM()
+    first_user, second_user = await add_user(db), await add_user(db)
+
+    first = await save(db, first_user, make_snapshot(0.2), llm)
+    second = await save(db, second_user, make_snapshot(0.8), llm)
+    assert first.codename.startswith("Snapshot_") and llm.calls == 0
+    await db.commit()
+
+    await wait_for_applied(scheduler, 2)
+    assert llm.calls == 1
+    repo = AsyncMemorySnapshotRepository(db)
+    saved = [(first.id, first_user.id), (second.id, second_user.id)]
+    db.expire_all()
+    names = {
+        (await repo.get_snapshot_by_id(snapshot_id, user_id)).codename
+        for snapshot_id, user_id in saved
+    }
+    assert names == {"Quiet Dawn 1.1", "Quiet Dawn 1.2"}
+
+
+@pytest.mark.asyncio
+async def test_unchanged_and_cached_states_skip_the_llm(async_sqlite_session, scheduler):
+    db = async_sqlite_session
+    llm = BatchNamingLLM()
+    user = await add_user(db)
+
+    model = await save(db, user, make_snapshot(0.5), llm)
+    await db.commit()
+    await wait_for_applied(scheduler, 1)
+    await db.refresh(model)
+    named = model.codename
+
+    # Score drift below the rounding step is not a meaningful change
+    model = await save(db, user, make_snapshot(0.51), llm, stored_model=model)
+    await db.commit()
+    assert model.codename == named
+
+    # A new snapshot of an already named state reuses the cached name
+    other = await save(db, await add_user(db), make_snapshot(0.5), llm)
+    assert other.codename == named
+    await db.commit()
+    await asyncio.sleep(0.2)
+    assert llm.calls == 1 and scheduler.get_metrics()["scheduled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_saves_are_not_named(async_sqlite_session, scheduler):
+    db = async_sqlite_session
+    user = await add_user(db)
+    await save(db, user, make_snapshot(0.3), BatchNamingLLM())
+    await db.rollback()
+    await db.commit()
+    assert scheduler.get_metrics()["scheduled"] == 0
+
+
+@pytest.mark.asyncio
+async def test_newer_codename_is_not_overwritten(async_sqlite_session, scheduler):
+    db = async_sqlite_session
+    user = await add_user(db)
+    model = await save(db, user, make_snapshot(0.3), BatchNamingLLM())
+    await db.commit()
+    model.codename = "Renamed By User"
+    await db.commit()
+
+    await asyncio.sleep(0.3)
+    assert scheduler.get_metrics()["stale"] == 1
+    await db.refresh(model)
+    assert model.codename == "Renamed By User"
+
+
+@pytest.mark.asyncio
+async def test_failed_generation_is_retried(async_sqlite_session, scheduler):
+    scheduler.task_queue.retry_backoff = 0.01
+    db = async_sqlite_session
+    llm = FlakyNamingLLM(failures=1)
+    model = await save(db, await add_user(db), make_snapshot(0.4), llm)
+    await db.commit()
+
+    await wait_for_applied(scheduler, 1)
+    metrics = scheduler.get_metrics()
+    assert metrics["llm_failures"] == 1 and metrics["retries"] == 1
+    await db.refresh(model)
+    assert model.codename == "Quiet Dawn 1.1"
+
+
+@pytest.mark.asyncio
+async def test_retries_stop_after_max_attempts(async_sqlite_session, scheduler):
+    scheduler.task_queue.retry_backoff = 0.01
+    scheduler.task_queue.max_attempts = 2
+    db = async_sqlite_session
+    await save(db, await add_user(db), make_snapshot(0.4), FlakyNamingLLM(failures=5))
+    await db.commit()
+
+    await asyncio.sleep(0.5)
+    metrics = scheduler.get_metrics()
+    assert metrics["llm_failures"] == 2 and metrics["abandoned"] == 1
+    assert metrics["pending"] == 0 and metrics["applied"] == 0
+
+
+@pytest.mark.asyncio
+async def test_write_back_falls_back_to_the_sync_session(
+    async_sqlite_session, scheduler, tmp_path, monkeypatch
+):
+    engine = create_engine(f"sqlite:///{tmp_path / 'forest.db'}")
+    monkeypatch.setattr(scheduler, "session_factory", None)
+    monkeypatch.setattr(database, "AsyncSessionLocal", None)
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine))
+    db = async_sqlite_session
+    model = await save(db, await add_user(db), make_snapshot(0.6), BatchNamingLLM())
+    await db.commit()
+
+    await wait_for_applied(scheduler, 1)
+    with database.SessionLocal() as sync_db:
+        assert sync_db.get(MemorySnapshotModel, model.id).codename == "Quiet Dawn 1.1"
+    engine.dispose()
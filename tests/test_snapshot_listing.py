@@ -0,0 +1,74 @@
+"""Tests for paged, projected snapshot listing."""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from forest_app.persistence.async_repository import AsyncMemorySnapshotRepository
+from forest_app.persistence.models import MemorySnapshotModel, UserModel
+from forest_app.persistence.repository import MemorySnapshotRepository
+from forest_app.persistence.snapshot_listing import decode_cursor, encode_cursor
+
+
+def add_snapshots(db, user_id, count):
+    """Snapshots with pairwise-tied updated_at values, to exercise the id tiebreak."""
+    base = datetime(2026, 1, 1)
+    for i in range(count):
+        model = MemorySnapshotRepository(db).create_snapshot(
+            user_id, {"capacity": 0.1 * i}, f"Snapshot {i}"
+        )
+        model.updated_at = base + timedelta(minutes=i // 2)
+    db.commit()
+
+
+@pytest.fixture
+def user_id(sqlite_session):
+    user = UserModel(id=uuid.uuid4(), email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+    sqlite_session.add(user)
+    sqlite_session.commit()
+    return user.id
+
+
+def test_pages_cover_every_snapshot_once_newest_first(sqlite_session, user_id):
+    add_snapshots(sqlite_session, user_id, 7)
+    repo = MemorySnapshotRepository(sqlite_session)
+    pages, before = [], None
+    while True:
+        rows, before = repo.list_snapshot_infos(user_id, limit=3, before=before)
+        pages.append(rows)
+        if before is None:
+            break
+
+    assert [len(rows) for rows in pages] == [3, 3, 1]
+    listed = [row for rows in pages for row in rows]
+    expected = sorted(
+        sqlite_session.query(MemorySnapshotModel.updated_at, MemorySnapshotModel.id).all(),
+        reverse=True,
+    )
+    assert [(row.updated_at, row.id) for row in listed] == [tuple(key) for key in expected]
+    assert set(listed[0]._fields) == {"id", "codename", "created_at", "updated_at"}
+
+
+@pytest.mark.asyncio
+async def test_async_listing_matches(async_sqlite_session):
+    db = async_sqlite_session
+    user = UserModel(id=uuid.uuid4(), email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+    db.add(user)
+    for i in range(3):
+        AsyncMemorySnapshotRepository(db).create_snapshot(user.id, {"capacity": 0.1}, f"S{i}")
+    await db.commit()
+
+    repo = AsyncMemorySnapshotRepository(db)
+    first, before = await repo.list_snapshot_infos(user.id, limit=2)
+    rest, after = await repo.list_snapshot_infos(user.id, limit=2, before=before)
+    assert len(first) == 2 and len(rest) == 1 and after is None
+    assert {row.codename for row in first + rest} == {"S0", "S1", "S2"}
+
+
+def test_cursor_round_trip_and_validation():
+    moment, snapshot_id = datetime(2026, 3, 1, 12, 30, 0, 123456), uuid.uuid4()
+    assert decode_cursor(encode_cursor(moment, snapshot_id)) == (moment, snapshot_id)
+    for bad in ("not-a-cursor", encode_cursor(moment, snapshot_id)[:-4], ""):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
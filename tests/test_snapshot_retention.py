@@ -0,0 +1,131 @@
+"""Tests for snapshot retention and the snapshot archive."""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from forest_app.core.snapshot_retention import SnapshotRetention, SnapshotRetentionPolicy
+from forest_app.persistence.async_repository import AsyncMemorySnapshotRepository
+from forest_app.persistence.models import (
+    ArchivedSnapshotModel,
+    MemorySnapshotModel,
+    UserModel,
+)
+from forest_app.persistence.repository import (
+    ArchivedSnapshotRepository,
+    MemorySnapshotRepository,
+)
+from forest_app.persistence.snapshot_archive import archive_snapshot, read_archived_snapshot
+
+NOW = datetime(2026, 6, 15, 12, 0)  # A Monday
+
+
+def hourly(count):
+    """(id, updated_at) newest first, one snapshot per hour back from NOW."""
+    return [(i, NOW - timedelta(hours=i)) for i in range(count)]
+
+
+def test_policy_keeps_recent_and_checkpoints():
+    # 10 days of hourly snapshots: keep 5, plus a daily checkpoint for each of
+    # the last 3 days and a weekly one for the last 2 weeks
+    snapshots = hourly(24 * 10)
+    policy = SnapshotRetentionPolicy(keep_last=5, daily_checkpoints=3, weekly_checkpoints=2)
+    expired = set(policy.select_expired(snapshots, NOW))
+    kept = [(i, at) for i, at in snapshots if i not in expired]
+
+    assert [i for i, _ in kept[:5]] == [0, 1, 2, 3, 4]
+    older = kept[5:]
+    # Newest of June 14 and 13 (June 15 is already covered), newest of the previous week
+    assert [at for _, at in older] == [
+        datetime(2026, 6, 14, 23, 0),
+        datetime(2026, 6, 13, 23, 0),
+    ]
+    assert len(expired) == len(snapshots) - 7
+
+
+def test_policy_always_keeps_latest():
+    policy = SnapshotRetentionPolicy(keep_last=0, daily_checkpoints=0, weekly_checkpoints=0)
+    assert policy.select_expired(hourly(3), NOW) == [1, 2]
+
+
+def test_archive_round_trip_keeps_document_and_embeddings(sqlite_session):
+    user = UserModel(id=uuid.uuid4(), email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+    sqlite_session.add(user)
+    document = {
+        "capacity": 0.4,
+        "reflection_log": [{"content": "walked"}],
+        "semantic_memories": {"memories": [{"content": "m", "embedding": [0.5, -0.25, 1.0]}]},
+    }
+    model = MemorySnapshotRepository(sqlite_session).create_snapshot(user.id, document, "Old")
+    sqlite_session.commit()
+
+    sqlite_session.add(archive_snapshot(model))
+    sqlite_session.delete(model)
+    sqlite_session.commit()
+
+    archived = ArchivedSnapshotRepository(sqlite_session).get_archived_snapshot(model.id, user.id)
+    restored = read_archived_snapshot(archived)
+    assert restored["reflection_log"] == document["reflection_log"]
+    memory = restored["semantic_memories"]["memories"][0]
+    assert memory["content"] == "m"
+    assert memory["embedding"].tolist() == [0.5, -0.25, 1.0]
+    rows, _ = ArchivedSnapshotRepository(sqlite_session).list_snapshot_infos(user.id)
+    assert [(row.id, row.codename) for row in rows] == [(model.id, "Old")]
+
+
+@pytest.mark.asyncio
+async def test_run_archives_expired_snapshots_in_batches(async_sqlite_session):
+    db = async_sqlite_session
+    user = UserModel(id=uuid.uuid4(), email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+    db.add(user)
+    for i in range(12):
+        model = AsyncMemorySnapshotRepository(db).create_snapshot(
+            user.id, {"capacity": 0.1 * i}, f"S{i}"
+        )
+        model.updated_at = NOW - timedelta(days=30 * i)
+    await db.commit()
+
+    retention = SnapshotRetention(
+        policy=SnapshotRetentionPolicy(keep_last=3, daily_checkpoints=0, weekly_checkpoints=0),
+        batch_size=4,
+        batch_pause=0,
+        session_factory=sessionmaker(db.bind, class_=AsyncSession, expire_on_commit=False),
+    )
+    assert await retention.run(NOW) == 9
+    assert await retention.run(NOW) == 0  # Nothing left over the limit
+
+    live = await db.execute(select(MemorySnapshotModel.codename))
+    assert sorted(live.scalars().all()) == ["S0", "S1", "S2"]
+    archived = await db.execute(select(func.count()).select_from(ArchivedSnapshotModel))
+    assert archived.scalar_one() == 9
+    metrics = retention.get_metrics()
+    assert metrics["batches"] == 3 and metrics["archived"] == 9 and metrics["failures"] == 0
+
+
+@pytest.mark.asyncio
+async def test_runs_page_past_users_with_only_checkpoints(async_sqlite_session):
+    db = async_sqlite_session
+    # Ordered ids: the first user's extra snapshots are all daily checkpoints
+    checkpoints_only = UserModel(id=uuid.UUID(int=1), email="a@example.com", hashed_password="x")
+    expiring = UserModel(id=uuid.UUID(int=2), email="b@example.com", hashed_password="x")
+    db.add_all([checkpoints_only, expiring])
+    repo = AsyncMemorySnapshotRepository(db)
+    for i in range(3):
+        repo.create_snapshot(checkpoints_only.id, {}, f"A{i}").updated_at = NOW - timedelta(days=i)
+        repo.create_snapshot(expiring.id, {}, f"B{i}").updated_at = NOW - timedelta(hours=i)
+    await db.commit()
+
+    retention = SnapshotRetention(
+        policy=SnapshotRetentionPolicy(keep_last=1, daily_checkpoints=7, weekly_checkpoints=0),
+        max_users_per_run=1,
+        batch_pause=0,
+        session_factory=sessionmaker(db.bind, class_=AsyncSession, expire_on_commit=False),
+    )
+    assert await retention.run(NOW) == 0  # The first user keeps everything
+    assert await retention.run(NOW) == 2  # The next run moves on to the second
+    assert await retention.run(NOW) == 0  # Back to the start
+    assert retention.get_metrics()["users"] == 3
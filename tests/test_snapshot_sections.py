@@ -0,0 +1,123 @@
+"""Tests for section-wise snapshot persistence."""
+
+import uuid
+
+from sqlalchemy import event, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from forest_app.core.snapshot import MemorySnapshot
+from forest_app.persistence.models import JSONType, MemorySnapshotModel, UserModel
+from forest_app.persistence.repository import MemorySnapshotRepository
+from forest_app.persistence.snapshot_sections import (
+    assemble_snapshot,
+    split_snapshot,
+    write_metrics,
+    write_snapshot_data,
+)
+
+
+def big_snapshot():
+    snapshot = MemorySnapshot()
+    snapshot.core_state["hta_tree"] = {
+        "root": {"id": "root", "children": [{"id": f"n{i}", "title": "x" * 200} for i in range(50)]}
+    }
+    snapshot.semantic_memories = {"m1": {"embedding": [0.1] * 256}}
+    snapshot.reflection_log = [{"role": "user", "content": "Reflection"}]
+    return snapshot
+
+
+def capture_statements(session):
+    statements = []
+
+    @event.listens_for(session.get_bind(), "before_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    return statements
+
+
+def test_split_and_assemble_round_trip():
+    data = big_snapshot().to_dict()
+    core, sections = split_snapshot(data)
+    assert "hta_tree" not in core["core_state"] and "semantic_memories" not in core
+    assert assemble_snapshot(core, sections) == data
+    assert assemble_snapshot(data, {}) == data  # Rows stored before the split
+
+
+def test_only_changed_sections_are_written(sqlite_session):
+    user = UserModel(id=uuid.uuid4(), email="a@example.com", hashed_password="x")
+    sqlite_session.add(user)
+    repo = MemorySnapshotRepository(sqlite_session)
+    snapshot = big_snapshot()
+    model = repo.create_snapshot(user.id, snapshot.to_dict(), "first")
+    sqlite_session.commit()
+
+    write_metrics.reset()
+    statements = capture_statements(sqlite_session)
+    snapshot = MemorySnapshot.from_dict(model.snapshot_data)
+    snapshot.capacity = 0.9
+    repo.update_snapshot(model, snapshot.to_dict())
+    sqlite_session.commit()
+
+    (statement,) = [s for s in statements if s.startswith("UPDATE")]
+    assert "snapshot_data" in statement and "hta_tree_data" not in statement
+    metrics = write_metrics.get_metrics()
+    assert metrics["sections_skipped"] == 3
+    assert metrics["bytes_written"] < metrics["bytes_full"] / 5
+
+    # In-place changes to shared dicts are detected through the stored hashes
+    snapshot = MemorySnapshot.from_dict(model.snapshot_data)
+    snapshot.core_state["hta_tree"]["root"]["children"].pop()
+    repo.update_snapshot(model, snapshot.to_dict())
+    sqlite_session.commit()
+    sqlite_session.expire_all()
+    stored = repo.get_latest_snapshot(user.id).snapshot_data
+    assert len(stored["core_state"]["hta_tree"]["root"]["children"]) == 49
+    assert stored["capacity"] == 0.9 and stored["semantic_memories"] == snapshot.semantic_memories
+
+
+def test_rows_stored_before_the_split_are_split_on_next_save(sqlite_session):
+    user = UserModel(id=uuid.uuid4(), email="b@example.com", hashed_password="x")
+    sqlite_session.add(user)
+    data = big_snapshot().to_dict()
+    model = MemorySnapshotModel(user_id=user.id, core_data=data)
+    sqlite_session.add(model)
+    sqlite_session.commit()
+    assert model.snapshot_data == data and model.hta_tree_data is None
+
+    MemorySnapshotRepository(sqlite_session).update_snapshot(model, data)
+    sqlite_session.commit()
+    assert "hta_tree" not in model.core_data["core_state"]
+    assert model.snapshot_data == data
+
+
+def test_postgres_patches_changed_core_keys_with_jsonb_set():
+    model = MemorySnapshotModel(user_id=uuid.uuid4())
+    data = big_snapshot().to_dict()
+    write_snapshot_data(model, data, "postgresql")
+    assert isinstance(model.core_data, dict)  # New rows are written whole
+
+    data = dict(data, capacity=0.1)
+    write_snapshot_data(model, data, "postgresql")
+    assert model.snapshot_data == data  # Readable before the flush
+    compiled = (
+        update(MemorySnapshotModel)
+        .values(core_data=model.core_data)
+        .compile(dialect=postgresql.dialect())
+    )
+    assert str(compiled).count("jsonb_set") == 1
+    assert ["capacity"] in compiled.params.values()
+
+
+def test_json_type_decodes_only_the_text_fallback():
+    column = JSONType()
+    pg = postgresql.dialect()
+    assert column.process_bind_param({"a": 1}, pg) == {"a": 1}
+    assert column.process_bind_param({"a": 1}, sqlite.dialect()) == {"a": 1}
+    assert column.process_result_value({"a": 1}, pg) == {"a": 1}
+    # Strings from a JSON column are string values, not encoded documents
+    assert column.process_result_value('{"a": 1}', pg) == '{"a": 1}'
+    text_dialect = mysql.dialect()
+    assert column.process_bind_param("123", text_dialect) == '"123"'
+    assert column.process_result_value('"123"', text_dialect) == "123"
+    assert column.process_result_value('{"a": 1}', text_dialect) == {"a": 1}
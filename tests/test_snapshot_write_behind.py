@@ -0,0 +1,237 @@
+"""Tests for write-behind snapshot persistence."""
+
+import asyncio
+import time
+import uuid
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from forest_app.core.session_manager import SessionManager
+from forest_app.core.snapshot import MemorySnapshot
+from forest_app.core.snapshot_write_behind import SnapshotWriteBehind
+from forest_app.persistence.async_repository import AsyncMemorySnapshotRepository
+from forest_app.persistence.models import ConversationSummaryModel, UserModel
+
+
+@pytest_asyncio.fixture
+async def session_factory(async_sqlite_session):
+    return sessionmaker(async_sqlite_session.bind, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest_asyncio.fixture
+async def user_id(async_sqlite_session):
+    user = UserModel(id=uuid.uuid4(), email=f"{uuid.uuid4()}@example.com", hashed_password="x")
+    async_sqlite_session.add(user)
+    await async_sqlite_session.commit()
+    return user.id
+
+
+def make_write_behind(session_factory, **kwargs):
+    return SnapshotWriteBehind(
+        enabled=True,
+        session_factory=session_factory,
+        lock_provider=SessionManager().get_user_lock,
+        **kwargs,
+    )
+
+
+async def stored_capacity(session_factory, user_id):
+    async with session_factory() as db:
+        model = await AsyncMemorySnapshotRepository(db).get_latest_snapshot(user_id)
+        return model.snapshot_data["capacity"] if model else None
+
+
+async def command(write_behind, user_id, capacity):
+    """What /core/command does: load (cache first), process, stage."""
+    async with write_behind.command_scope(user_id):
+        entry = write_behind.get(user_id)
+        snapshot = entry.snapshot if entry else MemorySnapshot()
+        await asyncio.sleep(0)  # Processing yields to the event loop
+        snapshot.capacity = capacity
+        write_behind.stage(user_id, snapshot, llm_client=None)
+
+
+@pytest.mark.asyncio
+async def test_burst_of_commands_is_written_once(session_factory, user_id):
+    write_behind = make_write_behind(session_factory, window=0.1)
+    for i in range(5):
+        await command(write_behind, user_id, 0.1 * (i + 1))
+    assert await stored_capacity(session_factory, user_id) is None  # Not written yet
+
+    await asyncio.sleep(0.3)
+    metrics = write_behind.get_metrics()
+    assert metrics["flushes"] == 1 and metrics["coalesced"] == 4 and metrics["dirty"] == 0
+    assert await stored_capacity(session_factory, user_id) == pytest.approx(0.5)
+    assert write_behind.get(user_id).snapshot.capacity == pytest.approx(0.5)
+    await write_behind.stop()
+
+
+@pytest.mark.asyncio
+async def test_busy_users_are_skipped_until_max_delay(session_factory, user_id):
+    write_behind = make_write_behind(session_factory, window=5, max_delay=60)
+    await command(write_behind, user_id, 0.3)
+    due = time.monotonic() + 10
+    async with write_behind.user_lock(user_id):
+        assert await write_behind.flush_due(now=due) == 0  # Mid-command: skipped
+    assert await write_behind.flush_due(now=due) == 1
+    assert await stored_capacity(session_factory, user_id) == pytest.approx(0.3)
+    await write_behind.stop()
+
+
+@pytest.mark.asyncio
+async def test_shutdown_flushes_and_release_drops_the_cache(session_factory, user_id):
+    write_behind = make_write_behind(session_factory, window=60)
+    await command(write_behind, user_id, 0.7)
+    await write_behind.stop()
+    assert await stored_capacity(session_factory, user_id) == pytest.approx(0.7)
+
+    await command(write_behind, user_id, 0.8)
+    await write_behind.release(user_id)
+    assert write_behind.get(user_id) is None
+    assert await stored_capacity(session_factory, user_id) == pytest.approx(0.8)
+    await write_behind.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_changes_for_retry(session_factory, user_id):
+    calls = []
+
+    def flaky_factory():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError("database unavailable")
+        return session_factory()
+
+    write_behind = make_write_behind(flaky_factory, window=5)
+    await command(write_behind, user_id, 0.4)
+    due = time.monotonic() + 10
+    assert await write_behind.flush_due(now=due) == 0
+    assert write_behind.get_metrics()["dirty"] == 1
+    # Until a flush succeeds the database keeps its last flushed state
+    assert await stored_capacity(session_factory, user_id) is None
+
+    assert await write_behind.flush_due(now=due) == 1
+    assert await stored_capacity(session_factory, user_id) == pytest.approx(0.4)
+    await write_behind.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_explicit_save_is_retried_by_the_flusher(session_factory, user_id):
+    database_down = []
+
+    def factory():
+        if database_down:
+            raise ConnectionError("database unavailable")
+        return session_factory()
+
+    write_behind = make_write_behind(factory, window=5)
+    await command(write_behind, user_id, 0.4)
+    assert await write_behind.flush_due(now=time.monotonic() + 10) == 1
+
+    database_down.append(True)
+    async with write_behind.user_lock(user_id):
+        assert await write_behind.write_now(user_id) is None
+    database_down.clear()
+
+    assert await write_behind.flush_due(now=time.monotonic() + 10) == 1
+    assert write_behind.get_metrics()["dirty"] == 0
+    await write_behind.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_command_drops_a_clean_cached_snapshot(session_factory, user_id):
+    write_behind = make_write_behind(session_factory, window=60)
+    await command(write_behind, user_id, 0.2)
+    await write_behind.flush_all()
+    with pytest.raises(RuntimeError):
+        async with write_behind.command_scope(user_id):
+            write_behind.get(user_id).snapshot.capacity = 0.9  # Partial change
+            raise RuntimeError("processing failed")
+    assert write_behind.get(user_id) is None
+    assert await stored_capacity(session_factory, user_id) == pytest.approx(0.2)
+    await write_behind.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_command_restores_a_dirty_cached_snapshot(session_factory, user_id):
+    write_behind = make_write_behind(session_factory, window=60)
+    await command(write_behind, user_id, 0.2)
+    with pytest.raises(RuntimeError):
+        async with write_behind.command_scope(user_id):
+            write_behind.get(user_id).snapshot.capacity = 0.9  # Partial change
+            raise RuntimeError("processing failed")
+    # The staged command survives; the failed command's change does not
+    assert write_behind.get(user_id).snapshot.capacity == pytest.approx(0.2)
+    await write_behind.flush_all()
+    assert await stored_capacity(session_factory, user_id) == pytest.approx(0.2)
+    await write_behind.stop()
+
+
+@pytest.mark.asyncio
+async def test_flush_drops_a_snapshot_written_by_another_worker(session_factory, user_id):
+    write_behind = make_write_behind(session_factory, window=60)
+    await command(write_behind, user_id, 0.2)
+    await write_behind.flush_all()
+    await command(write_behind, user_id, 0.3)
+
+    # Another worker saves the user's snapshot while this one has it cached
+    async with session_factory() as db:
+        model = await AsyncMemorySnapshotRepository(db).get_latest_snapshot(user_id)
+        AsyncMemorySnapshotRepository(db).update_snapshot(model, {"capacity": 0.6})
+        await db.commit()
+
+    assert await write_behind.flush_all() == 0
+    assert write_behind.get(user_id) is None
+    assert write_behind.get_metrics()["conflicts"] == 1
+    assert await stored_capacity(session_factory, user_id) == pytest.approx(0.6)
+    await write_behind.stop()
+
+
+class CommitFailsSession(AsyncSession):
+    async def commit(self):
+        raise ConnectionError("connection lost at commit")
+
+
+@pytest.mark.asyncio
+async def test_compacted_history_survives_a_failed_flush(session_factory, user_id):
+    failing_factory = sessionmaker(
+        session_factory.kw["bind"], class_=CommitFailsSession, expire_on_commit=False
+    )
+    factories = iter([failing_factory])
+
+    def first_commit_fails():
+        return next(factories, session_factory)()
+
+    write_behind = make_write_behind(first_commit_fails, window=5)
+    async with write_behind.command_scope(user_id):
+        snapshot = MemorySnapshot()
+        snapshot.conversation_history = [
+            {"role": "user", "content": f"Turn {i}."} for i in range(40)
+        ]
+        write_behind.stage(user_id, snapshot, llm_client=None)
+
+    due = time.monotonic() + 10
+    assert await write_behind.flush_due(now=due) == 0
+    (segment,) = write_behind.get(user_id).snapshot.pending_history_segments
+
+    # A failed command restores the staged copy, segments included
+    with pytest.raises(RuntimeError):
+        async with write_behind.command_scope(user_id):
+            write_behind.get(user_id).snapshot.conversation_history.clear()
+            raise RuntimeError("processing failed")
+    assert write_behind.get(user_id).snapshot.pending_history_segments == [segment]
+
+    assert await write_behind.flush_due(now=due) == 1
+    assert write_behind.get(user_id).snapshot.pending_history_segments == []
+    async with session_factory() as db:
+        count = await db.execute(
+            select(func.count()).select_from(ConversationSummaryModel).where(
+                ConversationSummaryModel.user_id == user_id
+            )
+        )
+        assert count.scalar_one() == 1
+    await write_behind.stop()
@@ -0,0 +1,358 @@
+"""Tests for the background task queue and its durable store."""
+
+import asyncio
+import time
+
+import pytest
+
+from forest_app.core.task_queue import TaskQueue, register_task
+from forest_app.core.task_store import SQLTaskStore, TaskStatus, TaskStore
+
+CALLS = {"flaky": 0}
+ORDER = []
+
+
+@register_task("tests.add")
+async def add_task(a, b):
+    return a + b
+
+
+@register_task("tests.always_fails")
+def always_fails_task():
+    raise RuntimeError("boom")
+
+
+@register_task("tests.record")
+def record_task():
+    ORDER.append("durable")
+
+
+@register_task("tests.flaky")
+def flaky_task():
+    CALLS["flaky"] += 1
+    if CALLS["flaky"] < 2:
+        raise RuntimeError("transient")
+    return "ok"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLTaskStore(db_url=f"sqlite:///{tmp_path / 'tasks.db'}")
+
+
+def make_queue(store, **kwargs):
+    defaults = dict(
+        max_workers=2,
+        store=store,
+        poll_interval=0.01,
+        retry_backoff=0.0,
+        visibility_timeout=5.0,
+    )
+    defaults.update(kwargs)
+    return TaskQueue(**defaults)
+
+
+@pytest.mark.asyncio
+async def test_in_memory_task_runs_without_store():
+    queue = TaskQueue(max_workers=1)
+    await queue.start()
+    try:
+        task_id = await queue.enqueue(add_task, 2, 3)
+        result = await queue.get_result(task_id, timeout=2)
+    finally:
+        await queue.stop()
+
+    assert result == {"status": "completed", "result": 5}
+
+
+@pytest.mark.asyncio
+async def test_expired_results_are_popped_from_heap():
+    queue = TaskQueue(max_workers=1, result_ttl=0)
+    queue._store_result("a", {"status": "completed", "result": 1})
+    queue._store_result("b", {"status": "completed", "result": 2})
+    await asyncio.sleep(0)
+
+    expired = queue._pop_expired_results()
+
+    assert sorted(expired) == ["a", "b"]
+    assert queue.results == {}
+    assert queue._expiry_heap == []
+
+
+@pytest.mark.asyncio
+async def test_durable_task_survives_restart(store):
+    producer = make_queue(store)
+    task_id = await producer.enqueue("tests.add", 20, 22)
+    producer.thread_pool.shutdown()
+
+    # A fresh queue (e.g. after a deploy) drains the persisted task
+    consumer = make_queue(store)
+    await consumer.start()
+    try:
+        result = await consumer.get_result(task_id, timeout=5)
+    finally:
+        await consumer.stop()
+
+    assert result == {"status": "completed", "result": 42}
+
+
+@pytest.mark.asyncio
+async def test_multiple_workers_claim_each_task_once(store):
+    queues = [make_queue(store), make_queue(store)]
+    task_ids = [await queues[0].enqueue(add_task, i, 0) for i in range(10)]
+
+    for queue in queues:
+        await queue.start()
+    try:
+        results = [await queues[1].get_result(t, timeout=5) for t in task_ids]
+    finally:
+        for queue in queues:
+            await queue.stop()
+
+    assert [r["result"] for r in results] == list(range(10))
+    assert all(store.get(t)["attempts"] == 1 for t in task_ids)
+
+
+@pytest.mark.asyncio
+async def test_idle_workers_drain_a_durable_backlog_without_polling(store):
+    queue = make_queue(store, max_workers=1, poll_interval=30.0)
+    task_ids = [await queue.enqueue("tests.add", i, 1) for i in range(20)]
+
+    await queue.start()
+    try:
+        # Claims continue while they succeed rather than one per poll_interval
+        results = [await queue.get_result(t, timeout=5) for t in task_ids]
+    finally:
+        await queue.stop()
+
+    assert [r["result"] for r in results] == list(range(1, 21))
+
+
+@pytest.mark.asyncio
+async def test_in_memory_load_does_not_starve_the_store(store):
+    ORDER.clear()
+
+    async def busy():
+        await asyncio.sleep(0.001)
+        ORDER.append("memory")
+
+    queue = make_queue(store, max_workers=1, poll_interval=30.0)
+    for _ in range(20):
+        await queue.enqueue(busy)
+    durable_id = await queue.enqueue("tests.record")
+
+    await queue.start()
+    try:
+        await queue.get_result(durable_id, timeout=5)
+    finally:
+        await queue.stop()
+
+    # Claimed between in-memory tasks, not after the queue drained
+    assert ORDER.index("durable") < 3
+
+
+def test_task_store_is_abstract():
+    with pytest.raises(TypeError):
+        TaskStore()
+
+
+@pytest.mark.asyncio
+async def test_failed_task_retries_then_succeeds(store):
+    CALLS["flaky"] = 0
+    queue = make_queue(store)
+    await queue.start()
+    try:
+        task_id = await queue.enqueue("tests.flaky")
+        result = await queue.get_result(task_id, timeout=5)
+    finally:
+        await queue.stop()
+
+    assert result["status"] == "completed"
+    assert store.get(task_id)["attempts"] == 2
+
+
+@pytest.mark.asyncio
+async def test_exhausted_task_is_dead_lettered(store):
+    queue = make_queue(store, max_attempts=2)
+    await queue.start()
+    try:
+        task_id = await queue.enqueue(always_fails_task)
+        result = await queue.get_result(task_id, timeout=5)
+        dead = await queue.get_dead_letters()
+    finally:
+        await queue.stop()
+
+    assert result["status"] == "failed"
+    assert "boom" in result["error"]["error"]
+    assert [record["id"] for record in dead] == [task_id]
+
+
+def test_expired_lease_can_be_reclaimed(store):
+    store.enqueue("t1", "tests.add", [1, 1], {})
+    first = store.claim(visibility_timeout=-1)  # lease already expired
+    second = store.claim(visibility_timeout=30)
+
+    assert first["id"] == second["id"] == "t1"
+    assert second["attempts"] == 2
+    # The stale owner can no longer record a result
+    assert store.complete("t1", first["lease_owner"], 2, 60) is False
+    assert store.complete("t1", second["lease_owner"], 2, 60) is True
+
+
+def test_purge_expired_removes_only_expired_results(store):
+    store.enqueue("old", "tests.add", [1, 1], {})
+    store.enqueue("new", "tests.add", [1, 1], {})
+    for _ in range(2):
+        record = store.claim(visibility_timeout=30)
+        ttl = -1 if record["id"] == "old" else 60
+        store.complete(record["id"], record["lease_owner"], 2, ttl)
+
+    assert store.purge_expired(now=time.time()) == 1
+    assert store.get("old") is None
+    assert store.get("new")["status"] == TaskStatus.COMPLETED
+
+
+def test_non_json_arguments_stay_in_memory(store):
+    queue = make_queue(store)
+    assert queue._durable_task_name(add_task, (object(), 1), {}) is None
+    assert queue._durable_task_name(add_task, (1, 1), {}) == "tests.add"
+
+
+@pytest.mark.asyncio
+async def test_merge_coalesces_pending_duplicates():
+    calls = []
+
+    async def expand(node_id):
+        calls.append(node_id)
+        return node_id
+
+    queue = TaskQueue(max_workers=1)
+    first = await queue.enqueue(expand, "n1", dedup_key="expand:n1")
+    second = await queue.enqueue(expand, "n1", dedup_key="expand:n1")
+    aliased = await queue.enqueue(
+        expand, "n1", dedup_key="expand:n1", task_id="caller-id"
+    )
+
+    await queue.start()
+    try:
+        results = [await queue.get_result(t, timeout=2) for t in (first, aliased)]
+    finally:
+        await queue.stop()
+
+    assert second == first
+    assert calls == ["n1"]
+    assert results[0] == results[1] == {"status": "completed", "result": "n1"}
+
+
+@pytest.mark.asyncio
+async def test_supersede_replaces_pending_arguments():
+    calls = []
+
+    async def process(version):
+        calls.append(version)
+        return version
+
+    queue = TaskQueue(max_workers=1)
+    old = await queue.enqueue(process, 1, priority=2, dedup_key="moments:tree")
+    new = await queue.enqueue(
+        process, 2, priority=5, dedup_key="moments:tree", coalesce="supersede"
+    )
+
+    await queue.start()
+    try:
+        old_result = await queue.get_result(old, timeout=2)
+        new_result = await queue.get_result(new, timeout=2)
+    finally:
+        await queue.stop()
+
+    assert calls == [2]
+    assert old_result == new_result == {"status": "completed", "result": 2}
+    assert queue.get_task_metadata(new)["priority"] == 2
+
+
+@pytest.mark.asyncio
+async def test_started_task_does_not_absorb_new_duplicates():
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow():
+        started.set()
+        await release.wait()
+        return "done"
+
+    queue = TaskQueue(max_workers=2)
+    await queue.start()
+    try:
+        first = await queue.enqueue(slow, dedup_key="k")
+        await started.wait()
+        second = await queue.enqueue(slow, dedup_key="k")
+        release.set()
+        await queue.get_result(second, timeout=2)
+    finally:
+        await queue.stop()
+
+    assert first != second
+
+
+def test_durable_duplicates_coalesce_in_store(store):
+    first = store.enqueue("a", "tests.add", [1, 1], {}, dedup_key="k")
+    merged = store.enqueue("b", "tests.add", [5, 5], {}, dedup_key="k")
+    superseded = store.enqueue(
+        "c", "tests.add", [2, 2], {}, priority=1, dedup_key="k", supersede=True
+    )
+
+    assert (first, merged, superseded) == ("a", "b", "c")
+    assert store.enqueue(None, "tests.add", [1, 1], {}, dedup_key="k") == "a"
+    record = store.get("a")
+    assert record["args"] == [2, 2]
+    assert record["priority"] == 1
+    assert store.get("b") == store.get("c") == record
+    assert store.stats() == {TaskStatus.QUEUED: 1, TaskStatus.COALESCED: 2}
+
+    # Duplicates are cleaned up along with the task they were folded into
+    claimed = store.claim(visibility_timeout=30)
+    store.complete(claimed["id"], claimed["lease_owner"], 4, -1)
+    store.purge_expired()
+    assert store.get("b") is None
+    assert store.stats() == {}
+
+
+def test_concurrent_duplicate_coalesces_on_unique_index(store, mocker):
+    store.enqueue("a", "tests.add", [1, 1], {}, dedup_key="k")
+    # Another worker's row appears between our lookup and our insert
+    lookups = iter([lambda *args: None, store._coalesce])
+    coalesce = mocker.patch.object(
+        store, "_coalesce", side_effect=lambda *args: next(lookups)(*args)
+    )
+
+    assert store.enqueue("b", "tests.add", [1, 1], {}, dedup_key="k") == "b"
+    assert coalesce.call_count == 2
+    assert store.get("b")["id"] == "a"
+    assert store.stats() == {TaskStatus.QUEUED: 1, TaskStatus.COALESCED: 1}
+
+
+def test_retrying_task_does_not_absorb_new_duplicates(store):
+    store.enqueue("a", "tests.add", [1, 1], {}, dedup_key="k")
+    claimed = store.claim(visibility_timeout=30)
+    store.fail("a", claimed["lease_owner"], {"error": "transient"}, 0.0, 60)
+
+    assert store.enqueue("b", "tests.add", [1, 1], {}, dedup_key="k") == "b"
+    assert store.stats() == {TaskStatus.QUEUED: 2}
+
+
+@pytest.mark.asyncio
+async def test_durable_merge_keeps_the_callers_task_id(store):
+    queue = make_queue(store)
+    first = await queue.enqueue("tests.add", 1, 2, dedup_key="add:1:2")
+    second = await queue.enqueue(
+        "tests.add", 1, 2, dedup_key="add:1:2", task_id="caller-id"
+    )
+
+    await queue.start()
+    try:
+        results = [await queue.get_result(t, timeout=5) for t in (first, second)]
+    finally:
+        await queue.stop()
+
+    assert second == "caller-id"
+    assert results == [{"status": "completed", "result": 3}] * 2